@@ -14,8 +14,23 @@ import json
 import logging
 import random
 import os
-from dataclasses import dataclass, field
-from typing import List, Dict, Optional, Any, Union, Tuple
+import mmap
+import re
+import gzip
+import zlib
+import bisect
+import calendar
+import fnmatch
+import heapq
+import itertools
+import tempfile
+import threading
+import urllib.request
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, Future, wait as wait_futures
+from dataclasses import dataclass, field, replace
+from email.utils import formatdate
+from typing import List, Dict, Optional, Any, Union, Tuple, Iterator, Iterable, Callable
 from datetime import datetime, timedelta
 from enum import Enum
 import uuid
@@ -61,6 +76,13 @@ class ContentStatus(Enum):
     FAILED = "failed"
     EXPIRED = "expired"
 
+class PurgeType(Enum):
+    """Purge match type enumeration."""
+    URL = "url"
+    PREFIX = "prefix"
+    GLOB = "glob"
+    TAG = "tag"
+
 @dataclass
 class Content:
     """Content model."""
@@ -77,6 +99,7 @@ class Content:
     last_accessed: Optional[datetime] = None
     access_count: int = 0
     checksum: str = ""
+    surrogate_keys: List[str] = field(default_factory=list)  # Tags for group purges
 
 @dataclass
 class EdgeNode:
@@ -98,7 +121,7 @@ class CacheEntry:
     content_id: str
     node_id: str
     url: str
-    content_data: bytes
+    content_data: bytes  # Body; a memory-mapped view when loaded from the object store
     content_type: ContentType
     mime_type: str
     file_size: int
@@ -132,12 +155,763 @@ class PurgeRequest:
     status: str = "pending"  # pending, completed, failed
     created_at: datetime = field(default_factory=datetime.now)
     completed_at: Optional[datetime] = None
+    purge_type: PurgeType = PurgeType.URL
+    soft: bool = False  # Mark cached copies stale instead of deleting them
+    matched_content: int = 0
+    purged_copies: int = 0
+
+@dataclass
+class PrefetchJob:
+    """Cache warming job model."""
+    job_id: str
+    urls: List[str]
+    locations: List[EdgeLocation] = field(default_factory=list)  # Empty means every location
+    status: str = "pending"  # pending, running, completed, failed
+    concurrency: int = 4
+    total: int = 0  # (URL, node) pairs to warm
+    filled: int = 0
+    skipped: int = 0  # Already cached
+    failed: int = 0
+    errors: List[str] = field(default_factory=list)
+    created_at: datetime = field(default_factory=datetime.now)
+    completed_at: Optional[datetime] = None
+
+class ObjectStore:
+    """Content-addressed on-disk store for cached object bodies.
+    
+    Bodies are stored once per checksum under root/ab/abcdef..., so the same
+    object cached on several edge nodes shares one file. Reads are served
+    from memory maps or with sendfile rather than copied out of SQLite.
+    """
+    
+    def __init__(self, root: str):
+        self.root = root
+    
+    def path(self, checksum: str) -> str:
+        """Get the file path for a checksum."""
+        return os.path.join(self.root, checksum[:2], checksum)
+    
+    def exists(self, checksum: str) -> bool:
+        """Check whether an object is stored."""
+        return bool(checksum) and os.path.exists(self.path(checksum))
+    
+    def size(self, checksum: str) -> int:
+        """Get an object's size in bytes."""
+        return os.path.getsize(self.path(checksum))
+    
+    def put(self, data: bytes) -> str:
+        """Store data and return its checksum, skipping bodies already stored."""
+        checksum = hashlib.md5(data).hexdigest()
+        path = self.path(checksum)
+        if os.path.exists(path):
+            return checksum
+        
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write aside and rename so readers never see a partial object
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            raise
+        return checksum
+    
+    def open(self, checksum: str):
+        """Open an object for binary reading."""
+        return open(self.path(checksum), 'rb')
+    
+    def view(self, checksum: str, offset: int = 0, length: int = None) -> memoryview:
+        """Get a read-only memory-mapped view of an object (or a slice of it)."""
+        with self.open(checksum) as f:
+            size = os.fstat(f.fileno()).st_size
+            if size == 0:
+                return memoryview(b"")
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        end = size if length is None else min(size, offset + length)
+        return memoryview(mapped)[offset:end]
+    
+    def sendfile(self, checksum: str, out_fd: int, offset: int = 0, count: int = None) -> int:
+        """Copy an object (or a slice of it) to a socket or file descriptor.
+        
+        Uses os.sendfile where available so the body never enters user space.
+        Returns the number of bytes sent.
+        """
+        with self.open(checksum) as f:
+            size = os.fstat(f.fileno()).st_size
+            remaining = size - offset if count is None else min(count, size - offset)
+            sent = 0
+            while remaining > 0:
+                if hasattr(os, 'sendfile'):
+                    n = os.sendfile(out_fd, f.fileno(), offset + sent, remaining)
+                else:
+                    f.seek(offset + sent)
+                    n = os.write(out_fd, f.read(min(remaining, 65536)))
+                if n == 0:
+                    break
+                sent += n
+                remaining -= n
+        return sent
+    
+    def delete(self, checksum: str) -> bool:
+        """Delete an object."""
+        try:
+            os.unlink(self.path(checksum))
+            return True
+        except FileNotFoundError:
+            return False
+    
+    def checksums(self) -> List[str]:
+        """List the checksums of all stored objects."""
+        if not os.path.isdir(self.root):
+            return []
+        return [name for prefix in os.listdir(self.root)
+                if os.path.isdir(os.path.join(self.root, prefix))
+                for name in os.listdir(os.path.join(self.root, prefix))
+                if not name.startswith('tmp')]
+
+class RangeNotSatisfiable(ValueError):
+    """A Range header selects no bytes of the representation."""
+
+def parse_range_header(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """Parse a bytes Range header into an inclusive (start, end) pair.
+    
+    Returns None when the whole representation should be sent: no header,
+    another unit, a malformed value or several ranges (which a server may
+    ignore). Raises RangeNotSatisfiable when the range starts past the end.
+    """
+    if not header:
+        return None
+    unit, _, spec = header.partition('=')
+    if unit.strip().lower() != 'bytes' or ',' in spec:
+        return None
+    first, dash, last = spec.strip().partition('-')
+    try:
+        start = int(first) if first else None
+        end = int(last) if last else None
+    except ValueError:
+        return None
+    if not dash or (start is None and end is None):
+        return None
+    
+    if start is None:
+        # Suffix range: the last `end` bytes
+        if end == 0 or size == 0:
+            raise RangeNotSatisfiable(header)
+        return max(size - end, 0), size - 1
+    if end is not None and end < start:
+        return None
+    if start >= size:
+        raise RangeNotSatisfiable(header)
+    return start, size - 1 if end is None else min(end, size - 1)
+
+# Content codings precomputed for compressible objects, in order of preference
+CONTENT_ENCODERS: Dict[str, Callable[[bytes], bytes]] = {
+    'gzip': lambda data: gzip.compress(data, compresslevel=9, mtime=0),
+    'deflate': lambda data: zlib.compress(data, 9)
+}
+
+COMPRESSIBLE_MIME_TYPES = {
+    'application/javascript', 'application/x-javascript', 'application/json',
+    'application/ld+json', 'application/manifest+json', 'application/xml',
+    'application/xhtml+xml', 'application/wasm', 'image/svg+xml'
+}
+
+def is_compressible(mime_type: str) -> bool:
+    """Check whether a MIME type is worth compressing."""
+    mime_type = mime_type.split(';')[0].strip().lower()
+    return mime_type.startswith('text/') or mime_type in COMPRESSIBLE_MIME_TYPES
+
+def negotiate_encoding(accept_encoding: Optional[str], available: Iterable[str]) -> Optional[str]:
+    """Pick the available content coding an Accept-Encoding header ranks highest.
+    
+    Ties go to the order of CONTENT_ENCODERS. Returns None when the client
+    accepts none of them, meaning the identity body should be sent.
+    """
+    if not accept_encoding:
+        return None
+    weights = {}
+    for part in accept_encoding.split(','):
+        coding, _, params = part.partition(';')
+        quality = 1.0
+        match = re.search(r'q\s*=\s*([0-9.]+)', params)
+        if match:
+            try:
+                quality = float(match.group(1))
+            except ValueError:
+                quality = 0.0
+        weights[coding.strip().lower()] = quality
+    
+    best, best_quality = None, 0.0
+    for encoding in CONTENT_ENCODERS:
+        if encoding in available:
+            quality = weights.get(encoding, weights.get('*', 0.0))
+            if quality > best_quality:
+                best, best_quality = encoding, quality
+    return best
+
+def parse_prefetch_manifest(manifest: str) -> List[str]:
+    """Read URLs from a prefetch manifest.
+    
+    A manifest is a JSON list of URLs, a JSON object with a "urls" list, or
+    plain text with one URL per line (blank lines and # comments ignored).
+    """
+    try:
+        parsed = json.loads(manifest)
+    except ValueError:
+        return [line.strip() for line in manifest.splitlines()
+                if line.strip() and not line.strip().startswith('#')]
+    urls = parsed.get('urls', []) if isinstance(parsed, dict) else parsed
+    if not isinstance(urls, list) or not all(isinstance(url, str) for url in urls):
+        raise ValueError("manifest must list URLs")
+    return urls
+
+class SimulatedOrigin:
+    """Stand-in origin serving a placeholder body for every URL."""
+    
+    def fetch(self, url: str, start: int = 0, end: int = None) -> Tuple[int, Iterator[bytes]]:
+        """Fetch bytes start..end (inclusive) of an object; returns (total size, chunks)."""
+        body = b"Simulated content data for " + url.encode()
+        end = len(body) - 1 if end is None else min(end, len(body) - 1)
+        return len(body), iter([body[start:end + 1]])
+
+class HTTPOrigin:
+    """Origin client fetching object bodies over HTTP with ranged GETs."""
+    
+    def __init__(self, chunk_size: int = 65536, timeout: float = 10.0):
+        self.chunk_size = chunk_size
+        self.timeout = timeout
+    
+    def fetch(self, url: str, start: int = 0, end: int = None) -> Tuple[int, Iterator[bytes]]:
+        """Fetch bytes start..end (inclusive) of an object; returns (total size, chunks).
+        
+        Headers are read before returning; the body is read lazily in
+        chunk_size pieces as the chunks are consumed.
+        """
+        headers = {}
+        if start or end is not None:
+            headers['Range'] = f"bytes={start}-{'' if end is None else end}"
+        response = urllib.request.urlopen(urllib.request.Request(url, headers=headers),
+                                          timeout=self.timeout)
+        
+        content_range = response.headers.get('Content-Range')
+        content_length = response.headers.get('Content-Length')
+        if response.status == 206 and content_range:
+            total, skip = int(content_range.rsplit('/', 1)[1]), 0
+        elif content_length is not None:
+            total, skip = int(content_length), start  # Origin ignored the range
+        else:
+            with response:
+                body = response.read()
+            end = len(body) - 1 if end is None else end
+            return len(body), iter([body[start:end + 1]])
+        
+        length = (total if end is None else min(end + 1, total)) - start
+        return total, self._read(response, skip, length)
+    
+    def _read(self, response, skip: int, length: int) -> Iterator[bytes]:
+        """Read length bytes after skipping skip bytes, then close the response."""
+        with response:
+            while skip > 0:
+                skipped = len(response.read(min(skip, self.chunk_size)))
+                if not skipped:
+                    return
+                skip -= skipped
+            while length > 0:
+                chunk = response.read(min(length, self.chunk_size))
+                if not chunk:
+                    return
+                length -= len(chunk)
+                yield chunk
+
+class GDSFCache:
+    """Size-aware cache index with Greedy-Dual-Size-Frequency eviction.
+    
+    An object's priority is L + frequency / size, where L is the priority of
+    the last object evicted. Small, frequently used objects stay longest,
+    and the rising L ages out objects that were popular once. Values are
+    optional, so the same index can hold bodies or just order metadata.
+    """
+    
+    def __init__(self, capacity: float):
+        self.capacity = capacity
+        self.used = 0
+        self.clock = 0.0
+        self.entries: Dict[Any, list] = {}  # key -> [priority, frequency, size, value, seq]
+        self.heap: List[Tuple[float, int, Any]] = []
+        self.counter = itertools.count()
+    
+    def __contains__(self, key) -> bool:
+        return key in self.entries
+    
+    def __len__(self) -> int:
+        return len(self.entries)
+    
+    def _push(self, key, entry: list):
+        """Reprioritize an entry; superseded heap items are skipped when popped."""
+        entry[0] = self.clock + entry[1] / max(entry[2], 1)
+        entry[4] = next(self.counter)
+        heapq.heappush(self.heap, (entry[0], entry[4], key))
+        if len(self.heap) > 2 * len(self.entries) + 64:
+            self.heap = [(e[0], e[4], k) for k, e in self.entries.items()]
+            heapq.heapify(self.heap)
+    
+    def get(self, key, default=None):
+        """Get a value, counting the access."""
+        entry = self.entries.get(key)
+        if entry is None:
+            return default
+        entry[1] += 1
+        self._push(key, entry)
+        return entry[3]
+    
+    def put(self, key, size: int, value=None, frequency: int = 1) -> List[Tuple[Any, Any]]:
+        """Insert or replace an object, returning the (key, value) pairs evicted for it.
+        
+        A replaced object keeps its frequency. Raises ValueError for objects
+        larger than the whole cache.
+        """
+        if size > self.capacity:
+            raise ValueError(f"object of {size} bytes exceeds cache capacity")
+        old = self.entries.pop(key, None)
+        if old is not None:
+            self.used -= old[2]
+            frequency = max(frequency, old[1])
+        
+        evicted = []
+        while self.used + size > self.capacity:
+            evicted.append(self.pop())
+        entry = [0.0, frequency, size, value, 0]
+        self.entries[key] = entry
+        self.used += size
+        self._push(key, entry)
+        return evicted
+    
+    def pop(self) -> Tuple[Any, Any]:
+        """Evict the lowest-priority object, returning (key, value)."""
+        while self.heap:
+            priority, seq, key = heapq.heappop(self.heap)
+            entry = self.entries.get(key)
+            if entry is not None and entry[4] == seq:
+                del self.entries[key]
+                self.used -= entry[2]
+                self.clock = priority
+                return key, entry[3]
+        raise KeyError("pop from an empty cache")
+    
+    def peek(self, key, default=None):
+        """Get a value without counting an access."""
+        entry = self.entries.get(key)
+        return default if entry is None else entry[3]
+    
+    def frequency(self, key) -> int:
+        """Get how often an object has been used (0 if absent)."""
+        entry = self.entries.get(key)
+        return 0 if entry is None else entry[1]
+    
+    def remove(self, key):
+        """Remove an object without aging the cache; returns its value."""
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return None
+        self.used -= entry[2]
+        return entry[3]
+
+class EdgeNodeCache:
+    """Cache state for one edge node: hot bodies in memory, the rest on disk.
+    
+    The memory tier holds CacheEntry objects with their bodies, so hits on
+    hot objects touch neither SQLite nor the object store. The disk tier
+    holds no bodies; it orders every cached entry (by content ID) and large
+    object segment (by (content ID, index)) for eviction, and its byte
+    count is the node's used capacity.
+    """
+    
+    def __init__(self, node_id: str, memory_capacity: int, disk_capacity: float):
+        self.node_id = node_id
+        self.memory = GDSFCache(memory_capacity)
+        self.disk = GDSFCache(disk_capacity)
+        # Hits not yet written back: cache_id -> [last_accessed, count]
+        self.pending_hits: Dict[str, list] = {}
+    
+    def record_hit(self, cache_id: str, accessed_at: datetime) -> int:
+        """Remember a hit for the next stats flush; returns the pending count."""
+        pending = self.pending_hits.setdefault(cache_id, [accessed_at, 0])
+        pending[0] = accessed_at
+        pending[1] += 1
+        return len(self.pending_hits)
+
+def replay_cache_trace(trace: Iterable[Tuple[str, int]], capacity: int) -> Dict[str, Dict[str, float]]:
+    """Replay (key, size) requests through GDSF and LRU caches of one capacity.
+    
+    Returns the hit ratio and byte hit ratio of each policy, in percent.
+    """
+    gdsf = GDSFCache(capacity)
+    lru = OrderedDict()
+    lru_used = 0
+    stats = {policy: {'requests': 0, 'hits': 0, 'bytes': 0, 'hit_bytes': 0}
+             for policy in ('gdsf', 'lru')}
+    
+    for key, size in trace:
+        for policy in stats:
+            stats[policy]['requests'] += 1
+            stats[policy]['bytes'] += size
+        
+        if key in gdsf:
+            gdsf.get(key)
+            stats['gdsf']['hits'] += 1
+            stats['gdsf']['hit_bytes'] += size
+        elif size <= capacity:
+            gdsf.put(key, size)
+        
+        if key in lru:
+            lru.move_to_end(key)
+            stats['lru']['hits'] += 1
+            stats['lru']['hit_bytes'] += size
+        elif size <= capacity:
+            lru[key] = size
+            lru_used += size
+            while lru_used > capacity:
+                lru_used -= lru.popitem(last=False)[1]
+    
+    return {
+        policy: {
+            'requests': counts['requests'],
+            'hit_ratio': round(counts['hits'] / counts['requests'] * 100, 2) if counts['requests'] else 0.0,
+            'byte_hit_ratio': round(counts['hit_bytes'] / counts['bytes'] * 100, 2) if counts['bytes'] else 0.0
+        }
+        for policy, counts in stats.items()
+    }
+
+def zipf_trace(requests: int, objects: int, alpha: float = 0.8,
+               seed: int = 0) -> Iterator[Tuple[str, int]]:
+    """Generate a synthetic request trace with Zipf popularity and log-normal sizes."""
+    rng = random.Random(seed)
+    sizes = [int(min(rng.lognormvariate(9, 2), 50 * 1024 * 1024)) + 1 for _ in range(objects)]
+    weights = list(itertools.accumulate(1 / (rank + 1) ** alpha for rank in range(objects)))
+    for _ in range(requests):
+        rank = rng.choices(range(objects), cum_weights=weights)[0]
+        yield f"object_{rank}", sizes[rank]
+
+def load_trace(path: str) -> Iterator[Tuple[str, int]]:
+    """Read a trace file of "key size" lines."""
+    with open(path) as f:
+        for line in f:
+            fields = line.split()
+            if len(fields) >= 2:
+                yield fields[0], int(fields[1])
+
+class URLIndex:
+    """Sorted index of content URLs for exact, prefix and glob lookups.
+    
+    A prefix lookup bisects to the first match and walks forward, costing
+    O(log n + matches). A glob is narrowed to the literal prefix before its
+    first wildcard and the candidates are then matched with fnmatch rules.
+    """
+    
+    def __init__(self):
+        self.urls: List[str] = []
+        self.content_ids: Dict[str, str] = {}
+    
+    def __len__(self) -> int:
+        return len(self.urls)
+    
+    def add(self, url: str, content_id: str):
+        """Index a URL."""
+        if url not in self.content_ids:
+            bisect.insort(self.urls, url)
+        self.content_ids[url] = content_id
+    
+    def remove(self, url: str):
+        """Drop a URL from the index."""
+        if self.content_ids.pop(url, None) is not None:
+            del self.urls[bisect.bisect_left(self.urls, url)]
+    
+    def exact(self, url: str) -> List[str]:
+        """Get the content ID for one URL, as a list."""
+        content_id = self.content_ids.get(url)
+        return [content_id] if content_id else []
+    
+    def iter_prefix(self, prefix: str) -> Iterator[str]:
+        """Iterate indexed URLs starting with prefix, in order."""
+        for i in range(bisect.bisect_left(self.urls, prefix), len(self.urls)):
+            if not self.urls[i].startswith(prefix):
+                break
+            yield self.urls[i]
+    
+    def prefix(self, prefix: str) -> List[str]:
+        """Get content IDs for URLs starting with prefix."""
+        return [self.content_ids[url] for url in self.iter_prefix(prefix)]
+    
+    def glob(self, pattern: str) -> List[str]:
+        """Get content IDs for URLs matching a shell-style pattern."""
+        literal = re.split(r'[*?\[]', pattern, maxsplit=1)[0]
+        matcher = re.compile(fnmatch.translate(pattern))
+        return [self.content_ids[url] for url in self.iter_prefix(literal) if matcher.match(url)]
+
+# Approximate coordinates of each edge location, for distance estimates
+REGION_COORDINATES = {
+    EdgeLocation.US_EAST: (39.0, -77.5),
+    EdgeLocation.US_WEST: (37.4, -122.0),
+    EdgeLocation.EU_WEST: (53.3, -6.3),
+    EdgeLocation.EU_CENTRAL: (50.1, 8.7),
+    EdgeLocation.ASIA_PACIFIC: (1.35, 103.8),
+    EdgeLocation.ASIA_SOUTH: (19.1, 72.9),
+}
+
+def region_latency_ms(a: EdgeLocation, b: EdgeLocation) -> float:
+    """Estimate round-trip latency between two locations (about 1 ms per 100 km)."""
+    lat1, lon1 = map(math.radians, REGION_COORDINATES[a])
+    lat2, lon2 = map(math.radians, REGION_COORDINATES[b])
+    cos_angle = (math.sin(lat1) * math.sin(lat2) +
+                 math.cos(lat1) * math.cos(lat2) * math.cos(lon1 - lon2))
+    return 6371 * math.acos(max(-1.0, min(1.0, cos_angle))) / 100
+
+class EdgeNodeTable:
+    """In-memory routing view of the active edge nodes.
+    
+    Built once per change to the node set. Each client location gets a
+    ranked node list (node latency plus estimated distance from the
+    location) and a consistent-hash ring over its own nodes, so a URL keeps
+    landing on the same node and per-node hit ratios stay high. Nodes that
+    are over capacity or, when a heartbeat_timeout is set, missed heartbeats are
+    skipped in favour of the next one along the ring, then along the ranking.
+    """
+    
+    def __init__(self, nodes: List[EdgeNode], virtual_nodes: int = 64,
+                 heartbeat_timeout: Optional[int] = None):
+        self.nodes = {node.node_id: node for node in nodes}
+        # Without heartbeats being reported, node liveness isn't checked
+        self.heartbeat_timeout = (timedelta(seconds=heartbeat_timeout)
+                                  if heartbeat_timeout is not None else None)
+        
+        self.ranked = {None: sorted(nodes, key=lambda node: node.latency_ms)}
+        self.rings: Dict[EdgeLocation, Tuple[List[int], List[EdgeNode]]] = {}
+        for location in EdgeLocation:
+            self.ranked[location] = sorted(
+                nodes, key=lambda node: node.latency_ms + region_latency_ms(location, node.location))
+            points = sorted(
+                ((self.hash(f"{node.node_id}#{i}"), node.node_id)
+                 for node in nodes if node.location == location
+                 for i in range(virtual_nodes)))
+            self.rings[location] = ([point for point, _ in points],
+                                    [self.nodes[node_id] for _, node_id in points])
+    
+    @staticmethod
+    def hash(key: str) -> int:
+        """Hash a key onto the ring."""
+        return zlib.crc32(key.encode())
+    
+    def is_available(self, node: EdgeNode, now: datetime) -> bool:
+        """Check a node has cache capacity to spare and, if required, is heartbeating."""
+        # A node at capacity evicts to make room; one holding more than its
+        # capacity (shrunk, or draining) is routed around
+        if node.capacity <= 0 or node.used_capacity > node.capacity:
+            return False
+        return self.heartbeat_timeout is None or now - node.last_heartbeat <= self.heartbeat_timeout
+    
+    def select(self, location: EdgeLocation = None, url: str = None) -> Optional[EdgeNode]:
+        """Pick the node to serve a request from a location, for a URL if given."""
+        now = datetime.now()
+        ring = self.rings.get(location)
+        if url is not None and ring and ring[0]:
+            points, ring_nodes = ring
+            start = bisect.bisect(points, self.hash(url))
+            for i in range(len(ring_nodes)):
+                node = ring_nodes[(start + i) % len(ring_nodes)]
+                if self.is_available(node, now):
+                    return node
+        
+        ranked = self.ranked[location]
+        for node in ranked:
+            if self.is_available(node, now):
+                return node
+        # No node looks healthy; keep routing as usual rather than failing requests
+        if url is not None and ring and ring[0]:
+            return ring[1][bisect.bisect(ring[0], self.hash(url)) % len(ring[1])]
+        return ranked[0] if ranked else None
+
+class RequestCollapser:
+    """Collapses concurrent calls for the same key into a single call.
+    
+    The first caller for a key runs the function; callers arriving while it
+    is in flight wait for it and share its result, or its exception. Work
+    that outlives the call starting it (a fill running in the background)
+    uses start() or lead() and reports its outcome with finish().
+    """
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.flights: Dict[Any, Dict[str, Any]] = {}
+        self.calls = 0
+        self.collapsed = 0
+    
+    def _new_flight(self, key: Any, state: Dict[str, Any]) -> Dict[str, Any]:
+        """Register a flight for key; call with the lock held."""
+        flight = {'done': threading.Event(), 'result': None, 'error': None, **state}
+        self.flights[key] = flight
+        self.calls += 1
+        return flight
+    
+    def start(self, key: Any, **state) -> Tuple[bool, Dict[str, Any]]:
+        """Join the flight for key, or lead a new one carrying state.
+        
+        Returns (leader, flight); a leader must call finish() for the flight.
+        """
+        with self.lock:
+            flight = self.flights.get(key)
+            if flight is None:
+                return True, self._new_flight(key, state)
+            self.collapsed += 1
+            return False, flight
+    
+    def lead(self, key: Any, **state) -> Optional[Dict[str, Any]]:
+        """Lead a new flight for key, or return None if one is in flight."""
+        with self.lock:
+            if key in self.flights:
+                return None
+            return self._new_flight(key, state)
+    
+    def wait(self, flight: Dict[str, Any]) -> Any:
+        """Wait for a flight and return its result, or raise its exception."""
+        flight['done'].wait()
+        if flight['error'] is not None:
+            raise flight['error']
+        return flight['result']
+    
+    def finish(self, key: Any, flight: Dict[str, Any], result: Any = None,
+               error: BaseException = None):
+        """Record a led flight's outcome and release the callers waiting for it."""
+        flight['result'], flight['error'] = result, error
+        with self.lock:
+            del self.flights[key]
+        flight['done'].set()
+    
+    def run(self, key: Any, func: Callable[[], Any]) -> Any:
+        """Call func for key, or wait for the call already in flight."""
+        leader, flight = self.start(key)
+        if not leader:
+            return self.wait(flight)
+        
+        try:
+            result = func()
+        except BaseException as e:
+            self.finish(key, flight, error=e)
+            raise
+        self.finish(key, flight, result)
+        return result
+    
+    def in_flight(self, key: Any) -> bool:
+        """Check whether a call for key is running."""
+        with self.lock:
+            return key in self.flights
+
+class StreamBuffer:
+    """A body fetched once and streamed to any number of readers as it arrives.
+    
+    The writer calls start() with the body's size, append() for each chunk
+    and finish() once it is done, whether or not the body was complete.
+    """
+    
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.data = bytearray()
+        self.size: Optional[int] = None
+        self.done = False
+    
+    @classmethod
+    def of(cls, data: Optional[bytes]) -> 'StreamBuffer':
+        """Make a finished buffer for a whole body, or a failed one for None."""
+        buffer = cls()
+        if data is not None:
+            buffer.start(len(data))
+            buffer.append(data)
+        buffer.finish()
+        return buffer
+    
+    def start(self, size: int):
+        """Set the body's size."""
+        with self.condition:
+            self.size = size
+            self.condition.notify_all()
+    
+    def append(self, chunk: bytes):
+        """Add the next chunk of the body."""
+        with self.condition:
+            self.data += chunk
+            self.condition.notify_all()
+    
+    def finish(self):
+        """Mark the body as done, releasing readers waiting for more."""
+        with self.condition:
+            self.done = True
+            self.condition.notify_all()
+    
+    def wait_size(self) -> Optional[int]:
+        """Wait for the body's size; None if the fetch failed before it was known."""
+        with self.condition:
+            self.condition.wait_for(lambda: self.size is not None or self.done)
+            return self.size
+    
+    def wait(self):
+        """Wait for the writer to finish."""
+        with self.condition:
+            self.condition.wait_for(lambda: self.done)
+    
+    def read(self, start: int, end: int, chunk_size: int) -> Iterator[bytes]:
+        """Yield bytes start..end (inclusive) in pieces of at most chunk_size as they arrive.
+        
+        Stops early if the body ends short. Returns, or closes, only once
+        the writer has finished, so the body is cached by the time a reader
+        is done even if its client went away.
+        """
+        offset = start
+        try:
+            while offset <= end:
+                with self.condition:
+                    self.condition.wait_for(lambda: len(self.data) > offset or self.done)
+                    if len(self.data) <= offset:
+                        break
+                    piece = bytes(self.data[offset:min(len(self.data), end + 1, offset + chunk_size)])
+                yield piece
+                offset += len(piece)
+        finally:
+            self.wait()
+
+CACHE_ENTRY_COLUMNS = (
+    "cache_id, content_id, node_id, url, content_type, mime_type, file_size, ttl, "
+    "created_at, expires_at, last_accessed, access_count, checksum"
+)
+
+# Upper bounds (ms) of the latency histogram buckets; a last bucket takes the rest
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+REQUEST_STATS_SUMS = ["requests", "cache_hits", "bytes_transferred", "response_time_total"] + [
+    f"latency_{i}" for i in range(len(LATENCY_BUCKETS_MS) + 1)]
+
+def minute_bucket(moment: datetime) -> int:
+    """Start of the minute containing a timestamp, in epoch seconds."""
+    return calendar.timegm(moment.timetuple()) // 60 * 60
+
+def histogram_percentile(histogram: List[int], percentile: float, maximum: int) -> int:
+    """Estimate a latency percentile as the upper bound of the bucket it falls in."""
+    rank = sum(histogram) * percentile / 100
+    cumulative = 0
+    for i, count in enumerate(histogram):
+        cumulative += count
+        if count and cumulative >= rank:
+            return min(LATENCY_BUCKETS_MS[i], maximum) if i < len(LATENCY_BUCKETS_MS) else maximum
+    return 0
 
 class CDNDatabase:
     """Database operations for CDN service."""
     
-    def __init__(self, db_path: str = "cdn.db"):
+    def __init__(self, db_path: str = "cdn.db", object_dir: str = None):
         self.db_path = db_path
+        self.objects = ObjectStore(object_dir or os.path.splitext(db_path)[0] + "_objects")
+        # Bumped whenever edge nodes are saved, so routing tables know to rebuild
+        self.node_version = 0
         self.init_database()
     
     def init_database(self):
@@ -160,7 +934,19 @@ class CDNDatabase:
                 updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                 last_accessed TIMESTAMP,
                 access_count INTEGER DEFAULT 0,
-                checksum TEXT DEFAULT ''
+                checksum TEXT DEFAULT '',
+                surrogate_keys TEXT DEFAULT ''
+            )
+        ''')
+        self._add_missing_columns(cursor, 'content', {'surrogate_keys': "TEXT DEFAULT ''"})
+        
+        # Surrogate keys (tags) index for group purges
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS content_tags (
+                tag TEXT NOT NULL,
+                content_id TEXT NOT NULL,
+                PRIMARY KEY (tag, content_id),
+                FOREIGN KEY (content_id) REFERENCES content (content_id)
             )
         ''')
         
@@ -179,14 +965,18 @@ class CDNDatabase:
             )
         ''')
         
-        # Cache entries table
+        # Cache entries table; bodies live in the object store, keyed by checksum
+        cursor.execute("PRAGMA table_info(cache_entries)")
+        legacy_blobs = any(column[1] == 'content_data' for column in cursor.fetchall())
+        if legacy_blobs:
+            self._migrate_cache_blobs(cursor)
+        
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS cache_entries (
                 cache_id TEXT PRIMARY KEY,
                 content_id TEXT NOT NULL,
                 node_id TEXT NOT NULL,
                 url TEXT NOT NULL,
-                content_data BLOB NOT NULL,
                 content_type TEXT NOT NULL,
                 mime_type TEXT NOT NULL,
                 file_size INTEGER NOT NULL,
@@ -200,6 +990,12 @@ class CDNDatabase:
                 FOREIGN KEY (node_id) REFERENCES edge_nodes (node_id)
             )
         ''')
+        if legacy_blobs:
+            cursor.execute(f'''
+                INSERT INTO cache_entries ({CACHE_ENTRY_COLUMNS})
+                SELECT {CACHE_ENTRY_COLUMNS} FROM cache_entries_old
+            ''')
+            cursor.execute("DROP TABLE cache_entries_old")
         
         # Request logs table
         cursor.execute('''
@@ -219,6 +1015,53 @@ class CDNDatabase:
             )
         ''')
         
+        # Prefetch (cache warming) jobs
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS prefetch_jobs (
+                job_id TEXT PRIMARY KEY,
+                urls TEXT NOT NULL,
+                locations TEXT NOT NULL,
+                status TEXT DEFAULT 'pending',
+                concurrency INTEGER DEFAULT 4,
+                total INTEGER DEFAULT 0,
+                filled INTEGER DEFAULT 0,
+                skipped INTEGER DEFAULT 0,
+                failed INTEGER DEFAULT 0,
+                errors TEXT DEFAULT '[]',
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                completed_at TIMESTAMP
+            )
+        ''')
+        
+        # Per-minute request rollups, which analytics are answered from
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'request_stats'")
+        backfill_stats = cursor.fetchone() is None
+        latency_columns = ",\n".join(f"                {name} INTEGER DEFAULT 0"
+                                      for name in REQUEST_STATS_SUMS[4:])
+        cursor.execute(f'''
+            CREATE TABLE IF NOT EXISTS request_stats (
+                minute INTEGER NOT NULL,
+                node_id TEXT NOT NULL,
+                content_id TEXT NOT NULL,
+                status_code INTEGER NOT NULL,
+                requests INTEGER DEFAULT 0,
+                cache_hits INTEGER DEFAULT 0,
+                bytes_transferred INTEGER DEFAULT 0,
+                response_time_total INTEGER DEFAULT 0,
+                response_time_max INTEGER DEFAULT 0,
+{latency_columns},
+                PRIMARY KEY (minute, node_id, content_id, status_code)
+            )
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_request_stats_node ON request_stats (node_id, minute)
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_request_stats_content ON request_stats (content_id, minute)
+        ''')
+        if backfill_stats:
+            self._backfill_request_stats(cursor)
+        
         # Purge requests table
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS purge_requests (
@@ -228,13 +1071,99 @@ class CDNDatabase:
                 status TEXT DEFAULT 'pending',
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                 completed_at TIMESTAMP,
+                purge_type TEXT DEFAULT 'url',
+                soft BOOLEAN DEFAULT 0,
+                matched_content INTEGER DEFAULT 0,
+                purged_copies INTEGER DEFAULT 0,
                 FOREIGN KEY (content_id) REFERENCES content (content_id)
             )
         ''')
+        self._add_missing_columns(cursor, 'purge_requests', {
+            'purge_type': "TEXT DEFAULT 'url'",
+            'soft': "BOOLEAN DEFAULT 0",
+            'matched_content': "INTEGER DEFAULT 0",
+            'purged_copies': "INTEGER DEFAULT 0"
+        })
+        
+        # Segments of large objects, cached piece by piece as ranges are requested
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS cache_segments (
+                content_id TEXT NOT NULL,
+                node_id TEXT NOT NULL,
+                segment_index INTEGER NOT NULL,
+                checksum TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                expires_at TIMESTAMP NOT NULL,
+                PRIMARY KEY (content_id, node_id, segment_index)
+            )
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_cache_segments_checksum ON cache_segments (checksum)
+        ''')
+        
+        # Compressed variants of cached bodies, keyed by the identity body's checksum
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS cache_variants (
+                checksum TEXT NOT NULL,
+                encoding TEXT NOT NULL,
+                variant_checksum TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                PRIMARY KEY (checksum, encoding)
+            )
+        ''')
+        
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_cache_entries_content_node
+            ON cache_entries (content_id, node_id)
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_cache_entries_checksum ON cache_entries (checksum)
+        ''')
         
         conn.commit()
         conn.close()
     
+    def _add_missing_columns(self, cursor, table: str, columns: Dict[str, str]):
+        """Add columns that databases created by older versions lack."""
+        cursor.execute(f"PRAGMA table_info({table})")
+        existing = {column[1] for column in cursor.fetchall()}
+        for name, definition in columns.items():
+            if name not in existing:
+                cursor.execute(f"ALTER TABLE {table} ADD COLUMN {name} {definition}")
+    
+    def _backfill_request_stats(self, cursor):
+        """Roll up request logs saved before request_stats existed."""
+        bounds = (0,) + LATENCY_BUCKETS_MS
+        buckets = [f"SUM(response_time > {low} AND response_time <= {high})"
+                   for low, high in zip(bounds, bounds[1:])]
+        buckets[0] = f"SUM(response_time <= {LATENCY_BUCKETS_MS[0]})"
+        buckets.append(f"SUM(response_time > {LATENCY_BUCKETS_MS[-1]})")
+        cursor.execute(f'''
+            INSERT INTO request_stats (minute, node_id, content_id, status_code,
+                                       {", ".join(REQUEST_STATS_SUMS)}, response_time_max)
+            SELECT CAST(strftime('%s', request_time) AS INTEGER) / 60 * 60 AS log_minute,
+                   node_id, content_id, status_code, COUNT(*), SUM(cache_hit),
+                   SUM(bytes_transferred), SUM(response_time), {", ".join(buckets)},
+                   MAX(response_time)
+            FROM request_logs
+            WHERE request_time IS NOT NULL
+            GROUP BY log_minute, node_id, content_id, status_code
+        ''')
+    
+    def _migrate_cache_blobs(self, cursor):
+        """Move cache bodies from an old BLOB column into the object store.
+        
+        The old table is renamed aside; init_database recreates it without
+        the column and copies the metadata back.
+        """
+        cursor.execute("SELECT cache_id, content_data FROM cache_entries")
+        for cache_id, data in cursor.fetchall():
+            checksum = self.objects.put(bytes(data or b""))
+            cursor.execute("UPDATE cache_entries SET checksum = ? WHERE cache_id = ?",
+                           (checksum, cache_id))
+        
+        cursor.execute("ALTER TABLE cache_entries RENAME TO cache_entries_old")
+    
     def save_content(self, content: Content) -> bool:
         """Save content to database."""
         try:
@@ -244,14 +1173,20 @@ class CDNDatabase:
             cursor.execute('''
                 INSERT OR REPLACE INTO content 
                 (content_id, url, content_type, file_size, mime_type, cache_strategy,
-                 ttl, status, created_at, updated_at, last_accessed, access_count, checksum)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                 ttl, status, created_at, updated_at, last_accessed, access_count, checksum,
+                 surrogate_keys)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
             ''', (
                 content.content_id, content.url, content.content_type.value,
                 content.file_size, content.mime_type, content.cache_strategy.value,
                 content.ttl, content.status.value, content.created_at, content.updated_at,
-                content.last_accessed, content.access_count, content.checksum
+                content.last_accessed, content.access_count, content.checksum,
+                ' '.join(content.surrogate_keys)
             ))
+            cursor.execute('DELETE FROM content_tags WHERE content_id = ?', (content.content_id,))
+            cursor.executemany('''
+                INSERT OR IGNORE INTO content_tags (tag, content_id) VALUES (?, ?)
+            ''', [(tag, content.content_id) for tag in content.surrogate_keys])
             
             conn.commit()
             conn.close()
@@ -260,6 +1195,43 @@ class CDNDatabase:
             logger.error(f"Error saving content: {e}")
             return False
     
+    def record_content_access(self, content_id: str, accessed_at: datetime) -> bool:
+        """Bump a content item's access statistics without rewriting the row or its tags."""
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                UPDATE content SET last_accessed = ?, access_count = access_count + 1
+                WHERE content_id = ?
+            ''', (accessed_at, content_id))
+            
+            conn.commit()
+            conn.close()
+            return True
+        except Exception as e:
+            logger.error(f"Error recording content access: {e}")
+            return False
+    
+    def _content_from_row(self, row: tuple) -> Content:
+        """Build a Content from a content table row."""
+        return Content(
+            content_id=row[0],
+            url=row[1],
+            content_type=ContentType(row[2]),
+            file_size=row[3],
+            mime_type=row[4],
+            cache_strategy=CacheStrategy(row[5]),
+            ttl=row[6],
+            status=ContentStatus(row[7]),
+            created_at=datetime.fromisoformat(row[8]) if row[8] else datetime.now(),
+            updated_at=datetime.fromisoformat(row[9]) if row[9] else datetime.now(),
+            last_accessed=datetime.fromisoformat(row[10]) if row[10] else None,
+            access_count=row[11] or 0,
+            checksum=row[12] or "",
+            surrogate_keys=(row[13] or "").split()
+        )
+    
     def get_content(self, content_id: str) -> Optional[Content]:
         """Get content by ID."""
         try:
@@ -269,26 +1241,8 @@ class CDNDatabase:
             cursor.execute('SELECT * FROM content WHERE content_id = ?', (content_id,))
             row = cursor.fetchone()
             
-            if row:
-                content = Content(
-                    content_id=row[0],
-                    url=row[1],
-                    content_type=ContentType(row[2]),
-                    file_size=row[3],
-                    mime_type=row[4],
-                    cache_strategy=CacheStrategy(row[5]),
-                    ttl=row[6],
-                    status=ContentStatus(row[7]),
-                    created_at=datetime.fromisoformat(row[8]) if row[8] else datetime.now(),
-                    updated_at=datetime.fromisoformat(row[9]) if row[9] else datetime.now(),
-                    last_accessed=datetime.fromisoformat(row[10]) if row[10] else None,
-                    access_count=row[11] or 0,
-                    checksum=row[12] or ""
-                )
-                conn.close()
-                return content
             conn.close()
-            return None
+            return self._content_from_row(row) if row else None
         except Exception as e:
             logger.error(f"Error getting content: {e}")
             return None
@@ -302,30 +1256,42 @@ class CDNDatabase:
             cursor.execute('SELECT * FROM content WHERE url = ?', (url,))
             row = cursor.fetchone()
             
-            if row:
-                content = Content(
-                    content_id=row[0],
-                    url=row[1],
-                    content_type=ContentType(row[2]),
-                    file_size=row[3],
-                    mime_type=row[4],
-                    cache_strategy=CacheStrategy(row[5]),
-                    ttl=row[6],
-                    status=ContentStatus(row[7]),
-                    created_at=datetime.fromisoformat(row[8]) if row[8] else datetime.now(),
-                    updated_at=datetime.fromisoformat(row[9]) if row[9] else datetime.now(),
-                    last_accessed=datetime.fromisoformat(row[10]) if row[10] else None,
-                    access_count=row[11] or 0,
-                    checksum=row[12] or ""
-                )
-                conn.close()
-                return content
             conn.close()
-            return None
+            return self._content_from_row(row) if row else None
         except Exception as e:
             logger.error(f"Error getting content by URL: {e}")
             return None
     
+    def get_content_urls(self) -> List[Tuple[str, str]]:
+        """Get (url, content_id) for all content."""
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            cursor.execute('SELECT url, content_id FROM content')
+            urls = cursor.fetchall()
+            
+            conn.close()
+            return urls
+        except Exception as e:
+            logger.error(f"Error getting content URLs: {e}")
+            return []
+    
+    def get_content_ids_by_tag(self, tag: str) -> List[str]:
+        """Get IDs of content carrying a surrogate key."""
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            cursor.execute('SELECT content_id FROM content_tags WHERE tag = ?', (tag,))
+            content_ids = [row[0] for row in cursor.fetchall()]
+            
+            conn.close()
+            return content_ids
+        except Exception as e:
+            logger.error(f"Error getting content by tag: {e}")
+            return []
+    
     def save_edge_node(self, node: EdgeNode) -> bool:
         """Save edge node to database."""
         try:
@@ -345,11 +1311,33 @@ class CDNDatabase:
             
             conn.commit()
             conn.close()
+            self.node_version += 1
             return True
         except Exception as e:
             logger.error(f"Error saving edge node: {e}")
             return False
     
+    def update_node_status(self, node_id: str, used_capacity: int = None,
+                           last_heartbeat: datetime = None) -> bool:
+        """Update a node's usage or heartbeat without changing its routing."""
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                UPDATE edge_nodes SET used_capacity = COALESCE(?, used_capacity),
+                                      last_heartbeat = COALESCE(?, last_heartbeat)
+                WHERE node_id = ?
+            ''', (used_capacity, last_heartbeat, node_id))
+            updated = cursor.rowcount > 0
+            
+            conn.commit()
+            conn.close()
+            return updated
+        except Exception as e:
+            logger.error(f"Error updating edge node status: {e}")
+            return False
+    
     def get_edge_nodes(self, location: EdgeLocation = None) -> List[EdgeNode]:
         """Get edge nodes, optionally filtered by location."""
         try:
@@ -391,20 +1379,29 @@ class CDNDatabase:
             return []
     
     def save_cache_entry(self, cache_entry: CacheEntry) -> bool:
-        """Save cache entry to database."""
+        """Save cache entry metadata, storing its body in the object store.
+        
+        The body is written only when no object with the entry's checksum is
+        stored yet, so re-saving an entry or caching the same object on
+        another node does not copy it again.
+        """
         try:
+            if not self.objects.exists(cache_entry.checksum):
+                cache_entry.checksum = self.objects.put(bytes(cache_entry.content_data))
+            
             conn = sqlite3.connect(self.db_path)
             cursor = conn.cursor()
             
-            cursor.execute('''
-                INSERT OR REPLACE INTO cache_entries 
-                (cache_id, content_id, node_id, url, content_data, content_type,
-                 mime_type, file_size, ttl, created_at, expires_at, last_accessed,
-                 access_count, checksum)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            # Hold the write lock so a delete can't remove the body before it is referenced
+            cursor.execute("BEGIN IMMEDIATE")
+            if not self.objects.exists(cache_entry.checksum):
+                cache_entry.checksum = self.objects.put(bytes(cache_entry.content_data))
+            cursor.execute(f'''
+                INSERT OR REPLACE INTO cache_entries ({CACHE_ENTRY_COLUMNS})
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
             ''', (
                 cache_entry.cache_id, cache_entry.content_id, cache_entry.node_id,
-                cache_entry.url, cache_entry.content_data, cache_entry.content_type.value,
+                cache_entry.url, cache_entry.content_type.value,
                 cache_entry.mime_type, cache_entry.file_size, cache_entry.ttl,
                 cache_entry.created_at, cache_entry.expires_at, cache_entry.last_accessed,
                 cache_entry.access_count, cache_entry.checksum
@@ -417,74 +1414,59 @@ class CDNDatabase:
             logger.error(f"Error saving cache entry: {e}")
             return False
     
+    def _cache_entry_from_row(self, row: tuple, with_data: bool) -> CacheEntry:
+        """Build a CacheEntry, memory-mapping its body if with_data is set."""
+        return CacheEntry(
+            cache_id=row[0],
+            content_id=row[1],
+            node_id=row[2],
+            url=row[3],
+            content_data=self.objects.view(row[12]) if with_data else b"",
+            content_type=ContentType(row[4]),
+            mime_type=row[5],
+            file_size=row[6],
+            ttl=row[7],
+            created_at=datetime.fromisoformat(row[8]) if row[8] else datetime.now(),
+            expires_at=datetime.fromisoformat(row[9]) if row[9] else datetime.now(),
+            last_accessed=datetime.fromisoformat(row[10]) if row[10] else datetime.now(),
+            access_count=row[11] or 0,
+            checksum=row[12] or ""
+        )
+    
     def get_cache_entry(self, content_id: str, node_id: str) -> Optional[CacheEntry]:
-        """Get cache entry by content ID and node ID."""
+        """Get cache entry by content ID and node ID, with a mapped view of its body."""
         try:
             conn = sqlite3.connect(self.db_path)
             cursor = conn.cursor()
             
-            cursor.execute('''
-                SELECT * FROM cache_entries 
+            cursor.execute(f'''
+                SELECT {CACHE_ENTRY_COLUMNS} FROM cache_entries 
                 WHERE content_id = ? AND node_id = ?
             ''', (content_id, node_id))
             
             row = cursor.fetchone()
-            if row:
-                cache_entry = CacheEntry(
-                    cache_id=row[0],
-                    content_id=row[1],
-                    node_id=row[2],
-                    url=row[3],
-                    content_data=row[4],
-                    content_type=ContentType(row[5]),
-                    mime_type=row[6],
-                    file_size=row[7],
-                    ttl=row[8],
-                    created_at=datetime.fromisoformat(row[9]) if row[9] else datetime.now(),
-                    expires_at=datetime.fromisoformat(row[10]) if row[10] else datetime.now(),
-                    last_accessed=datetime.fromisoformat(row[11]) if row[11] else datetime.now(),
-                    access_count=row[12] or 0,
-                    checksum=row[13] or ""
-                )
-                conn.close()
-                return cache_entry
             conn.close()
+            if row:
+                return self._cache_entry_from_row(row, with_data=True)
             return None
         except Exception as e:
             logger.error(f"Error getting cache entry: {e}")
             return None
     
     def get_cache_entries_by_node(self, node_id: str) -> List[CacheEntry]:
-        """Get all cache entries for a node."""
+        """Get metadata for all cache entries on a node (bodies are not loaded)."""
         try:
             conn = sqlite3.connect(self.db_path)
             cursor = conn.cursor()
             
-            cursor.execute('''
-                SELECT * FROM cache_entries 
+            cursor.execute(f'''
+                SELECT {CACHE_ENTRY_COLUMNS} FROM cache_entries 
                 WHERE node_id = ?
                 ORDER BY last_accessed DESC
             ''', (node_id,))
             
-            entries = []
-            for row in cursor.fetchall():
-                cache_entry = CacheEntry(
-                    cache_id=row[0],
-                    content_id=row[1],
-                    node_id=row[2],
-                    url=row[3],
-                    content_data=row[4],
-                    content_type=ContentType(row[5]),
-                    mime_type=row[6],
-                    file_size=row[7],
-                    ttl=row[8],
-                    created_at=datetime.fromisoformat(row[9]) if row[9] else datetime.now(),
-                    expires_at=datetime.fromisoformat(row[10]) if row[10] else datetime.now(),
-                    last_accessed=datetime.fromisoformat(row[11]) if row[11] else datetime.now(),
-                    access_count=row[12] or 0,
-                    checksum=row[13] or ""
-                )
-                entries.append(cache_entry)
+            entries = [self._cache_entry_from_row(row, with_data=False)
+                       for row in cursor.fetchall()]
             
             conn.close()
             return entries
@@ -492,30 +1474,519 @@ class CDNDatabase:
             logger.error(f"Error getting cache entries by node: {e}")
             return []
     
+    def touch_cache_entries(self, hits: Dict[str, list]) -> bool:
+        """Record batched hits ({cache_id: [last_accessed, count]}) in one transaction."""
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            cursor.executemany('''
+                UPDATE cache_entries SET last_accessed = ?, access_count = access_count + ?
+                WHERE cache_id = ?
+            ''', [(last_accessed, count, cache_id) for cache_id, (last_accessed, count) in hits.items()])
+            
+            conn.commit()
+            conn.close()
+            return True
+        except Exception as e:
+            logger.error(f"Error touching cache entries: {e}")
+            return False
+    
+    def delete_cache_entry(self, cache_id: str) -> bool:
+        """Delete a cache entry, removing its body once no entry references it."""
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            cursor.execute('SELECT checksum FROM cache_entries WHERE cache_id = ?', (cache_id,))
+            row = cursor.fetchone()
+            if row is None:
+                conn.close()
+                return False
+            cursor.execute('DELETE FROM cache_entries WHERE cache_id = ?', (cache_id,))
+            if row[0] and not self._object_referenced(cursor, row[0]):
+                # Unlinked before committing, while saves of the same body wait
+                for checksum in [row[0]] + self._delete_variants(cursor, [row[0]]):
+                    self.objects.delete(checksum)
+            
+            conn.commit()
+            conn.close()
+            return True
+        except Exception as e:
+            logger.error(f"Error deleting cache entry: {e}")
+            return False
+    
+    def _object_referenced(self, cursor, checksum: str) -> bool:
+        """Check whether any cache entry or segment still uses an object."""
+        cursor.execute('''
+            SELECT 1 FROM cache_entries WHERE checksum = ?
+            UNION ALL SELECT 1 FROM cache_segments WHERE checksum = ? LIMIT 1
+        ''', (checksum, checksum))
+        return cursor.fetchone() is not None
+    
+    def _delete_variants(self, cursor, checksums: List[str]) -> List[str]:
+        """Drop the variants of bodies no longer cached; returns the variant objects."""
+        variants = []
+        for checksum in checksums:
+            cursor.execute('SELECT variant_checksum FROM cache_variants WHERE checksum = ?',
+                           (checksum,))
+            variants.extend(row[0] for row in cursor.fetchall())
+            cursor.execute('DELETE FROM cache_variants WHERE checksum = ?', (checksum,))
+        return variants
+    
+    def save_cache_variant(self, checksum: str, encoding: str, data: bytes) -> Optional[str]:
+        """Store an encoded variant of a cached body; returns the variant's checksum.
+        
+        Nothing is kept if the body was evicted while it was being compressed.
+        """
+        try:
+            variant_checksum = self.objects.put(data)
+            
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            # Hold the write lock so the body can't be deleted between check and insert
+            cursor.execute("BEGIN IMMEDIATE")
+            if not self._object_referenced(cursor, checksum):
+                conn.rollback()
+                conn.close()
+                self.objects.delete(variant_checksum)
+                return None
+            cursor.execute('''
+                INSERT OR REPLACE INTO cache_variants (checksum, encoding, variant_checksum, size)
+                VALUES (?, ?, ?, ?)
+            ''', (checksum, encoding, variant_checksum, len(data)))
+            
+            conn.commit()
+            conn.close()
+            return variant_checksum
+        except Exception as e:
+            logger.error(f"Error saving cache variant: {e}")
+            return None
+    
+    def get_cache_variants(self, checksum: str) -> Dict[str, Tuple[str, int]]:
+        """Get a cached body's variants as {encoding: (variant checksum, size)}."""
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                SELECT encoding, variant_checksum, size FROM cache_variants WHERE checksum = ?
+            ''', (checksum,))
+            variants = {row[0]: (row[1], row[2]) for row in cursor.fetchall()}
+            
+            conn.close()
+            return variants
+        except Exception as e:
+            logger.error(f"Error getting cache variants: {e}")
+            return {}
+    
+    def save_cache_segment(self, content_id: str, node_id: str, segment_index: int,
+                           data: bytes, expires_at: datetime) -> bool:
+        """Store one segment of a large object cached on a node."""
+        try:
+            checksum = self.objects.put(data)
+            
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            # Hold the write lock so a delete can't remove the body before it is
+            # referenced; put() only writes again if one removed it meanwhile
+            cursor.execute("BEGIN IMMEDIATE")
+            self.objects.put(data)
+            cursor.execute('''
+                INSERT OR REPLACE INTO cache_segments
+                (content_id, node_id, segment_index, checksum, size, expires_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (content_id, node_id, segment_index, checksum, len(data), expires_at))
+            
+            conn.commit()
+            conn.close()
+            return True
+        except Exception as e:
+            logger.error(f"Error saving cache segment: {e}")
+            return False
+    
+    def get_cache_segments(self, content_id: str, node_id: str, first: int,
+                           last: int) -> Dict[int, str]:
+        """Get checksums of unexpired cached segments first..last, by segment index."""
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                SELECT segment_index, checksum FROM cache_segments
+                WHERE content_id = ? AND node_id = ? AND segment_index BETWEEN ? AND ?
+                AND expires_at > ?
+            ''', (content_id, node_id, first, last, datetime.now()))
+            segments = dict(cursor.fetchall())
+            
+            conn.close()
+            return segments
+        except Exception as e:
+            logger.error(f"Error getting cache segments: {e}")
+            return {}
+    
+    def get_cache_segments_by_node(self, node_id: str) -> List[Tuple[str, int, int]]:
+        """Get (content_id, segment_index, size) for every segment cached on a node."""
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                SELECT content_id, segment_index, size FROM cache_segments WHERE node_id = ?
+            ''', (node_id,))
+            segments = cursor.fetchall()
+            
+            conn.close()
+            return segments
+        except Exception as e:
+            logger.error(f"Error getting cache segments by node: {e}")
+            return []
+    
+    def delete_cache_segment(self, content_id: str, node_id: str, segment_index: int) -> bool:
+        """Delete a cached segment, removing its body once nothing references it."""
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                SELECT checksum FROM cache_segments
+                WHERE content_id = ? AND node_id = ? AND segment_index = ?
+            ''', (content_id, node_id, segment_index))
+            row = cursor.fetchone()
+            if row is None:
+                conn.close()
+                return False
+            cursor.execute('''
+                DELETE FROM cache_segments
+                WHERE content_id = ? AND node_id = ? AND segment_index = ?
+            ''', (content_id, node_id, segment_index))
+            if not self._object_referenced(cursor, row[0]):
+                # Unlinked before committing, while saves of the same body wait
+                self.objects.delete(row[0])
+            
+            conn.commit()
+            conn.close()
+            return True
+        except Exception as e:
+            logger.error(f"Error deleting cache segment: {e}")
+            return False
+    
+    def purge_cached_content(self, content_ids: List[str],
+                             hard: bool = True) -> Optional[List[Tuple[str, str, Optional[int]]]]:
+        """Delete (hard) or expire (soft) every cached copy of some content.
+        
+        Returns (node_id, content_id, segment_index) for each entry and
+        segment affected; segment_index is None for whole-object entries.
+        """
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            now = datetime.now()
+            
+            affected = []
+            checksums = set()
+            for i in range(0, len(content_ids), 500):
+                batch = content_ids[i:i + 500]
+                marks = ', '.join('?' * len(batch))
+                cursor.execute(f'''
+                    SELECT node_id, content_id, NULL, checksum FROM cache_entries
+                    WHERE content_id IN ({marks})
+                    UNION ALL
+                    SELECT node_id, content_id, segment_index, checksum FROM cache_segments
+                    WHERE content_id IN ({marks})
+                ''', batch + batch)
+                for node_id, content_id, segment_index, checksum in cursor.fetchall():
+                    affected.append((node_id, content_id, segment_index))
+                    checksums.add(checksum)
+                
+                for table in ('cache_entries', 'cache_segments'):
+                    if hard:
+                        cursor.execute(f'DELETE FROM {table} WHERE content_id IN ({marks})', batch)
+                    else:
+                        cursor.execute(f'''
+                            UPDATE {table} SET expires_at = ?
+                            WHERE content_id IN ({marks}) AND expires_at > ?
+                        ''', [now] + batch + [now])
+            
+            orphaned = [checksum for checksum in checksums
+                        if hard and not self._object_referenced(cursor, checksum)]
+            orphaned += self._delete_variants(cursor, orphaned)
+            # Unlinked before committing, while saves of the same bodies wait
+            for checksum in orphaned:
+                self.objects.delete(checksum)
+            
+            conn.commit()
+            conn.close()
+            return affected
+        except Exception as e:
+            logger.error(f"Error purging cached content: {e}")
+            return None
+    
+    def save_purge_request(self, purge_request: PurgeRequest) -> bool:
+        """Save purge request to database."""
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                INSERT OR REPLACE INTO purge_requests
+                (purge_id, content_id, url_pattern, status, created_at, completed_at,
+                 purge_type, soft, matched_content, purged_copies)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (
+                purge_request.purge_id, purge_request.content_id, purge_request.url_pattern,
+                purge_request.status, purge_request.created_at, purge_request.completed_at,
+                purge_request.purge_type.value, purge_request.soft,
+                purge_request.matched_content, purge_request.purged_copies
+            ))
+            
+            conn.commit()
+            conn.close()
+            return True
+        except Exception as e:
+            logger.error(f"Error saving purge request: {e}")
+            return False
+    
+    def get_purge_request(self, purge_id: str) -> Optional[PurgeRequest]:
+        """Get purge request by ID."""
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                SELECT purge_id, content_id, url_pattern, status, created_at, completed_at,
+                       purge_type, soft, matched_content, purged_copies
+                FROM purge_requests WHERE purge_id = ?
+            ''', (purge_id,))
+            row = cursor.fetchone()
+            
+            conn.close()
+            if row:
+                return PurgeRequest(
+                    purge_id=row[0],
+                    content_id=row[1],
+                    url_pattern=row[2],
+                    status=row[3],
+                    created_at=datetime.fromisoformat(row[4]) if row[4] else datetime.now(),
+                    completed_at=datetime.fromisoformat(row[5]) if row[5] else None,
+                    purge_type=PurgeType(row[6] or 'url'),
+                    soft=bool(row[7]),
+                    matched_content=row[8] or 0,
+                    purged_copies=row[9] or 0
+                )
+            return None
+        except Exception as e:
+            logger.error(f"Error getting purge request: {e}")
+            return None
+    
+    def save_prefetch_job(self, job: PrefetchJob) -> bool:
+        """Save a prefetch job and its progress."""
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                INSERT OR REPLACE INTO prefetch_jobs
+                (job_id, urls, locations, status, concurrency, total, filled, skipped, failed,
+                 errors, created_at, completed_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (
+                job.job_id, json.dumps(job.urls),
+                json.dumps([location.value for location in job.locations]), job.status,
+                job.concurrency, job.total, job.filled, job.skipped, job.failed,
+                json.dumps(job.errors), job.created_at, job.completed_at
+            ))
+            
+            conn.commit()
+            conn.close()
+            return True
+        except Exception as e:
+            logger.error(f"Error saving prefetch job: {e}")
+            return False
+    
+    def get_prefetch_job(self, job_id: str) -> Optional[PrefetchJob]:
+        """Get a prefetch job by ID."""
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                SELECT job_id, urls, locations, status, concurrency, total, filled, skipped,
+                       failed, errors, created_at, completed_at
+                FROM prefetch_jobs WHERE job_id = ?
+            ''', (job_id,))
+            row = cursor.fetchone()
+            
+            conn.close()
+            if row:
+                return PrefetchJob(
+                    job_id=row[0],
+                    urls=json.loads(row[1]),
+                    locations=[EdgeLocation(value) for value in json.loads(row[2])],
+                    status=row[3],
+                    concurrency=row[4],
+                    total=row[5],
+                    filled=row[6],
+                    skipped=row[7],
+                    failed=row[8],
+                    errors=json.loads(row[9] or '[]'),
+                    created_at=datetime.fromisoformat(row[10]) if row[10] else datetime.now(),
+                    completed_at=datetime.fromisoformat(row[11]) if row[11] else None
+                )
+            return None
+        except Exception as e:
+            logger.error(f"Error getting prefetch job: {e}")
+            return None
+    
+    def collect_garbage(self) -> int:
+        """Delete stored objects no cache entry or segment references; returns the count."""
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                SELECT checksum FROM cache_entries UNION SELECT checksum FROM cache_segments
+            ''')
+            referenced = {row[0] for row in cursor.fetchall()}
+            
+            cursor.execute('SELECT DISTINCT checksum FROM cache_variants')
+            self._delete_variants(cursor, [row[0] for row in cursor.fetchall()
+                                           if row[0] not in referenced])
+            cursor.execute('SELECT variant_checksum FROM cache_variants')
+            referenced.update(row[0] for row in cursor.fetchall())
+            
+            conn.commit()
+            conn.close()
+            return sum(self.objects.delete(checksum) for checksum in self.objects.checksums()
+                       if checksum not in referenced)
+        except Exception as e:
+            logger.error(f"Error collecting garbage: {e}")
+            return 0
+    
     def save_request_log(self, log: RequestLog) -> bool:
         """Save request log to database."""
+        return self.save_request_logs([log])
+    
+    def save_request_logs(self, logs: List[RequestLog]) -> bool:
+        """Save a batch of request logs and add them to the per-minute rollups."""
+        rollups = {}
+        for log in logs:
+            key = (minute_bucket(log.request_time), log.node_id, log.content_id, log.status_code)
+            rollup = rollups.get(key)
+            if rollup is None:
+                rollup = rollups[key] = [0] * (len(REQUEST_STATS_SUMS) + 1)
+            rollup[0] += 1
+            rollup[1] += int(log.cache_hit)
+            rollup[2] += log.bytes_transferred
+            rollup[3] += log.response_time
+            rollup[4 + bisect.bisect_left(LATENCY_BUCKETS_MS, log.response_time)] += 1
+            rollup[-1] = max(rollup[-1], log.response_time)
+        
         try:
             conn = sqlite3.connect(self.db_path)
             cursor = conn.cursor()
             
-            cursor.execute('''
+            cursor.executemany('''
                 INSERT OR REPLACE INTO request_logs 
                 (log_id, content_id, node_id, client_ip, user_agent, request_time,
                  response_time, status_code, cache_hit, bytes_transferred)
                 VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
+            ''', [(
                 log.log_id, log.content_id, log.node_id, log.client_ip, log.user_agent,
                 log.request_time, log.response_time, log.status_code, log.cache_hit,
                 log.bytes_transferred
-            ))
+            ) for log in logs])
+            
+            updates = ", ".join(f"{name} = {name} + excluded.{name}" for name in REQUEST_STATS_SUMS)
+            cursor.executemany(f'''
+                INSERT INTO request_stats (minute, node_id, content_id, status_code,
+                                           {", ".join(REQUEST_STATS_SUMS)}, response_time_max)
+                VALUES ({", ".join("?" * (len(REQUEST_STATS_SUMS) + 5))})
+                ON CONFLICT (minute, node_id, content_id, status_code) DO UPDATE SET
+                    {updates},
+                    response_time_max = MAX(response_time_max, excluded.response_time_max)
+            ''', [key + tuple(rollup) for key, rollup in rollups.items()])
             
             conn.commit()
             conn.close()
             return True
         except Exception as e:
-            logger.error(f"Error saving request log: {e}")
+            logger.error(f"Error saving request logs: {e}")
             return False
     
+    def get_trending_content(self, since_minute: int, min_requests: int,
+                             limit: int) -> List[Tuple[str, int, List[str]]]:
+        """Get the most requested content since a minute, with the nodes that served it.
+        
+        Returns (content_id, requests, node_ids) for content with at least
+        min_requests requests, busiest first.
+        """
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                SELECT content_id, SUM(requests) AS total, GROUP_CONCAT(DISTINCT node_id)
+                FROM request_stats
+                WHERE minute >= ?
+                GROUP BY content_id
+                HAVING total >= ?
+                ORDER BY total DESC
+                LIMIT ?
+            ''', (since_minute, min_requests, limit))
+            trending = [(row[0], row[1], row[2].split(',')) for row in cursor.fetchall()]
+            
+            conn.close()
+            return trending
+        except Exception as e:
+            logger.error(f"Error getting trending content: {e}")
+            return []
+    
+    def get_request_stats(self, content_id: str = None, node_id: str = None,
+                          start_minute: int = None, end_minute: int = None) -> List[Dict[str, Any]]:
+        """Sum request rollups per node and status code over a range of minutes."""
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            where_conditions = []
+            params = []
+            for condition, value in (("content_id = ?", content_id), ("node_id = ?", node_id),
+                                     ("minute >= ?", start_minute), ("minute <= ?", end_minute)):
+                if value is not None:
+                    where_conditions.append(condition)
+                    params.append(value)
+            where_clause = " AND ".join(where_conditions) if where_conditions else "1=1"
+            
+            sums = ", ".join(f"SUM({name})" for name in REQUEST_STATS_SUMS)
+            cursor.execute(f'''
+                SELECT node_id, status_code, MIN(minute), MAX(minute), MAX(response_time_max), {sums}
+                FROM request_stats
+                WHERE {where_clause}
+                GROUP BY node_id, status_code
+            ''', params)
+            
+            stats = []
+            for row in cursor.fetchall():
+                totals = dict(zip(REQUEST_STATS_SUMS[:4], row[5:9]))
+                totals.update({
+                    'node_id': row[0],
+                    'status_code': row[1],
+                    'first_minute': row[2],
+                    'last_minute': row[3],
+                    'response_time_max': row[4],
+                    'latency_histogram': list(row[9:])
+                })
+                stats.append(totals)
+            
+            conn.close()
+            return stats
+        except Exception as e:
+            logger.error(f"Error getting request stats: {e}")
+            return []
+    
     def get_request_logs(self, content_id: str = None, node_id: str = None, 
                         limit: int = 100) -> List[RequestLog]:
         """Get request logs with optional filtering."""
@@ -569,8 +2040,59 @@ class CDNDatabase:
 class CDNService:
     """CDN service with content delivery and caching."""
     
-    def __init__(self, db_path: str = "cdn.db"):
+    def __init__(self, db_path: str = "cdn.db", origin=None, chunk_size: int = 65536,
+                 segment_size: int = 1024 * 1024, large_object_threshold: int = 8 * 1024 * 1024,
+                 memory_cache_size: int = 64 * 1024 * 1024, hot_object_limit: int = 1024 * 1024,
+                 stats_flush_size: int = 100, shield_nodes: Dict[EdgeLocation, str] = None,
+                 log_batch_size: int = 500, log_flush_interval: float = 1.0,
+                 compression_workers: int = 2, compress_min_size: int = 256,
+                 variant_index_size: int = 100000, heartbeat_timeout: Optional[int] = None):
         self.db = CDNDatabase(db_path)
+        self.origin = origin or SimulatedOrigin()
+        # Edges in a mapped location fill misses from that shield node, not origin
+        self.shield_nodes = shield_nodes or {}
+        self.origin_requests = RequestCollapser()
+        self.chunk_size = chunk_size
+        # Objects at least this large are cached in segment_size pieces
+        self.segment_size = segment_size
+        self.large_object_threshold = large_object_threshold
+        # Per-node hot tier: bodies up to hot_object_limit kept in memory
+        self.memory_cache_size = memory_cache_size
+        self.hot_object_limit = hot_object_limit
+        self.stats_flush_size = stats_flush_size
+        self.node_caches: Dict[str, EdgeNodeCache] = {}
+        self.revalidations: Dict[Tuple[str, str], threading.Thread] = {}
+        self.cache_lock = threading.RLock()
+        self.url_index: Optional[URLIndex] = None
+        self.node_table: Optional[EdgeNodeTable] = None
+        self.node_table_version = -1
+        self.node_table_loaded_at = 0.0
+        self.node_table_ttl = 30  # Also pick up node changes made by other processes
+        # Set when nodes report heartbeats, to route around ones that stop
+        self.heartbeat_timeout = heartbeat_timeout
+        # Purges run one at a time in the background
+        self.purge_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="cdn-purge")
+        self.purge_jobs: Dict[str, Any] = {}
+        # Request logs are queued and written in batches, at most log_flush_interval late
+        self.log_batch_size = log_batch_size
+        self.log_flush_interval = log_flush_interval
+        self.pending_logs: List[RequestLog] = []
+        self.log_lock = threading.Lock()
+        self.log_write_lock = threading.Lock()
+        self.log_timer: Optional[threading.Timer] = None
+        self.log_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="cdn-logs")
+        # Compressible bodies get precompressed variants, built once per body at fill time
+        self.compress_min_size = compress_min_size
+        self.compression_executor = ThreadPoolExecutor(max_workers=compression_workers,
+                                                       thread_name_prefix="cdn-compress")
+        self.compression_jobs: Dict[str, Future] = {}
+        self.variant_index: OrderedDict = OrderedDict()
+        self.variant_index_size = variant_index_size
+        # Prefetch jobs run one at a time, each fanning out over its own workers
+        self.prefetch_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="cdn-prefetch")
+        self.prefetch_jobs: Dict[str, PrefetchJob] = {}
+        self.prefetch_futures: Dict[str, Future] = {}
+        self.prefetch_lock = threading.Lock()
         self.initialize_default_data()
     
     def initialize_default_data(self):
@@ -668,7 +2190,8 @@ class CDNService:
     
     def add_content(self, url: str, content_data: bytes, 
                    content_type: ContentType = None, ttl: int = 3600,
-                   cache_strategy: CacheStrategy = CacheStrategy.CACHE_FIRST) -> Optional[Content]:
+                   cache_strategy: CacheStrategy = CacheStrategy.CACHE_FIRST,
+                   surrogate_keys: List[str] = None) -> Optional[Content]:
         """Add content to CDN."""
         content_id = self.generate_id("content")
         
@@ -686,10 +2209,14 @@ class CDNService:
             mime_type=mime_type,
             cache_strategy=cache_strategy,
             ttl=ttl,
-            checksum=checksum
+            checksum=checksum,
+            surrogate_keys=list(surrogate_keys or [])
         )
         
         if self.db.save_content(content):
+            with self.cache_lock:
+                if self.url_index is not None:
+                    self.url_index.add(content.url, content.content_id)
             return content
         return None
     
@@ -701,40 +2228,119 @@ class CDNService:
         """Get content by URL."""
         return self.db.get_content_by_url(url)
     
-    def find_best_edge_node(self, client_location: EdgeLocation = None) -> Optional[EdgeNode]:
-        """Find the best edge node for serving content."""
-        nodes = self.db.get_edge_nodes(client_location)
+    def get_node_table(self) -> EdgeNodeTable:
+        """Get the routing table of active nodes, rebuilding it after node changes."""
+        with self.cache_lock:
+            if (self.node_table is None or self.node_table_version != self.db.node_version or
+                    time.time() - self.node_table_loaded_at > self.node_table_ttl):
+                self.node_table_version = self.db.node_version
+                self.node_table = EdgeNodeTable(self.db.get_edge_nodes(),
+                                                heartbeat_timeout=self.heartbeat_timeout)
+                self.node_table_loaded_at = time.time()
+            return self.node_table
+    
+    def find_best_edge_node(self, client_location: EdgeLocation = None,
+                            url: str = None) -> Optional[EdgeNode]:
+        """Find the best edge node for serving content.
         
-        if not nodes:
-            # If no nodes in specific location, get all active nodes
-            nodes = self.db.get_edge_nodes()
+        Nodes in the client's location are preferred, then the nearest and
+        fastest elsewhere. With a URL, the choice within the location is
+        made by consistent hashing so each object concentrates on one node.
+        """
+        return self.get_node_table().select(client_location, url)
+    
+    def record_heartbeat(self, node_id: str) -> bool:
+        """Record that a node is alive."""
+        now = datetime.now()
+        with self.cache_lock:
+            node = self.get_node_table().nodes.get(node_id)
+            if node is not None:
+                node.last_heartbeat = now
+        return self.db.update_node_status(node_id, last_heartbeat=now)
+    
+    def get_node_cache(self, node_id: str) -> EdgeNodeCache:
+        """Get a node's cache tiers, loading the disk tier from the database on first use.
         
-        if not nodes:
-            return None
+        The load runs outside cache_lock; if two threads race to load a
+        node, the first to finish wins and the other's copy is dropped.
+        """
+        with self.cache_lock:
+            node_cache = self.node_caches.get(node_id)
+        if node_cache is not None:
+            return node_cache
         
-        # Select node with lowest latency and available capacity
-        best_node = None
-        best_score = float('inf')
+        loaded = EdgeNodeCache(node_id, self.memory_cache_size, float('inf'))
+        duplicates = []
+        # Most recently used first; older duplicates for a content ID are dropped
+        for entry in self.db.get_cache_entries_by_node(node_id):
+            if entry.content_id in loaded.disk:
+                duplicates.append(entry.cache_id)
+                continue
+            loaded.disk.put(entry.content_id, entry.file_size, entry.cache_id,
+                            frequency=entry.access_count + 1)
+        for content_id, index, size in self.db.get_cache_segments_by_node(node_id):
+            loaded.disk.put((content_id, index), size)
         
-        for node in nodes:
-            # Simple scoring: latency + capacity usage percentage
-            capacity_usage = (node.used_capacity / node.capacity) * 100
-            score = node.latency_ms + capacity_usage
-            
-            if score < best_score:
-                best_score = score
-                best_node = node
+        with self.cache_lock:
+            node_cache = self.node_caches.setdefault(node_id, loaded)
+        if node_cache is loaded:
+            for cache_id in duplicates:
+                self.db.delete_cache_entry(cache_id)
+        return node_cache
+    
+    def _evict(self, node_cache: EdgeNodeCache,
+               evicted: List[Tuple[Any, Any]]) -> List[Tuple[Any, Any]]:
+        """Drop evicted entries from a node's memory tier; call with cache_lock held.
         
-        return best_node
+        Returns the evictions for _delete_evicted to remove from the
+        database once the lock is released.
+        """
+        for key, cache_id in evicted:
+            if not isinstance(key, tuple):
+                node_cache.memory.remove(key)
+                node_cache.pending_hits.pop(cache_id, None)
+        return evicted
+    
+    def _delete_evicted(self, node_id: str, evicted: List[Tuple[Any, Any]]):
+        """Delete evicted entries and segments of a node from the database."""
+        for key, cache_id in evicted:
+            if isinstance(key, tuple):
+                self.db.delete_cache_segment(key[0], node_id, key[1])
+            else:
+                self.db.delete_cache_entry(cache_id)
+    
+    def _admit_hot(self, node_cache: EdgeNodeCache, cache_entry: CacheEntry):
+        """Keep a small entry's body in memory once it has been used twice."""
+        size = len(cache_entry.content_data)
+        if (size > self.hot_object_limit or size > node_cache.memory.capacity or
+                node_cache.disk.frequency(cache_entry.content_id) < 2):
+            return
+        if not isinstance(cache_entry.content_data, bytes):
+            cache_entry = replace(cache_entry, content_data=bytes(cache_entry.content_data))
+        node_cache.memory.put(cache_entry.content_id, size, cache_entry)
+    
+    def _update_used_capacity(self, node: EdgeNode, node_cache: EdgeNodeCache):
+        """Save a node's used capacity as tracked by its disk tier."""
+        if node.used_capacity != node_cache.disk.used:
+            node.used_capacity = node_cache.disk.used
+            routed = self.node_table.nodes.get(node.node_id) if self.node_table else None
+            if routed is not None:
+                routed.used_capacity = node.used_capacity
+            self.db.update_node_status(node.node_id, used_capacity=node.used_capacity)
     
     def cache_content(self, content: Content, node: EdgeNode, content_data: bytes) -> Optional[CacheEntry]:
-        """Cache content on edge node."""
-        # Check if node has enough capacity
-        if node.used_capacity + content.file_size > node.capacity:
+        """Cache content on edge node, evicting colder objects to make room.
+        
+        NO_CACHE content and objects larger than the whole node are not cached.
+        """
+        if content.cache_strategy == CacheStrategy.NO_CACHE or content.file_size > node.capacity:
             return None
         
         cache_id = self.generate_id("cache")
         expires_at = datetime.now() + timedelta(seconds=content.ttl)
+        # The body is stored under its own checksum, which matches
+        # content.checksum unless the origin served something else
+        checksum = self.calculate_checksum(content_data)
         
         cache_entry = CacheEntry(
             cache_id=cache_id,
@@ -747,32 +2353,296 @@ class CDNService:
             file_size=content.file_size,
             ttl=content.ttl,
             expires_at=expires_at,
-            checksum=content.checksum
+            checksum=checksum
         )
         
-        if self.db.save_cache_entry(cache_entry):
-            # Update node capacity
-            node.used_capacity += content.file_size
-            self.db.save_edge_node(node)
-            return cache_entry
-        return None
+        # The body and metadata are written before taking cache_lock, which
+        # only guards the in-memory tiers, so hits elsewhere aren't held up
+        node_cache = self.get_node_cache(node.node_id)
+        if not self.db.save_cache_entry(cache_entry):
+            return None
+        
+        with self.cache_lock:
+            node_cache.disk.capacity = node.capacity
+            previous_id = node_cache.disk.peek(content.content_id)
+            evicted = node_cache.disk.put(content.content_id, content.file_size, cache_id)
+            node_cache.memory.remove(content.content_id)
+            if previous_id:
+                evicted.append((content.content_id, previous_id))
+            self._evict(node_cache, evicted)
+            self._admit_hot(node_cache, cache_entry)
+        self._delete_evicted(node.node_id, evicted)
+        self._update_used_capacity(node, node_cache)
+        
+        if is_compressible(content.mime_type) and len(content_data) >= self.compress_min_size:
+            self.compress_variants(cache_entry.checksum, content_data)
+        return cache_entry
+    
+    def compress_variants(self, checksum: str, content_data: bytes):
+        """Build a body's compressed variants in the background, once per body."""
+        with self.cache_lock:
+            if checksum in self.compression_jobs:
+                return
+            self.compression_jobs[checksum] = self.compression_executor.submit(
+                self._compress_variants, checksum, bytes(content_data))
+    
+    def _compress_variants(self, checksum: str, content_data: bytes):
+        """Compress a body with each encoder, keeping the variants that are smaller."""
+        try:
+            variants = self.db.get_cache_variants(checksum)
+            for encoding, encode in CONTENT_ENCODERS.items():
+                if encoding in variants:
+                    continue
+                encoded = encode(content_data)
+                if len(encoded) < len(content_data):
+                    variant_checksum = self.db.save_cache_variant(checksum, encoding, encoded)
+                    if variant_checksum:
+                        variants[encoding] = (variant_checksum, len(encoded))
+            self._index_variants(checksum, variants)
+        except Exception as e:
+            logger.error(f"Error compressing {checksum}: {e}")
+        finally:
+            with self.cache_lock:
+                self.compression_jobs.pop(checksum, None)
+    
+    def wait_for_compression(self, timeout: float = None) -> bool:
+        """Wait for queued compression jobs; returns whether they all finished."""
+        with self.cache_lock:
+            jobs = list(self.compression_jobs.values())
+        _, not_done = wait_futures(jobs, timeout=timeout)
+        return not not_done
+    
+    def _index_variants(self, checksum: str, variants: Dict[str, Tuple[str, int]]):
+        """Remember a body's variants, forgetting the least recently used bodies."""
+        with self.cache_lock:
+            self.variant_index[checksum] = variants
+            self.variant_index.move_to_end(checksum)
+            while len(self.variant_index) > self.variant_index_size:
+                self.variant_index.popitem(last=False)
+    
+    def get_variants(self, checksum: str) -> Dict[str, Tuple[str, int]]:
+        """Get a cached body's compressed variants as {encoding: (checksum, size)}."""
+        with self.cache_lock:
+            variants = self.variant_index.get(checksum)
+            if variants is not None:
+                self.variant_index.move_to_end(checksum)
+                return variants
+        variants = self.db.get_cache_variants(checksum)
+        if variants or checksum not in self.compression_jobs:
+            self._index_variants(checksum, variants)
+        return variants
+    
+    def select_variant(self, content: Content, cache_entry: Optional[CacheEntry],
+                       accept_encoding: Optional[str]) -> Tuple[Optional[str], Any]:
+        """Choose the encoding and body to send for a cached object.
+        
+        Returns (None, identity body) unless the client accepts one of the
+        object's precompressed variants.
+        """
+        if cache_entry is None or not is_compressible(content.mime_type):
+            return None, cache_entry.content_data if cache_entry else None
+        variants = self.get_variants(cache_entry.checksum)
+        encoding = negotiate_encoding(accept_encoding, variants)
+        if encoding is None:
+            return None, cache_entry.content_data
+        try:
+            return encoding, self.db.objects.view(variants[encoding][0])
+        except OSError as e:
+            logger.error(f"Error reading {encoding} variant of {content.url}: {e}")
+            with self.cache_lock:
+                self.variant_index.pop(cache_entry.checksum, None)
+            return None, cache_entry.content_data
     
-    def get_cached_content(self, content_id: str, node_id: str) -> Optional[CacheEntry]:
-        """Get cached content from edge node."""
-        cache_entry = self.db.get_cache_entry(content_id, node_id)
+    def get_cached_content(self, content_id: str, node_id: str,
+                           max_stale: int = 0) -> Optional[CacheEntry]:
+        """Get cached content from edge node.
         
-        if cache_entry and cache_entry.expires_at > datetime.now():
-            # Update access statistics
-            cache_entry.last_accessed = datetime.now()
-            cache_entry.access_count += 1
-            self.db.save_cache_entry(cache_entry)
-            return cache_entry
+        Hot entries are answered from memory. Hits are counted in memory and
+        written back in batches (see flush_cache_stats). Entries up to
+        max_stale seconds past expiry are still returned.
+        """
+        node_cache = self.get_node_cache(node_id)
+        with self.cache_lock:
+            if content_id not in node_cache.disk:
+                return None
+            node_cache.disk.get(content_id)
+            cache_entry = node_cache.memory.get(content_id)
         
-        return None
+        if cache_entry is None:
+            cache_entry = self.db.get_cache_entry(content_id, node_id)
+            if cache_entry is None:
+                return None
+            with self.cache_lock:
+                self._admit_hot(node_cache, cache_entry)
+        
+        now = datetime.now()
+        if cache_entry.expires_at + timedelta(seconds=max_stale) <= now:
+            return None
+        
+        # Update access statistics
+        cache_entry.last_accessed = now
+        cache_entry.access_count += 1
+        with self.cache_lock:
+            pending = node_cache.record_hit(cache_entry.cache_id, now)
+        if pending >= self.stats_flush_size:
+            self.flush_cache_stats()
+        return cache_entry
+    
+    def flush_cache_stats(self) -> int:
+        """Write batched cache hit counters to the database; returns entries updated."""
+        with self.cache_lock:
+            hits = {}
+            for node_cache in self.node_caches.values():
+                hits.update(node_cache.pending_hits)
+                node_cache.pending_hits = {}
+        if hits:
+            self.db.touch_cache_entries(hits)
+        return len(hits)
+    
+    def fetch_from_origin(self, content: Content) -> Optional[bytes]:
+        """Fetch a whole object from origin, or None if the fetch fails."""
+        try:
+            _, chunks = self.origin.fetch(content.url)
+            return b"".join(chunks)
+        except Exception as e:
+            logger.error(f"Error fetching {content.url} from origin: {e}")
+            return None
+    
+    def get_shield(self, node: EdgeNode) -> Optional[EdgeNode]:
+        """Get the active shield node that fills a node's misses, if any.
+        
+        Shields fill straight from origin, so shields pointing at each other
+        cannot chain fills back to a key this thread is already fetching.
+        """
+        shield_id = self.shield_nodes.get(node.location)
+        if shield_id is None or node.node_id in self.shield_nodes.values():
+            return None
+        return self.get_node_table().nodes.get(shield_id)
+    
+    def fill_from_origin(self, content: Content,
+                         node: EdgeNode) -> Tuple[Optional[bytes], Optional[CacheEntry]]:
+        """Fetch an object for a miss on a node and cache it there.
+        
+        Concurrent misses for the same object on a node share one fetch. The
+        object comes from the node's shield when it has one, so each shield
+        fetches an object from origin once for all the edges behind it.
+        Returns the body (None if the fetch failed) and the new cache entry.
+        """
+        return self.origin_requests.run((node.node_id, content.content_id),
+                                        lambda: self._fill_from_origin(content, node))
+    
+    def _fill_from_origin(self, content: Content,
+                          node: EdgeNode) -> Tuple[Optional[bytes], Optional[CacheEntry]]:
+        """Fetch and cache an object unless a fill that just finished beat us to it."""
+        if content.cache_strategy not in (CacheStrategy.NO_CACHE, CacheStrategy.NETWORK_FIRST):
+            cache_entry = self.get_cached_content(content.content_id, node.node_id)
+            if cache_entry is not None:
+                return bytes(cache_entry.content_data), cache_entry
+        
+        shield = self.get_shield(node)
+        if shield is None:
+            content_data = self.fetch_from_origin(content)
+        else:
+            content_data, _ = self.fill_from_origin(content, shield)
+        if content_data is None or content.cache_strategy == CacheStrategy.NO_CACHE:
+            return content_data, None
+        return content_data, self.cache_content(content, node, content_data)
+    
+    def stream_from_origin(self, content: Content, node: EdgeNode) -> StreamBuffer:
+        """Fetch an object for a streamed miss on a node, returning a buffer to stream it from.
+        
+        The first miss leads the node's fill for the object: it is fetched
+        in the background into a buffer that every concurrent miss streams
+        from as it arrives, then cached. Misses arriving during a
+        fill_from_origin wait for that fill's body instead, as do nodes
+        behind a shield, which fill from the shield.
+        """
+        if self.get_shield(node) is not None:
+            content_data, _ = self.fill_from_origin(content, node)
+            return StreamBuffer.of(content_data)
+        
+        key = (node.node_id, content.content_id)
+        leader, flight = self.origin_requests.start(key, stream=StreamBuffer())
+        if not leader:
+            if flight.get('stream') is not None:
+                return flight['stream']
+            try:
+                content_data, _ = self.origin_requests.wait(flight)
+            except Exception as e:
+                logger.error(f"Error filling {content.url} on {node.node_id}: {e}")
+                content_data = None
+            return StreamBuffer.of(content_data)
+        
+        threading.Thread(target=self._stream_fill, args=(content, node, key, flight),
+                         daemon=True).start()
+        return flight['stream']
+    
+    def _stream_fill(self, content: Content, node: EdgeNode, key: Tuple[str, str],
+                     flight: Dict[str, Any]):
+        """Read an object from origin into a fill's stream buffer and cache it once complete."""
+        stream = flight['stream']
+        result = (None, None)
+        try:
+            size, chunks = self.origin.fetch(content.url)
+            stream.start(size)
+            for chunk in chunks:
+                stream.append(chunk)
+            if len(stream.data) == size:
+                content_data = bytes(stream.data)
+                cache_entry = None
+                if content.cache_strategy != CacheStrategy.NO_CACHE:
+                    cache_entry = self.cache_content(content, node, content_data)
+                result = (content_data, cache_entry)
+            else:
+                logger.error(f"Origin returned a short body for {content.url}")
+        except Exception as e:
+            logger.error(f"Error fetching {content.url} from origin: {e}")
+        finally:
+            stream.finish()
+            self.origin_requests.finish(key, flight, result)
+    
+    def revalidate(self, content: Content, node: EdgeNode):
+        """Refresh an object on a node from origin in the background, once at a time."""
+        key = (content.content_id, node.node_id)
+        with self.cache_lock:
+            if key in self.revalidations:
+                return
+            thread = threading.Thread(target=self._revalidate, args=(content, node, key), daemon=True)
+            self.revalidations[key] = thread
+        thread.start()
+    
+    def _revalidate(self, content: Content, node: EdgeNode, key: Tuple[str, str]):
+        """Fetch and re-cache an object, then clear its revalidation marker."""
+        try:
+            self.fill_from_origin(content, node)
+        finally:
+            with self.cache_lock:
+                self.revalidations.pop(key, None)
+    
+    def lookup_cache(self, content: Content, node: EdgeNode) -> Tuple[Optional[CacheEntry], bool]:
+        """Look up content for a request according to its cache strategy.
+        
+        Returns the entry to serve (None means go to origin) and whether the
+        origin should be bypassed even on a miss. NO_CACHE and NETWORK_FIRST
+        skip the cache; STALE_WHILE_REVALIDATE serves entries up to one TTL
+        past expiry while refreshing them in the background.
+        """
+        strategy = content.cache_strategy
+        if strategy in (CacheStrategy.NO_CACHE, CacheStrategy.NETWORK_FIRST):
+            return None, False
+        if strategy == CacheStrategy.STALE_WHILE_REVALIDATE:
+            cache_entry = self.get_cached_content(content.content_id, node.node_id,
+                                                  max_stale=content.ttl)
+            if cache_entry and cache_entry.expires_at <= datetime.now():
+                self.revalidate(content, node)
+            return cache_entry, False
+        cache_entry = self.get_cached_content(content.content_id, node.node_id)
+        return cache_entry, strategy == CacheStrategy.CACHE_ONLY
     
     def serve_content(self, url: str, client_ip: str, user_agent: str,
-                     client_location: EdgeLocation = None) -> Dict[str, Any]:
-        """Serve content through CDN."""
+                     client_location: EdgeLocation = None,
+                     accept_encoding: str = None) -> Dict[str, Any]:
+        """Serve content through CDN, compressed if the client accepts a cached variant."""
         start_time = time.time()
         
         # Find content
@@ -785,7 +2655,7 @@ class CDNService:
             }
         
         # Find best edge node
-        node = self.find_best_edge_node(client_location)
+        node = self.find_best_edge_node(client_location, content.url)
         if not node:
             return {
                 'success': False,
@@ -794,23 +2664,40 @@ class CDNService:
             }
         
         # Try to get from cache first
-        cache_entry = self.get_cached_content(content.content_id, node.node_id)
+        cache_entry, cache_only = self.lookup_cache(content, node)
         cache_hit = cache_entry is not None
         
         if not cache_hit:
-            # Simulate fetching from origin server
-            # In real implementation, this would fetch from origin
-            content_data = b"Simulated content data for " + url.encode()
+            if cache_only:
+                return {
+                    'success': False,
+                    'error': 'Content not cached',
+                    'status_code': 504
+                }
             
-            # Cache the content
-            cache_entry = self.cache_content(content, node, content_data)
-            if not cache_entry:
+            content_data, cache_entry = self.fill_from_origin(content, node)
+            if content_data is None:
+                # Network-first falls back to the edge's copy, even if stale
+                if content.cache_strategy == CacheStrategy.NETWORK_FIRST:
+                    cache_entry = self.get_cached_content(content.content_id, node.node_id,
+                                                          max_stale=content.ttl)
+                if cache_entry is None:
+                    return {
+                        'success': False,
+                        'error': 'Origin fetch failed',
+                        'status_code': 502
+                    }
+                cache_hit = True
+            elif content.cache_strategy != CacheStrategy.NO_CACHE and not cache_entry:
                 return {
                     'success': False,
                     'error': 'Failed to cache content',
                     'status_code': 507
                 }
         
+        content_encoding, body = self.select_variant(content, cache_entry, accept_encoding)
+        transfer_size = len(body) if content_encoding else content.file_size
+        
         # Calculate response time
         response_time = int((time.time() - start_time) * 1000)
         
@@ -824,14 +2711,14 @@ class CDNService:
             user_agent=user_agent,
             response_time=response_time,
             cache_hit=cache_hit,
-            bytes_transferred=content.file_size
+            bytes_transferred=transfer_size
         )
-        self.db.save_request_log(log)
+        self.log_request(log)
         
         # Update content access statistics
         content.last_accessed = datetime.now()
         content.access_count += 1
-        self.db.save_content(content)
+        self.db.record_content_access(content.content_id, content.last_accessed)
         
         return {
             'success': True,
@@ -841,6 +2728,8 @@ class CDNService:
             'content_type': content.content_type.value,
             'mime_type': content.mime_type,
             'file_size': content.file_size,
+            'content_encoding': content_encoding or 'identity',
+            'transfer_size': transfer_size,
             'cache_hit': cache_hit,
             'response_time_ms': response_time,
             'node_location': node.location.value,
@@ -848,58 +2737,652 @@ class CDNService:
             'status_code': 200
         }
     
-    def purge_content(self, url_pattern: str, content_id: str = None) -> Optional[PurgeRequest]:
-        """Purge content from cache."""
-        purge_id = self.generate_id("purge")
+    def stream_content(self, url: str, client_ip: str, user_agent: str,
+                       client_location: EdgeLocation = None, range_header: str = None,
+                       if_range: str = None, accept_encoding: str = None) -> Dict[str, Any]:
+        """Serve content as a stream of body chunks, honoring Range and If-Range.
+        
+        Returns the status code, response headers and a 'body' iterator. A
+        miss streams from origin while the object is cached; objects of at
+        least large_object_threshold bytes are cached in segments, so a range
+        request only fetches the segments it covers. Cached hits without a
+        Range are sent as a precompressed variant when Accept-Encoding allows.
+        """
+        start_time = time.time()
+        
+        content = self.get_content_by_url(url)
+        if not content:
+            return {
+                'success': False,
+                'error': 'Content not found',
+                'status_code': 404
+            }
+        
+        node = self.find_best_edge_node(client_location, content.url)
+        if not node:
+            return {
+                'success': False,
+                'error': 'No available edge nodes',
+                'status_code': 503
+            }
+        
+        etag = f'"{content.checksum}"'
+        last_modified = formatdate(content.updated_at.timestamp(), usegmt=True)
+        if if_range and if_range not in (etag, last_modified):
+            range_header = None  # The client's copy is stale; send the whole object
+        
+        cache_entry, cache_only = self.lookup_cache(content, node)
+        fill = content_encoding = None
+        if cache_entry:
+            cached_body = cache_entry.content_data
+            if not range_header:
+                content_encoding, cached_body = self.select_variant(content, cache_entry,
+                                                                    accept_encoding)
+            size = len(cached_body)
+        elif content.file_size >= self.large_object_threshold:
+            size = content.file_size
+        elif cache_only:
+            return {
+                'success': False,
+                'error': 'Content not cached',
+                'status_code': 504
+            }
+        else:
+            fill = self.stream_from_origin(content, node)
+            size = fill.wait_size()
+            if size is None:
+                return {
+                    'success': False,
+                    'error': 'Origin fetch failed',
+                    'status_code': 502
+                }
+        
+        try:
+            byte_range = parse_range_header(range_header, size)
+        except RangeNotSatisfiable:
+            if fill is not None:
+                fill.wait()  # Let the fill cache the object first, as a full read would
+            return {
+                'success': False,
+                'error': 'Range not satisfiable',
+                'status_code': 416,
+                'headers': {'Content-Range': f'bytes */{size}'}
+            }
+        start, end = byte_range or (0, size - 1)
+        
+        if cache_entry:
+            cache_hit = True
+            body = self._iter_view(cached_body, start, end)
+        elif fill is not None:
+            cache_hit = False
+            body = fill.read(start, end, self.chunk_size)
+        else:
+            first, last = start // self.segment_size, end // self.segment_size
+            segments = {}
+            if content.cache_strategy not in (CacheStrategy.NO_CACHE, CacheStrategy.NETWORK_FIRST):
+                segments = self.db.get_cache_segments(content.content_id, node.node_id, first, last)
+            cache_hit = len(segments) == last - first + 1
+            if cache_only and not cache_hit:
+                return {
+                    'success': False,
+                    'error': 'Content not cached',
+                    'status_code': 504
+                }
+            body = self._stream_segments(content, node, segments, start, end)
+        
+        headers = {
+            'Content-Type': content.mime_type,
+            'Content-Length': str(end - start + 1),
+            'Accept-Ranges': 'bytes',
+            'ETag': etag,
+            'Last-Modified': last_modified,
+            'Cache-Control': f'max-age={content.ttl}'
+        }
+        if byte_range:
+            headers['Content-Range'] = f'bytes {start}-{end}/{size}'
+        if is_compressible(content.mime_type):
+            # Caches must key on Accept-Encoding even when the identity body is sent
+            headers['Vary'] = 'Accept-Encoding'
+        if content_encoding:
+            headers['Content-Encoding'] = content_encoding
+            headers['ETag'] = f'"{content.checksum}-{content_encoding}"'
+        
+        # Update content access statistics
+        content.last_accessed = datetime.now()
+        content.access_count += 1
+        self.db.record_content_access(content.content_id, content.last_accessed)
+        
+        return {
+            'success': True,
+            'content_id': content.content_id,
+            'node_id': node.node_id,
+            'cache_hit': cache_hit,
+            'status_code': 206 if byte_range else 200,
+            'headers': headers,
+            'body': self._log_stream(body, content, node, client_ip, user_agent,
+                                     cache_hit, start_time)
+        }
+    
+    def _iter_view(self, data, start: int, end: int) -> Iterator[bytes]:
+        """Yield bytes start..end (inclusive) of a buffer in chunk_size pieces."""
+        view = memoryview(data)
+        for offset in range(start, end + 1, self.chunk_size):
+            yield bytes(view[offset:min(offset + self.chunk_size, end + 1)])
+    
+    def _stream_segments(self, content: Content, node: EdgeNode, segments: Dict[int, str],
+                         start: int, end: int) -> Iterator[bytes]:
+        """Stream a range of a large object segment by segment."""
+        for index, data in self._load_segments(content, node, segments, start // self.segment_size,
+                                               end // self.segment_size):
+            segment_start = index * self.segment_size
+            yield from self._iter_view(data, max(start - segment_start, 0),
+                                       min(end - segment_start, len(data) - 1))
+    
+    def _load_segments(self, content: Content, node: EdgeNode, segments: Dict[int, str],
+                       first: int, last: int) -> Iterator[Tuple[int, bytes]]:
+        """Yield segments first..last in order, filling missing ones on the node.
+        
+        Missing segments are filled once per node however many requests
+        want them. A request leads the fill of each run of segments nobody
+        is fetching yet (see _fill_segments), and waits for the segments
+        other requests are fetching; if one of those requests goes away
+        first, the segments it had left are fetched here instead.
+        """
+        index = first
+        while index <= last:
+            if index in segments:
+                node_cache = self.get_node_cache(node.node_id)
+                with self.cache_lock:
+                    node_cache.disk.get((content.content_id, index))
+                yield index, self.db.objects.view(segments[index])
+                index += 1
+                continue
+            
+            leader, flight = self.origin_requests.start((node.node_id, content.content_id, index))
+            if not leader:
+                data = self.origin_requests.wait(flight)
+                if data is None:
+                    if flight.get('abandoned'):
+                        continue
+                    return
+                yield index, data
+                index += 1
+                continue
+            
+            claimed = {index: flight}
+            run_end = index
+            while run_end < last and run_end + 1 not in segments:
+                flight = self.origin_requests.lead((node.node_id, content.content_id, run_end + 1))
+                if flight is None:
+                    break
+                run_end += 1
+                claimed[run_end] = flight
+            yield from self._fill_segments(content, node, claimed)
+            if claimed:
+                return  # The run came up short
+            index = run_end + 1
+    
+    def _fill_segments(self, content: Content, node: EdgeNode,
+                       claimed: Dict[int, Dict[str, Any]]) -> Iterator[Tuple[int, bytes]]:
+        """Fill a run of segments whose flights this request leads, yielding each in order.
+        
+        Each segment is cached on the node and handed to the requests waiting
+        for it as it arrives, and its flight is removed from claimed. Segments
+        cached since the request looked are read back; the rest come from
+        the node's shield when it has one, otherwise from one ranged origin
+        request per run.
+        """
+        first, last = min(claimed), max(claimed)
+        expires_at = datetime.now() + timedelta(seconds=content.ttl)
+        cached = {}
+        if content.cache_strategy not in (CacheStrategy.NO_CACHE, CacheStrategy.NETWORK_FIRST):
+            cached = self.db.get_cache_segments(content.content_id, node.node_id, first, last)
+        shield = self.get_shield(node)
+        
+        abandoned = False
+        try:
+            index = first
+            while index <= last:
+                if index in cached:
+                    data = bytes(self.db.objects.view(cached[index]))
+                    self.origin_requests.finish((node.node_id, content.content_id, index),
+                                                claimed.pop(index), data)
+                    yield index, data
+                    index += 1
+                    continue
+                
+                run_end = index
+                while run_end < last and run_end + 1 not in cached:
+                    run_end += 1
+                if shield is None:
+                    source = self._fetch_segment_run(content, index, run_end)
+                else:
+                    shield_segments = {}
+                    if content.cache_strategy != CacheStrategy.NO_CACHE:
+                        shield_segments = self.db.get_cache_segments(
+                            content.content_id, shield.node_id, index, run_end)
+                    source = self._load_segments(content, shield, shield_segments, index, run_end)
+                for index, data in source:
+                    data = bytes(data)
+                    self._cache_segment(content, node, index, data, expires_at)
+                    self.origin_requests.finish((node.node_id, content.content_id, index),
+                                                claimed.pop(index), data)
+                    yield index, data
+                if run_end in claimed:
+                    return
+                index = run_end + 1
+        except GeneratorExit:
+            abandoned = True
+            raise
+        finally:
+            # Waiting requests fetch abandoned segments themselves; failed ones get None
+            for index, flight in claimed.items():
+                flight['abandoned'] = abandoned
+                self.origin_requests.finish((node.node_id, content.content_id, index), flight)
+    
+    def _fetch_segment_run(self, content: Content, first: int,
+                           last: int) -> Iterator[Tuple[int, bytes]]:
+        """Yield segments first..last of an object from one ranged origin request."""
+        segment_size = self.segment_size
+        fetch_end = min((last + 1) * segment_size, content.file_size) - 1
+        _, chunks = self.origin.fetch(content.url, first * segment_size, fetch_end)
+        
+        index = first
+        buffer = bytearray()
+        for chunk in chunks:
+            buffer += chunk
+            while index <= last:
+                length = min(segment_size, fetch_end + 1 - index * segment_size)
+                if len(buffer) < length:
+                    break
+                data = bytes(buffer[:length])
+                del buffer[:length]
+                yield index, data
+                index += 1
+        if index <= last:
+            logger.error(f"Origin returned a short body for {content.url}")
+    
+    def _cache_segment(self, content: Content, node: EdgeNode, index: int,
+                       data: bytes, expires_at: datetime):
+        """Cache one segment on a node, evicting colder objects to make room."""
+        if content.cache_strategy == CacheStrategy.NO_CACHE or len(data) > node.capacity:
+            return
+        node_cache = self.get_node_cache(node.node_id)
+        if not self.db.save_cache_segment(content.content_id, node.node_id, index, data, expires_at):
+            return
+        with self.cache_lock:
+            node_cache.disk.capacity = node.capacity
+            evicted = self._evict(node_cache, node_cache.disk.put((content.content_id, index), len(data)))
+        self._delete_evicted(node.node_id, evicted)
+        self._update_used_capacity(node, node_cache)
+    
+    def _log_stream(self, body: Iterator[bytes], content: Content, node: EdgeNode,
+                    client_ip: str, user_agent: str, cache_hit: bool,
+                    start_time: float) -> Iterator[bytes]:
+        """Pass a body through, logging the request once it has been sent."""
+        bytes_sent = 0
+        try:
+            for chunk in body:
+                bytes_sent += len(chunk)
+                yield chunk
+        finally:
+            log = RequestLog(
+                log_id=self.generate_id("log"),
+                content_id=content.content_id,
+                node_id=node.node_id,
+                client_ip=client_ip,
+                user_agent=user_agent,
+                response_time=int((time.time() - start_time) * 1000),
+                cache_hit=cache_hit,
+                bytes_transferred=bytes_sent
+            )
+            self.log_request(log)
+    
+    def get_url_index(self) -> URLIndex:
+        """Get the URL index of all content, building it on first use."""
+        with self.cache_lock:
+            if self.url_index is None:
+                url_index = URLIndex()
+                for url, content_id in self.db.get_content_urls():
+                    url_index.add(url, content_id)
+                self.url_index = url_index
+            return self.url_index
+    
+    def submit_purge(self, url_pattern: str, content_id: str = None,
+                     purge_type: PurgeType = None, soft: bool = False) -> PurgeRequest:
+        """Queue a purge across all edge nodes and return it while still pending.
+        
+        url_pattern is an exact URL, a URL prefix, a glob or a surrogate key,
+        according to purge_type; by default patterns containing wildcards
+        are globs and anything else an exact URL. content_id narrows the
+        purge to that object. A soft purge marks cached copies stale (so
+        they are revalidated) instead of deleting them.
+        """
+        if purge_type is None:
+            purge_type = PurgeType.GLOB if re.search(r'[*?\[]', url_pattern) else PurgeType.URL
         
         purge_request = PurgeRequest(
-            purge_id=purge_id,
+            purge_id=self.generate_id("purge"),
             content_id=content_id,
-            url_pattern=url_pattern
+            url_pattern=url_pattern,
+            purge_type=purge_type,
+            soft=soft
         )
+        self.db.save_purge_request(purge_request)
         
-        # In real implementation, this would trigger cache invalidation
-        # across all edge nodes
-        purge_request.status = "completed"
-        purge_request.completed_at = datetime.now()
+        future = self.purge_executor.submit(self._run_purge, replace(purge_request))
+        self.purge_jobs[purge_request.purge_id] = future
+        future.add_done_callback(lambda _: self.purge_jobs.pop(purge_request.purge_id, None))
+        return purge_request
+    
+    def purge_content(self, url_pattern: str, content_id: str = None,
+                      purge_type: PurgeType = None, soft: bool = False) -> Optional[PurgeRequest]:
+        """Purge content from cache on every edge node, waiting for it to finish."""
+        purge_request = self.submit_purge(url_pattern, content_id, purge_type, soft)
+        return self.wait_for_purge(purge_request.purge_id)
+    
+    def wait_for_purge(self, purge_id: str, timeout: float = None) -> Optional[PurgeRequest]:
+        """Wait for a queued purge and return its final state."""
+        future = self.purge_jobs.get(purge_id)
+        if future is not None:
+            future.result(timeout)
+        return self.get_purge_status(purge_id)
+    
+    def get_purge_status(self, purge_id: str) -> Optional[PurgeRequest]:
+        """Get a purge request and its progress."""
+        return self.db.get_purge_request(purge_id)
+    
+    def resolve_purge(self, purge_request: PurgeRequest) -> List[str]:
+        """Get the IDs of the content a purge request covers."""
+        pattern = purge_request.url_pattern
+        if purge_request.purge_type == PurgeType.TAG:
+            content_ids = self.db.get_content_ids_by_tag(pattern)
+        else:
+            url_index = self.get_url_index()
+            with self.cache_lock:
+                if purge_request.purge_type == PurgeType.PREFIX:
+                    content_ids = url_index.prefix(pattern)
+                elif purge_request.purge_type == PurgeType.GLOB:
+                    content_ids = url_index.glob(pattern)
+                else:
+                    content_ids = url_index.exact(pattern)
+        
+        if purge_request.content_id:
+            content_ids = [c for c in content_ids if c == purge_request.content_id]
+        return content_ids
+    
+    def _run_purge(self, purge_request: PurgeRequest) -> PurgeRequest:
+        """Execute a purge on every edge node and record the outcome."""
+        try:
+            content_ids = self.resolve_purge(purge_request)
+            affected = self.db.purge_cached_content(content_ids, hard=not purge_request.soft)
+        except Exception as e:
+            logger.error(f"Error running purge {purge_request.purge_id}: {e}")
+            affected = None
         
+        if affected is None:
+            purge_request.status = "failed"
+        else:
+            self._purge_node_caches(affected, purge_request.soft)
+            purge_request.status = "completed"
+            purge_request.matched_content = len(content_ids)
+            purge_request.purged_copies = len(affected)
+        purge_request.completed_at = datetime.now()
+        self.db.save_purge_request(purge_request)
         return purge_request
     
+    def _purge_node_caches(self, affected: List[Tuple[str, str, Optional[int]]], soft: bool):
+        """Bring in-memory cache tiers in line with a purge already applied to the database."""
+        now = datetime.now()
+        purged_nodes = set()
+        with self.cache_lock:
+            for node_id, content_id, segment_index in affected:
+                node_cache = self.node_caches.get(node_id)
+                if node_cache is None:
+                    continue  # Loaded from the purged database on first use
+                if soft:
+                    cache_entry = node_cache.memory.peek(content_id)
+                    if cache_entry is not None:
+                        cache_entry.expires_at = min(cache_entry.expires_at, now)
+                    continue
+                if segment_index is None:
+                    cache_id = node_cache.disk.remove(content_id)
+                    node_cache.memory.remove(content_id)
+                    node_cache.pending_hits.pop(cache_id, None)
+                else:
+                    node_cache.disk.remove((content_id, segment_index))
+                purged_nodes.add(node_id)
+        
+        for node in self.db.get_edge_nodes():
+            if node.node_id in purged_nodes:
+                self._update_used_capacity(node, self.node_caches[node.node_id])
+    
+    def submit_prefetch(self, urls: List[str] = None, manifest: str = None,
+                        locations: List[EdgeLocation] = None,
+                        concurrency: int = 4) -> PrefetchJob:
+        """Queue a cache warming job and return it while still pending.
+        
+        URLs come from urls and a manifest (see parse_prefetch_manifest).
+        Each is filled on every active node in the given locations (all by
+        default), at most concurrency fills at a time; copies that are
+        already cached are skipped. Fills go through shields and request
+        collapsing like ordinary misses.
+        """
+        urls = list(urls or [])
+        if manifest:
+            urls += parse_prefetch_manifest(manifest)
+        urls = list(dict.fromkeys(urls))
+        locations = list(locations or [])
+        nodes = [node for node in self.get_node_table().nodes.values()
+                 if not locations or node.location in locations]
+        return self._submit_prefetch(urls, [(url, node) for url in urls for node in nodes],
+                                     locations, concurrency)
+    
+    def prefetch_trending(self, window_minutes: int = 15, min_requests: int = 10,
+                          limit: int = 50, concurrency: int = 4) -> Optional[PrefetchJob]:
+        """Warm content trending on some edges onto the nodes that haven't served it.
+        
+        Trending content has at least min_requests requests in the last
+        window_minutes. Returns None when there is nothing to warm.
+        """
+        self.flush_request_logs()
+        since = minute_bucket(datetime.now() - timedelta(minutes=window_minutes))
+        nodes = list(self.get_node_table().nodes.values())
+        
+        urls, targets = [], []
+        for content_id, _, served_by in self.db.get_trending_content(since, min_requests, limit):
+            content = self.get_content(content_id)
+            if content is None or content.cache_strategy in (CacheStrategy.NO_CACHE,
+                                                             CacheStrategy.NETWORK_FIRST):
+                continue
+            cold = [(content.url, node) for node in nodes if node.node_id not in served_by]
+            if cold:
+                urls.append(content.url)
+                targets += cold
+        
+        if not targets:
+            return None
+        return self._submit_prefetch(urls, targets, [], concurrency)
+    
+    def start_auto_prefetch(self, interval: float = 60.0, **options) -> threading.Event:
+        """Run prefetch_trending every interval seconds until the returned event is set."""
+        stop = threading.Event()
+        
+        def loop():
+            while not stop.wait(interval):
+                try:
+                    self.prefetch_trending(**options)
+                except Exception as e:
+                    logger.error(f"Error prefetching trending content: {e}")
+        
+        threading.Thread(target=loop, daemon=True, name="cdn-auto-prefetch").start()
+        return stop
+    
+    def _submit_prefetch(self, urls: List[str], targets: List[Tuple[str, EdgeNode]],
+                         locations: List[EdgeLocation], concurrency: int) -> PrefetchJob:
+        """Record a prefetch job over (URL, node) targets and queue it."""
+        job = PrefetchJob(
+            job_id=self.generate_id("prefetch"),
+            urls=urls,
+            locations=locations,
+            concurrency=max(1, concurrency),
+            total=len(targets)
+        )
+        self.db.save_prefetch_job(job)
+        
+        with self.prefetch_lock:
+            self.prefetch_jobs[job.job_id] = job
+            snapshot = replace(job, errors=[])
+        future = self.prefetch_executor.submit(self._run_prefetch, job, targets)
+        self.prefetch_futures[job.job_id] = future
+        future.add_done_callback(lambda _: self.prefetch_futures.pop(job.job_id, None))
+        return snapshot
+    
+    def wait_for_prefetch(self, job_id: str, timeout: float = None) -> Optional[PrefetchJob]:
+        """Wait for a queued prefetch job and return its final state."""
+        future = self.prefetch_futures.get(job_id)
+        if future is not None:
+            future.result(timeout)
+        return self.get_prefetch_status(job_id)
+    
+    def get_prefetch_status(self, job_id: str) -> Optional[PrefetchJob]:
+        """Get a prefetch job and its progress, live while it runs."""
+        with self.prefetch_lock:
+            job = self.prefetch_jobs.get(job_id)
+            if job is not None:
+                return replace(job, errors=list(job.errors))
+        return self.db.get_prefetch_job(job_id)
+    
+    def _run_prefetch(self, job: PrefetchJob, targets: List[Tuple[str, EdgeNode]]) -> PrefetchJob:
+        """Warm every target with up to job.concurrency fills at once."""
+        job.status = "running"
+        self.db.save_prefetch_job(job)
+        contents = {url: self.get_content_by_url(url) for url in job.urls}
+        
+        def warm(target: Tuple[str, EdgeNode]):
+            url, node = target
+            try:
+                if contents.get(url) is None:
+                    raise LookupError("content not found")
+                outcome = 'filled' if self._prefetch_object(contents[url], node) else 'skipped'
+            except Exception as e:
+                outcome = f"{url} on {node.node_id}: {e}"
+            with self.prefetch_lock:
+                if outcome == 'filled':
+                    job.filled += 1
+                elif outcome == 'skipped':
+                    job.skipped += 1
+                else:
+                    job.failed += 1
+                    if len(job.errors) < 20:
+                        job.errors.append(outcome)
+        
+        try:
+            with ThreadPoolExecutor(max_workers=job.concurrency,
+                                    thread_name_prefix="cdn-prefetch-fill") as pool:
+                for _ in pool.map(warm, targets):
+                    pass
+            job.status = "completed"
+        except Exception as e:
+            logger.error(f"Error running prefetch {job.job_id}: {e}")
+            job.status = "failed"
+        job.completed_at = datetime.now()
+        self.db.save_prefetch_job(job)
+        with self.prefetch_lock:
+            self.prefetch_jobs.pop(job.job_id, None)
+        return job
+    
+    def _prefetch_object(self, content: Content, node: EdgeNode) -> bool:
+        """Cache an object on a node unless it is there already; returns whether it was filled."""
+        if content.cache_strategy == CacheStrategy.NO_CACHE:
+            raise ValueError("content is not cacheable")
+        
+        if content.file_size >= self.large_object_threshold:
+            last = (content.file_size - 1) // self.segment_size
+            segments = self.db.get_cache_segments(content.content_id, node.node_id, 0, last)
+            if len(segments) == last + 1:
+                return False
+            loaded = sum(1 for _ in self._load_segments(content, node, segments, 0, last))
+            if loaded < last + 1:
+                raise ConnectionError("origin returned a short body")
+            return True
+        
+        cache_entry = self.db.get_cache_entry(content.content_id, node.node_id)
+        if cache_entry is not None and cache_entry.expires_at > datetime.now():
+            return False
+        content_data, cache_entry = self.fill_from_origin(content, node)
+        if content_data is None:
+            raise ConnectionError("origin fetch failed")
+        if cache_entry is None:
+            raise ValueError("content could not be cached")
+        return True
+    
+    def log_request(self, log: RequestLog):
+        """Queue a request log to be written with the next batch."""
+        with self.log_lock:
+            self.pending_logs.append(log)
+            pending = len(self.pending_logs)
+            if pending == 1:
+                self.log_timer = threading.Timer(self.log_flush_interval, self.flush_request_logs)
+                self.log_timer.daemon = True
+                self.log_timer.start()
+        if pending % self.log_batch_size == 0:
+            self.log_executor.submit(self.flush_request_logs)
+    
+    def flush_request_logs(self) -> int:
+        """Write queued request logs and their rollups; returns logs written."""
+        with self.log_write_lock:
+            with self.log_lock:
+                logs, self.pending_logs = self.pending_logs, []
+                if self.log_timer is not None:
+                    self.log_timer.cancel()
+                    self.log_timer = None
+            if logs:
+                self.db.save_request_logs(logs)
+        return len(logs)
+    
     def get_analytics(self, content_id: str = None, node_id: str = None,
                      start_date: datetime = None, end_date: datetime = None) -> Dict[str, Any]:
-        """Get CDN analytics."""
-        logs = self.db.get_request_logs(content_id, node_id, limit=1000)
+        """Get CDN analytics for a time window (all time by default).
+        
+        Answered from the per-minute rollups, so every request in the window
+        counts. Bandwidth is bytes per second over the window's minutes;
+        latency percentiles are upper bounds of histogram buckets.
+        """
+        self.flush_request_logs()
+        stats = self.db.get_request_stats(content_id, node_id,
+                                          minute_bucket(start_date) if start_date else None,
+                                          minute_bucket(end_date) if end_date else None)
+        total_requests = sum(row['requests'] for row in stats)
         
-        if not logs:
+        if not total_requests:
             return {
                 'total_requests': 0,
                 'cache_hit_rate': 0.0,
                 'average_response_time': 0.0,
                 'total_bytes_transferred': 0,
                 'requests_by_status': {},
-                'requests_by_node': {}
+                'requests_by_node': {},
+                'bandwidth_bps': 0.0,
+                'latency_percentiles': {}
             }
         
-        total_requests = len(logs)
-        cache_hits = sum(1 for log in logs if log.cache_hit)
-        cache_hit_rate = (cache_hits / total_requests) * 100 if total_requests > 0 else 0
+        cache_hits = sum(row['cache_hits'] for row in stats)
+        cache_hit_rate = (cache_hits / total_requests) * 100
+        average_response_time = sum(row['response_time_total'] for row in stats) / total_requests
+        total_bytes = sum(row['bytes_transferred'] for row in stats)
         
-        total_response_time = sum(log.response_time for log in logs)
-        average_response_time = total_response_time / total_requests if total_requests > 0 else 0
-        
-        total_bytes = sum(log.bytes_transferred for log in logs)
-        
-        # Group by status code
         status_counts = {}
-        for log in logs:
-            status = log.status_code
-            status_counts[status] = status_counts.get(status, 0) + 1
-        
-        # Group by node
         node_counts = {}
-        for log in logs:
-            node = log.node_id
-            node_counts[node] = node_counts.get(node, 0) + 1
+        histogram = [0] * len(stats[0]['latency_histogram'])
+        for row in stats:
+            status_counts[row['status_code']] = status_counts.get(row['status_code'], 0) + row['requests']
+            node_counts[row['node_id']] = node_counts.get(row['node_id'], 0) + row['requests']
+            histogram = [a + b for a, b in zip(histogram, row['latency_histogram'])]
+        
+        window_start = minute_bucket(start_date) if start_date else min(row['first_minute'] for row in stats)
+        window_end = (minute_bucket(end_date) if end_date else max(row['last_minute'] for row in stats)) + 60
+        maximum = max(row['response_time_max'] for row in stats)
         
         return {
             'total_requests': total_requests,
@@ -907,11 +3390,16 @@ class CDNService:
             'average_response_time': round(average_response_time, 2),
             'total_bytes_transferred': total_bytes,
             'requests_by_status': status_counts,
-            'requests_by_node': node_counts
+            'requests_by_node': node_counts,
+            'bandwidth_bps': round(total_bytes / (window_end - window_start), 2),
+            'latency_percentiles': {
+                f'p{p}': histogram_percentile(histogram, p, maximum) for p in (50, 90, 95, 99)
+            }
         }
     
     def get_node_status(self) -> List[Dict[str, Any]]:
         """Get status of all edge nodes."""
+        self.flush_cache_stats()
         nodes = self.db.get_edge_nodes()
         
         status_list = []
@@ -938,7 +3426,7 @@ class CDNService:
 cdn_service = CDNService()
 
 # Flask app for API
-from flask import Flask, request, jsonify, render_template_string, Response
+from flask import Flask, request, jsonify, render_template_string, Response, stream_with_context
 
 app = Flask(__name__)
 
@@ -1232,12 +3720,17 @@ def add_content():
         # Simulate content data
         content_data = b"Simulated content data for " + data['url'].encode()
         
+        surrogate_keys = data.get('surrogate_keys', [])
+        if isinstance(surrogate_keys, str):
+            surrogate_keys = surrogate_keys.split()
+        
         content = cdn_service.add_content(
             url=data['url'],
             content_data=content_data,
             content_type=content_type,
             ttl=ttl,
-            cache_strategy=cache_strategy
+            cache_strategy=cache_strategy,
+            surrogate_keys=surrogate_keys
         )
         
         if content:
@@ -1270,7 +3763,8 @@ def serve_content():
             url=data['serve_url'],
             client_ip=client_ip,
             user_agent=user_agent,
-            client_location=client_location
+            client_location=client_location,
+            accept_encoding=request.headers.get('Accept-Encoding')
         )
         
         return jsonify(result)
@@ -1279,6 +3773,145 @@ def serve_content():
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
 
+@app.route('/api/stream')
+def stream_content():
+    """Stream content bytes through CDN, with Range support."""
+    url = request.args.get('url')
+    if not url:
+        return jsonify({'success': False, 'error': 'url is required'}), 400
+    
+    try:
+        client_location = EdgeLocation(request.args.get('client_location', 'us_east'))
+    except ValueError:
+        return jsonify({'success': False, 'error': 'Invalid client location'}), 400
+    
+    result = cdn_service.stream_content(
+        url=url,
+        client_ip=request.remote_addr or '127.0.0.1',
+        user_agent=request.headers.get('User-Agent', 'CDN-Client/1.0'),
+        client_location=client_location,
+        range_header=request.headers.get('Range'),
+        if_range=request.headers.get('If-Range'),
+        accept_encoding=request.headers.get('Accept-Encoding')
+    )
+    
+    if not result['success']:
+        return (jsonify({'success': False, 'error': result['error']}), result['status_code'],
+                result.get('headers', {}))
+    return Response(stream_with_context(result['body']), status=result['status_code'],
+                    headers=result['headers'], direct_passthrough=True)
+
+@app.route('/api/purge', methods=['POST'])
+def purge_content():
+    """Queue a purge across all edge nodes."""
+    data = request.get_json()
+    
+    if not data.get('pattern'):
+        return jsonify({'success': False, 'error': 'pattern is required'}), 400
+    
+    try:
+        purge_type = PurgeType(data['type']) if data.get('type') else None
+    except ValueError:
+        return jsonify({'success': False, 'error': 'Invalid purge type'}), 400
+    
+    purge_request = cdn_service.submit_purge(
+        url_pattern=data['pattern'],
+        content_id=data.get('content_id'),
+        purge_type=purge_type,
+        soft=bool(data.get('soft', False))
+    )
+    return jsonify({
+        'success': True,
+        'purge_id': purge_request.purge_id,
+        'status': purge_request.status
+    }), 202
+
+@app.route('/api/purge/<purge_id>')
+def get_purge_status(purge_id):
+    """Get purge request status."""
+    purge_request = cdn_service.get_purge_status(purge_id)
+    if purge_request is None:
+        return jsonify({'success': False, 'error': 'Purge request not found'}), 404
+    
+    return jsonify({
+        'success': True,
+        'purge_id': purge_request.purge_id,
+        'pattern': purge_request.url_pattern,
+        'type': purge_request.purge_type.value,
+        'soft': purge_request.soft,
+        'status': purge_request.status,
+        'matched_content': purge_request.matched_content,
+        'purged_copies': purge_request.purged_copies,
+        'created_at': purge_request.created_at.isoformat(),
+        'completed_at': purge_request.completed_at.isoformat() if purge_request.completed_at else None
+    })
+
+def prefetch_job_to_dict(job: PrefetchJob) -> Dict[str, Any]:
+    """Describe a prefetch job for the API."""
+    done = job.filled + job.skipped + job.failed
+    return {
+        'success': True,
+        'job_id': job.job_id,
+        'status': job.status,
+        'urls': len(job.urls),
+        'locations': [location.value for location in job.locations],
+        'concurrency': job.concurrency,
+        'total': job.total,
+        'filled': job.filled,
+        'skipped': job.skipped,
+        'failed': job.failed,
+        'progress': round(done / job.total * 100, 2) if job.total else 100.0,
+        'errors': job.errors,
+        'created_at': job.created_at.isoformat(),
+        'completed_at': job.completed_at.isoformat() if job.completed_at else None
+    }
+
+@app.route('/api/prefetch', methods=['POST'])
+def prefetch_content():
+    """Queue a cache warming job."""
+    data = request.get_json()
+    
+    if not data.get('urls') and not data.get('manifest'):
+        return jsonify({'success': False, 'error': 'urls or manifest is required'}), 400
+    
+    try:
+        locations = [EdgeLocation(location) for location in data.get('locations', [])]
+        job = cdn_service.submit_prefetch(
+            urls=data.get('urls'),
+            manifest=data.get('manifest'),
+            locations=locations,
+            concurrency=int(data.get('concurrency', 4))
+        )
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    return jsonify(prefetch_job_to_dict(job)), 202
+
+@app.route('/api/prefetch/trending', methods=['POST'])
+def prefetch_trending():
+    """Queue warming of content trending on other edges."""
+    data = request.get_json(silent=True) or {}
+    
+    try:
+        job = cdn_service.prefetch_trending(
+            window_minutes=int(data.get('window_minutes', 15)),
+            min_requests=int(data.get('min_requests', 10)),
+            limit=int(data.get('limit', 50)),
+            concurrency=int(data.get('concurrency', 4))
+        )
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    if job is None:
+        return jsonify({'success': True, 'job_id': None, 'status': 'nothing to prefetch'})
+    return jsonify(prefetch_job_to_dict(job)), 202
+
+@app.route('/api/prefetch/<job_id>')
+def get_prefetch_status(job_id):
+    """Get prefetch job progress."""
+    job = cdn_service.get_prefetch_status(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Prefetch job not found'}), 404
+    return jsonify(prefetch_job_to_dict(job))
+
 @app.route('/api/analytics')
 def get_analytics():
     """Get CDN analytics."""
@@ -1286,7 +3919,13 @@ def get_analytics():
     node_id = request.args.get('node_id')
     
     try:
-        analytics = cdn_service.get_analytics(content_id, node_id)
+        start_date = request.args.get('start')
+        end_date = request.args.get('end')
+        analytics = cdn_service.get_analytics(
+            content_id, node_id,
+            datetime.fromisoformat(start_date) if start_date else None,
+            datetime.fromisoformat(end_date) if end_date else None
+        )
         return jsonify(analytics)
     except Exception as e:
         return jsonify({'error': str(e)})
@@ -1300,10 +3939,45 @@ def get_node_status():
     except Exception as e:
         return jsonify({'error': str(e)})
 
+@app.route('/api/nodes/<node_id>/heartbeat', methods=['POST'])
+def node_heartbeat(node_id):
+    """Record a heartbeat from an edge node."""
+    if not cdn_service.record_heartbeat(node_id):
+        return jsonify({'success': False, 'error': 'Heartbeat not recorded'}), 404
+    return jsonify({'success': True})
+
 @app.route('/api/health')
 def health_check():
     """Health check endpoint."""
     return jsonify({'status': 'healthy', 'service': 'cdn_system'})
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000, debug=True)
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="CDN service")
+    parser.add_argument('--replay-trace', metavar='PATH',
+                        help='replay a "key size" trace file through the edge cache and exit')
+    parser.add_argument('--synthetic-trace', type=int, metavar='REQUESTS',
+                        help='replay a synthetic Zipf trace of this many requests and exit')
+    parser.add_argument('--objects', type=int, default=10000,
+                        help='distinct objects in the synthetic trace')
+    parser.add_argument('--capacity-mb', type=int, default=100, help='cache capacity to replay with')
+    parser.add_argument('--auto-prefetch', type=float, default=0, metavar='SECONDS',
+                        help='warm trending content onto other edges at this interval')
+    parser.add_argument('--heartbeat-timeout', type=int, metavar='SECONDS',
+                        help='route around nodes that have not sent a heartbeat for this long')
+    args = parser.parse_args()
+    
+    if args.replay_trace or args.synthetic_trace:
+        trace = (load_trace(args.replay_trace) if args.replay_trace
+                 else zipf_trace(args.synthetic_trace, args.objects))
+        for policy, result in replay_cache_trace(trace, args.capacity_mb * 1024 * 1024).items():
+            print(f"{policy}: {result['requests']} requests, hit ratio {result['hit_ratio']}%, "
+                  f"byte hit ratio {result['byte_hit_ratio']}%")
+    else:
+        if args.auto_prefetch:
+            cdn_service.start_auto_prefetch(args.auto_prefetch)
+        if args.heartbeat_timeout:
+            cdn_service.heartbeat_timeout = args.heartbeat_timeout
+            cdn_service.node_table = None
+        app.run(host='0.0.0.0', port=5000, debug=True)
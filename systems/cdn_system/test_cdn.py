@@ -12,6 +12,13 @@ import os
 import sys
 import time
 import json
+import shutil
+import socket
+import sqlite3
+import threading
+import gzip
+import zlib
+from http.server import HTTPServer, ThreadingHTTPServer, BaseHTTPRequestHandler
 from datetime import datetime, timedelta
 from unittest.mock import patch, MagicMock
 
@@ -19,7 +26,10 @@ from unittest.mock import patch, MagicMock
 sys.path.insert(0, os.path.dirname(__file__))
 
 from cdn_service import (
-    CDNService, CDNDatabase,
+    CDNService, CDNDatabase, HTTPOrigin, GDSFCache,
+    replay_cache_trace, zipf_trace, URLIndex, PurgeType, EdgeNodeTable, RequestCollapser,
+    parse_range_header, RangeNotSatisfiable, minute_bucket, negotiate_encoding, is_compressible,
+    parse_prefetch_manifest,
     Content, EdgeNode, CacheEntry, RequestLog, PurgeRequest,
     ContentType, CacheStrategy, EdgeLocation, ContentStatus
 )
@@ -728,6 +738,1397 @@ class TestEdgeCases(unittest.TestCase):
         
         os.unlink(temp_db.name)
 
+class TestObjectStore(unittest.TestCase):
+    """Test the content-addressed object store behind the edge caches."""
+    
+    def setUp(self):
+        """Set up test service."""
+        self.temp_db = tempfile.NamedTemporaryFile(delete=False)
+        self.temp_db.close()
+        self.service = CDNService(self.temp_db.name)
+        self.objects = self.service.db.objects
+    
+    def tearDown(self):
+        """Clean up test service and stored objects."""
+        os.unlink(self.temp_db.name)
+        shutil.rmtree(self.objects.root, ignore_errors=True)
+    
+    def cache_on_all_nodes(self, url, content_data):
+        """Add content and cache it on every edge node."""
+        content = self.service.add_content(url=url, content_data=content_data)
+        entries = [self.service.cache_content(content, node, content_data)
+                   for node in self.service.db.get_edge_nodes()]
+        return content, entries
+    
+    def test_bodies_are_deduplicated_across_nodes(self):
+        """Test one object file is shared by every node caching it."""
+        content, entries = self.cache_on_all_nodes("https://example.com/app.js", b"x" * 4096)
+        
+        self.assertEqual(len(entries), 4)
+        self.assertEqual({entry.checksum for entry in entries}, {content.checksum})
+        self.assertTrue(self.service.wait_for_compression(timeout=5))
+        variants = self.service.get_variants(content.checksum)
+        self.assertEqual(set(variants), {'gzip', 'deflate'})
+        self.assertEqual(sorted(self.objects.checksums()),
+                         sorted([content.checksum] + [v[0] for v in variants.values()]))
+        self.assertEqual(self.objects.size(content.checksum), 4096)
+    
+    def test_no_bodies_in_sqlite(self):
+        """Test cache_entries holds only metadata."""
+        self.cache_on_all_nodes("https://example.com/app.js", b"body")
+        conn = sqlite3.connect(self.temp_db.name)
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(cache_entries)")]
+        conn.close()
+        
+        self.assertNotIn('content_data', columns)
+        self.assertIn('checksum', columns)
+    
+    def test_hits_read_through_memory_map(self):
+        """Test stored bodies are read as mapped views and hits only bump counters."""
+        content, entries = self.cache_on_all_nodes("https://example.com/app.js", b"0123456789")
+        node_id = entries[0].node_id
+        
+        for _ in range(3):
+            self.service.get_cached_content(content.content_id, node_id)
+        self.service.flush_cache_stats()
+        stored = self.service.db.get_cache_entry(content.content_id, node_id)
+        self.assertIsInstance(stored.content_data, memoryview)
+        self.assertEqual(stored.content_data, b"0123456789")
+        self.assertEqual(stored.access_count, 3)
+        self.assertEqual(self.objects.view(content.checksum, 2, 3), b"234")
+    
+    def test_sendfile(self):
+        """Test bodies can be copied straight to a socket."""
+        content, _ = self.cache_on_all_nodes("https://example.com/app.js", b"0123456789")
+        sender, receiver = socket.socketpair()
+        try:
+            sent = self.objects.sendfile(content.checksum, sender.fileno(), offset=4, count=3)
+            self.assertEqual(sent, 3)
+            self.assertEqual(receiver.recv(16), b"456")
+        finally:
+            sender.close()
+            receiver.close()
+    
+    def test_delete_removes_body_with_last_reference(self):
+        """Test an object file outlives all but the last entry using it."""
+        content, entries = self.cache_on_all_nodes("https://example.com/app.js", b"shared")
+        
+        for entry in entries[:-1]:
+            self.assertTrue(self.service.db.delete_cache_entry(entry.cache_id))
+            self.assertTrue(self.objects.exists(content.checksum))
+        self.assertTrue(self.service.db.delete_cache_entry(entries[-1].cache_id))
+        self.assertFalse(self.objects.exists(content.checksum))
+        self.assertFalse(self.service.db.delete_cache_entry(entries[-1].cache_id))
+    
+    def test_collect_garbage(self):
+        """Test unreferenced objects are collected."""
+        content, _ = self.cache_on_all_nodes("https://example.com/app.js", b"kept")
+        orphan = self.objects.put(b"orphan")
+        
+        self.assertEqual(self.service.db.collect_garbage(), 1)
+        self.assertFalse(self.objects.exists(orphan))
+        self.assertTrue(self.objects.exists(content.checksum))
+    
+    def test_legacy_blob_table_is_migrated(self):
+        """Test bodies stored in the old BLOB column move to the object store."""
+        temp_db = tempfile.NamedTemporaryFile(delete=False)
+        temp_db.close()
+        conn = sqlite3.connect(temp_db.name)
+        conn.execute('''
+            CREATE TABLE cache_entries (
+                cache_id TEXT PRIMARY KEY, content_id TEXT NOT NULL, node_id TEXT NOT NULL,
+                url TEXT NOT NULL, content_data BLOB NOT NULL, content_type TEXT NOT NULL,
+                mime_type TEXT NOT NULL, file_size INTEGER NOT NULL, ttl INTEGER NOT NULL,
+                created_at TIMESTAMP, expires_at TIMESTAMP NOT NULL, last_accessed TIMESTAMP,
+                access_count INTEGER DEFAULT 0, checksum TEXT DEFAULT ''
+            )
+        ''')
+        conn.execute('''
+            INSERT INTO cache_entries VALUES
+            ('cache_001', 'content_001', 'node_001', 'https://example.com/a.png', ?, 'image',
+             'image/png', 3, 60, NULL, ?, NULL, 7, '')
+        ''', (b"old", datetime.now() + timedelta(hours=1)))
+        conn.commit()
+        conn.close()
+        
+        try:
+            db = CDNDatabase(temp_db.name)
+            entry = db.get_cache_entry('content_001', 'node_001')
+            self.assertEqual(entry.content_data, b"old")
+            self.assertEqual(entry.access_count, 7)
+            self.assertTrue(db.objects.exists(entry.checksum))
+        finally:
+            os.unlink(temp_db.name)
+            shutil.rmtree(os.path.splitext(temp_db.name)[0] + "_objects", ignore_errors=True)
+    
+    def test_large_object_hits_performance(self):
+        """Test hits on a large object do not copy its body."""
+        content_data = os.urandom(32 * 1024 * 1024)
+        content, entries = self.cache_on_all_nodes("https://example.com/big.bin", content_data)
+        
+        start_time = time.time()
+        for _ in range(100):
+            cached = self.service.get_cached_content(content.content_id, entries[0].node_id)
+            self.assertEqual(len(cached.content_data), len(content_data))
+        duration = time.time() - start_time
+        
+        self.assertLess(duration, 2.0)
+
+class StubOrigin:
+    """In-memory origin that records every fetch."""
+    
+    def __init__(self, objects, chunk_size=1000):
+        self.objects = objects
+        self.chunk_size = chunk_size
+        self.requests = []
+        self.fail = False
+    
+    def fetch(self, url, start=0, end=None):
+        if self.fail:
+            raise ConnectionError("origin down")
+        body = self.objects[url]
+        end = len(body) - 1 if end is None else min(end, len(body) - 1)
+        self.requests.append((start, end))
+        return len(body), (body[i:min(i + self.chunk_size, end + 1)]
+                           for i in range(start, end + 1, self.chunk_size))
+
+class SlowOrigin(StubOrigin):
+    """Stub origin that takes a while per fetch and tracks concurrent fetches."""
+    
+    def __init__(self, objects, delay=0.05):
+        super().__init__(objects)
+        self.delay = delay
+        self.active = 0
+        self.max_active = 0
+        self.lock = threading.Lock()
+    
+    def fetch(self, url, start=0, end=None):
+        with self.lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        try:
+            time.sleep(self.delay)
+            return super().fetch(url, start, end)
+        finally:
+            with self.lock:
+                self.active -= 1
+
+class RangeRequestHandler(BaseHTTPRequestHandler):
+    """Origin handler serving one body with single-range support."""
+    
+    body = bytes(range(256)) * 40
+    
+    def do_GET(self):
+        byte_range = parse_range_header(self.headers.get('Range'), len(self.body))
+        start, end = byte_range or (0, len(self.body) - 1)
+        self.send_response(206 if byte_range else 200)
+        if byte_range:
+            self.send_header('Content-Range', f'bytes {start}-{end}/{len(self.body)}')
+        self.send_header('Content-Length', str(end - start + 1))
+        self.end_headers()
+        self.wfile.write(self.body[start:end + 1])
+    
+    def log_message(self, format, *args):
+        pass
+
+class CountingOriginHandler(BaseHTTPRequestHandler):
+    """Slow origin handler that counts requests per path."""
+    
+    body = b"console.log('hello');" * 100
+    delay = 0.2
+    counts = {}
+    lock = threading.Lock()
+    
+    def do_GET(self):
+        with self.lock:
+            self.counts[self.path] = self.counts.get(self.path, 0) + 1
+        time.sleep(self.delay)
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(self.body)))
+        self.end_headers()
+        self.wfile.write(self.body)
+    
+    def log_message(self, format, *args):
+        pass
+
+class TestStreaming(unittest.TestCase):
+    """Test streaming and byte-range serving."""
+    
+    def setUp(self):
+        """Set up a service with a stub origin."""
+        self.temp_db = tempfile.NamedTemporaryFile(delete=False)
+        self.temp_db.close()
+        self.small = bytes(range(256)) * 20
+        self.large = os.urandom(10000)
+        self.origin = StubOrigin({
+            "https://example.com/app.js": self.small,
+            "https://example.com/movie.mp4": self.large
+        })
+        self.service = CDNService(self.temp_db.name, origin=self.origin, chunk_size=512,
+                                  segment_size=1024, large_object_threshold=8192)
+        self.service.add_content("https://example.com/app.js", self.small)
+        self.service.add_content("https://example.com/movie.mp4", self.large)
+    
+    def tearDown(self):
+        """Clean up test service and stored objects."""
+        os.unlink(self.temp_db.name)
+        shutil.rmtree(self.service.db.objects.root, ignore_errors=True)
+    
+    def stream(self, url, range_header=None, if_range=None):
+        """Stream a URL and collect the body."""
+        result = self.service.stream_content(url, "192.168.1.100", "Mozilla/5.0",
+                                             range_header=range_header, if_range=if_range)
+        result['data'] = b"".join(result['body']) if result['success'] else None
+        return result
+    
+    def test_parse_range_header(self):
+        """Test Range header forms."""
+        self.assertEqual(parse_range_header("bytes=0-99", 1000), (0, 99))
+        self.assertEqual(parse_range_header("bytes=900-", 1000), (900, 999))
+        self.assertEqual(parse_range_header("bytes=-100", 1000), (900, 999))
+        self.assertEqual(parse_range_header("bytes=990-2000", 1000), (990, 999))
+        self.assertEqual(parse_range_header("bytes=-5000", 1000), (0, 999))
+        self.assertIsNone(parse_range_header(None, 1000))
+        self.assertIsNone(parse_range_header("bytes=0-1,5-6", 1000))
+        self.assertIsNone(parse_range_header("items=0-1", 1000))
+        self.assertIsNone(parse_range_header("bytes=abc", 1000))
+        with self.assertRaises(RangeNotSatisfiable):
+            parse_range_header("bytes=1000-", 1000)
+    
+    def test_stream_whole_object_miss_then_hit(self):
+        """Test a miss streams from origin and fills the cache."""
+        result = self.stream("https://example.com/app.js")
+        
+        self.assertEqual(result['status_code'], 200)
+        self.assertFalse(result['cache_hit'])
+        self.assertEqual(result['data'], self.small)
+        self.assertEqual(result['headers']['Content-Length'], str(len(self.small)))
+        self.assertEqual(result['headers']['Accept-Ranges'], 'bytes')
+        
+        result = self.stream("https://example.com/app.js")
+        self.assertTrue(result['cache_hit'])
+        self.assertEqual(result['data'], self.small)
+        self.assertEqual(len(self.origin.requests), 1)
+    
+    def test_range_requests(self):
+        """Test partial responses carry the requested bytes."""
+        result = self.stream("https://example.com/app.js", "bytes=100-199")
+        self.assertEqual(result['status_code'], 206)
+        self.assertEqual(result['data'], self.small[100:200])
+        self.assertEqual(result['headers']['Content-Range'], f'bytes 100-199/{len(self.small)}')
+        
+        result = self.stream("https://example.com/app.js", "bytes=-10")
+        self.assertEqual(result['data'], self.small[-10:])
+        self.assertTrue(result['cache_hit'])
+    
+    def test_unsatisfiable_range(self):
+        """Test a range past the end gets 416."""
+        result = self.stream("https://example.com/app.js", "bytes=99999-")
+        
+        self.assertEqual(result['status_code'], 416)
+        self.assertEqual(result['headers']['Content-Range'], f'bytes */{len(self.small)}')
+    
+    def test_if_range(self):
+        """Test If-Range only honors the range for the current validator."""
+        etag = self.stream("https://example.com/app.js")['headers']['ETag']
+        
+        result = self.stream("https://example.com/app.js", "bytes=0-9", if_range=etag)
+        self.assertEqual(result['status_code'], 206)
+        result = self.stream("https://example.com/app.js", "bytes=0-9", if_range='"stale"')
+        self.assertEqual(result['status_code'], 200)
+        self.assertEqual(result['data'], self.small)
+    
+    def test_large_object_segments(self):
+        """Test large objects fetch and cache only the segments requested."""
+        result = self.stream("https://example.com/movie.mp4", "bytes=2500-5500")
+        self.assertEqual(result['data'], self.large[2500:5501])
+        self.assertFalse(result['cache_hit'])
+        self.assertEqual(self.origin.requests, [(2048, 6143)])
+        
+        result = self.stream("https://example.com/movie.mp4")
+        self.assertEqual(result['data'], self.large)
+        self.assertEqual(self.origin.requests[1:], [(0, 2047), (6144, 9999)])
+        
+        result = self.stream("https://example.com/movie.mp4", "bytes=9000-")
+        self.assertTrue(result['cache_hit'])
+        self.assertEqual(result['data'], self.large[9000:])
+        self.assertEqual(len(self.origin.requests), 3)
+    
+    def test_abandoned_stream_still_fills_cache(self):
+        """Test a client disconnect does not waste the origin fetch."""
+        result = self.service.stream_content("https://example.com/app.js", "192.168.1.100",
+                                             "Mozilla/5.0")
+        next(result['body'])
+        result['body'].close()
+        
+        self.assertTrue(self.stream("https://example.com/app.js")['cache_hit'])
+        self.service.flush_request_logs()
+        logs = self.service.db.get_request_logs()
+        # Streamed misses are sent in chunk_size pieces, like hits
+        self.assertEqual(sorted(log.bytes_transferred for log in logs), [512, len(self.small)])
+    
+    def test_http_origin_ranged_fetch(self):
+        """Test the HTTP origin client requests and reads byte ranges."""
+        server = HTTPServer(('127.0.0.1', 0), RangeRequestHandler)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            url = f"http://127.0.0.1:{server.server_port}/file.bin"
+            origin = HTTPOrigin(chunk_size=1000)
+            total, chunks = origin.fetch(url, 300, 4299)
+            self.assertEqual(total, len(RangeRequestHandler.body))
+            self.assertEqual(b"".join(chunks), RangeRequestHandler.body[300:4300])
+            total, chunks = origin.fetch(url)
+            self.assertEqual(b"".join(chunks), RangeRequestHandler.body)
+        finally:
+            server.shutdown()
+            server.server_close()
+    
+    def test_stream_api(self):
+        """Test the streaming endpoint passes Range through."""
+        from cdn_service import app
+        with patch('cdn_service.cdn_service', self.service):
+            client = app.test_client()
+            response = client.get('/api/stream?url=https://example.com/app.js',
+                                  headers={'Range': 'bytes=10-19'})
+            self.assertEqual(response.status_code, 206)
+            self.assertEqual(response.data, self.small[10:20])
+            self.assertEqual(response.headers['Content-Range'], f'bytes 10-19/{len(self.small)}')
+            
+            self.assertEqual(client.get('/api/stream?url=https://example.com/none').status_code, 404)
+            self.assertEqual(client.get('/api/stream').status_code, 400)
+    
+    def test_time_to_first_byte_on_large_miss(self):
+        """Test the first chunk of a large miss arrives before the rest is fetched."""
+        body = os.urandom(64 * 1024 * 1024)
+        self.origin.objects["https://example.com/big.iso"] = body
+        self.origin.chunk_size = 65536
+        self.service.segment_size = 4 * 1024 * 1024
+        self.service.add_content("https://example.com/big.iso", body)
+        
+        start_time = time.time()
+        result = self.service.stream_content("https://example.com/big.iso", "192.168.1.100",
+                                             "Mozilla/5.0")
+        first_chunk = next(result['body'])
+        ttfb = time.time() - start_time
+        result['body'].close()
+        
+        self.assertEqual(first_chunk, body[:512])
+        self.assertLess(ttfb, 0.5)
+
+class TestEdgeCaching(unittest.TestCase):
+    """Test two-tier edge caching, eviction and cache strategies."""
+    
+    def setUp(self):
+        """Set up a service with a small edge node and a stub origin."""
+        self.temp_db = tempfile.NamedTemporaryFile(delete=False)
+        self.temp_db.close()
+        self.origin = StubOrigin({})
+        self.service = CDNService(self.temp_db.name, origin=self.origin)
+        self.node = EdgeNode(
+            node_id="node_small",
+            location=EdgeLocation.EU_CENTRAL,
+            ip_address="192.168.1.20",
+            capacity=3000
+        )
+        self.service.db.save_edge_node(self.node)
+    
+    def tearDown(self):
+        """Clean up test service and stored objects."""
+        for thread in list(self.service.revalidations.values()):
+            thread.join()
+        os.unlink(self.temp_db.name)
+        shutil.rmtree(self.service.db.objects.root, ignore_errors=True)
+    
+    def add(self, name, size, **kwargs):
+        """Add content whose origin body has the given size."""
+        url = f"https://example.com/{name}"
+        self.origin.objects[url] = name.encode().ljust(size, b".")
+        return self.service.add_content(url, self.origin.objects[url], **kwargs)
+    
+    def serve(self, content):
+        """Serve content from the small node's location."""
+        return self.service.serve_content(content.url, "192.168.1.100", "Mozilla/5.0",
+                                          client_location=EdgeLocation.EU_CENTRAL)
+    
+    def test_gdsf_prefers_small_frequent_objects(self):
+        """Test GDSF evicts large, rarely used objects first."""
+        cache = GDSFCache(1000)
+        cache.put("small", 100, "s")
+        cache.put("large", 800, "l")
+        cache.get("small")
+        
+        evicted = cache.put("new", 200, "n")
+        self.assertEqual(evicted, [("large", "l")])
+        self.assertEqual(cache.used, 300)
+        cache.put("small", 150, "s2")
+        self.assertEqual(cache.frequency("small"), 2)
+        with self.assertRaises(ValueError):
+            cache.put("huge", 1001)
+    
+    def test_full_node_evicts_instead_of_failing(self):
+        """Test a full node evicts cold objects and frees their capacity."""
+        hot = self.add("hot.css", 1000)
+        for _ in range(3):
+            self.assertTrue(self.serve(hot)['success'])
+        cold = [self.add(f"cold{i}.css", 1000) for i in range(4)]
+        for content in cold:
+            self.assertTrue(self.serve(content)['success'])
+        
+        node = self.service.db.get_edge_nodes(EdgeLocation.EU_CENTRAL)[0]
+        self.assertLessEqual(node.used_capacity, 3000)
+        self.assertTrue(self.serve(hot)['cache_hit'])
+        entries = self.service.db.get_cache_entries_by_node("node_small")
+        self.assertEqual(sum(entry.file_size for entry in entries), node.used_capacity)
+        self.assertTrue(self.service.wait_for_compression(timeout=5))
+        stored = {entry.checksum for entry in entries}
+        for entry in entries:
+            stored.update(v[0] for v in self.service.db.get_cache_variants(entry.checksum).values())
+        self.assertEqual(set(self.service.db.objects.checksums()), stored)
+    
+    def test_slow_fill_does_not_block_other_nodes(self):
+        """Test hits on one node are served while another node is writing a fill."""
+        hot = self.add("hot.css", 500)
+        self.serve(hot)
+        other = EdgeNode(node_id="node_other", location=EdgeLocation.EU_WEST,
+                         ip_address="192.168.1.21", capacity=3000)
+        self.service.db.save_edge_node(other)
+        cold = self.add("cold.css", 500)
+        
+        save_cache_entry = self.service.db.save_cache_entry
+        writing, release = threading.Event(), threading.Event()
+        
+        def slow_save(cache_entry):
+            writing.set()
+            release.wait(5)
+            return save_cache_entry(cache_entry)
+        
+        with patch.object(self.service.db, 'save_cache_entry', side_effect=slow_save):
+            fill = threading.Thread(target=self.service.cache_content,
+                                    args=(cold, other, self.origin.objects[cold.url]))
+            fill.start()
+            self.assertTrue(writing.wait(5))
+            hits = []
+            hit = threading.Thread(target=lambda: hits.append(
+                self.service.get_cached_content(hot.content_id, "node_small")))
+            hit.start()
+            hit.join(2)
+            served_during_fill = not hit.is_alive()
+            release.set()
+            fill.join()
+            hit.join()
+        
+        self.assertTrue(served_during_fill)
+        self.assertIsNotNone(hits[0])
+        self.assertTrue(self.service.get_cached_content(cold.content_id, "node_other"))
+    
+    def test_hot_objects_served_from_memory(self):
+        """Test repeat hits skip SQLite once an object is hot."""
+        content = self.add("hot.js", 500)
+        self.serve(content)
+        self.serve(content)  # Second use promotes the body into memory
+        
+        with patch.object(self.service.db, 'get_cache_entry') as get_cache_entry:
+            for _ in range(10):
+                self.assertTrue(self.serve(content)['cache_hit'])
+            get_cache_entry.assert_not_called()
+    
+    def test_hit_counters_written_in_batches(self):
+        """Test hits are flushed to the database in batches."""
+        self.service.stats_flush_size = 1000
+        content = self.add("hot.js", 500)
+        self.serve(content)
+        for _ in range(5):
+            self.service.get_cached_content(content.content_id, "node_small")
+        
+        entry = self.service.db.get_cache_entries_by_node("node_small")[0]
+        self.assertEqual(entry.access_count, 0)
+        self.assertEqual(self.service.flush_cache_stats(), 1)
+        entry = self.service.db.get_cache_entries_by_node("node_small")[0]
+        self.assertEqual(entry.access_count, 5)
+    
+    def test_used_capacity_rebuilt_from_cache(self):
+        """Test a restarted service recomputes used capacity from cached entries."""
+        self.serve(self.add("a.css", 1000))
+        restarted = CDNService(self.temp_db.name, origin=self.origin)
+        
+        content = self.add("b.css", 500)
+        restarted.serve_content(content.url, "192.168.1.100", "Mozilla/5.0",
+                                client_location=EdgeLocation.EU_CENTRAL)
+        node = restarted.db.get_edge_nodes(EdgeLocation.EU_CENTRAL)[0]
+        self.assertEqual(node.used_capacity, 1500)
+    
+    def test_no_cache_strategy(self):
+        """Test NO_CACHE content is always fetched and never stored."""
+        content = self.add("api/data", 100, cache_strategy=CacheStrategy.NO_CACHE)
+        
+        for _ in range(2):
+            result = self.serve(content)
+            self.assertTrue(result['success'])
+            self.assertFalse(result['cache_hit'])
+        self.assertEqual(len(self.origin.requests), 2)
+        self.assertEqual(self.service.db.get_cache_entries_by_node("node_small"), [])
+    
+    def test_network_first_strategy(self):
+        """Test NETWORK_FIRST goes to origin but falls back to the edge copy."""
+        content = self.add("api/feed", 100, cache_strategy=CacheStrategy.NETWORK_FIRST)
+        
+        self.assertFalse(self.serve(content)['cache_hit'])
+        self.assertFalse(self.serve(content)['cache_hit'])
+        self.assertEqual(len(self.origin.requests), 2)
+        self.origin.fail = True
+        result = self.serve(content)
+        self.assertTrue(result['success'])
+        self.assertTrue(result['cache_hit'])
+    
+    def test_cache_only_strategy(self):
+        """Test CACHE_ONLY never goes to origin."""
+        content = self.add("static.css", 100, cache_strategy=CacheStrategy.CACHE_ONLY)
+        
+        result = self.serve(content)
+        self.assertEqual(result['status_code'], 504)
+        self.assertEqual(self.origin.requests, [])
+        self.service.cache_content(content, self.node, self.origin.objects[content.url])
+        self.assertTrue(self.serve(content)['cache_hit'])
+    
+    def test_stale_while_revalidate_strategy(self):
+        """Test expired entries are served while being refreshed in the background."""
+        content = self.add("news.html", 100, ttl=1,
+                           cache_strategy=CacheStrategy.STALE_WHILE_REVALIDATE)
+        self.serve(content)
+        time.sleep(1.1)
+        
+        result = self.serve(content)
+        self.assertTrue(result['cache_hit'])
+        for thread in list(self.service.revalidations.values()):
+            thread.join()
+        self.assertEqual(len(self.origin.requests), 2)
+        entry = self.service.get_cached_content(content.content_id, "node_small")
+        self.assertIsNotNone(entry)
+    
+    def test_trace_replay_reports_byte_hit_ratio(self):
+        """Test trace replay compares GDSF against LRU."""
+        results = replay_cache_trace(zipf_trace(20000, 2000), 20 * 1024 * 1024)
+        
+        for policy in ('gdsf', 'lru'):
+            self.assertEqual(results[policy]['requests'], 20000)
+            self.assertGreater(results[policy]['byte_hit_ratio'], 0)
+        self.assertGreater(results['gdsf']['hit_ratio'], results['lru']['hit_ratio'])
+    
+    def test_cache_hit_performance(self):
+        """Test hot-tier hits are cheap."""
+        content = self.add("hot.js", 500)
+        self.serve(content)
+        self.service.get_cached_content(content.content_id, "node_small")
+        
+        start_time = time.time()
+        for _ in range(10000):
+            self.service.get_cached_content(content.content_id, "node_small")
+        duration = time.time() - start_time
+        
+        self.assertLess(duration, 1.0)
+
+class TestPurge(unittest.TestCase):
+    """Test purge execution across edge nodes."""
+    
+    def setUp(self):
+        """Set up a service with content cached on every node."""
+        self.temp_db = tempfile.NamedTemporaryFile(delete=False)
+        self.temp_db.close()
+        self.origin = StubOrigin({})
+        self.service = CDNService(self.temp_db.name, origin=self.origin)
+        self.nodes = self.service.db.get_edge_nodes()
+        self.content = {}
+        for path, tags in [("images/a.png", ["images"]), ("images/b.png", ["images"]),
+                           ("imagesets/c.png", []), ("css/site.css", ["styles", "release-1"]),
+                           ("css/print.css", ["styles"]), ("js/app.js", ["release-1"])]:
+            url = f"https://example.com/{path}"
+            self.origin.objects[url] = path.encode() * 10
+            content = self.service.add_content(url, self.origin.objects[url], surrogate_keys=tags)
+            for node in self.nodes:
+                self.service.cache_content(content, node, self.origin.objects[url])
+            self.content[path] = content
+    
+    def tearDown(self):
+        """Clean up test service and stored objects."""
+        self.service.purge_executor.shutdown()
+        os.unlink(self.temp_db.name)
+        shutil.rmtree(self.service.db.objects.root, ignore_errors=True)
+    
+    def cached_paths(self):
+        """Get the paths still cached (and fresh) on every node."""
+        return {path for path, content in self.content.items()
+                if all(self.service.get_cached_content(content.content_id, node.node_id)
+                       for node in self.nodes)}
+    
+    def test_exact_url_purge(self):
+        """Test an exact URL purge deletes every node's copy."""
+        used_before = sum(node.used_capacity for node in self.service.db.get_edge_nodes())
+        purge_request = self.service.purge_content("https://example.com/js/app.js")
+        
+        self.assertEqual(purge_request.status, "completed")
+        self.assertEqual(purge_request.purge_type, PurgeType.URL)
+        self.assertEqual(purge_request.matched_content, 1)
+        self.assertEqual(purge_request.purged_copies, 4)
+        self.assertEqual(self.cached_paths(), set(self.content) - {"js/app.js"})
+        self.assertFalse(self.service.db.objects.exists(self.content["js/app.js"].checksum))
+        used_after = sum(node.used_capacity for node in self.service.db.get_edge_nodes())
+        self.assertEqual(used_before - used_after, 4 * self.content["js/app.js"].file_size)
+    
+    def test_prefix_and_glob_purges(self):
+        """Test prefix and glob patterns match only their URLs."""
+        self.service.purge_content("https://example.com/images/", purge_type=PurgeType.PREFIX)
+        self.assertEqual(self.cached_paths(), {"imagesets/c.png", "css/site.css",
+                                               "css/print.css", "js/app.js"})
+        
+        purge_request = self.service.purge_content("https://example.com/*.css")
+        self.assertEqual(purge_request.purge_type, PurgeType.GLOB)
+        self.assertEqual(self.cached_paths(), {"imagesets/c.png", "js/app.js"})
+    
+    def test_surrogate_key_purge(self):
+        """Test purging every object tagged with a surrogate key."""
+        purge_request = self.service.purge_content("release-1", purge_type=PurgeType.TAG)
+        
+        self.assertEqual(purge_request.matched_content, 2)
+        self.assertEqual(self.cached_paths(), {"images/a.png", "images/b.png",
+                                               "imagesets/c.png", "css/print.css"})
+        self.assertEqual(self.service.get_content(self.content["css/site.css"].content_id).surrogate_keys,
+                         ["styles", "release-1"])
+    
+    def test_serving_keeps_tags_untouched(self):
+        """Test serving bumps access statistics without rewriting content or its tags."""
+        content = self.content["css/site.css"]
+        with patch.object(self.service.db, 'save_content', wraps=self.service.db.save_content) as save:
+            for _ in range(2):
+                self.assertTrue(self.service.serve_content(content.url, "192.168.1.100", "Mozilla/5.0")['success'])
+            b"".join(self.service.stream_content(content.url, "192.168.1.100", "Mozilla/5.0")['body'])
+        
+        save.assert_not_called()
+        stored = self.service.get_content(content.content_id)
+        self.assertEqual(stored.access_count, 3)
+        self.assertIsNotNone(stored.last_accessed)
+        self.assertEqual(stored.surrogate_keys, ["styles", "release-1"])
+        self.assertEqual(self.service.purge_content("styles", purge_type=PurgeType.TAG).matched_content, 2)
+    
+    def test_soft_purge_marks_stale(self):
+        """Test a soft purge keeps copies but forces revalidation."""
+        content = self.content["css/site.css"]
+        purge_request = self.service.purge_content(content.url, soft=True)
+        
+        self.assertEqual(purge_request.purged_copies, 4)
+        self.assertNotIn("css/site.css", self.cached_paths())
+        node = self.nodes[0]
+        self.assertIsNotNone(self.service.get_cached_content(content.content_id, node.node_id,
+                                                             max_stale=60))
+        self.assertTrue(self.service.db.objects.exists(content.checksum))
+    
+    def test_purge_drops_hot_copies(self):
+        """Test purged objects are not served from the memory tier."""
+        content = self.content["js/app.js"]
+        node = self.nodes[0]
+        for _ in range(2):
+            self.service.get_cached_content(content.content_id, node.node_id)
+        self.assertIn(content.content_id, self.service.get_node_cache(node.node_id).memory)
+        
+        self.service.purge_content(content.url)
+        self.assertNotIn(content.content_id, self.service.get_node_cache(node.node_id).memory)
+        self.assertIsNone(self.service.get_cached_content(content.content_id, node.node_id))
+    
+    def test_purge_is_asynchronous(self):
+        """Test purges are queued and report status when done."""
+        release = threading.Event()
+        self.service.purge_executor.submit(release.wait)
+        
+        purge_request = self.service.submit_purge("https://example.com/css/*")
+        self.assertEqual(self.service.get_purge_status(purge_request.purge_id).status, "pending")
+        release.set()
+        
+        finished = self.service.wait_for_purge(purge_request.purge_id, timeout=5)
+        self.assertEqual(finished.status, "completed")
+        self.assertEqual(finished.matched_content, 2)
+        self.assertIsNotNone(finished.completed_at)
+    
+    def test_purge_api(self):
+        """Test the purge endpoints."""
+        from cdn_service import app
+        with patch('cdn_service.cdn_service', self.service):
+            client = app.test_client()
+            response = client.post('/api/purge', json={'pattern': 'styles', 'type': 'tag'})
+            self.assertEqual(response.status_code, 202)
+            purge_id = response.get_json()['purge_id']
+            
+            self.service.wait_for_purge(purge_id, timeout=5)
+            status = client.get(f'/api/purge/{purge_id}').get_json()
+            self.assertEqual(status['status'], 'completed')
+            self.assertEqual(status['purged_copies'], 8)
+            self.assertEqual(client.get('/api/purge/purge_missing').status_code, 404)
+            self.assertEqual(client.post('/api/purge', json={'pattern': 'x', 'type': 'bad'}).status_code, 400)
+    
+    def test_url_index_lookup_performance(self):
+        """Test prefix and glob lookups cost time proportional to matches."""
+        url_index = URLIndex()
+        for i in range(100000):
+            url_index.add(f"https://example.com/assets/{i:06d}/file.js", f"content_{i}")
+        url_index.add("https://example.com/assets/000042/extra.css", "content_extra")
+        
+        start_time = time.time()
+        for _ in range(1000):
+            matches = url_index.prefix("https://example.com/assets/00004")
+            globbed = url_index.glob("https://example.com/assets/000042/*.css")
+        duration = time.time() - start_time
+        
+        self.assertEqual(len(matches), 11)
+        self.assertEqual(globbed, ["content_extra"])
+        self.assertLess(duration, 1.0)
+
+class TestNodeSelection(unittest.TestCase):
+    """Test cached edge node selection."""
+    
+    def setUp(self):
+        """Set up a service with three nodes in one location."""
+        self.temp_db = tempfile.NamedTemporaryFile(delete=False)
+        self.temp_db.close()
+        self.service = CDNService(self.temp_db.name, origin=StubOrigin({}))
+        for i in range(3):
+            self.service.db.save_edge_node(EdgeNode(
+                node_id=f"eu_central_00{i}", location=EdgeLocation.EU_CENTRAL,
+                ip_address=f"10.0.1.{i}", latency_ms=12))
+        self.urls = [f"https://example.com/asset{i}.js" for i in range(200)]
+    
+    def tearDown(self):
+        """Clean up test database."""
+        os.unlink(self.temp_db.name)
+        shutil.rmtree(self.service.db.objects.root, ignore_errors=True)
+    
+    def select_all(self):
+        """Map every test URL to a node ID."""
+        return {url: self.service.find_best_edge_node(EdgeLocation.EU_CENTRAL, url).node_id
+                for url in self.urls}
+    
+    def test_urls_hash_consistently_within_region(self):
+        """Test each URL sticks to one node and load spreads across the region."""
+        first = self.select_all()
+        self.assertEqual(first, self.select_all())
+        self.assertEqual(set(first.values()), {"eu_central_000", "eu_central_001", "eu_central_002"})
+        
+        # Taking a node out only moves the URLs it was serving
+        node = self.service.db.get_edge_nodes(EdgeLocation.EU_CENTRAL)[0]
+        node.is_active = False
+        self.service.db.save_edge_node(node)
+        second = self.select_all()
+        moved = [url for url in self.urls if first[url] != second[url]]
+        self.assertTrue(moved)
+        self.assertTrue(all(first[url] == node.node_id for url in moved))
+    
+    def test_fallback_skips_unhealthy_nodes(self):
+        """Test stale and inactive nodes are skipped in favour of the next best."""
+        self.service.heartbeat_timeout = 300
+        for node in self.service.db.get_edge_nodes(EdgeLocation.EU_CENTRAL):
+            node.last_heartbeat = datetime.now() - timedelta(hours=1)
+            self.service.db.save_edge_node(node)
+        self.service.record_heartbeat("eu_central_001")
+        self.assertEqual(set(self.select_all().values()), {"eu_central_001"})
+        
+        node = self.service.get_node_table().nodes["eu_central_001"]
+        node.is_active = False
+        self.service.db.save_edge_node(node)
+        # The nearest healthy region takes over
+        fallback = self.service.find_best_edge_node(EdgeLocation.EU_CENTRAL, self.urls[0])
+        self.assertEqual(fallback.node_id, "node_eu_west_001")
+        
+        # A location without nodes uses the nearest ones
+        node = self.service.find_best_edge_node(EdgeLocation.ASIA_SOUTH, self.urls[0])
+        self.assertEqual(node.node_id, "node_asia_pacific_001")
+    
+    def test_heartbeats_opt_in_and_full_nodes_skipped(self):
+        """Test stale heartbeats only matter when a timeout is set, and overfull nodes are skipped."""
+        for node in self.service.db.get_edge_nodes(EdgeLocation.EU_CENTRAL):
+            node.last_heartbeat = datetime.now() - timedelta(hours=1)
+            self.service.db.save_edge_node(node)
+        self.assertEqual(set(self.select_all().values()),
+                         {"eu_central_000", "eu_central_001", "eu_central_002"})
+        
+        node = self.service.get_node_table().nodes["eu_central_001"]
+        node.used_capacity = node.capacity
+        self.assertIn("eu_central_001", self.select_all().values())
+        node.used_capacity = node.capacity + 1
+        self.assertEqual(set(self.select_all().values()), {"eu_central_000", "eu_central_002"})
+        
+        self.assertTrue(self.service.record_heartbeat("eu_central_001"))
+        self.assertFalse(self.service.record_heartbeat("missing_node"))
+    
+    def test_table_refreshes_on_node_changes(self):
+        """Test saved nodes are routed to without restarting the service."""
+        table = self.service.get_node_table()
+        self.assertIs(table, self.service.get_node_table())
+        
+        self.service.db.save_edge_node(EdgeNode(
+            node_id="asia_south_001", location=EdgeLocation.ASIA_SOUTH, ip_address="10.0.2.1"))
+        self.assertIsNot(table, self.service.get_node_table())
+        node = self.service.find_best_edge_node(EdgeLocation.ASIA_SOUTH)
+        self.assertEqual(node.node_id, "asia_south_001")
+        
+        # Capacity updates from cache fills don't rebuild the table
+        table = self.service.get_node_table()
+        content = self.service.add_content("https://example.com/a.css", b"a" * 100)
+        self.service.cache_content(content, node, b"a" * 100)
+        self.assertIs(table, self.service.get_node_table())
+        self.assertEqual(table.nodes["asia_south_001"].used_capacity, 100)
+    
+    def test_selection_avoids_database(self):
+        """Test node selection is served from memory."""
+        self.service.get_node_table()
+        with patch.object(self.service.db, 'get_edge_nodes',
+                          side_effect=AssertionError("queried database")):
+            start_time = time.time()
+            for i in range(100000):
+                self.service.find_best_edge_node(EdgeLocation.US_EAST, self.urls[i % 200])
+            duration = time.time() - start_time
+        
+        self.assertLess(duration, 2.0)
+    
+    def test_region_ranking(self):
+        """Test nodes are ranked by latency plus distance from the client."""
+        table = EdgeNodeTable(self.service.db.get_edge_nodes())
+        ranked = [node.node_id for node in table.ranked[EdgeLocation.US_WEST]]
+        self.assertEqual(ranked[:2], ["node_us_west_001", "node_us_east_001"])
+        self.assertEqual(table.select().node_id, "node_us_east_001")
+
+class TestOriginShield(unittest.TestCase):
+    """Test origin request collapsing and shield nodes."""
+    
+    def setUp(self):
+        """Set up a service in front of a counting origin server."""
+        self.temp_db = tempfile.NamedTemporaryFile(delete=False)
+        self.temp_db.close()
+        CountingOriginHandler.counts = {}
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), CountingOriginHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.base_url = f"http://127.0.0.1:{self.server.server_port}"
+        self.service = CDNService(self.temp_db.name, origin=HTTPOrigin(), shield_nodes={
+            EdgeLocation.US_WEST: "node_shield_001",
+            EdgeLocation.EU_WEST: "node_shield_001"
+        })
+        self.service.db.save_edge_node(EdgeNode(
+            node_id="node_shield_001", location=EdgeLocation.US_EAST, ip_address="10.0.3.1"))
+    
+    def tearDown(self):
+        """Stop the origin and clean up."""
+        self.server.shutdown()
+        self.server.server_close()
+        os.unlink(self.temp_db.name)
+        shutil.rmtree(self.service.db.objects.root, ignore_errors=True)
+    
+    def add(self, path):
+        """Add content served by the counting origin."""
+        return self.service.add_content(self.base_url + path, CountingOriginHandler.body)
+    
+    def serve_concurrently(self, content, locations):
+        """Serve content once per location, all at the same time."""
+        results = [None] * len(locations)
+        
+        def serve(i):
+            results[i] = self.service.serve_content(content.url, "192.168.1.100", "Mozilla/5.0",
+                                                    client_location=locations[i])
+        
+        threads = [threading.Thread(target=serve, args=(i,)) for i in range(len(locations))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+    
+    def stream_concurrently(self, content, locations):
+        """Stream content once per location, all at the same time, collecting the bodies."""
+        bodies = [None] * len(locations)
+        
+        def stream(i):
+            result = self.service.stream_content(content.url, "192.168.1.100", "Mozilla/5.0",
+                                                 client_location=locations[i])
+            bodies[i] = b"".join(result['body'])
+        
+        threads = [threading.Thread(target=stream, args=(i,)) for i in range(len(locations))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return bodies
+    
+    def test_concurrent_misses_collapse(self):
+        """Test concurrent misses on one edge make a single origin request."""
+        content = self.add("/app.js")
+        results = self.serve_concurrently(content, [EdgeLocation.US_EAST] * 10)
+        
+        self.assertTrue(all(result['success'] for result in results))
+        self.assertEqual(len({result['node_id'] for result in results}), 1)
+        self.assertEqual(CountingOriginHandler.counts, {"/app.js": 1})
+        self.assertGreater(self.service.origin_requests.collapsed, 0)
+        self.assertTrue(self.service.serve_content(content.url, "192.168.1.100", "Mozilla/5.0",
+                                                   client_location=EdgeLocation.US_EAST)['cache_hit'])
+    
+    def test_shield_fetches_once_per_region(self):
+        """Test edges behind a shield fill from it instead of origin."""
+        content = self.add("/site.css")
+        locations = [EdgeLocation.US_WEST, EdgeLocation.EU_WEST] * 4
+        results = self.serve_concurrently(content, locations)
+        
+        self.assertTrue(all(result['success'] for result in results))
+        self.assertEqual(CountingOriginHandler.counts, {"/site.css": 1})
+        for node_id in ("node_shield_001", "node_us_west_001", "node_eu_west_001"):
+            self.assertIsNotNone(self.service.get_cached_content(content.content_id, node_id))
+        
+        # Another edge behind the shield is filled from the shield's copy
+        self.service.db.save_edge_node(EdgeNode(
+            node_id="node_us_west_002", location=EdgeLocation.US_WEST, ip_address="10.0.3.2"))
+        node = self.service.get_node_table().nodes["node_us_west_002"]
+        data, _ = self.service.fill_from_origin(content, node)
+        self.assertEqual(data, CountingOriginHandler.body)
+        self.assertEqual(CountingOriginHandler.counts, {"/site.css": 1})
+    
+    def test_stream_through_shield(self):
+        """Test streamed misses fill through the shield."""
+        content = self.add("/stream.js")
+        response = self.service.stream_content(content.url, "192.168.1.100", "Mozilla/5.0",
+                                               client_location=EdgeLocation.EU_WEST,
+                                               range_header="bytes=0-99")
+        self.assertEqual(response['status_code'], 206)
+        self.assertEqual(b"".join(response['body']), CountingOriginHandler.body[:100])
+        self.assertIsNotNone(self.service.get_cached_content(content.content_id, "node_shield_001"))
+        self.assertEqual(CountingOriginHandler.counts, {"/stream.js": 1})
+    
+    def test_concurrent_stream_misses_collapse(self):
+        """Test concurrent streamed misses on one edge share one origin fetch."""
+        content = self.add("/player.js")
+        bodies = self.stream_concurrently(content, [EdgeLocation.US_EAST] * 8)
+        
+        self.assertEqual(bodies, [CountingOriginHandler.body] * 8)
+        self.assertEqual(CountingOriginHandler.counts, {"/player.js": 1})
+        node = self.service.find_best_edge_node(EdgeLocation.US_EAST, content.url)
+        self.assertIsNotNone(self.service.get_cached_content(content.content_id, node.node_id))
+        
+        # A whole-object fill joins a streamed fill under way too
+        other = self.add("/other.js")
+        response = self.service.stream_content(other.url, "192.168.1.100", "Mozilla/5.0",
+                                               client_location=EdgeLocation.US_EAST)
+        node = self.service.get_node_table().nodes[response['node_id']]
+        data, _ = self.service.fill_from_origin(other, node)
+        self.assertEqual(b"".join(response['body']), data)
+        self.assertEqual(CountingOriginHandler.counts["/other.js"], 1)
+    
+    def test_concurrent_large_object_misses_collapse(self):
+        """Test concurrent segmented misses share segment fetches, through the shield."""
+        self.service.large_object_threshold = 1000
+        self.service.segment_size = 512
+        content = self.add("/movie.mp4")
+        bodies = self.stream_concurrently(content, [EdgeLocation.US_EAST] * 8)
+        self.assertEqual(bodies, [CountingOriginHandler.body] * 8)
+        self.assertEqual(CountingOriginHandler.counts, {"/movie.mp4": 1})
+        
+        content = self.add("/trailer.mp4")
+        bodies = self.stream_concurrently(content, [EdgeLocation.US_WEST, EdgeLocation.EU_WEST] * 4)
+        self.assertEqual(bodies, [CountingOriginHandler.body] * 8)
+        self.assertEqual(CountingOriginHandler.counts["/trailer.mp4"], 1)
+        last = (len(CountingOriginHandler.body) - 1) // 512
+        for node_id in ("node_shield_001", "node_us_west_001", "node_eu_west_001"):
+            segments = self.service.db.get_cache_segments(content.content_id, node_id, 0, last)
+            self.assertEqual(len(segments), last + 1)
+    
+    def test_abandoned_segment_fill_taken_over(self):
+        """Test a request waiting on segments fetches them itself if their leader goes away."""
+        self.service.large_object_threshold = 1000
+        self.service.segment_size = 512
+        content = self.add("/clip.mp4")
+        leader = self.service.stream_content(content.url, "192.168.1.100", "Mozilla/5.0",
+                                             client_location=EdgeLocation.US_EAST)
+        next(leader['body'])
+        follower = self.service.stream_content(content.url, "192.168.1.100", "Mozilla/5.0",
+                                               client_location=EdgeLocation.US_EAST)
+        bodies = []
+        thread = threading.Thread(target=lambda: bodies.append(b"".join(follower['body'])))
+        thread.start()
+        # Go away once the follower is waiting on a segment the leader claimed
+        deadline = time.time() + 5
+        while self.service.origin_requests.collapsed < 1 and time.time() < deadline:
+            time.sleep(0.01)
+        leader['body'].close()
+        thread.join(10)
+        
+        self.assertEqual(bodies, [CountingOriginHandler.body])
+        self.assertEqual(CountingOriginHandler.counts, {"/clip.mp4": 2})
+    
+    def test_shields_pointing_at_each_other(self):
+        """Test shield nodes fill from origin instead of chaining through each other."""
+        self.service.shield_nodes = {
+            EdgeLocation.US_WEST: "node_us_east_001",
+            EdgeLocation.US_EAST: "node_us_west_001"
+        }
+        content = self.add("/cycle.js")
+        results = []
+        thread = threading.Thread(target=lambda: results.append(self.service.serve_content(
+            content.url, "192.168.1.100", "Mozilla/5.0", client_location=EdgeLocation.US_WEST)),
+            daemon=True)
+        thread.start()
+        thread.join(timeout=10)
+        
+        self.assertFalse(thread.is_alive())
+        self.assertTrue(results[0]['success'])
+        self.assertEqual(CountingOriginHandler.counts, {"/cycle.js": 1})
+    
+    def test_origin_failure_shared_by_waiters(self):
+        """Test collapsed callers share the leader's failure."""
+        collapser = RequestCollapser()
+        started = threading.Event()
+        errors = []
+        
+        def fail():
+            started.set()
+            time.sleep(0.1)
+            raise ConnectionError("origin down")
+        
+        def call():
+            try:
+                collapser.run("key", fail)
+            except ConnectionError as e:
+                errors.append(e)
+        
+        leader = threading.Thread(target=call)
+        leader.start()
+        started.wait()
+        followers = [threading.Thread(target=call) for _ in range(3)]
+        for thread in followers:
+            thread.start()
+        for thread in [leader] + followers:
+            thread.join()
+        
+        self.assertEqual(len(errors), 4)
+        self.assertEqual((collapser.calls, collapser.collapsed), (1, 3))
+        self.assertFalse(collapser.in_flight("key"))
+
+class TestAnalyticsRollups(unittest.TestCase):
+    """Test batched request logging and rollup analytics."""
+    
+    def setUp(self):
+        """Set up a service that flushes logs quickly."""
+        self.temp_db = tempfile.NamedTemporaryFile(delete=False)
+        self.temp_db.close()
+        self.service = CDNService(self.temp_db.name,
+                                  origin=StubOrigin({"https://example.com/a.js": b"a" * 100}),
+                                  log_batch_size=5, log_flush_interval=0.2)
+        self.start = datetime(2026, 3, 1, 12, 0, 0)
+    
+    def tearDown(self):
+        """Clean up test database."""
+        os.unlink(self.temp_db.name)
+        shutil.rmtree(self.service.db.objects.root, ignore_errors=True)
+    
+    def make_logs(self, count, minutes=3):
+        """Build logs spread over minutes and two nodes, with latency i % 100 ms."""
+        return [RequestLog(
+            log_id=f"log_{i}",
+            content_id=f"content_{i % 4}",
+            node_id="node_a" if i % 2 else "node_b",
+            client_ip="192.168.1.100",
+            user_agent="Mozilla/5.0",
+            request_time=self.start + timedelta(seconds=60 * (i % minutes) + 30),
+            response_time=i % 100,
+            status_code=206 if i % 10 == 0 else 200,
+            cache_hit=i % 4 != 0,
+            bytes_transferred=1000
+        ) for i in range(count)]
+    
+    def test_logs_written_in_background_batches(self):
+        """Test request logs are queued and flushed by size or age."""
+        self.service.add_content("https://example.com/a.js", b"a" * 100)
+        for _ in range(3):
+            self.service.serve_content("https://example.com/a.js", "192.168.1.100", "Mozilla/5.0")
+        self.assertEqual(self.service.db.get_request_logs(), [])
+        
+        time.sleep(0.5)
+        self.assertEqual(len(self.service.db.get_request_logs()), 3)
+        self.assertEqual(self.service.get_analytics()['total_requests'], 3)
+        
+        for i in range(5):
+            self.service.log_request(self.make_logs(5)[i])
+        self.service.log_executor.submit(lambda: None).result()
+        self.assertEqual(self.service.pending_logs, [])
+    
+    def test_analytics_count_every_request(self):
+        """Test analytics cover all requests, not just the latest 1000."""
+        self.assertTrue(self.service.db.save_request_logs(self.make_logs(3000)))
+        analytics = self.service.get_analytics()
+        
+        self.assertEqual(analytics['total_requests'], 3000)
+        self.assertEqual(analytics['cache_hit_rate'], 75.0)
+        self.assertEqual(analytics['average_response_time'], 49.5)
+        self.assertEqual(analytics['total_bytes_transferred'], 3000000)
+        self.assertEqual(analytics['requests_by_node'], {'node_a': 1500, 'node_b': 1500})
+        self.assertEqual(analytics['requests_by_status'], {200: 2700, 206: 300})
+        self.assertEqual(analytics['bandwidth_bps'], round(3000000 / 180, 2))
+        self.assertEqual(analytics['latency_percentiles'],
+                         {'p50': 50, 'p90': 99, 'p95': 99, 'p99': 99})
+    
+    def test_analytics_window_and_filters(self):
+        """Test analytics for a time window, node and content."""
+        self.service.db.save_request_logs(self.make_logs(3000))
+        second_minute = self.start + timedelta(minutes=1)
+        
+        analytics = self.service.get_analytics(start_date=second_minute, end_date=second_minute)
+        self.assertEqual(analytics['total_requests'], 1000)
+        self.assertEqual(analytics['bandwidth_bps'], round(1000000 / 60, 2))
+        
+        analytics = self.service.get_analytics(content_id="content_1", node_id="node_a")
+        self.assertEqual(analytics['total_requests'], 750)
+        self.assertEqual(analytics['cache_hit_rate'], 100.0)
+        self.assertEqual(self.service.get_analytics(node_id="node_c")['total_requests'], 0)
+        self.assertEqual(minute_bucket(self.start + timedelta(seconds=59)),
+                         minute_bucket(self.start))
+    
+    def test_analytics_from_rollups_performance(self):
+        """Test analytics over many requests are answered from rollups quickly."""
+        self.service.db.save_request_logs(self.make_logs(50000, minutes=60))
+        
+        start_time = time.time()
+        for _ in range(20):
+            analytics = self.service.get_analytics()
+        duration = time.time() - start_time
+        
+        self.assertEqual(analytics['total_requests'], 50000)
+        self.assertLess(duration, 1.0)
+
+class TestCompression(unittest.TestCase):
+    """Test precompressed variants and Accept-Encoding negotiation."""
+    
+    def setUp(self):
+        """Set up a service with text and binary content cached on a node."""
+        self.temp_db = tempfile.NamedTemporaryFile(delete=False)
+        self.temp_db.close()
+        self.script = b"function hello() { return 'world'; }\n" * 200
+        self.image = os.urandom(4096)
+        self.origin = StubOrigin({"https://example.com/app.js": self.script,
+                                  "https://example.com/photo.png": self.image})
+        self.service = CDNService(self.temp_db.name, origin=self.origin)
+        self.js = self.service.add_content("https://example.com/app.js", self.script)
+        self.png = self.service.add_content("https://example.com/photo.png", self.image)
+        for url in self.origin.objects:
+            self.stream(url)
+        self.assertTrue(self.service.wait_for_compression(timeout=5))
+    
+    def tearDown(self):
+        """Clean up test database."""
+        os.unlink(self.temp_db.name)
+        shutil.rmtree(self.service.db.objects.root, ignore_errors=True)
+    
+    def stream(self, url, accept_encoding=None, range_header=None):
+        """Stream a URL and collect its body."""
+        result = self.service.stream_content(url, "192.168.1.100", "Mozilla/5.0",
+                                             range_header=range_header,
+                                             accept_encoding=accept_encoding)
+        result['data'] = b"".join(result['body'])
+        return result
+    
+    def test_negotiate_encoding(self):
+        """Test Accept-Encoding parsing and preference order."""
+        available = {'gzip', 'deflate'}
+        self.assertEqual(negotiate_encoding("gzip, deflate, br", available), 'gzip')
+        self.assertEqual(negotiate_encoding("deflate, gzip;q=0.5", available), 'deflate')
+        self.assertEqual(negotiate_encoding("br", available), None)
+        self.assertEqual(negotiate_encoding("*", available), 'gzip')
+        self.assertEqual(negotiate_encoding("*, gzip;q=0", available), 'deflate')
+        self.assertEqual(negotiate_encoding(None, available), None)
+        self.assertEqual(negotiate_encoding("gzip", {}), None)
+        self.assertTrue(is_compressible("text/css; charset=utf-8"))
+        self.assertTrue(is_compressible("image/svg+xml"))
+        self.assertFalse(is_compressible("image/png"))
+    
+    def test_compressed_variants_served(self):
+        """Test clients accepting gzip or deflate get the smaller variant."""
+        result = self.stream(self.js.url, accept_encoding="gzip, deflate")
+        self.assertTrue(result['cache_hit'])
+        self.assertEqual(result['headers']['Content-Encoding'], 'gzip')
+        self.assertEqual(result['headers']['Vary'], 'Accept-Encoding')
+        self.assertEqual(int(result['headers']['Content-Length']), len(result['data']))
+        self.assertLess(len(result['data']), len(self.script) // 10)
+        self.assertEqual(gzip.decompress(result['data']), self.script)
+        self.assertNotEqual(result['headers']['ETag'], f'"{self.js.checksum}"')
+        
+        result = self.stream(self.js.url, accept_encoding="deflate")
+        self.assertEqual(result['headers']['Content-Encoding'], 'deflate')
+        self.assertEqual(zlib.decompress(result['data']), self.script)
+    
+    def test_identity_still_varies(self):
+        """Test identity responses of compressible objects still carry Vary."""
+        result = self.stream(self.js.url)
+        self.assertNotIn('Content-Encoding', result['headers'])
+        self.assertEqual(result['headers']['Vary'], 'Accept-Encoding')
+        self.assertEqual(result['data'], self.script)
+        
+        # Ranges are served from the identity body
+        result = self.stream(self.js.url, accept_encoding="gzip", range_header="bytes=0-9")
+        self.assertEqual(result['status_code'], 206)
+        self.assertNotIn('Content-Encoding', result['headers'])
+        self.assertEqual(result['data'], self.script[:10])
+        
+        result = self.stream(self.png.url, accept_encoding="gzip")
+        self.assertNotIn('Content-Encoding', result['headers'])
+        self.assertNotIn('Vary', result['headers'])
+        self.assertEqual(self.service.get_variants(self.png.checksum), {})
+    
+    def test_variants_built_once_and_purged(self):
+        """Test variants are shared by nodes and removed with their body."""
+        for node in self.service.db.get_edge_nodes():
+            self.service.cache_content(self.js, node, self.script)
+        self.assertTrue(self.service.wait_for_compression(timeout=5))
+        variants = self.service.db.get_cache_variants(self.js.checksum)
+        self.assertEqual(set(variants), {'gzip', 'deflate'})
+        
+        result = self.service.serve_content(self.js.url, "192.168.1.100", "Mozilla/5.0",
+                                            accept_encoding="gzip")
+        self.assertEqual(result['content_encoding'], 'gzip')
+        self.assertEqual(result['transfer_size'], variants['gzip'][1])
+        
+        self.service.purge_content(self.js.url)
+        self.assertEqual(self.service.db.get_cache_variants(self.js.checksum), {})
+        for variant_checksum, _ in variants.values():
+            self.assertFalse(self.service.db.objects.exists(variant_checksum))
+        result = self.stream(self.js.url, accept_encoding="gzip")
+        self.assertFalse(result['cache_hit'])
+        self.assertEqual(result['data'], self.script)
+    
+    def test_stream_api_negotiates_encoding(self):
+        """Test the stream endpoint passes Accept-Encoding through."""
+        from cdn_service import app
+        with patch('cdn_service.cdn_service', self.service):
+            client = app.test_client()
+            response = client.get(f'/api/stream?url={self.js.url}',
+                                  headers={'Accept-Encoding': 'gzip'})
+            self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+            self.assertEqual(response.headers['Vary'], 'Accept-Encoding')
+            self.assertEqual(gzip.decompress(response.get_data()), self.script)
+
+class TestPrefetch(unittest.TestCase):
+    """Test cache warming jobs."""
+    
+    def setUp(self):
+        """Set up a service with content that is not cached anywhere yet."""
+        self.temp_db = tempfile.NamedTemporaryFile(delete=False)
+        self.temp_db.close()
+        self.origin = SlowOrigin({f"https://example.com/release/{i}.png": os.urandom(2000)
+                                  for i in range(6)}, delay=0.02)
+        self.origin.objects["https://example.com/release/video.mp4"] = os.urandom(5000)
+        self.service = CDNService(self.temp_db.name, origin=self.origin,
+                                  segment_size=1024, large_object_threshold=4096)
+        for url, body in self.origin.objects.items():
+            self.service.add_content(url, body)
+        self.urls = sorted(url for url in self.origin.objects if url.endswith(".png"))
+    
+    def tearDown(self):
+        """Clean up test database."""
+        os.unlink(self.temp_db.name)
+        shutil.rmtree(self.service.db.objects.root, ignore_errors=True)
+    
+    def serve(self, url, location):
+        """Serve a URL to a client in a location."""
+        return self.service.serve_content(url, "192.168.1.100", "Mozilla/5.0",
+                                          client_location=location)
+    
+    def test_prefetch_to_selected_locations(self):
+        """Test a job fills every URL on the nodes of the chosen locations."""
+        job = self.service.submit_prefetch(self.urls[:3], locations=[EdgeLocation.US_EAST,
+                                                                      EdgeLocation.EU_WEST])
+        self.assertEqual((job.status, job.total), ("pending", 6))
+        
+        job = self.service.wait_for_prefetch(job.job_id, timeout=10)
+        self.assertEqual(job.status, "completed")
+        self.assertEqual((job.filled, job.skipped, job.failed), (6, 0, 0))
+        self.assertIsNotNone(job.completed_at)
+        self.assertEqual(len(self.origin.requests), 6)
+        self.assertTrue(self.serve(self.urls[0], EdgeLocation.US_EAST)['cache_hit'])
+        self.assertFalse(self.serve(self.urls[0], EdgeLocation.US_WEST)['cache_hit'])
+        
+        job = self.service.wait_for_prefetch(
+            self.service.submit_prefetch(self.urls[:3], locations=[EdgeLocation.US_EAST]).job_id)
+        self.assertEqual((job.filled, job.skipped), (0, 3))
+    
+    def test_concurrency_limit_and_progress(self):
+        """Test fills are capped at the job's concurrency and progress is visible."""
+        self.origin.delay = 0.05
+        job = self.service.submit_prefetch(self.urls, concurrency=2)
+        time.sleep(0.15)
+        running = self.service.get_prefetch_status(job.job_id)
+        self.assertEqual(running.status, "running")
+        self.assertLess(running.filled, running.total)
+        
+        job = self.service.wait_for_prefetch(job.job_id, timeout=10)
+        self.assertEqual(job.filled, 24)
+        self.assertEqual(self.origin.max_active, 2)
+    
+    def test_manifest_and_failures(self):
+        """Test manifests are parsed and failed fills are reported."""
+        self.assertEqual(parse_prefetch_manifest('{"urls": ["a", "b"]}'), ["a", "b"])
+        self.assertEqual(parse_prefetch_manifest('["a"]'), ["a"])
+        self.assertEqual(parse_prefetch_manifest("# launch\na\n\nb\n"), ["a", "b"])
+        with self.assertRaises(ValueError):
+            parse_prefetch_manifest('{"urls": [1]}')
+        
+        manifest = "\n".join([self.urls[0], "https://example.com/missing.png", self.urls[0]])
+        job = self.service.submit_prefetch(manifest=manifest, locations=[EdgeLocation.US_WEST])
+        job = self.service.wait_for_prefetch(job.job_id, timeout=10)
+        self.assertEqual((job.total, job.filled, job.failed), (2, 1, 1))
+        self.assertIn("content not found", job.errors[0])
+        
+        self.origin.fail = True
+        job = self.service.wait_for_prefetch(
+            self.service.submit_prefetch([self.urls[1]], locations=[EdgeLocation.US_WEST]).job_id)
+        self.assertEqual(job.failed, 1)
+        self.assertEqual(self.service.db.get_prefetch_job(job.job_id).errors, job.errors)
+    
+    def test_large_objects_prefetched_in_segments(self):
+        """Test large objects are warmed segment by segment."""
+        url = "https://example.com/release/video.mp4"
+        job = self.service.wait_for_prefetch(
+            self.service.submit_prefetch([url], locations=[EdgeLocation.EU_WEST]).job_id)
+        self.assertEqual(job.filled, 1)
+        content = self.service.get_content_by_url(url)
+        segments = self.service.db.get_cache_segments(content.content_id, "node_eu_west_001", 0, 4)
+        self.assertEqual(len(segments), 5)
+        self.assertEqual(self.origin.requests, [(0, 4999)])
+    
+    def test_trending_content_prefetched_to_other_edges(self):
+        """Test content hot on one edge is warmed onto the others."""
+        for _ in range(5):
+            self.serve(self.urls[0], EdgeLocation.US_EAST)
+        self.serve(self.urls[1], EdgeLocation.US_EAST)
+        
+        job = self.service.prefetch_trending(min_requests=3)
+        self.assertEqual(job.urls, [self.urls[0]])
+        job = self.service.wait_for_prefetch(job.job_id, timeout=10)
+        self.assertEqual((job.total, job.filled), (3, 3))
+        for location in (EdgeLocation.US_WEST, EdgeLocation.EU_WEST, EdgeLocation.ASIA_PACIFIC):
+            self.assertTrue(self.serve(self.urls[0], location)['cache_hit'])
+        self.assertIsNone(self.service.prefetch_trending(min_requests=100))
+    
+    def test_prefetch_api(self):
+        """Test the prefetch endpoints."""
+        from cdn_service import app
+        with patch('cdn_service.cdn_service', self.service):
+            client = app.test_client()
+            response = client.post('/api/prefetch', json={'urls': self.urls[:2],
+                                                          'locations': ['asia_pacific']})
+            self.assertEqual(response.status_code, 202)
+            job_id = response.get_json()['job_id']
+            
+            self.service.wait_for_prefetch(job_id, timeout=10)
+            status = client.get(f'/api/prefetch/{job_id}').get_json()
+            self.assertEqual(status['status'], 'completed')
+            self.assertEqual(status['progress'], 100.0)
+            self.assertEqual(status['filled'], 2)
+            self.assertEqual(client.get('/api/prefetch/prefetch_missing').status_code, 404)
+            self.assertEqual(client.post('/api/prefetch', json={}).status_code, 400)
+            self.assertEqual(client.post('/api/prefetch', json={
+                'urls': self.urls, 'locations': ['mars']}).status_code, 400)
+            response = client.post('/api/prefetch/trending', json={'min_requests': 1000})
+            self.assertIsNone(response.get_json()['job_id'])
+
 class TestPerformance(unittest.TestCase):
     """Test performance characteristics."""
     
@@ -9,15 +9,23 @@ record types and caching mechanisms.
 
 import sqlite3
 import socket
+import struct
+import asyncio
 import time
 import hashlib
+import ipaddress
 import threading
-from dataclasses import dataclass, field
-from typing import List, Dict, Optional, Any, Union
+import itertools
+import heapq
+from bisect import bisect_left
+from collections import deque, OrderedDict
+from dataclasses import dataclass, field, replace
+from typing import List, Dict, Optional, Any, Union, Iterable, Iterator
 from datetime import datetime, timedelta
 from enum import Enum
 import json
 import logging
+import re
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -86,6 +94,576 @@ class DNSCache:
     expires_at: datetime
     hit_count: int = 0
     last_accessed: datetime = field(default_factory=datetime.now)
+    ttl: int = 0  # Lifetime the entry was cached with, in seconds
+    nxdomain: bool = False  # Negative entries have no records; NODATA unless set
+
+def ip_from_reverse_pointer(name: str) -> Optional[Union[ipaddress.IPv4Address, ipaddress.IPv6Address]]:
+    """Parse an in-addr.arpa or ip6.arpa name, or a bare IP address."""
+    name = name.lower().rstrip('.')
+    try:
+        if name.endswith('.in-addr.arpa'):
+            return ipaddress.IPv4Address('.'.join(reversed(name[:-13].split('.'))))
+        if name.endswith('.ip6.arpa'):
+            nibbles = ''.join(reversed(name[:-9].split('.')))
+            return ipaddress.IPv6Address(int(nibbles, 16)) if len(nibbles) == 32 else None
+        return ipaddress.ip_address(name)
+    except ValueError:
+        return None
+
+class ReverseIndex:
+    """Radix tree from IP addresses to the records naming them.
+    
+    Each level consumes one byte of the address, so IPv4 lookups take four
+    steps and IPv6 sixteen, and any CIDR range is one subtree plus a filter
+    on the partial byte. Leaves hold PTR records and forward A/AAAA records.
+    """
+    
+    def __init__(self):
+        self.roots: Dict[int, dict] = {4: {}, 6: {}}
+    
+    @staticmethod
+    def record_address(record: DNSRecord):
+        """Get the address a record maps, or None if it is not a usable A/AAAA/PTR."""
+        if record.record_type == RecordType.PTR:
+            return ip_from_reverse_pointer(record.name)
+        if record.record_type in (RecordType.A, RecordType.AAAA):
+            try:
+                return ipaddress.ip_address(record.value)
+            except ValueError:
+                return None
+        return None
+    
+    def add(self, record: DNSRecord):
+        """Index a record under its address."""
+        address = self.record_address(record)
+        if address is None:
+            return
+        node = self.roots[address.version]
+        for byte in address.packed:
+            node = node.setdefault(byte, {})
+        leaf = node.setdefault(None, [])
+        leaf[:] = [r for r in leaf if r.id != record.id]
+        leaf.append(record)
+    
+    def remove(self, record: DNSRecord):
+        """Remove a record by id."""
+        address = self.record_address(record)
+        if address is None:
+            return
+        node = self.roots[address.version]
+        for byte in address.packed:
+            node = node.get(byte)
+            if node is None:
+                return
+        if None in node:
+            node[None] = [r for r in node[None] if r.id != record.id]
+    
+    @staticmethod
+    def ptr_records(address, records: List[DNSRecord]) -> List[DNSRecord]:
+        """PTR records for an address, synthesized from A/AAAA records if none exist."""
+        ptrs = [r for r in records if r.record_type == RecordType.PTR]
+        if ptrs:
+            return ptrs
+        return [replace(r, name=address.reverse_pointer, record_type=RecordType.PTR, value=r.name)
+                for r in records]
+    
+    def lookup(self, address) -> List[DNSRecord]:
+        """Get PTR records for an address."""
+        node = self.roots[address.version]
+        for byte in address.packed:
+            node = node.get(byte)
+            if node is None:
+                return []
+        return self.ptr_records(address, node.get(None, []))
+    
+    def lookup_network(self, network) -> Dict[str, List[str]]:
+        """Map every indexed address in a network to its names."""
+        full_bytes, partial_bits = divmod(network.prefixlen, 8)
+        packed = network.network_address.packed
+        node = self.roots[network.version]
+        for byte in packed[:full_bytes]:
+            node = node.get(byte)
+            if node is None:
+                return {}
+        
+        results = {}
+        stack = [(node, packed[:full_bytes])]
+        if partial_bits:
+            mask = (0xFF << (8 - partial_bits)) & 0xFF
+            stack = [(child, packed[:full_bytes] + bytes([byte]))
+                     for byte, child in node.items()
+                     if byte is not None and byte & mask == packed[full_bytes]]
+        while stack:
+            node, prefix = stack.pop()
+            for byte, child in node.items():
+                if byte is None:
+                    address = ipaddress.ip_address(prefix)
+                    names = [r.value for r in self.ptr_records(address, child)]
+                    if names:
+                        results[str(address)] = names
+                else:
+                    stack.append((child, prefix + bytes([byte])))
+        return results
+
+class ZoneNode:
+    """Node in the zone index, one per domain label."""
+    __slots__ = ('children', 'records', 'zone')
+    
+    def __init__(self):
+        self.children: Dict[str, 'ZoneNode'] = {}
+        self.records: Dict[RecordType, List[DNSRecord]] = {}
+        self.zone: Optional[DNSZone] = None
+
+class ZoneIndex:
+    """In-memory authoritative data in a trie keyed by reversed domain labels.
+    
+    "www.example.com" is stored under com -> example -> www, so the walk for a
+    name also passes every zone apex and wildcard that could cover it.
+    """
+    
+    MAX_CNAME_CHAIN = 8
+    
+    def __init__(self):
+        self.root = ZoneNode()
+        self.reverse = ReverseIndex()
+        self.lock = threading.Lock()
+        self.record_count = 0
+    
+    @staticmethod
+    def labels(name: str) -> List[str]:
+        """Split a domain name into lowercase labels, top-level label first."""
+        return [label for label in name.lower().rstrip('.').split('.') if label][::-1]
+    
+    def load(self, records: List[DNSRecord], zones: List[DNSZone] = ()):
+        """Replace the index contents with the given records and zones.
+        
+        The new trie is built off to the side, so readers never walk a
+        half-built one.
+        """
+        staged = ZoneIndex()
+        for zone in zones:
+            staged.add_zone(zone)
+        for record in records:
+            staged.add_record(record)
+        with self.lock:
+            self.root, self.reverse, self.record_count = staged.root, staged.reverse, staged.record_count
+    
+    def _node(self, name: str, create: bool = False) -> Optional[ZoneNode]:
+        node = self.root
+        for label in self.labels(name):
+            child = node.children.get(label)
+            if child is None:
+                if not create:
+                    return None
+                child = node.children[label] = ZoneNode()
+            node = child
+        return node
+    
+    def add_zone(self, zone: DNSZone):
+        """Mark a zone apex."""
+        with self.lock:
+            self._node(zone.name, create=True).zone = zone
+    
+    def add_record(self, record: DNSRecord):
+        """Add or replace a record, keyed by its id."""
+        with self.lock:
+            node = self._node(record.name, create=True)
+            records = []
+            for existing in node.records.get(record.record_type, []):
+                if existing.id == record.id:
+                    self.reverse.remove(existing)
+                    self.record_count -= 1
+                else:
+                    records.append(existing)
+            if record.is_active:
+                records.append(record)
+                records.sort(key=lambda r: (r.priority, r.created_at))
+                self.reverse.add(record)
+                self.record_count += 1
+            if records:
+                node.records[record.record_type] = records
+            else:
+                node.records.pop(record.record_type, None)
+    
+    def remove_record(self, record: DNSRecord):
+        """Remove a record by id."""
+        self.add_record(replace(record, is_active=False))
+    
+    def find(self, name: str) -> tuple:
+        """Find the node answering for a name as (node, is_wildcard).
+        
+        A wildcard only applies below the closest existing ancestor (RFC 4592),
+        so a name that exists with no records never matches one.
+        """
+        node = self.root
+        for label in self.labels(name):
+            child = node.children.get(label)
+            if child is None:
+                wildcard = node.children.get('*')
+                return (wildcard, True) if wildcard else (None, False)
+            node = child
+        return node, False
+    
+    def find_zone(self, name: str) -> Optional[DNSZone]:
+        """Find the most specific zone containing a name."""
+        node = self.root
+        zone = node.zone
+        for label in self.labels(name):
+            node = node.children.get(label)
+            if node is None:
+                break
+            zone = node.zone or zone
+        return zone
+    
+    def lookup(self, name: str, record_type: RecordType) -> List[DNSRecord]:
+        """Resolve a name, following CNAMEs and synthesizing wildcard answers."""
+        answer = []
+        seen = set()
+        for _ in range(self.MAX_CNAME_CHAIN):
+            node, wildcard = self.find(name)
+            if node is None:
+                break
+            records = node.records.get(record_type)
+            if not records and record_type != RecordType.CNAME:
+                records = node.records.get(RecordType.CNAME)
+                if records:
+                    records = records[:1]  # A name has at most one CNAME
+            if not records:
+                break
+            if wildcard:
+                records = [replace(r, name=name) for r in records]
+            answer.extend(records)
+            if records[0].record_type == record_type:
+                break
+            
+            seen.add(name.lower().rstrip('.'))
+            name = records[0].value
+            if name.lower().rstrip('.') in seen:
+                break
+        return answer
+
+# Upper bounds in seconds of the query latency histogram buckets; the last bucket is open
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+                   0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+# Summed columns of the per-domain rollups; the latency histogram gets one column per bucket
+DOMAIN_ROLLUP_SUMS = ["total", "cached", "success", "response_time_sum"] + [
+    f"latency_{i}" for i in range(len(LATENCY_BUCKETS) + 1)]
+
+class SpaceSavingSketch:
+    """Approximate top-k counter using the Space-Saving algorithm.
+    
+    Holds at most capacity keys. A new key evicts the smallest counter and
+    inherits its count, so heavy hitters are never missed but counts can be
+    overestimated by up to the evicted value.
+    """
+    
+    def __init__(self, capacity: int = 100, counts: Dict[str, int] = None):
+        self.capacity = capacity
+        self.counts: Dict[str, int] = {}
+        self.merge(counts or {})
+    
+    def add(self, key: str, count: int = 1):
+        """Count occurrences of a key."""
+        if key in self.counts:
+            self.counts[key] += count
+        elif len(self.counts) < self.capacity:
+            self.counts[key] = count
+        else:
+            smallest = min(self.counts, key=self.counts.get)
+            self.counts[key] = self.counts.pop(smallest) + count
+    
+    def merge(self, counts: Dict[str, int]):
+        """Add another sketch's counts."""
+        for key, count in counts.items():
+            self.add(key, count)
+    
+    def top(self, n: int) -> List[tuple]:
+        """Get the n largest (key, count) pairs."""
+        return heapq.nlargest(n, self.counts.items(), key=lambda item: item[1])
+
+@dataclass
+class QueryRollup:
+    """Aggregated DNS query counters for one minute, or a range of minutes."""
+    total: int = 0
+    cached: int = 0
+    success: int = 0
+    response_time_sum: float = 0.0  # Successful queries only
+    latency_histogram: List[int] = field(default_factory=lambda: [0] * (len(LATENCY_BUCKETS) + 1))
+    top_domains: Dict[str, int] = field(default_factory=dict)
+    
+    def add(self, response_time: float, cached: bool, success: bool):
+        """Count one query."""
+        self.total += 1
+        self.cached += int(bool(cached))
+        if success:
+            self.success += 1
+            self.response_time_sum += response_time
+        self.latency_histogram[bisect_left(LATENCY_BUCKETS, response_time)] += 1
+    
+    def merge(self, other: 'QueryRollup', top_capacity: int = 100):
+        """Add another rollup's counters."""
+        self.total += other.total
+        self.cached += other.cached
+        self.success += other.success
+        self.response_time_sum += other.response_time_sum
+        self.latency_histogram = [a + b for a, b in zip(self.latency_histogram,
+                                                         other.latency_histogram)]
+        if other.top_domains:
+            sketch = SpaceSavingSketch(top_capacity, self.top_domains)
+            sketch.merge(other.top_domains)
+            self.top_domains = sketch.counts
+    
+    def latency_percentile(self, fraction: float) -> float:
+        """Estimate a latency percentile as the upper bound of its bucket."""
+        target = fraction * self.total
+        seen = 0
+        for bound, count in zip(LATENCY_BUCKETS + (LATENCY_BUCKETS[-1],), self.latency_histogram):
+            seen += count
+            if count and seen >= target:
+                return bound
+        return 0.0
+
+class DNSAnswerCache:
+    """Bounded LRU of resolved answers.
+    
+    Positive answers live for the smallest TTL among their records. Negative
+    answers (NXDOMAIN or NODATA) live for the enclosing zone's SOA minimum
+    TTL, as in RFC 2308. Entries hit at least prefetch_min_hits times are
+    reported as due for refresh during the last prefetch_window fraction of
+    their lifetime, so popular names are renewed before they expire.
+    """
+    
+    def __init__(self, capacity: int = 10000, prefetch_window: float = 0.1,
+                 prefetch_min_hits: int = 3):
+        self.capacity = capacity
+        self.prefetch_window = prefetch_window
+        self.prefetch_min_hits = prefetch_min_hits
+        self.entries: OrderedDict = OrderedDict()
+        self.lock = threading.Lock()
+    
+    def __len__(self) -> int:
+        return len(self.entries)
+    
+    def get(self, key: str) -> Optional[DNSCache]:
+        """Get an unexpired entry, marking it most recently used."""
+        now = datetime.now()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if entry.expires_at <= now:
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            entry.hit_count += 1
+            entry.last_accessed = now
+            return entry
+    
+    def put(self, entry: DNSCache):
+        """Add an entry, evicting the least recently used beyond capacity."""
+        if entry.ttl <= 0:
+            return
+        with self.lock:
+            self.entries[entry.key] = entry
+            self.entries.move_to_end(entry.key)
+            while len(self.entries) > self.capacity:
+                self.entries.popitem(last=False)
+    
+    def needs_prefetch(self, entry: DNSCache) -> bool:
+        """Check whether a popular entry is close enough to expiry to refresh."""
+        if entry.hit_count < self.prefetch_min_hits:
+            return False
+        remaining = (entry.expires_at - datetime.now()).total_seconds()
+        return remaining < entry.ttl * self.prefetch_window
+    
+    def clear(self):
+        """Drop all entries."""
+        with self.lock:
+            self.entries.clear()
+
+ZONE_TOKEN_RE = re.compile(r'"((?:[^"\\]|\\.)*)"|([()])|(;.*)|([^\s"();]+)')
+TTL_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 604800}
+
+def parse_ttl(value: str) -> int:
+    """Parse a TTL such as 3600 or 1h30m."""
+    if value.isdigit():
+        return int(value)
+    total = 0
+    for number, unit in re.findall(r'(\d+)([smhdw])', value.lower()):
+        total += int(number) * TTL_UNITS[unit]
+    if not total and not re.fullmatch(r'(\d+[smhdw])+', value.lower()):
+        raise ValueError(f"Invalid TTL: {value}")
+    return total
+
+def next_zone_serial(serial: int) -> int:
+    """Increment a zone serial using RFC 1982 32-bit wraparound."""
+    return (serial + 1) % (1 << 32) or 1
+
+def zone_record_id(name: str, record_type: RecordType, value: str, ttl: int,
+                   priority: int = 0, weight: int = 0, port: int = 0) -> str:
+    """Content-derived record ID, so re-importing the same record keeps its ID."""
+    key = f"{name}|{record_type.value}|{value}|{ttl}|{priority}|{weight}|{port}"
+    return hashlib.md5(key.encode()).hexdigest()[:12]
+
+def record_to_dict(record: DNSRecord) -> Dict[str, Any]:
+    """Serialize a record for zone transfers."""
+    return {
+        'id': record.id,
+        'name': record.name,
+        'record_type': record.record_type.value,
+        'value': record.value,
+        'ttl': record.ttl,
+        'priority': record.priority,
+        'weight': record.weight,
+        'port': record.port
+    }
+
+def record_from_dict(data: Dict[str, Any]) -> DNSRecord:
+    """Deserialize a record from a zone transfer."""
+    return DNSRecord(
+        id=data['id'],
+        name=data['name'],
+        record_type=RecordType(data['record_type']),
+        value=data['value'],
+        ttl=data['ttl'],
+        priority=data.get('priority', 0),
+        weight=data.get('weight', 0),
+        port=data.get('port', 0)
+    )
+
+class ZoneFileParser:
+    """Streaming parser for BIND master zone files (RFC 1035 section 5).
+    
+    Handles $ORIGIN and $TTL, @, relative names, blank owners, TTL units,
+    parenthesized multi-line records, comments and quoted strings. Records
+    are yielded one at a time; unsupported types and bad lines are counted
+    in skipped.
+    """
+    
+    def __init__(self, origin: str, default_ttl: int = 3600):
+        self.origin = origin.lower().rstrip('.')
+        self.default_ttl = default_ttl
+        self.skipped = 0
+        self.created_at = datetime.now()
+    
+    def absolute(self, name: str) -> str:
+        if name == '@':
+            return self.origin
+        if name.endswith('.'):
+            return name[:-1].lower()
+        return f"{name}.{self.origin}".lower() if self.origin else name.lower()
+    
+    def entries(self, lines: Iterable[str]) -> Iterator[tuple]:
+        """Yield (tokens, owner_omitted) for each logical line."""
+        tokens: List[str] = []
+        owner_omitted = False
+        depth = 0
+        for line in lines:
+            if depth == 0:
+                owner_omitted = line[:1] in (' ', '\t')
+            if '"' in line or '(' in line or ')' in line or ';' in line:
+                for quoted, paren, comment, word in ZONE_TOKEN_RE.findall(line):
+                    if paren == '(':
+                        depth += 1
+                    elif paren == ')':
+                        depth = max(0, depth - 1)
+                    elif word:
+                        tokens.append(word)
+                    elif not comment:
+                        tokens.append('"' + re.sub(r'\\(.)', r'\1', quoted))
+            else:
+                tokens.extend(line.split())
+            if depth == 0 and tokens:
+                yield tokens, owner_omitted
+                tokens = []
+        if tokens:
+            yield tokens, owner_omitted
+    
+    def parse(self, lines: Iterable[str]) -> Iterator[DNSRecord]:
+        """Yield a DNSRecord for every supported record in the file."""
+        owner = self.origin
+        for tokens, owner_omitted in self.entries(lines):
+            try:
+                if tokens[0].startswith('$'):
+                    directive = tokens[0].upper()
+                    if directive == '$ORIGIN':
+                        self.origin = self.absolute(tokens[1])
+                    elif directive == '$TTL':
+                        self.default_ttl = parse_ttl(tokens[1])
+                    else:
+                        logger.warning(f"Unsupported zone file directive: {tokens[0]}")
+                        self.skipped += 1
+                    continue
+                
+                if not owner_omitted:
+                    owner = self.absolute(tokens[0])
+                    tokens = tokens[1:]
+                ttl = self.default_ttl
+                while tokens and (tokens[0][0].isdigit() or tokens[0].upper() in ('IN', 'CH', 'HS', 'CS')):
+                    if tokens[0][0].isdigit():
+                        ttl = parse_ttl(tokens[0])
+                    tokens = tokens[1:]
+                
+                record = self.build_record(owner, tokens[0].upper(), ttl, tokens[1:])
+                if record:
+                    yield record
+                else:
+                    self.skipped += 1
+            except (IndexError, ValueError, KeyError) as e:
+                logger.warning(f"Skipping zone file entry {' '.join(tokens)}: {e}")
+                self.skipped += 1
+    
+    def build_record(self, name: str, type_name: str, ttl: int, rdata: List[str]) -> Optional[DNSRecord]:
+        if type_name not in RecordType.__members__:
+            return None
+        record_type = RecordType[type_name]
+        priority = weight = port = 0
+        if record_type in (RecordType.A, RecordType.AAAA):
+            value = rdata[0]
+        elif record_type in (RecordType.CNAME, RecordType.NS, RecordType.PTR):
+            value = self.absolute(rdata[0])
+        elif record_type == RecordType.MX:
+            priority = int(rdata[0])
+            value = self.absolute(rdata[1])
+        elif record_type == RecordType.SRV:
+            priority, weight, port = int(rdata[0]), int(rdata[1]), int(rdata[2])
+            value = self.absolute(rdata[3])
+        elif record_type == RecordType.TXT:
+            value = ''.join(part[1:] if part.startswith('"') else part for part in rdata)
+        else:  # SOA
+            numbers = [str(parse_ttl(n)) for n in rdata[2:7]]
+            if len(numbers) != 5:
+                raise ValueError("SOA needs five numeric fields")
+            value = ' '.join([self.absolute(rdata[0]), self.absolute(rdata[1])] + numbers)
+        
+        return DNSRecord(
+            id=zone_record_id(name, record_type, value, ttl, priority, weight, port),
+            name=name,
+            record_type=record_type,
+            value=value,
+            ttl=ttl,
+            priority=priority,
+            weight=weight,
+            port=port,
+            created_at=self.created_at,
+            updated_at=self.created_at
+        )
+
+def format_zone_record(record: DNSRecord) -> str:
+    """Format a record as a zone file line with absolute names."""
+    if record.record_type in (RecordType.CNAME, RecordType.NS, RecordType.PTR):
+        rdata = f"{record.value}."
+    elif record.record_type == RecordType.MX:
+        rdata = f"{record.priority} {record.value}."
+    elif record.record_type == RecordType.SRV:
+        rdata = f"{record.priority} {record.weight} {record.port} {record.value}."
+    elif record.record_type == RecordType.TXT:
+        # Split the raw value into 255-character strings, then escape each one
+        chunks = [record.value[i:i + 255] for i in range(0, max(len(record.value), 1), 255)]
+        rdata = ' '.join('"' + chunk.replace('\\', '\\\\').replace('"', '\\"') + '"' for chunk in chunks)
+    else:
+        rdata = record.value
+    return f"{record.name}. {record.ttl} IN {record.record_type.value} {rdata}"
 
 class DNSDatabase:
     """Database operations for DNS service."""
@@ -133,6 +711,33 @@ class DNSDatabase:
             )
         ''')
         
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_dns_records_name_type 
+            ON dns_records(name, record_type)
+        ''')
+        
+        # Zone change journal; each change set moves a zone from previous_serial to serial
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS dns_zone_journal (
+                zone_name TEXT NOT NULL,
+                previous_serial INTEGER NOT NULL,
+                serial INTEGER NOT NULL,
+                operation TEXT NOT NULL,
+                record_id TEXT,
+                name TEXT,
+                record_type TEXT,
+                value TEXT,
+                ttl INTEGER,
+                priority INTEGER,
+                weight INTEGER,
+                port INTEGER
+            )
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_dns_zone_journal_zone_serial 
+            ON dns_zone_journal(zone_name, serial)
+        ''')
+        
         # DNS queries log table
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS dns_queries (
@@ -148,6 +753,60 @@ class DNSDatabase:
             )
         ''')
         
+        # Per-minute query rollups, maintained as query logs are written
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'dns_query_rollups'")
+        rollups_exist = cursor.fetchone() is not None
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS dns_query_rollups (
+                minute INTEGER PRIMARY KEY,
+                total INTEGER DEFAULT 0,
+                cached INTEGER DEFAULT 0,
+                success INTEGER DEFAULT 0,
+                response_time_sum REAL DEFAULT 0.0,
+                latency_histogram TEXT NOT NULL,
+                top_domains TEXT NOT NULL
+            )
+        ''')
+        # Per-domain rollups, kept only for each minute's top domains
+        cursor.execute('PRAGMA table_info(dns_domain_rollups)')
+        if 'latency_histogram' in {row[1] for row in cursor.fetchall()}:
+            # Earlier layout with the histogram as JSON; expand it into bucket columns
+            cursor.execute('''
+                SELECT domain, minute, total, cached, success, response_time_sum, latency_histogram
+                FROM dns_domain_rollups
+            ''')
+            old_rows = [row[:6] + tuple(json.loads(row[6])) for row in cursor.fetchall()]
+            cursor.execute('DROP TABLE dns_domain_rollups')
+        else:
+            old_rows = []
+        latency_columns = ",\n".join(f"                {name} INTEGER DEFAULT 0"
+                                      for name in DOMAIN_ROLLUP_SUMS[4:])
+        cursor.execute(f'''
+            CREATE TABLE IF NOT EXISTS dns_domain_rollups (
+                domain TEXT NOT NULL,
+                minute INTEGER NOT NULL,
+                total INTEGER DEFAULT 0,
+                cached INTEGER DEFAULT 0,
+                success INTEGER DEFAULT 0,
+                response_time_sum REAL DEFAULT 0.0,
+{latency_columns},
+                PRIMARY KEY (domain, minute)
+            )
+        ''')
+        cursor.executemany(f'''
+            INSERT INTO dns_domain_rollups (domain, minute, {", ".join(DOMAIN_ROLLUP_SUMS)})
+            VALUES ({", ".join("?" * (len(DOMAIN_ROLLUP_SUMS) + 2))})
+        ''', old_rows)
+        if not rollups_exist:
+            # Roll up logs written before the rollup tables existed
+            cursor.execute('''
+                SELECT domain, timestamp, response_time, cached, success FROM dns_queries
+            ''')
+            self._apply_query_rollups(cursor, [
+                (row[0], datetime.fromisoformat(row[1]), row[2], row[3], row[4])
+                for row in cursor.fetchall()
+            ])
+        
         # DNS cache table
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS dns_cache (
@@ -205,22 +864,7 @@ class DNSDatabase:
                     ORDER BY priority ASC, created_at ASC
                 ''', (name,))
             
-            records = []
-            for row in cursor.fetchall():
-                record = DNSRecord(
-                    id=row[0],
-                    name=row[1],
-                    record_type=RecordType(row[2]),
-                    value=row[3],
-                    ttl=row[4],
-                    priority=row[5],
-                    weight=row[6],
-                    port=row[7],
-                    created_at=datetime.fromisoformat(row[8]) if row[8] else datetime.now(),
-                    updated_at=datetime.fromisoformat(row[9]) if row[9] else datetime.now(),
-                    is_active=bool(row[10])
-                )
-                records.append(record)
+            records = [self._record_from_row(row) for row in cursor.fetchall()]
             
             conn.close()
             return records
@@ -228,22 +872,46 @@ class DNSDatabase:
             logger.error(f"Error getting DNS records: {e}")
             return []
     
+    def get_all_dns_records(self) -> List[DNSRecord]:
+        """Get all active DNS records."""
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                SELECT * FROM dns_records WHERE is_active = 1
+                ORDER BY priority ASC, created_at ASC
+            ''')
+            records = [self._record_from_row(row) for row in cursor.fetchall()]
+            
+            conn.close()
+            return records
+        except Exception as e:
+            logger.error(f"Error getting all DNS records: {e}")
+            return []
+    
+    def _record_from_row(self, row: tuple) -> DNSRecord:
+        return DNSRecord(
+            id=row[0],
+            name=row[1],
+            record_type=RecordType(row[2]),
+            value=row[3],
+            ttl=row[4],
+            priority=row[5],
+            weight=row[6],
+            port=row[7],
+            created_at=datetime.fromisoformat(row[8]) if row[8] else datetime.now(),
+            updated_at=datetime.fromisoformat(row[9]) if row[9] else datetime.now(),
+            is_active=bool(row[10])
+        )
+    
     def save_dns_zone(self, zone: DNSZone) -> bool:
         """Save DNS zone to database."""
         try:
             conn = sqlite3.connect(self.db_path)
             cursor = conn.cursor()
             
-            cursor.execute('''
-                INSERT OR REPLACE INTO dns_zones 
-                (zone_id, name, primary_ns, admin_email, serial, refresh, 
-                 retry, expire, minimum_ttl, created_at, updated_at)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                zone.zone_id, zone.name, zone.primary_ns, zone.admin_email,
-                zone.serial, zone.refresh, zone.retry, zone.expire,
-                zone.minimum_ttl, zone.created_at, zone.updated_at
-            ))
+            self._write_zone(cursor, zone)
             
             conn.commit()
             conn.close()
@@ -252,6 +920,18 @@ class DNSDatabase:
             logger.error(f"Error saving DNS zone: {e}")
             return False
     
+    def _write_zone(self, cursor: sqlite3.Cursor, zone: DNSZone):
+        cursor.execute('''
+            INSERT OR REPLACE INTO dns_zones 
+            (zone_id, name, primary_ns, admin_email, serial, refresh, 
+             retry, expire, minimum_ttl, created_at, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (
+            zone.zone_id, zone.name, zone.primary_ns, zone.admin_email,
+            zone.serial, zone.refresh, zone.retry, zone.expire,
+            zone.minimum_ttl, zone.created_at, zone.updated_at
+        ))
+    
     def get_dns_zone(self, name: str) -> Optional[DNSZone]:
         """Get DNS zone by name."""
         try:
@@ -262,19 +942,7 @@ class DNSDatabase:
             row = cursor.fetchone()
             
             if row:
-                zone = DNSZone(
-                    zone_id=row[0],
-                    name=row[1],
-                    primary_ns=row[2],
-                    admin_email=row[3],
-                    serial=row[4],
-                    refresh=row[5],
-                    retry=row[6],
-                    expire=row[7],
-                    minimum_ttl=row[8],
-                    created_at=datetime.fromisoformat(row[9]) if row[9] else datetime.now(),
-                    updated_at=datetime.fromisoformat(row[10]) if row[10] else datetime.now()
-                )
+                zone = self._zone_from_row(row)
                 conn.close()
                 return zone
             conn.close()
@@ -283,6 +951,216 @@ class DNSDatabase:
             logger.error(f"Error getting DNS zone: {e}")
             return None
     
+    def get_all_dns_zones(self) -> List[DNSZone]:
+        """Get all DNS zones."""
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            cursor.execute('SELECT * FROM dns_zones')
+            zones = [self._zone_from_row(row) for row in cursor.fetchall()]
+            
+            conn.close()
+            return zones
+        except Exception as e:
+            logger.error(f"Error getting all DNS zones: {e}")
+            return []
+    
+    def _zone_from_row(self, row: tuple) -> DNSZone:
+        return DNSZone(
+            zone_id=row[0],
+            name=row[1],
+            primary_ns=row[2],
+            admin_email=row[3],
+            serial=row[4],
+            refresh=row[5],
+            retry=row[6],
+            expire=row[7],
+            minimum_ttl=row[8],
+            created_at=datetime.fromisoformat(row[9]) if row[9] else datetime.now(),
+            updated_at=datetime.fromisoformat(row[10]) if row[10] else datetime.now()
+        )
+    
+    # Active records owned by a zone: at or below its apex but not inside a more specific zone
+    # Suffix tests use substr rather than LIKE, where '_' and '%' in zone names are wildcards
+    ZONE_OWNED_SQL = '''
+        (d.name = :zone OR substr(d.name, -length(:zone) - 1) = '.' || :zone) AND NOT EXISTS (
+            SELECT 1 FROM dns_zones z WHERE substr(z.name, -length(:zone) - 1) = '.' || :zone
+            AND (d.name = z.name OR substr(d.name, -length(z.name) - 1) = '.' || z.name))
+    '''
+    SAME_RECORD_SQL = '''
+        d.name = i.name AND d.record_type = i.record_type AND d.value = i.value
+        AND d.ttl = i.ttl AND d.priority = i.priority AND d.weight = i.weight AND d.port = i.port
+    '''
+    
+    def _journal_marker(self, cursor: sqlite3.Cursor, zone: DNSZone, previous_serial: int):
+        cursor.execute('''
+            INSERT INTO dns_zone_journal (zone_name, previous_serial, serial, operation)
+            VALUES (?, ?, ?, 'serial')
+        ''', (zone.name, previous_serial, zone.serial))
+    
+    def _journal_staged(self, cursor: sqlite3.Cursor, zone: DNSZone, previous_serial: int,
+                        operation: str, table: str):
+        cursor.execute(f'''
+            INSERT INTO dns_zone_journal 
+            (zone_name, previous_serial, serial, operation, record_id, name, 
+             record_type, value, ttl, priority, weight, port)
+            SELECT ?, ?, ?, ?, id, name, record_type, value, ttl, priority, weight, port
+            FROM {table}
+        ''', (zone.name, previous_serial, zone.serial, operation))
+    
+    def _apply_staged_changes(self, cursor: sqlite3.Cursor, zone: DNSZone, previous_serial: int) -> Dict[str, int]:
+        """Apply the zone_added/zone_deleted temp tables, journal them and save the zone."""
+        now = datetime.now()
+        cursor.execute('''
+            UPDATE dns_records SET is_active = 0, updated_at = ?
+            WHERE id IN (SELECT id FROM zone_deleted)
+        ''', (now,))
+        cursor.execute('''
+            INSERT OR REPLACE INTO dns_records 
+            (id, name, record_type, value, ttl, priority, weight, port, 
+             created_at, updated_at, is_active)
+            SELECT id, name, record_type, value, ttl, priority, weight, port, ?, ?, 1
+            FROM zone_added
+        ''', (now, now))
+        
+        self._journal_marker(cursor, zone, previous_serial)
+        self._journal_staged(cursor, zone, previous_serial, 'delete', 'zone_deleted')
+        self._journal_staged(cursor, zone, previous_serial, 'add', 'zone_added')
+        self._write_zone(cursor, zone)
+        
+        counts = {
+            'added': cursor.execute('SELECT COUNT(*) FROM zone_added').fetchone()[0],
+            'deleted': cursor.execute('SELECT COUNT(*) FROM zone_deleted').fetchone()[0]
+        }
+        for table in ('zone_import', 'zone_added', 'zone_deleted'):
+            cursor.execute(f'DROP TABLE IF EXISTS temp.{table}')
+        return counts
+    
+    def _stage_records(self, cursor: sqlite3.Cursor, table: str, records: Iterable[DNSRecord]):
+        cursor.execute(f'DROP TABLE IF EXISTS temp.{table}')
+        cursor.execute(f'''
+            CREATE TEMP TABLE {table} (
+                id TEXT, name TEXT, record_type TEXT, value TEXT,
+                ttl INTEGER, priority INTEGER, weight INTEGER, port INTEGER
+            )
+        ''')
+        cursor.executemany(f'INSERT INTO {table} VALUES (?, ?, ?, ?, ?, ?, ?, ?)', (
+            (r.id, r.name, r.record_type.value, r.value, r.ttl, r.priority, r.weight, r.port)
+            for r in records
+        ))
+        cursor.execute(f'CREATE INDEX temp.idx_{table}_name_type ON {table}(name, record_type)')
+    
+    def import_zone_records(self, zone: DNSZone, previous_serial: int,
+                            records: Iterable[DNSRecord]) -> Optional[Dict[str, int]]:
+        """Replace a zone's records with the given stream in one transaction.
+        
+        Records identical to an existing one are kept as they are; additions
+        and deletions are journaled as the change from previous_serial to
+        zone.serial.
+        """
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            self._stage_records(cursor, 'zone_import', records)
+            cursor.execute(f'''
+                CREATE TEMP TABLE zone_deleted AS
+                SELECT d.* FROM dns_records d
+                WHERE d.is_active = 1 AND {self.ZONE_OWNED_SQL} AND NOT EXISTS (
+                    SELECT 1 FROM zone_import i WHERE {self.SAME_RECORD_SQL})
+            ''', {'zone': zone.name})
+            cursor.execute(f'''
+                CREATE TEMP TABLE zone_added AS
+                SELECT DISTINCT i.* FROM zone_import i
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM dns_records d WHERE d.is_active = 1 AND {self.SAME_RECORD_SQL})
+            ''')
+            counts = self._apply_staged_changes(cursor, zone, previous_serial)
+            
+            conn.commit()
+            conn.close()
+            return counts
+        except Exception as e:
+            logger.error(f"Error importing zone {zone.name}: {e}")
+            return None
+    
+    def write_zone_changes(self, zone: DNSZone, previous_serial: int,
+                           added: Iterable[DNSRecord] = (),
+                           deleted: Iterable[DNSRecord] = ()) -> Optional[Dict[str, int]]:
+        """Apply one journaled change set to a zone in one transaction."""
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            self._stage_records(cursor, 'zone_import', deleted)
+            cursor.execute(f'''
+                CREATE TEMP TABLE zone_deleted AS
+                SELECT d.* FROM dns_records d JOIN zone_import i ON {self.SAME_RECORD_SQL}
+                WHERE d.is_active = 1
+            ''')
+            self._stage_records(cursor, 'zone_added', added)
+            counts = self._apply_staged_changes(cursor, zone, previous_serial)
+            
+            conn.commit()
+            conn.close()
+            return counts
+        except Exception as e:
+            logger.error(f"Error writing changes to zone {zone.name}: {e}")
+            return None
+    
+    def get_zone_journal(self, zone_name: str, since_serial: int) -> List[tuple]:
+        """Get journal rows for changes after since_serial, oldest first."""
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                SELECT previous_serial, serial, operation, record_id, name, record_type, 
+                       value, ttl, priority, weight, port
+                FROM dns_zone_journal WHERE zone_name = ? AND serial > ?
+                ORDER BY serial, rowid
+            ''', (zone_name, since_serial))
+            rows = cursor.fetchall()
+            
+            conn.close()
+            return rows
+        except Exception as e:
+            logger.error(f"Error getting zone journal: {e}")
+            return []
+    
+    def trim_zone_journal(self, zone_name: str, before_serial: int) -> int:
+        """Delete journal entries older than before_serial."""
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                DELETE FROM dns_zone_journal WHERE zone_name = ? AND serial < ?
+            ''', (zone_name, before_serial))
+            deleted_count = cursor.rowcount
+            
+            conn.commit()
+            conn.close()
+            return deleted_count
+        except Exception as e:
+            logger.error(f"Error trimming zone journal: {e}")
+            return 0
+    
+    def iter_zone_records(self, zone_name: str) -> Iterator[DNSRecord]:
+        """Stream a zone's active records, ordered by name."""
+        conn = sqlite3.connect(self.db_path)
+        try:
+            cursor = conn.execute(f'''
+                SELECT * FROM dns_records d 
+                WHERE d.is_active = 1 AND {self.ZONE_OWNED_SQL}
+                ORDER BY d.name, d.record_type, d.priority
+            ''', {'zone': zone_name})
+            for row in cursor:
+                yield self._record_from_row(row)
+        finally:
+            conn.close()
+    
     def log_dns_query(self, query: DNSQuery) -> bool:
         """Log DNS query to database."""
         try:
@@ -299,6 +1177,10 @@ class DNSDatabase:
                 query.client_ip, query.timestamp, query.response_time,
                 query.cached, query.success, query.error_message
             ))
+            self._apply_query_rollups(cursor, [(
+                query.domain, query.timestamp, query.response_time,
+                query.cached, query.success
+            )])
             
             conn.commit()
             conn.close()
@@ -307,6 +1189,143 @@ class DNSDatabase:
             logger.error(f"Error logging DNS query: {e}")
             return False
     
+    def log_dns_queries(self, queries: List[DNSQuery]) -> bool:
+        """Log a batch of DNS queries in one transaction."""
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            cursor.executemany('''
+                INSERT INTO dns_queries 
+                (query_id, domain, record_type, client_ip, timestamp, 
+                 response_time, cached, success, error_message)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', [(
+                query.query_id, query.domain, query.record_type.value,
+                query.client_ip, query.timestamp, query.response_time,
+                query.cached, query.success, query.error_message
+            ) for query in queries])
+            self._apply_query_rollups(cursor, [(
+                query.domain, query.timestamp, query.response_time,
+                query.cached, query.success
+            ) for query in queries])
+            
+            conn.commit()
+            conn.close()
+            return True
+        except Exception as e:
+            logger.error(f"Error logging DNS queries: {e}")
+            return False
+    
+    def _apply_query_rollups(self, cursor: sqlite3.Cursor, rows: List[tuple]):
+        """Fold (domain, timestamp, response_time, cached, success) rows into the rollups.
+        
+        Per-domain rows are written only for domains in the minute's top-domain
+        sketch, so their number per minute is bounded by the sketch capacity.
+        """
+        minutes: Dict[int, QueryRollup] = {}
+        domains: Dict[tuple, QueryRollup] = {}
+        for domain, timestamp, response_time, cached, success in rows:
+            minute = int(timestamp.timestamp() // 60)
+            rollup = minutes.setdefault(minute, QueryRollup())
+            rollup.add(response_time, cached, success)
+            rollup.top_domains[domain] = rollup.top_domains.get(domain, 0) + 1
+            domains.setdefault((domain, minute), QueryRollup()).add(response_time, cached, success)
+        
+        domain_rows = []
+        for minute, rollup in minutes.items():
+            cursor.execute('''
+                SELECT total, cached, success, response_time_sum, latency_histogram, top_domains
+                FROM dns_query_rollups WHERE minute = ?
+            ''', (minute,))
+            row = cursor.fetchone()
+            if row:
+                stored = self._rollup_from_row(row)
+                stored.merge(rollup)
+                rollup = stored
+            else:
+                rollup.top_domains = SpaceSavingSketch(counts=rollup.top_domains).counts
+            cursor.execute('''
+                INSERT OR REPLACE INTO dns_query_rollups 
+                (minute, total, cached, success, response_time_sum, latency_histogram, top_domains)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', (
+                minute, rollup.total, rollup.cached, rollup.success, rollup.response_time_sum,
+                json.dumps(rollup.latency_histogram), json.dumps(rollup.top_domains)
+            ))
+            
+            for domain in rollup.top_domains:
+                counts = domains.get((domain, minute))
+                if counts:
+                    domain_rows.append((domain, minute, counts.total, counts.cached, counts.success,
+                                        counts.response_time_sum, *counts.latency_histogram))
+        
+        updates = ", ".join(f"{name} = {name} + excluded.{name}" for name in DOMAIN_ROLLUP_SUMS)
+        cursor.executemany(f'''
+            INSERT INTO dns_domain_rollups (domain, minute, {", ".join(DOMAIN_ROLLUP_SUMS)})
+            VALUES ({", ".join("?" * (len(DOMAIN_ROLLUP_SUMS) + 2))})
+            ON CONFLICT (domain, minute) DO UPDATE SET {updates}
+        ''', domain_rows)
+    
+    def _rollup_from_row(self, row: tuple) -> QueryRollup:
+        return QueryRollup(
+            total=row[0],
+            cached=row[1],
+            success=row[2],
+            response_time_sum=row[3],
+            latency_histogram=json.loads(row[4]),
+            top_domains=json.loads(row[5]) if len(row) > 5 else {}
+        )
+    
+    def get_query_rollup(self, since_minute: int, domain: str = None) -> Optional[QueryRollup]:
+        """Sum the per-minute rollups from since_minute onwards."""
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            rollup = QueryRollup()
+            if domain:
+                cursor.execute(f'''
+                    SELECT {", ".join(DOMAIN_ROLLUP_SUMS)}
+                    FROM dns_domain_rollups WHERE domain = ? AND minute >= ?
+                ''', (domain, since_minute))
+                for row in cursor.fetchall():
+                    rollup.merge(QueryRollup(total=row[0], cached=row[1], success=row[2],
+                                             response_time_sum=row[3], latency_histogram=list(row[4:])))
+            else:
+                cursor.execute('''
+                    SELECT total, cached, success, response_time_sum, latency_histogram, top_domains
+                    FROM dns_query_rollups WHERE minute >= ?
+                ''', (since_minute,))
+                for row in cursor.fetchall():
+                    rollup.merge(self._rollup_from_row(row))
+            
+            conn.close()
+            return rollup
+        except Exception as e:
+            logger.error(f"Error getting query rollup: {e}")
+            return None
+    
+    def compact_query_logs(self, logs_before: datetime, rollups_before_minute: int) -> int:
+        """Delete raw query logs and rollups older than the given cutoffs."""
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            cursor.execute('DELETE FROM dns_queries WHERE timestamp < ?', (logs_before,))
+            deleted_count = cursor.rowcount
+            cursor.execute('DELETE FROM dns_query_rollups WHERE minute < ?',
+                           (rollups_before_minute,))
+            cursor.execute('DELETE FROM dns_domain_rollups WHERE minute < ?',
+                           (rollups_before_minute,))
+            
+            conn.commit()
+            conn.close()
+            return deleted_count
+        except Exception as e:
+            logger.error(f"Error compacting query logs: {e}")
+            return 0
+    
     def get_dns_cache(self, cache_key: str) -> Optional[DNSCache]:
         """Get DNS cache entry."""
         try:
@@ -415,6 +1434,105 @@ class DNSDatabase:
             logger.error(f"Error cleaning up expired cache: {e}")
             return 0
 
+class QueryLogWriter:
+    """Background writer for DNS query logs.
+    
+    Resolution appends queries to a bounded in-memory buffer and a daemon
+    thread writes them in batched transactions. When the buffer is full new
+    entries are dropped and counted instead of slowing resolution down.
+    """
+    
+    def __init__(self, db: 'DNSDatabase', capacity: int = 100000,
+                 batch_size: int = 1000, flush_interval: float = 0.5,
+                 compact_interval: float = 3600.0, log_retention_hours: int = 24,
+                 rollup_retention_hours: int = 24 * 30):
+        self.db = db
+        self.compact_interval = compact_interval
+        self.log_retention_hours = log_retention_hours
+        self.rollup_retention_hours = rollup_retention_hours
+        self.capacity = capacity
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.buffer: deque = deque()
+        self.written = 0
+        self.dropped = 0
+        self.stats_lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.running = False
+        self.thread: Optional[threading.Thread] = None
+    
+    def start(self):
+        """Start the background writer thread."""
+        if self.running:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name="dns-query-log", daemon=True)
+        self.thread.start()
+    
+    def stop(self):
+        """Stop the writer thread and write anything still buffered."""
+        self.running = False
+        self.wakeup.set()
+        if self.thread:
+            self.thread.join()
+            self.thread = None
+        self.flush()
+    
+    def log(self, query: DNSQuery) -> bool:
+        """Buffer a query for writing. Returns False if it was dropped."""
+        if len(self.buffer) >= self.capacity:
+            with self.stats_lock:
+                self.dropped += 1
+            return False
+        self.buffer.append(query)
+        if len(self.buffer) >= self.batch_size:
+            self.wakeup.set()
+        return True
+    
+    def flush(self) -> int:
+        """Write all buffered queries. Returns the number written."""
+        written = 0
+        with self.flush_lock:
+            while self.buffer:
+                batch = []
+                while self.buffer and len(batch) < self.batch_size:
+                    batch.append(self.buffer.popleft())
+                if self.db.log_dns_queries(batch):
+                    written += len(batch)
+                else:
+                    with self.stats_lock:
+                        self.dropped += len(batch)
+        with self.stats_lock:
+            self.written += written
+        return written
+    
+    def get_stats(self) -> Dict[str, int]:
+        """Get buffer and write counters."""
+        return {
+            'buffered': len(self.buffer),
+            'written': self.written,
+            'dropped': self.dropped
+        }
+    
+    def compact(self) -> int:
+        """Drop raw logs and rollups past their retention."""
+        now = datetime.now()
+        return self.db.compact_query_logs(
+            now - timedelta(hours=self.log_retention_hours),
+            int(now.timestamp() // 60) - self.rollup_retention_hours * 60
+        )
+    
+    def _run(self):
+        last_compact = time.monotonic()
+        while self.running:
+            self.wakeup.wait(self.flush_interval)
+            self.wakeup.clear()
+            self.flush()
+            if time.monotonic() - last_compact >= self.compact_interval:
+                self.compact()
+                last_compact = time.monotonic()
+
 class DNSService:
     """DNS service with caching and query handling."""
     
@@ -422,6 +1540,15 @@ class DNSService:
         self.db = DNSDatabase(db_path)
         self.cache_lock = threading.Lock()
         self.cache_ttl = 300  # 5 minutes default cache TTL
+        # Authoritative data is served from memory, loaded on first lookup
+        self.zone_index = ZoneIndex()
+        self.zone_index_loaded = False
+        self.answer_cache = DNSAnswerCache()
+        self.zone_lock = threading.Lock()  # Serializes zone serial changes
+        # Query logs are written in batches off the resolution path
+        self.query_counter = itertools.count()
+        self.query_log = QueryLogWriter(self.db)
+        self.query_log.start()
         
     def generate_record_id(self, name: str, record_type: RecordType) -> str:
         """Generate unique record ID."""
@@ -429,7 +1556,7 @@ class DNSService:
     
     def generate_query_id(self) -> str:
         """Generate unique query ID."""
-        return hashlib.md5(f"query{time.time()}".encode()).hexdigest()[:12]
+        return hashlib.md5(f"query{time.time()}{next(self.query_counter)}".encode()).hexdigest()[:12]
     
     def create_dns_record(self, name: str, record_type: RecordType, value: str,
                          ttl: int = 3600, priority: int = 0, weight: int = 0, 
@@ -448,7 +1575,23 @@ class DNSService:
             port=port
         )
         
-        if self.db.save_dns_record(record):
+        # Records inside a zone are journaled under a new zone serial
+        zone = self.get_zone_index().find_zone(name)
+        if zone:
+            with self.zone_lock:
+                previous_serial = zone.serial
+                zone.serial = next_zone_serial(previous_serial)
+                saved = self.db.write_zone_changes(zone, previous_serial, added=[record]) is not None
+                if not saved:
+                    zone.serial = previous_serial
+        else:
+            saved = self.db.save_dns_record(record)
+        
+        if saved:
+            with self.cache_lock:
+                if self.zone_index_loaded:
+                    self.zone_index.add_record(record)
+            self.answer_cache.clear()
             return record
         return None
     
@@ -468,6 +1611,10 @@ class DNSService:
         )
         
         if self.db.save_dns_zone(zone):
+            with self.cache_lock:
+                if self.zone_index_loaded:
+                    self.zone_index.add_zone(zone)
+            self.answer_cache.clear()
             return zone
         return None
     
@@ -475,47 +1622,212 @@ class DNSService:
         """Get DNS zone by name."""
         return self.db.get_dns_zone(name)
     
-    def resolve_domain(self, domain: str, record_type: RecordType = RecordType.A,
-                      client_ip: str = "127.0.0.1") -> List[DNSRecord]:
-        """Resolve domain name to DNS records."""
+    def import_zone_file(self, zone_name: str, lines: Iterable[str],
+                         default_ttl: int = 3600) -> Optional[Dict[str, Any]]:
+        """Load a BIND zone file, replacing the zone's records in one transaction.
+        
+        The zone is created from the file's SOA if it does not exist yet. Its
+        serial becomes the larger of the SOA serial and the current serial + 1.
+        Lines are parsed as they are read, so files need not fit in memory.
+        """
+        zone_name = zone_name.lower().rstrip('.')
+        parser = ZoneFileParser(zone_name, default_ttl)
+        records = parser.parse(lines)
+        first = next(records, None)
+        soa = first if first and first.record_type == RecordType.SOA else None
+        if first and not soa:
+            records = itertools.chain([first], records)
+        
+        zone = self.db.get_dns_zone(zone_name)
+        if zone is None and soa is None:
+            logger.error(f"Cannot import zone {zone_name}: zone does not exist and file has no SOA")
+            return None
+        previous_serial = zone.serial if zone else 0
+        if zone is None:
+            zone = DNSZone(
+                zone_id=hashlib.md5(f"zone{zone_name}{time.time()}".encode()).hexdigest()[:12],
+                name=zone_name, primary_ns="", admin_email=""
+            )
+        zone.serial = next_zone_serial(previous_serial)
+        if soa:
+            mname, rname, serial, refresh, retry, expire, minimum = soa.value.split()
+            local, _, domain = rname.partition('.')
+            zone.primary_ns = mname
+            zone.admin_email = f"{local}@{domain}" if domain else rname
+            zone.serial = max(int(serial), zone.serial)
+            zone.refresh, zone.retry, zone.expire, zone.minimum_ttl = (
+                int(refresh), int(retry), int(expire), int(minimum))
+        zone.updated_at = datetime.now()
+        
+        outside = 0
+        
+        def zone_records():
+            nonlocal outside
+            suffix = '.' + zone_name
+            for record in records:
+                if record.record_type == RecordType.SOA:
+                    continue
+                if record.name == zone_name or record.name.endswith(suffix):
+                    yield record
+                else:
+                    outside += 1
+        
+        with self.zone_lock:
+            counts = self.db.import_zone_records(zone, previous_serial, zone_records())
+        if counts is None:
+            return None
+        self.invalidate_zone_index()
+        
+        return {
+            'zone': zone_name,
+            'serial': zone.serial,
+            'added': counts['added'],
+            'deleted': counts['deleted'],
+            'skipped': parser.skipped + outside
+        }
+    
+    def export_zone_file(self, zone_name: str) -> Iterator[str]:
+        """Stream a zone as BIND zone file lines."""
+        zone = self.db.get_dns_zone(zone_name.lower().rstrip('.'))
+        if zone is None:
+            return
+        rname = zone.admin_email.replace('@', '.')
+        yield f"$ORIGIN {zone.name}."
+        yield f"$TTL {zone.minimum_ttl}"
+        yield (f"{zone.name}. {zone.minimum_ttl} IN SOA {zone.primary_ns}. {rname}. "
+               f"{zone.serial} {zone.refresh} {zone.retry} {zone.expire} {zone.minimum_ttl}")
+        for record in self.db.iter_zone_records(zone.name):
+            yield format_zone_record(record)
+    
+    def get_zone_changes(self, zone_name: str, since_serial: int) -> Optional[Dict[str, Any]]:
+        """Get the changes a replica at since_serial needs, IXFR style.
+        
+        Returns the journaled change sets in order, or the whole zone with
+        full=True when the journal does not reach back to since_serial.
+        """
+        zone = self.db.get_dns_zone(zone_name.lower().rstrip('.'))
+        if zone is None:
+            return None
+        transfer = {
+            'zone': {
+                'zone_id': zone.zone_id, 'name': zone.name, 'primary_ns': zone.primary_ns,
+                'admin_email': zone.admin_email, 'serial': zone.serial, 'refresh': zone.refresh,
+                'retry': zone.retry, 'expire': zone.expire, 'minimum_ttl': zone.minimum_ttl
+            },
+            'serial': zone.serial,
+            'full': False,
+            'changes': []
+        }
+        if since_serial == zone.serial:
+            return transfer
+        
+        changes = []
+        serial = since_serial
+        # Serial 0 means the replica has no copy yet; send the whole zone
+        journal = self.db.get_zone_journal(zone.name, since_serial) if since_serial else []
+        for row in journal:
+            previous_serial, row_serial, operation = row[:3]
+            if operation == 'serial':
+                if previous_serial != serial:
+                    break  # Gap in the journal
+                changes.append({'serial': row_serial, 'deleted': [], 'added': []})
+                serial = row_serial
+            elif changes and changes[-1]['serial'] == row_serial:
+                record = {
+                    'id': row[3], 'name': row[4], 'record_type': row[5], 'value': row[6],
+                    'ttl': row[7], 'priority': row[8], 'weight': row[9], 'port': row[10]
+                }
+                changes[-1]['deleted' if operation == 'delete' else 'added'].append(record)
+        
+        if serial == zone.serial:
+            transfer['changes'] = changes
+        else:
+            transfer['full'] = True
+            transfer['records'] = [record_to_dict(r) for r in self.db.iter_zone_records(zone.name)]
+        return transfer
+    
+    def apply_zone_changes(self, transfer: Dict[str, Any]) -> bool:
+        """Apply a transfer from get_zone_changes on a replica."""
+        zone_data = transfer['zone']
+        existing = self.db.get_dns_zone(zone_data['name'])
+        zone = existing or DNSZone(**zone_data)
+        previous_serial = existing.serial if existing else 0
+        for key in ('primary_ns', 'admin_email', 'refresh', 'retry', 'expire', 'minimum_ttl'):
+            setattr(zone, key, zone_data[key])
+        
+        with self.zone_lock:
+            if transfer['full']:
+                zone.serial = transfer['serial']
+                if self.db.import_zone_records(
+                        zone, previous_serial,
+                        (record_from_dict(r) for r in transfer['records'])) is None:
+                    return False
+            else:
+                for change in transfer['changes']:
+                    zone.serial = change['serial']
+                    if self.db.write_zone_changes(
+                            zone, previous_serial,
+                            added=[record_from_dict(r) for r in change['added']],
+                            deleted=[record_from_dict(r) for r in change['deleted']]) is None:
+                        return False
+                    previous_serial = zone.serial
+        self.invalidate_zone_index()
+        return True
+    
+    def invalidate_zone_index(self):
+        """Reload the zone index on next use, after bulk changes."""
+        with self.cache_lock:
+            self.zone_index_loaded = False
+        self.answer_cache.clear()
+    
+    def get_zone_index(self) -> ZoneIndex:
+        """Get the zone index, loading it from the database on first use."""
+        if not self.zone_index_loaded:
+            with self.cache_lock:
+                if not self.zone_index_loaded:
+                    # Swap in a complete index; lookups holding the old one finish against it
+                    index = ZoneIndex()
+                    index.load(self.db.get_all_dns_records(), self.db.get_all_dns_zones())
+                    self.zone_index = index
+                    self.zone_index_loaded = True
+        return self.zone_index
+    
+    def lookup_answer(self, domain: str, record_type: RecordType) -> tuple:
+        """Look up an answer through the answer cache. Returns (entry, cached)."""
+        key = f"{domain.lower().rstrip('.')}:{record_type.value}"
+        entry = self.answer_cache.get(key)
+        if entry and not self.answer_cache.needs_prefetch(entry):
+            return entry, True
+        
+        index = self.get_zone_index()
+        records = index.lookup(domain, record_type)
+        if records:
+            ttl = min(record.ttl for record in records)
+            nxdomain = False
+        else:
+            zone = index.find_zone(domain)
+            ttl = zone.minimum_ttl if zone else self.cache_ttl
+            nxdomain = index.find(domain)[0] is None
+        
+        fresh = DNSCache(
+            key=key,
+            records=records,
+            expires_at=datetime.now() + timedelta(seconds=ttl),
+            hit_count=entry.hit_count if entry else 0,
+            ttl=ttl,
+            nxdomain=nxdomain
+        )
+        self.answer_cache.put(fresh)
+        return fresh, entry is not None
+    
+    def resolve_answer(self, domain: str, record_type: RecordType = RecordType.A,
+                       client_ip: str = "127.0.0.1") -> Optional[DNSCache]:
+        """Resolve a domain, returning the answer entry including negative results."""
         start_time = time.time()
         query_id = self.generate_query_id()
         
         try:
-            # Check cache first
-            cache_key = f"{domain}:{record_type.value}"
-            cached_result = self.db.get_dns_cache(cache_key)
-            
-            if cached_result:
-                # Update hit count and last accessed
-                cached_result.hit_count += 1
-                cached_result.last_accessed = datetime.now()
-                self.db.save_dns_cache(cached_result)
-                
-                # Log query
-                query = DNSQuery(
-                    query_id=query_id,
-                    domain=domain,
-                    record_type=record_type,
-                    client_ip=client_ip,
-                    response_time=time.time() - start_time,
-                    cached=True
-                )
-                self.db.log_dns_query(query)
-                
-                return cached_result.records
-            
-            # Query database
-            records = self.db.get_dns_records(domain, record_type)
-            
-            # Cache the result
-            if records:
-                cache = DNSCache(
-                    key=cache_key,
-                    records=records,
-                    expires_at=datetime.now() + timedelta(seconds=self.cache_ttl)
-                )
-                self.db.save_dns_cache(cache)
+            entry, cached = self.lookup_answer(domain, record_type)
             
             # Log query
             query = DNSQuery(
@@ -524,12 +1836,12 @@ class DNSService:
                 record_type=record_type,
                 client_ip=client_ip,
                 response_time=time.time() - start_time,
-                cached=False,
-                success=len(records) > 0
+                cached=cached,
+                success=len(entry.records) > 0
             )
-            self.db.log_dns_query(query)
+            self.query_log.log(query)
             
-            return records
+            return entry
             
         except Exception as e:
             logger.error(f"Error resolving domain {domain}: {e}")
@@ -544,102 +1856,475 @@ class DNSService:
                 success=False,
                 error_message=str(e)
             )
-            self.db.log_dns_query(query)
+            self.query_log.log(query)
             
-            return []
+            return None
+    
+    def resolve_domain(self, domain: str, record_type: RecordType = RecordType.A,
+                      client_ip: str = "127.0.0.1") -> List[DNSRecord]:
+        """Resolve domain name to DNS records."""
+        entry = self.resolve_answer(domain, record_type, client_ip)
+        return entry.records if entry else []
     
     def reverse_dns_lookup(self, ip: str) -> List[DNSRecord]:
-        """Perform reverse DNS lookup."""
+        """Perform reverse DNS lookup for an IP address or in-addr.arpa/ip6.arpa name.
+        
+        Returns the address's PTR records or, if it has none, PTR records
+        synthesized from the A/AAAA records pointing at it.
+        """
         try:
-            # For reverse DNS, we need PTR records
-            # This is a simplified implementation
-            records = self.db.get_dns_records(ip, RecordType.PTR)
-            return records
+            address = ip_from_reverse_pointer(ip)
+            if address is None:
+                return []
+            return self.get_zone_index().reverse.lookup(address)
         except Exception as e:
             logger.error(f"Error in reverse DNS lookup for {ip}: {e}")
             return []
     
-    def get_query_stats(self, domain: str = None, hours: int = 24) -> Dict[str, Any]:
-        """Get DNS query statistics."""
+    def get_names_in_network(self, cidr: str) -> Dict[str, List[str]]:
+        """Map every known address in a CIDR range, e.g. "10.1.0.0/16", to its names."""
         try:
-            conn = sqlite3.connect(self.db.db_path)
-            cursor = conn.cursor()
-            
-            # Get total queries
-            if domain:
-                cursor.execute('''
-                    SELECT COUNT(*) FROM dns_queries 
-                    WHERE domain = ? AND timestamp > datetime('now', '-{} hours')
-                '''.format(hours), (domain,))
-            else:
-                cursor.execute('''
-                    SELECT COUNT(*) FROM dns_queries 
-                    WHERE timestamp > datetime('now', '-{} hours')
-                '''.format(hours))
-            
-            total_queries = cursor.fetchone()[0]
-            
-            # Get cached queries
-            if domain:
-                cursor.execute('''
-                    SELECT COUNT(*) FROM dns_queries 
-                    WHERE domain = ? AND cached = 1 AND timestamp > datetime('now', '-{} hours')
-                '''.format(hours), (domain,))
-            else:
-                cursor.execute('''
-                    SELECT COUNT(*) FROM dns_queries 
-                    WHERE cached = 1 AND timestamp > datetime('now', '-{} hours')
-                '''.format(hours))
-            
-            cached_queries = cursor.fetchone()[0]
-            
-            # Get average response time
-            if domain:
-                cursor.execute('''
-                    SELECT AVG(response_time) FROM dns_queries 
-                    WHERE domain = ? AND success = 1 AND timestamp > datetime('now', '-{} hours')
-                '''.format(hours), (domain,))
-            else:
-                cursor.execute('''
-                    SELECT AVG(response_time) FROM dns_queries 
-                    WHERE success = 1 AND timestamp > datetime('now', '-{} hours')
-                '''.format(hours))
-            
-            avg_response_time = cursor.fetchone()[0] or 0.0
-            
-            # Get top domains
-            if not domain:
-                cursor.execute('''
-                    SELECT domain, COUNT(*) as count FROM dns_queries 
-                    WHERE timestamp > datetime('now', '-{} hours')
-                    GROUP BY domain ORDER BY count DESC LIMIT 10
-                '''.format(hours))
-                top_domains = [{'domain': row[0], 'count': row[1]} for row in cursor.fetchall()]
-            else:
-                top_domains = []
-            
-            conn.close()
-            
-            return {
-                'total_queries': total_queries,
-                'cached_queries': cached_queries,
-                'cache_hit_rate': (cached_queries / total_queries * 100) if total_queries > 0 else 0,
-                'average_response_time': avg_response_time,
-                'top_domains': top_domains
-            }
+            network = ipaddress.ip_network(cidr, strict=False)
+            return self.get_zone_index().reverse.lookup_network(network)
         except Exception as e:
-            logger.error(f"Error getting query stats: {e}")
+            logger.error(f"Error looking up names in {cidr}: {e}")
+            return {}
+    
+    def get_query_stats(self, domain: str = None, hours: int = 24) -> Dict[str, Any]:
+        """Get DNS query statistics from the per-minute rollups."""
+        self.query_log.flush()
+        since_minute = int(time.time() // 60) - int(hours) * 60
+        rollup = self.db.get_query_rollup(since_minute, domain)
+        if rollup is None:
             return {}
+        
+        if not domain:
+            top_domains = [{'domain': name, 'count': count}
+                           for name, count in SpaceSavingSketch(counts=rollup.top_domains).top(10)]
+        else:
+            top_domains = []
+        
+        return {
+            'total_queries': rollup.total,
+            'cached_queries': rollup.cached,
+            'cache_hit_rate': (rollup.cached / rollup.total * 100) if rollup.total > 0 else 0,
+            'average_response_time': (rollup.response_time_sum / rollup.success) if rollup.success else 0.0,
+            'latency_percentiles': {
+                'p50': rollup.latency_percentile(0.5),
+                'p95': rollup.latency_percentile(0.95),
+                'p99': rollup.latency_percentile(0.99)
+            },
+            'top_domains': top_domains,
+            'dropped_query_logs': self.query_log.dropped
+        }
+    
+    def compact_query_logs(self) -> int:
+        """Delete raw query logs and rollups past their retention."""
+        self.query_log.flush()
+        return self.query_log.compact()
     
     def cleanup_cache(self) -> int:
         """Clean up expired cache entries."""
         return self.db.cleanup_expired_cache()
+    
+    def close(self):
+        """Stop background work, writing any buffered query logs."""
+        self.query_log.stop()
+
+# DNS wire protocol (RFC 1035), with EDNS0 payload sizes (RFC 6891)
+WIRE_TYPES = {
+    RecordType.A: 1, RecordType.NS: 2, RecordType.CNAME: 5, RecordType.SOA: 6,
+    RecordType.PTR: 12, RecordType.MX: 15, RecordType.TXT: 16,
+    RecordType.AAAA: 28, RecordType.SRV: 33
+}
+WIRE_RECORD_TYPES = {code: record_type for record_type, code in WIRE_TYPES.items()}
+OPT_TYPE = 41
+CLASS_IN = 1
+RCODE_NOERROR = 0
+RCODE_FORMERR = 1
+RCODE_SERVFAIL = 2
+RCODE_NXDOMAIN = 3
+RCODE_NOTIMP = 4
+RCODE_REFUSED = 5
+FLAG_QR = 0x8000
+FLAG_AA = 0x0400
+FLAG_TC = 0x0200
+FLAG_RD = 0x0100
+DEFAULT_UDP_PAYLOAD = 512
+MAX_UDP_PAYLOAD = 4096
+
+class DNSWireError(ValueError):
+    """Malformed DNS wire-format message."""
+
+@dataclass
+class DNSWireQuery:
+    """Question parsed from a DNS wire-format query."""
+    message_id: int
+    flags: int
+    name: str
+    qtype: int
+    qclass: int = CLASS_IN
+    edns: bool = False
+    udp_payload_size: int = DEFAULT_UDP_PAYLOAD
+    
+    @property
+    def opcode(self) -> int:
+        return (self.flags >> 11) & 0xF
+
+def read_wire_name(data: bytes, offset: int) -> tuple:
+    """Read a possibly compressed domain name. Returns (name, next_offset)."""
+    labels = []
+    next_offset = None
+    jumps = 0
+    while True:
+        if offset >= len(data):
+            raise DNSWireError("Name runs past end of message")
+        length = data[offset]
+        if length & 0xC0 == 0xC0:
+            if offset + 1 >= len(data):
+                raise DNSWireError("Truncated compression pointer")
+            if next_offset is None:
+                next_offset = offset + 2
+            offset = ((length & 0x3F) << 8) | data[offset + 1]
+            jumps += 1
+            if jumps > 32:
+                raise DNSWireError("Compression pointer loop")
+            continue
+        if length & 0xC0:
+            raise DNSWireError("Unsupported label type")
+        offset += 1
+        if length == 0:
+            break
+        if offset + length > len(data):
+            raise DNSWireError("Label runs past end of message")
+        labels.append(data[offset:offset + length].decode('ascii', errors='replace'))
+        offset += length
+    return '.'.join(labels), next_offset if next_offset is not None else offset
+
+def parse_dns_query(data: bytes) -> DNSWireQuery:
+    """Parse a wire-format query with exactly one question."""
+    if len(data) < 12:
+        raise DNSWireError("Message shorter than header")
+    message_id, flags, qdcount, ancount, nscount, arcount = struct.unpack('!6H', data[:12])
+    if flags & FLAG_QR:
+        raise DNSWireError("Message is a response")
+    if qdcount != 1:
+        raise DNSWireError("Expected exactly one question")
+    
+    name, offset = read_wire_name(data, 12)
+    if offset + 4 > len(data):
+        raise DNSWireError("Truncated question")
+    qtype, qclass = struct.unpack('!HH', data[offset:offset + 4])
+    offset += 4
+    query = DNSWireQuery(message_id=message_id, flags=flags, name=name,
+                         qtype=qtype, qclass=qclass)
+    
+    # Only the OPT pseudo-record in the additional section matters for queries
+    for _ in range(ancount + nscount + arcount):
+        _, offset = read_wire_name(data, offset)
+        if offset + 10 > len(data):
+            raise DNSWireError("Truncated resource record")
+        rtype, rclass, _, rdlength = struct.unpack('!HHIH', data[offset:offset + 10])
+        offset += 10 + rdlength
+        if rtype == OPT_TYPE:
+            query.edns = True
+            query.udp_payload_size = min(max(rclass, DEFAULT_UDP_PAYLOAD), MAX_UDP_PAYLOAD)
+    return query
+
+class WireWriter:
+    """Builds a DNS wire-format message with name compression."""
+    
+    def __init__(self):
+        self.buffer = bytearray()
+        self.names: Dict[str, int] = {}
+    
+    def write_name(self, name: str, compress: bool = True):
+        labels = [label for label in name.rstrip('.').split('.') if label]
+        for i, label in enumerate(labels):
+            suffix = '.'.join(labels[i:]).lower()
+            if compress and suffix in self.names:
+                self.buffer += struct.pack('!H', 0xC000 | self.names[suffix])
+                return
+            if len(self.buffer) < 0x4000:
+                self.names.setdefault(suffix, len(self.buffer))
+            encoded = label.encode('ascii')
+            if len(encoded) > 63:
+                raise DNSWireError(f"Label too long: {label}")
+            self.buffer.append(len(encoded))
+            self.buffer += encoded
+        self.buffer.append(0)
+    
+    def write_record(self, name: str, record_type: RecordType, ttl: int, value: Any) -> bool:
+        """Write a resource record; value is a DNSRecord or, for SOA, a DNSZone.
+        
+        Returns False, leaving the message unchanged, if the value cannot be encoded.
+        """
+        start = len(self.buffer)
+        try:
+            self.write_name(name)
+            self.buffer += struct.pack('!HHI', WIRE_TYPES[record_type], CLASS_IN, max(0, ttl))
+            length_at = len(self.buffer)
+            self.buffer += b'\0\0'
+            self._write_rdata(record_type, value)
+            struct.pack_into('!H', self.buffer, length_at, len(self.buffer) - length_at - 2)
+            return True
+        except (DNSWireError, ValueError, OSError, struct.error, IndexError, UnicodeError) as e:
+            logger.warning(f"Cannot encode {record_type.value} record for {name}: {e}")
+            del self.buffer[start:]
+            self.names = {suffix: at for suffix, at in self.names.items() if at < start}
+            return False
+    
+    def _write_rdata(self, record_type: RecordType, value: Any):
+        if isinstance(value, DNSZone):
+            self.write_name(value.primary_ns)
+            self.write_name(value.admin_email.replace('@', '.'))
+            self.buffer += struct.pack('!5I', value.serial, value.refresh, value.retry,
+                                       value.expire, value.minimum_ttl)
+        elif record_type == RecordType.A:
+            self.buffer += socket.inet_pton(socket.AF_INET, value.value)
+        elif record_type == RecordType.AAAA:
+            self.buffer += socket.inet_pton(socket.AF_INET6, value.value)
+        elif record_type in (RecordType.CNAME, RecordType.NS, RecordType.PTR):
+            self.write_name(value.value)
+        elif record_type == RecordType.MX:
+            self.buffer += struct.pack('!H', value.priority)
+            self.write_name(value.value)
+        elif record_type == RecordType.SRV:
+            self.buffer += struct.pack('!3H', value.priority, value.weight, value.port)
+            self.write_name(value.value, compress=False)  # RFC 2782
+        elif record_type == RecordType.TXT:
+            text = value.value.encode('utf-8')
+            for i in range(0, max(len(text), 1), 255):
+                chunk = text[i:i + 255]
+                self.buffer.append(len(chunk))
+                self.buffer += chunk
+        elif record_type == RecordType.SOA:
+            mname, rname, *numbers = value.value.split()
+            self.write_name(mname)
+            self.write_name(rname)
+            self.buffer += struct.pack('!5I', *(int(n) for n in numbers))
+
+def build_dns_query(name: str, qtype: int = 1, message_id: int = 0,
+                    recursion_desired: bool = True, edns_payload_size: int = None) -> bytes:
+    """Build a wire-format query."""
+    writer = WireWriter()
+    writer.buffer += struct.pack('!6H', message_id, FLAG_RD if recursion_desired else 0,
+                                 1, 0, 0, 1 if edns_payload_size else 0)
+    writer.write_name(name)
+    writer.buffer += struct.pack('!HH', qtype, CLASS_IN)
+    if edns_payload_size:
+        writer.buffer += b'\0' + struct.pack('!HHIH', OPT_TYPE, edns_payload_size, 0, 0)
+    return bytes(writer.buffer)
+
+def build_dns_response(query: DNSWireQuery, rcode: int, answers: List[DNSRecord] = (),
+                       zone: Optional[DNSZone] = None, max_size: int = None) -> bytes:
+    """Build a wire-format response.
+    
+    Negative answers carry the zone's SOA in the authority section (RFC 2308).
+    If the message exceeds max_size the records are left out and TC is set so
+    the client retries over TCP.
+    """
+    def encode(include_records: bool) -> tuple:
+        writer = WireWriter()
+        writer.buffer += bytes(12)
+        writer.write_name(query.name)
+        writer.buffer += struct.pack('!HH', query.qtype, query.qclass)
+        
+        ancount = nscount = arcount = 0
+        if include_records:
+            for record in answers:
+                if record.record_type in WIRE_TYPES:
+                    ancount += writer.write_record(record.name, record.record_type,
+                                                   record.ttl, record)
+            if zone and not answers:
+                nscount += writer.write_record(zone.name, RecordType.SOA,
+                                               zone.minimum_ttl, zone)
+        if query.edns:
+            writer.buffer += b'\0' + struct.pack('!HHIH', OPT_TYPE, MAX_UDP_PAYLOAD, 0, 0)
+            arcount += 1
+        return writer.buffer, ancount, nscount, arcount
+    
+    flags = FLAG_QR | (query.flags & (0x7800 | FLAG_RD)) | (rcode & 0xF)
+    if zone or answers:
+        flags |= FLAG_AA
+    
+    message, ancount, nscount, arcount = encode(True)
+    if max_size and len(message) > max_size:
+        message, ancount, nscount, arcount = encode(False)
+        flags |= FLAG_TC
+    struct.pack_into('!6H', message, 0, query.message_id, flags, 1, ancount, nscount, arcount)
+    return bytes(message)
+
+class DNSUDPProtocol(asyncio.DatagramProtocol):
+    """Datagram protocol handing UDP queries to a DNSWireServer."""
+    
+    def __init__(self, server: 'DNSWireServer'):
+        self.server = server
+        self.transport = None
+    
+    def connection_made(self, transport):
+        self.transport = transport
+    
+    def datagram_received(self, data: bytes, addr: tuple):
+        response = self.server.handle_message(data, addr[0], udp=True)
+        if response:
+            self.transport.sendto(response, addr)
+
+class DNSWireServer:
+    """Serves a DNSService over the DNS wire protocol on UDP and TCP.
+    
+    Use as an async context manager, or call start() and stop(). Passing
+    port 0 binds an ephemeral port, available as .port once started.
+    """
+    
+    def __init__(self, service: 'DNSService', host: str = "127.0.0.1", port: int = 5353,
+                 tcp_idle_timeout: float = 10.0):
+        self.service = service
+        self.host = host
+        self.port = port
+        self.tcp_idle_timeout = tcp_idle_timeout
+        self.udp_transport = None
+        self.tcp_server = None
+    
+    async def __aenter__(self):
+        await self.start()
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.stop()
+    
+    async def start(self):
+        """Bind the UDP and TCP listeners."""
+        self.service.get_zone_index()  # Load before the first query arrives
+        loop = asyncio.get_running_loop()
+        self.udp_transport, _ = await loop.create_datagram_endpoint(
+            lambda: DNSUDPProtocol(self), local_addr=(self.host, self.port))
+        self.port = self.udp_transport.get_extra_info('sockname')[1]
+        self.tcp_server = await asyncio.start_server(self._handle_tcp, self.host, self.port)
+        logger.info(f"DNS wire server listening on {self.host}:{self.port}")
+    
+    async def stop(self):
+        """Close the listeners."""
+        if self.udp_transport:
+            self.udp_transport.close()
+            self.udp_transport = None
+        if self.tcp_server:
+            self.tcp_server.close()
+            await self.tcp_server.wait_closed()
+            self.tcp_server = None
+    
+    def handle_message(self, data: bytes, client_ip: str, udp: bool = True) -> Optional[bytes]:
+        """Answer one wire-format query. Returns None if nothing should be sent."""
+        try:
+            query = parse_dns_query(data)
+        except DNSWireError as e:
+            if len(data) < 12 or data[2] & 0x80:
+                return None  # Too short to answer, or not a query
+            logger.debug(f"Malformed DNS query from {client_ip}: {e}")
+            message_id, flags = struct.unpack('!HH', data[:4])
+            return struct.pack('!6H', message_id, FLAG_QR | (flags & (0x7800 | FLAG_RD)) | RCODE_FORMERR,
+                               0, 0, 0, 0)
+        
+        max_size = query.udp_payload_size if udp else None
+        try:
+            if query.opcode != 0:
+                return build_dns_response(query, RCODE_NOTIMP, max_size=max_size)
+            if query.qclass != CLASS_IN:
+                return build_dns_response(query, RCODE_REFUSED, max_size=max_size)
+            
+            index = self.service.get_zone_index()
+            zone = index.find_zone(query.name)
+            record_type = WIRE_RECORD_TYPES.get(query.qtype)
+            if not record_type:
+                rcode = RCODE_NXDOMAIN if index.find(query.name)[0] is None else RCODE_NOERROR
+                return build_dns_response(query, rcode, zone=zone, max_size=max_size)
+            
+            entry = self.service.resolve_answer(query.name, record_type, client_ip)
+            if entry is None:
+                return build_dns_response(query, RCODE_SERVFAIL, max_size=max_size)
+            rcode = RCODE_NXDOMAIN if entry.nxdomain else RCODE_NOERROR
+            return build_dns_response(query, rcode, entry.records, zone, max_size)
+        except Exception as e:
+            logger.error(f"Error answering DNS query for {query.name}: {e}")
+            return build_dns_response(query, RCODE_SERVFAIL, max_size=max_size)
+    
+    async def _handle_tcp(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        client_ip = (writer.get_extra_info('peername') or ("127.0.0.1",))[0]
+        try:
+            while True:
+                header = await asyncio.wait_for(reader.readexactly(2), self.tcp_idle_timeout)
+                (length,) = struct.unpack('!H', header)
+                data = await asyncio.wait_for(reader.readexactly(length), self.tcp_idle_timeout)
+                response = self.handle_message(data, client_ip, udp=False)
+                if response:
+                    writer.write(struct.pack('!H', len(response)) + response)
+                    await writer.drain()
+        except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+class DNSBenchmarkProtocol(asyncio.DatagramProtocol):
+    """Client protocol matching UDP responses to pending queries by message id."""
+    
+    def __init__(self):
+        self.pending: Dict[int, asyncio.Future] = {}
+    
+    def datagram_received(self, data: bytes, addr: tuple):
+        if len(data) >= 2:
+            future = self.pending.pop(struct.unpack('!H', data[:2])[0], None)
+            if future and not future.done():
+                future.set_result(data)
+
+async def benchmark_dns_server(host: str, port: int, names: List[str],
+                               record_type: RecordType = RecordType.A, queries: int = 10000,
+                               concurrency: int = 100, timeout: float = 2.0) -> Dict[str, Any]:
+    """Load test a DNS server over UDP with a fixed number of queries in flight."""
+    loop = asyncio.get_running_loop()
+    transport, protocol = await loop.create_datagram_endpoint(
+        DNSBenchmarkProtocol, remote_addr=(host, port))
+    message_ids = itertools.count()
+    latencies = []
+    timeouts = 0
+    
+    async def worker(first: int):
+        nonlocal timeouts
+        for i in range(first, queries, concurrency):
+            message_id = next(message_ids) & 0xFFFF
+            future = loop.create_future()
+            protocol.pending[message_id] = future
+            sent_at = time.perf_counter()
+            transport.sendto(build_dns_query(names[i % len(names)], WIRE_TYPES[record_type], message_id))
+            try:
+                await asyncio.wait_for(future, timeout)
+                latencies.append(time.perf_counter() - sent_at)
+            except asyncio.TimeoutError:
+                protocol.pending.pop(message_id, None)
+                timeouts += 1
+    
+    started = time.perf_counter()
+    try:
+        await asyncio.gather(*(worker(i) for i in range(min(concurrency, queries))))
+    finally:
+        transport.close()
+    elapsed = time.perf_counter() - started
+    
+    latencies.sort()
+    return {
+        'queries': queries,
+        'answered': len(latencies),
+        'timeouts': timeouts,
+        'elapsed': elapsed,
+        'qps': len(latencies) / elapsed if elapsed > 0 else 0.0,
+        'p50_latency': latencies[len(latencies) // 2] if latencies else 0.0,
+        'p99_latency': latencies[int(len(latencies) * 0.99)] if latencies else 0.0
+    }
 
 # Global service instance
 dns_service = DNSService()
 
 # Flask app for API
-from flask import Flask, request, jsonify, render_template_string
+from flask import Flask, Response, request, jsonify, render_template_string
 
 app = Flask(__name__)
 
@@ -862,6 +2547,34 @@ def add_dns_record():
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
 
+@app.route('/api/zones/<zone_name>/import', methods=['POST'])
+def import_zone(zone_name):
+    """Import a BIND zone file from the request body."""
+    result = dns_service.import_zone_file(zone_name, request.get_data(as_text=True).splitlines())
+    if result is None:
+        return jsonify({'success': False, 'error': 'Failed to import zone'}), 400
+    return jsonify({'success': True, **result})
+
+@app.route('/api/zones/<zone_name>/export')
+def export_zone(zone_name):
+    """Export a zone as a BIND zone file."""
+    if not dns_service.get_dns_zone(zone_name.lower().rstrip('.')):
+        return jsonify({'error': 'Zone not found'}), 404
+    lines = dns_service.export_zone_file(zone_name)
+    return Response((line + '\n' for line in lines), mimetype='text/plain')
+
+@app.route('/api/zones/<zone_name>/ixfr')
+def zone_changes(zone_name):
+    """Get zone changes since a serial."""
+    try:
+        since_serial = int(request.args.get('serial', 0))
+    except ValueError:
+        return jsonify({'error': 'Invalid serial'}), 400
+    transfer = dns_service.get_zone_changes(zone_name, since_serial)
+    if transfer is None:
+        return jsonify({'error': 'Zone not found'}), 404
+    return jsonify(transfer)
+
 @app.route('/api/stats')
 def get_stats():
     """Get DNS statistics."""
@@ -873,5 +2586,35 @@ def health_check():
     """Health check endpoint."""
     return jsonify({'status': 'healthy', 'service': 'dns'})
 
+def run_wire_server(host: str, port: int):
+    """Run the DNS wire server until interrupted."""
+    async def serve():
+        async with DNSWireServer(dns_service, host, port):
+            await asyncio.Event().wait()
+    asyncio.run(serve())
+
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000, debug=True)
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="DNS service")
+    parser.add_argument('--dns-port', type=int,
+                        help="also serve the DNS wire protocol on this UDP/TCP port")
+    parser.add_argument('--benchmark', metavar='HOST:PORT',
+                        help="load test a DNS wire server and exit")
+    parser.add_argument('--names', nargs='+', default=['example.com'],
+                        help="names queried by --benchmark")
+    parser.add_argument('--queries', type=int, default=10000)
+    parser.add_argument('--concurrency', type=int, default=100)
+    args = parser.parse_args()
+    
+    if args.benchmark:
+        host, port = args.benchmark.rsplit(':', 1)
+        print(json.dumps(asyncio.run(benchmark_dns_server(
+            host, int(port), args.names, queries=args.queries,
+            concurrency=args.concurrency)), indent=2))
+    elif args.dns_port:
+        threading.Thread(target=run_wire_server, args=('0.0.0.0', args.dns_port),
+                         daemon=True).start()
+        app.run(host='0.0.0.0', port=5000, debug=True, use_reloader=False)
+    else:
+        app.run(host='0.0.0.0', port=5000, debug=True)
@@ -11,6 +11,11 @@ import tempfile
 import os
 import time
 import sqlite3
+import asyncio
+import socket
+import struct
+import ipaddress
+from dataclasses import replace
 from datetime import datetime, timedelta
 from unittest.mock import Mock, patch
 import sys
@@ -20,7 +25,11 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__)))
 
 from dns_service import (
     RecordType, DNSRecord, DNSQuery, DNSZone, DNSCache, 
-    DNSDatabase, DNSService, dns_service
+    DNSDatabase, DNSService, QueryLogWriter, DNSAnswerCache,
+    ReverseIndex, ip_from_reverse_pointer, ZoneFileParser, parse_ttl,
+    SpaceSavingSketch, DNSWireServer, DNSWireError,
+    build_dns_query, parse_dns_query, read_wire_name, benchmark_dns_server,
+    FLAG_TC, FLAG_AA, RCODE_NXDOMAIN, RCODE_FORMERR, dns_service
 )
 
 class TestRecordType(unittest.TestCase):
@@ -354,6 +363,7 @@ class TestDNSService(unittest.TestCase):
     
     def tearDown(self):
         """Clean up test service."""
+        self.service.close()
         os.unlink(self.temp_db.name)
     
     def test_service_creation(self):
@@ -499,6 +509,864 @@ class TestDNSService(unittest.TestCase):
         deleted_count = self.service.cleanup_cache()
         self.assertGreaterEqual(deleted_count, 0)
 
+class TestZoneIndex(unittest.TestCase):
+    """Test the in-memory zone index."""
+    
+    def setUp(self):
+        """Set up test service."""
+        self.temp_db = tempfile.NamedTemporaryFile(delete=False)
+        self.temp_db.close()
+        self.service = DNSService(self.temp_db.name)
+    
+    def tearDown(self):
+        """Clean up test service."""
+        self.service.close()
+        os.unlink(self.temp_db.name)
+    
+    def test_exact_and_case_insensitive_lookup(self):
+        """Test exact matches ignore case and a trailing dot."""
+        self.service.create_dns_record("Example.com", RecordType.A, "192.168.1.1")
+        self.service.create_dns_record("example.com", RecordType.MX, "mail.example.com", priority=20)
+        self.service.create_dns_record("example.com", RecordType.MX, "mx.example.com", priority=10)
+        
+        index = self.service.get_zone_index()
+        self.assertEqual(index.lookup("EXAMPLE.com.", RecordType.A)[0].value, "192.168.1.1")
+        self.assertEqual([r.value for r in index.lookup("example.com", RecordType.MX)],
+                         ["mx.example.com", "mail.example.com"])
+        self.assertEqual(index.lookup("example.com", RecordType.TXT), [])
+        self.assertEqual(index.lookup("missing.com", RecordType.A), [])
+    
+    def test_wildcard_lookup(self):
+        """Test wildcards answer only for names that do not exist."""
+        self.service.create_dns_record("*.example.com", RecordType.A, "10.0.0.1")
+        self.service.create_dns_record("www.example.com", RecordType.A, "10.0.0.2")
+        self.service.create_dns_record("a.b.example.com", RecordType.A, "10.0.0.3")
+        
+        records = self.service.resolve_domain("anything.example.com", RecordType.A)
+        self.assertEqual(records[0].value, "10.0.0.1")
+        self.assertEqual(records[0].name, "anything.example.com")
+        self.assertEqual(self.service.resolve_domain("www.example.com")[0].value, "10.0.0.2")
+        self.assertEqual(self.service.resolve_domain("deep.name.example.com")[0].value, "10.0.0.1")
+        # b.example.com exists as an empty non-terminal, so the wildcard does not apply
+        self.assertEqual(self.service.resolve_domain("b.example.com"), [])
+    
+    def test_cname_chasing(self):
+        """Test CNAME chains are followed and loops terminate."""
+        self.service.create_dns_record("www.example.com", RecordType.CNAME, "web.example.com")
+        self.service.create_dns_record("web.example.com", RecordType.CNAME, "origin.example.net")
+        self.service.create_dns_record("origin.example.net", RecordType.A, "172.16.0.1")
+        self.service.create_dns_record("loop1.example.com", RecordType.CNAME, "loop2.example.com")
+        self.service.create_dns_record("loop2.example.com", RecordType.CNAME, "loop1.example.com")
+        
+        records = self.service.resolve_domain("www.example.com", RecordType.A)
+        self.assertEqual([r.record_type for r in records],
+                         [RecordType.CNAME, RecordType.CNAME, RecordType.A])
+        self.assertEqual(records[-1].value, "172.16.0.1")
+        
+        cname = self.service.resolve_domain("www.example.com", RecordType.CNAME)
+        self.assertEqual(len(cname), 1)
+        self.assertEqual(len(self.service.resolve_domain("loop1.example.com")), 2)
+    
+    def test_longest_suffix_zone(self):
+        """Test the most specific enclosing zone is found."""
+        self.service.create_dns_zone("example.com", "ns1.example.com", "admin@example.com")
+        self.service.create_dns_zone("sub.example.com", "ns1.sub.example.com", "admin@example.com")
+        
+        index = self.service.get_zone_index()
+        self.assertEqual(index.find_zone("a.b.sub.example.com").name, "sub.example.com")
+        self.assertEqual(index.find_zone("www.example.com").name, "example.com")
+        self.assertIsNone(index.find_zone("example.org"))
+    
+    def test_index_loaded_from_database_and_kept_in_sync(self):
+        """Test the index loads existing records and picks up new ones."""
+        self.service.create_dns_record("old.example.com", RecordType.A, "10.0.0.1")
+        
+        service = DNSService(self.temp_db.name)
+        self.assertFalse(service.zone_index_loaded)
+        self.assertEqual(service.resolve_domain("old.example.com")[0].value, "10.0.0.1")
+        self.assertTrue(service.zone_index_loaded)
+        
+        record = service.create_dns_record("new.example.com", RecordType.A, "10.0.0.2")
+        self.assertEqual(service.resolve_domain("new.example.com")[0].id, record.id)
+        self.assertEqual(service.zone_index.record_count, 2)
+        
+        service.zone_index.remove_record(record)
+        self.assertEqual(service.zone_index.lookup("new.example.com", RecordType.A), [])
+        self.assertEqual(service.zone_index.record_count, 1)
+    
+    def test_reload_swaps_in_complete_index(self):
+        """Test a reload leaves the index in use intact and replaces it whole."""
+        self.service.create_dns_record("www.example.com", RecordType.A, "10.0.0.1")
+        old_index = self.service.get_zone_index()
+        
+        self.service.invalidate_zone_index()
+        self.service.create_dns_record("api.example.com", RecordType.A, "10.0.0.2")
+        new_index = self.service.get_zone_index()
+        
+        self.assertIsNot(new_index, old_index)
+        self.assertEqual(old_index.lookup("www.example.com", RecordType.A)[0].value, "10.0.0.1")
+        self.assertEqual(new_index.lookup("api.example.com", RecordType.A)[0].value, "10.0.0.2")
+        self.assertEqual(new_index.record_count, 2)
+    
+    def test_index_throughput_against_sqlite_cache(self):
+        """Benchmark zone index lookups against the SQLite cache path."""
+        for i in range(1000):
+            self.service.create_dns_record(f"host{i}.example.com", RecordType.A, f"10.0.{i // 256}.{i % 256}")
+        index = self.service.get_zone_index()
+        
+        lookups = 20000
+        start_time = time.time()
+        for i in range(lookups):
+            index.lookup(f"host{i % 1000}.example.com", RecordType.A)
+        index_qps = lookups / (time.time() - start_time)
+        
+        # Previous resolve path: cache lookup, falling back to the records table
+        lookups = 200
+        start_time = time.time()
+        for i in range(lookups):
+            name = f"host{i % 1000}.example.com"
+            if not self.service.db.get_dns_cache(f"{name}:A"):
+                self.service.db.get_dns_records(name, RecordType.A)
+        sqlite_qps = lookups / (time.time() - start_time)
+        
+        self.assertGreater(index_qps, 50000)
+        self.assertGreater(index_qps, sqlite_qps * 10)
+
+class TestQueryLogging(unittest.TestCase):
+    """Test batched background query logging."""
+    
+    def setUp(self):
+        """Set up test service."""
+        self.temp_db = tempfile.NamedTemporaryFile(delete=False)
+        self.temp_db.close()
+        self.service = DNSService(self.temp_db.name)
+        self.service.create_dns_record("example.com", RecordType.A, "192.168.1.1")
+    
+    def tearDown(self):
+        """Clean up test service."""
+        self.service.close()
+        os.unlink(self.temp_db.name)
+    
+    def count_logged_queries(self):
+        """Count rows in the query log table."""
+        conn = sqlite3.connect(self.temp_db.name)
+        count = conn.execute("SELECT COUNT(*) FROM dns_queries").fetchone()[0]
+        conn.close()
+        return count
+    
+    def test_queries_written_in_batches(self):
+        """Test every resolution is logged once the buffer is flushed."""
+        for _ in range(500):
+            self.service.resolve_domain("example.com", RecordType.A)
+        self.service.resolve_domain("missing.com", RecordType.A)
+        self.service.query_log.flush()
+        
+        self.assertEqual(self.count_logged_queries(), 501)
+        self.assertEqual(self.service.query_log.get_stats()['dropped'], 0)
+    
+    def test_background_thread_drains_buffer(self):
+        """Test the writer thread flushes without being asked."""
+        self.service.query_log.flush_interval = 0.05
+        self.service.resolve_domain("example.com", RecordType.A)
+        
+        deadline = time.time() + 5
+        while self.service.query_log.written < 1 and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(self.count_logged_queries(), 1)
+    
+    def test_full_buffer_drops_and_counts(self):
+        """Test backpressure drops new entries instead of blocking."""
+        writer = QueryLogWriter(self.service.db, capacity=10)
+        for i in range(15):
+            writer.log(DNSQuery(query_id=f"q{i}", domain="example.com",
+                                record_type=RecordType.A, client_ip="127.0.0.1"))
+        
+        self.assertEqual(writer.get_stats(), {'buffered': 10, 'written': 0, 'dropped': 5})
+        self.assertEqual(writer.flush(), 10)
+        self.assertEqual(self.count_logged_queries(), 10)
+    
+    def test_resolution_does_not_touch_disk(self):
+        """Test the resolution hot path never opens the database."""
+        self.service.resolve_domain("example.com", RecordType.A)  # Loads the zone index
+        self.service.query_log.stop()
+        
+        with patch('dns_service.sqlite3.connect', side_effect=AssertionError("disk access")):
+            for _ in range(100):
+                records = self.service.resolve_domain("example.com", RecordType.A)
+                self.assertEqual(len(records), 1)
+        
+        self.assertEqual(self.service.query_log.flush(), 100)
+        stats = self.service.get_query_stats()
+        self.assertEqual(stats['total_queries'], 101)
+        self.assertEqual(stats['dropped_query_logs'], 0)
+
+class TestQueryStatsRollups(unittest.TestCase):
+    """Test per-minute query rollups behind get_query_stats."""
+    
+    def setUp(self):
+        """Set up test service."""
+        self.temp_db = tempfile.NamedTemporaryFile(delete=False)
+        self.temp_db.close()
+        self.service = DNSService(self.temp_db.name)
+    
+    def tearDown(self):
+        """Clean up test service."""
+        self.service.close()
+        os.unlink(self.temp_db.name)
+    
+    def make_queries(self, domain, count, timestamp=None, cached=False,
+                     success=True, response_time=0.002):
+        """Build query log entries."""
+        return [DNSQuery(query_id=f"{domain}-{timestamp}-{i}-{cached}", domain=domain,
+                         record_type=RecordType.A, client_ip="127.0.0.1",
+                         timestamp=timestamp or datetime.now(), response_time=response_time,
+                         cached=cached, success=success)
+                for i in range(count)]
+    
+    def test_stats_from_rollups(self):
+        """Test totals, hit rate, latency and top domains."""
+        db = self.service.db
+        db.log_dns_queries(self.make_queries("a.com", 30, cached=True))
+        db.log_dns_queries(self.make_queries("a.com", 10))
+        db.log_dns_queries(self.make_queries("b.com", 20, success=False, response_time=0.5))
+        db.log_dns_query(self.make_queries("c.com", 1)[0])
+        
+        stats = self.service.get_query_stats()
+        self.assertEqual(stats['total_queries'], 61)
+        self.assertEqual(stats['cached_queries'], 30)
+        self.assertAlmostEqual(stats['cache_hit_rate'], 30 / 61 * 100)
+        self.assertAlmostEqual(stats['average_response_time'], 0.002)
+        self.assertEqual(stats['latency_percentiles']['p50'], 0.0025)
+        self.assertEqual(stats['latency_percentiles']['p99'], 0.5)
+        self.assertEqual(stats['top_domains'][:2], [{'domain': 'a.com', 'count': 40},
+                                                    {'domain': 'b.com', 'count': 20}])
+        
+        domain_stats = self.service.get_query_stats(domain="b.com")
+        self.assertEqual(domain_stats['total_queries'], 20)
+        self.assertEqual(domain_stats['average_response_time'], 0.0)
+        self.assertEqual(domain_stats['top_domains'], [])
+    
+    def test_window_excludes_old_minutes(self):
+        """Test only rollups inside the requested window are counted."""
+        old = datetime.now() - timedelta(hours=3)
+        self.service.db.log_dns_queries(self.make_queries("old.com", 5, timestamp=old))
+        self.service.db.log_dns_queries(self.make_queries("new.com", 2))
+        
+        self.assertEqual(self.service.get_query_stats(hours=1)['total_queries'], 2)
+        self.assertEqual(self.service.get_query_stats(hours=24)['total_queries'], 7)
+    
+    def test_compaction_keeps_stats(self):
+        """Test compacting raw logs does not change the statistics."""
+        old = datetime.now() - timedelta(hours=30)
+        self.service.db.log_dns_queries(self.make_queries("old.com", 5, timestamp=old))
+        self.service.db.log_dns_queries(self.make_queries("new.com", 3))
+        
+        self.assertEqual(self.service.compact_query_logs(), 5)
+        conn = sqlite3.connect(self.temp_db.name)
+        remaining = conn.execute("SELECT COUNT(*) FROM dns_queries").fetchone()[0]
+        conn.close()
+        self.assertEqual(remaining, 3)
+        self.assertEqual(self.service.get_query_stats(hours=48)['total_queries'], 8)
+    
+    def test_existing_logs_rolled_up_on_upgrade(self):
+        """Test logs written before the rollup tables existed are counted."""
+        self.service.db.log_dns_queries(self.make_queries("a.com", 4))
+        conn = sqlite3.connect(self.temp_db.name)
+        conn.execute("DROP TABLE dns_query_rollups")
+        conn.execute("DROP TABLE dns_domain_rollups")
+        conn.commit()
+        conn.close()
+        
+        service = DNSService(self.temp_db.name)
+        self.assertEqual(service.get_query_stats()['total_queries'], 4)
+        self.assertEqual(service.get_query_stats(domain="a.com")['total_queries'], 4)
+        service.close()
+    
+    def test_domain_rollups_capped_to_top_domains(self):
+        """Test per-domain rollups are kept only for each minute's top domains and accumulate."""
+        minute = datetime.now().replace(second=30)
+        db = self.service.db
+        db.log_dns_queries(self.make_queries("hot.com", 50, timestamp=minute, response_time=0.5))
+        db.log_dns_queries([query for i in range(300)
+                            for query in self.make_queries(f"rare{i}.com", 1, timestamp=minute)])
+        db.log_dns_queries(self.make_queries("hot.com", 25, timestamp=minute, cached=True))
+        
+        conn = sqlite3.connect(self.temp_db.name)
+        rows = conn.execute("SELECT COUNT(*) FROM dns_domain_rollups").fetchone()[0]
+        conn.close()
+        self.assertLessEqual(rows, 100)
+        
+        hot = self.service.get_query_stats(domain="hot.com")
+        self.assertEqual(hot['total_queries'], 75)
+        self.assertEqual(hot['cached_queries'], 25)
+        self.assertEqual(hot['latency_percentiles']['p50'], 0.5)
+        self.assertEqual(self.service.get_query_stats()['total_queries'], 375)
+    
+    def test_space_saving_sketch(self):
+        """Test heavy hitters survive eviction by many rare keys."""
+        sketch = SpaceSavingSketch(capacity=10)
+        for i in range(1000):
+            sketch.add("hot.com")
+            sketch.add(f"rare{i}.com")
+        
+        self.assertEqual(len(sketch.counts), 10)
+        self.assertEqual(sketch.top(1)[0][0], "hot.com")
+        self.assertGreaterEqual(sketch.top(1)[0][1], 1000)
+    
+    def test_stats_latency_independent_of_log_volume(self):
+        """Test stats are answered from rollups, not by scanning logs."""
+        for i in range(50):
+            self.service.db.log_dns_queries(self.make_queries(f"domain{i}.com", 1000))
+        
+        start_time = time.time()
+        stats = self.service.get_query_stats()
+        elapsed = time.time() - start_time
+        
+        self.assertEqual(stats['total_queries'], 50000)
+        self.assertEqual(len(stats['top_domains']), 10)
+        self.assertLess(elapsed, 0.05)
+
+class TestAnswerCache(unittest.TestCase):
+    """Test TTL-respecting positive and negative answer caching."""
+    
+    def setUp(self):
+        """Set up test service."""
+        self.temp_db = tempfile.NamedTemporaryFile(delete=False)
+        self.temp_db.close()
+        self.service = DNSService(self.temp_db.name)
+        zone = self.service.create_dns_zone("example.com", "ns1.example.com", "admin@example.com")
+        zone.minimum_ttl = 60
+        self.service.db.save_dns_zone(zone)
+        self.service.create_dns_record("example.com", RecordType.A, "192.168.1.1", ttl=600)
+        self.service.create_dns_record("example.com", RecordType.A, "192.168.1.2", ttl=120)
+    
+    def tearDown(self):
+        """Clean up test service."""
+        self.service.close()
+        os.unlink(self.temp_db.name)
+    
+    def test_positive_answer_uses_smallest_record_ttl(self):
+        """Test positive entries expire with their shortest-lived record."""
+        entry = self.service.resolve_answer("example.com", RecordType.A)
+        
+        self.assertEqual(entry.ttl, 120)
+        self.assertAlmostEqual((entry.expires_at - datetime.now()).total_seconds(), 120, delta=2)
+        self.assertIs(self.service.lookup_answer("example.com", RecordType.A)[0], entry)
+    
+    def test_negative_answers_use_soa_minimum(self):
+        """Test NXDOMAIN and NODATA are cached with the zone's minimum TTL."""
+        nxdomain = self.service.resolve_answer("missing.example.com", RecordType.A)
+        nodata = self.service.resolve_answer("example.com", RecordType.MX)
+        outside = self.service.resolve_answer("example.org", RecordType.A)
+        
+        self.assertTrue(nxdomain.nxdomain)
+        self.assertEqual(nxdomain.ttl, 60)
+        self.assertFalse(nodata.nxdomain)
+        self.assertEqual(nodata.records, [])
+        self.assertEqual(nodata.ttl, 60)
+        self.assertEqual(outside.ttl, self.service.cache_ttl)
+    
+    def test_repeated_misses_do_not_reach_index(self):
+        """Test lookups of a missing name are answered from the negative cache."""
+        index = self.service.get_zone_index()
+        with patch.object(index, 'lookup', wraps=index.lookup) as lookup:
+            for _ in range(100):
+                self.assertEqual(self.service.resolve_domain("missing.example.com"), [])
+        self.assertEqual(lookup.call_count, 1)
+    
+    def test_new_record_invalidates_negative_entry(self):
+        """Test creating a record replaces a cached negative answer."""
+        self.assertEqual(self.service.resolve_domain("new.example.com"), [])
+        self.service.create_dns_record("new.example.com", RecordType.A, "10.0.0.1")
+        self.assertEqual(self.service.resolve_domain("new.example.com")[0].value, "10.0.0.1")
+    
+    def test_expired_entries_are_refreshed(self):
+        """Test an entry past its TTL is looked up again."""
+        entry = self.service.resolve_answer("example.com", RecordType.A)
+        entry.expires_at = datetime.now() - timedelta(seconds=1)
+        
+        entry2, cached = self.service.lookup_answer("example.com", RecordType.A)
+        self.assertFalse(cached)
+        self.assertIsNot(entry2, entry)
+    
+    def test_lru_bound(self):
+        """Test the cache evicts least recently used entries beyond capacity."""
+        cache = DNSAnswerCache(capacity=10)
+        for i in range(20):
+            cache.put(DNSCache(key=f"name{i}:A", records=[], ttl=60,
+                               expires_at=datetime.now() + timedelta(seconds=60)))
+            cache.get("name0:A")  # Keep one entry hot
+        
+        self.assertEqual(len(cache), 10)
+        self.assertIsNotNone(cache.get("name0:A"))
+        self.assertIsNone(cache.get("name1:A"))
+        self.assertIsNotNone(cache.get("name19:A"))
+    
+    def test_popular_entries_prefetched_before_expiry(self):
+        """Test only popular entries are refreshed near the end of their TTL."""
+        self.service.create_dns_record("rare.example.com", RecordType.A, "10.0.0.2", ttl=100)
+        popular = self.service.resolve_answer("example.com", RecordType.A)
+        rare = self.service.resolve_answer("rare.example.com", RecordType.A)
+        for _ in range(5):
+            self.service.resolve_domain("example.com")
+        for entry in (popular, rare):
+            entry.expires_at = datetime.now() + timedelta(seconds=entry.ttl * 0.05)
+        
+        refreshed, cached = self.service.lookup_answer("example.com", RecordType.A)
+        self.assertTrue(cached)
+        self.assertIsNot(refreshed, popular)
+        self.assertGreater(refreshed.expires_at, popular.expires_at)
+        self.assertIs(self.service.lookup_answer("rare.example.com", RecordType.A)[0], rare)
+
+class TestReverseIndex(unittest.TestCase):
+    """Test reverse lookups and CIDR range queries."""
+    
+    def setUp(self):
+        """Set up test service."""
+        self.temp_db = tempfile.NamedTemporaryFile(delete=False)
+        self.temp_db.close()
+        self.service = DNSService(self.temp_db.name)
+    
+    def tearDown(self):
+        """Clean up test service."""
+        self.service.close()
+        os.unlink(self.temp_db.name)
+    
+    def test_reverse_pointer_parsing(self):
+        """Test in-addr.arpa, ip6.arpa and bare addresses are understood."""
+        self.assertEqual(str(ip_from_reverse_pointer("1.1.168.192.in-addr.arpa.")), "192.168.1.1")
+        ip6 = ip_from_reverse_pointer(
+            "1.0.0.0.0.0.0.0.0.0.0.0.0.0.0.0.0.0.0.0.0.0.0.0.8.b.d.0.1.0.0.2.ip6.arpa")
+        self.assertEqual(str(ip6), "2001:db8::1")
+        self.assertEqual(str(ip_from_reverse_pointer("10.0.0.1")), "10.0.0.1")
+        self.assertIsNone(ip_from_reverse_pointer("168.192.in-addr.arpa"))
+        self.assertIsNone(ip_from_reverse_pointer("example.com"))
+    
+    def test_ptr_records_preferred(self):
+        """Test explicit PTR records answer reverse lookups by IP or arpa name."""
+        self.service.create_dns_record("1.1.168.192.in-addr.arpa", RecordType.PTR, "example.com")
+        self.service.create_dns_record("www.example.com", RecordType.A, "192.168.1.1")
+        
+        for query in ("192.168.1.1", "1.1.168.192.in-addr.arpa"):
+            records = self.service.reverse_dns_lookup(query)
+            self.assertEqual([r.value for r in records], ["example.com"])
+        self.assertEqual(self.service.reverse_dns_lookup("not-an-ip"), [])
+    
+    def test_ptr_synthesized_from_forward_records(self):
+        """Test A and AAAA records answer reverse lookups without PTRs."""
+        self.service.create_dns_record("host.example.com", RecordType.A, "10.1.2.3")
+        self.service.create_dns_record("v6.example.com", RecordType.AAAA, "2001:db8::1")
+        self.service.create_dns_record("bad.example.com", RecordType.A, "invalid-ip")
+        
+        records = self.service.reverse_dns_lookup("10.1.2.3")
+        self.assertEqual(records[0].record_type, RecordType.PTR)
+        self.assertEqual(records[0].name, "3.2.1.10.in-addr.arpa")
+        self.assertEqual(records[0].value, "host.example.com")
+        self.assertEqual(self.service.reverse_dns_lookup("2001:0db8::0001")[0].value, "v6.example.com")
+    
+    def test_cidr_queries(self):
+        """Test range queries on byte and partial-byte prefixes."""
+        self.service.create_dns_record("a.example.com", RecordType.A, "10.1.0.5")
+        self.service.create_dns_record("b.example.com", RecordType.A, "10.1.15.9")
+        self.service.create_dns_record("c.example.com", RecordType.A, "10.1.16.1")
+        self.service.create_dns_record("d.example.com", RecordType.A, "10.2.0.1")
+        self.service.create_dns_record("v6.example.com", RecordType.AAAA, "2001:db8::1")
+        
+        self.assertEqual(self.service.get_names_in_network("10.1.0.0/16"), {
+            "10.1.0.5": ["a.example.com"],
+            "10.1.15.9": ["b.example.com"],
+            "10.1.16.1": ["c.example.com"]
+        })
+        self.assertEqual(set(self.service.get_names_in_network("10.1.0.0/20")),
+                         {"10.1.0.5", "10.1.15.9"})
+        self.assertEqual(len(self.service.get_names_in_network("0.0.0.0/0")), 4)
+        self.assertEqual(self.service.get_names_in_network("2001:db8::/64"),
+                         {"2001:db8::1": ["v6.example.com"]})
+        self.assertEqual(self.service.get_names_in_network("not a network"), {})
+    
+    def test_changed_record_moves_in_reverse_index(self):
+        """Test re-saving a record with a new address updates the reverse index."""
+        record = self.service.create_dns_record("host.example.com", RecordType.A, "10.0.0.1")
+        index = self.service.get_zone_index()
+        index.add_record(replace(record, value="10.0.0.2"))
+        
+        self.assertEqual(self.service.reverse_dns_lookup("10.0.0.1"), [])
+        self.assertEqual(self.service.reverse_dns_lookup("10.0.0.2")[0].value, "host.example.com")
+    
+    def test_reverse_lookup_throughput(self):
+        """Test reverse lookups stay fast with many addresses indexed."""
+        reverse = ReverseIndex()
+        for i in range(50000):
+            reverse.add(DNSRecord(id=str(i), name=f"host{i}.example.com", record_type=RecordType.A,
+                                  value=f"10.{i >> 16}.{(i >> 8) & 0xFF}.{i & 0xFF}"))
+        addresses = [ipaddress.ip_address(f"10.0.{(i >> 8) & 0xFF}.{i & 0xFF}") for i in range(50000)]
+        
+        start_time = time.time()
+        for address in addresses:
+            reverse.lookup(address)
+        elapsed = time.time() - start_time
+        
+        self.assertEqual(len(reverse.lookup_network(ipaddress.ip_network("10.0.0.0/16"))), 50000)
+        self.assertLess(elapsed, 1.0)
+
+ZONE_FILE = """\
+$ORIGIN example.com.
+$TTL 1h
+@       IN SOA ns1 hostmaster (
+            2024010101 ; serial
+            3h 15m 1w 300 )
+        IN NS ns1
+        IN MX 10 mail
+ns1     IN A 10.0.0.53
+www 300 IN A 10.0.0.1
+mail    IN A 10.0.0.25
+ftp     IN CNAME www
+txt     IN TXT "hello; world" "again"
+_sip._tcp IN SRV 10 5 5060 sip.example.org.
+odd     IN HINFO "cpu" "os"
+"""
+
+class TestZoneTransfer(unittest.TestCase):
+    """Test zone file import/export and journaled incremental transfers."""
+    
+    def setUp(self):
+        """Set up primary and replica services."""
+        self.temp_dbs = []
+        self.primary = self.make_service()
+        self.replica = self.make_service()
+    
+    def tearDown(self):
+        """Clean up test services."""
+        for service in (self.primary, self.replica):
+            service.close()
+        for path in self.temp_dbs:
+            os.unlink(path)
+    
+    def make_service(self):
+        """Create a service on a fresh database."""
+        temp_db = tempfile.NamedTemporaryFile(delete=False)
+        temp_db.close()
+        self.temp_dbs.append(temp_db.name)
+        return DNSService(temp_db.name)
+    
+    def zone_contents(self, service, zone_name="example.com"):
+        """Get a zone's records as comparable tuples."""
+        return sorted((r.name, r.record_type.value, r.value, r.ttl, r.priority)
+                      for r in service.db.iter_zone_records(zone_name))
+    
+    def test_parse_zone_file(self):
+        """Test directives, relative names, multi-line SOA and quoting."""
+        parser = ZoneFileParser("example.com")
+        records = {(r.name, r.record_type): r for r in parser.parse(ZONE_FILE.splitlines())}
+        
+        soa = records[("example.com", RecordType.SOA)]
+        self.assertEqual(soa.value, "ns1.example.com hostmaster.example.com 2024010101 10800 900 604800 300")
+        self.assertEqual(records[("example.com", RecordType.MX)].priority, 10)
+        self.assertEqual(records[("example.com", RecordType.MX)].value, "mail.example.com")
+        self.assertEqual(records[("www.example.com", RecordType.A)].ttl, 300)
+        self.assertEqual(records[("mail.example.com", RecordType.A)].ttl, 3600)
+        self.assertEqual(records[("ftp.example.com", RecordType.CNAME)].value, "www.example.com")
+        self.assertEqual(records[("txt.example.com", RecordType.TXT)].value, "hello; worldagain")
+        srv = records[("_sip._tcp.example.com", RecordType.SRV)]
+        self.assertEqual((srv.priority, srv.weight, srv.port, srv.value), (10, 5, 5060, "sip.example.org"))
+        self.assertEqual(parser.skipped, 1)  # HINFO
+        self.assertEqual(parse_ttl("1h30m"), 5400)
+    
+    def test_import_creates_zone_and_serves_records(self):
+        """Test importing a zone file creates the zone from its SOA."""
+        result = self.primary.import_zone_file("example.com", ZONE_FILE.splitlines())
+        
+        self.assertEqual(result['added'], 8)
+        self.assertEqual(result['deleted'], 0)
+        self.assertEqual(result['skipped'], 1)
+        self.assertEqual(result['serial'], 2024010101)
+        zone = self.primary.get_dns_zone("example.com")
+        self.assertEqual((zone.primary_ns, zone.admin_email, zone.minimum_ttl),
+                         ("ns1.example.com", "hostmaster@example.com", 300))
+        records = self.primary.resolve_domain("ftp.example.com", RecordType.A)
+        self.assertEqual(records[-1].value, "10.0.0.1")
+    
+    def test_reimport_journals_only_differences(self):
+        """Test re-importing keeps unchanged records and journals the delta."""
+        self.primary.import_zone_file("example.com", ZONE_FILE.splitlines())
+        changed = ZONE_FILE.replace("www 300 IN A 10.0.0.1", "www 300 IN A 10.0.0.2")
+        result = self.primary.import_zone_file("example.com", changed.splitlines())
+        
+        self.assertEqual((result['added'], result['deleted']), (1, 1))
+        self.assertEqual(result['serial'], 2024010102)
+        transfer = self.primary.get_zone_changes("example.com", 2024010101)
+        self.assertFalse(transfer['full'])
+        self.assertEqual(len(transfer['changes']), 1)
+        change = transfer['changes'][0]
+        self.assertEqual([r['value'] for r in change['deleted']], ["10.0.0.1"])
+        self.assertEqual([r['value'] for r in change['added']], ["10.0.0.2"])
+        self.assertEqual(self.primary.get_zone_changes("example.com", 2024010102)['changes'], [])
+    
+    def test_created_records_bump_serial(self):
+        """Test single records created in a zone are journaled."""
+        zone = self.primary.create_dns_zone("example.com", "ns1.example.com", "admin@example.com")
+        self.primary.create_dns_record("a.example.com", RecordType.A, "10.0.0.1")
+        self.primary.create_dns_record("b.example.com", RecordType.A, "10.0.0.2")
+        self.primary.create_dns_record("other.org", RecordType.A, "10.0.0.3")
+        
+        self.assertEqual(self.primary.get_dns_zone("example.com").serial, 3)
+        transfer = self.primary.get_zone_changes("example.com", 1)
+        self.assertEqual([c['serial'] for c in transfer['changes']], [2, 3])
+        self.assertEqual(transfer['changes'][1]['added'][0]['name'], "b.example.com")
+    
+    def test_replica_pulls_full_then_incremental(self):
+        """Test a replica syncs with a full transfer and then only deltas."""
+        self.primary.import_zone_file("example.com", ZONE_FILE.splitlines())
+        
+        full = self.primary.get_zone_changes("example.com", 0)
+        self.assertTrue(full['full'])
+        self.assertTrue(self.replica.apply_zone_changes(full))
+        self.assertEqual(self.zone_contents(self.replica), self.zone_contents(self.primary))
+        
+        changed = ZONE_FILE.replace("mail    IN A 10.0.0.25\n", "")
+        self.primary.import_zone_file("example.com", changed.splitlines())
+        self.primary.create_dns_record("new.example.com", RecordType.A, "10.0.0.9")
+        serial = self.replica.get_dns_zone("example.com").serial
+        delta = self.primary.get_zone_changes("example.com", serial)
+        
+        self.assertFalse(delta['full'])
+        self.assertEqual(len(delta['changes']), 2)
+        self.assertTrue(self.replica.apply_zone_changes(delta))
+        self.assertEqual(self.zone_contents(self.replica), self.zone_contents(self.primary))
+        self.assertEqual(self.replica.get_dns_zone("example.com").serial, delta['serial'])
+        self.assertEqual(self.replica.resolve_domain("mail.example.com"), [])
+        self.assertEqual(self.replica.resolve_domain("new.example.com")[0].value, "10.0.0.9")
+    
+    def test_trimmed_journal_falls_back_to_full(self):
+        """Test a replica older than the journal gets the whole zone."""
+        self.primary.create_dns_zone("example.com", "ns1.example.com", "admin@example.com")
+        for i in range(3):
+            self.primary.create_dns_record(f"h{i}.example.com", RecordType.A, f"10.0.0.{i}")
+        self.primary.db.trim_zone_journal("example.com", 3)
+        
+        self.assertTrue(self.primary.get_zone_changes("example.com", 1)['full'])
+        self.assertFalse(self.primary.get_zone_changes("example.com", 2)['full'])
+    
+    def test_subzone_records_survive_parent_import(self):
+        """Test importing a parent zone leaves delegated child zones alone."""
+        self.primary.create_dns_zone("sub.example.com", "ns1.sub.example.com", "admin@example.com")
+        self.primary.create_dns_record("www.sub.example.com", RecordType.A, "10.1.0.1")
+        self.primary.import_zone_file("example.com", ZONE_FILE.splitlines())
+        
+        self.assertEqual(self.primary.resolve_domain("www.sub.example.com")[0].value, "10.1.0.1")
+    
+    def test_export_round_trip(self):
+        """Test an exported zone imports to the same records elsewhere."""
+        self.primary.import_zone_file("example.com", ZONE_FILE.splitlines())
+        exported = list(self.primary.export_zone_file("example.com"))
+        
+        self.assertTrue(exported[2].startswith("example.com. 300 IN SOA ns1.example.com."))
+        result = self.replica.import_zone_file("example.com", exported)
+        self.assertEqual(result['skipped'], 0)
+        self.assertEqual(self.zone_contents(self.replica), self.zone_contents(self.primary))
+    
+    def test_import_ignores_like_wildcards_in_zone_names(self):
+        """Test '_' in a zone name does not match other zones' records."""
+        self.primary.create_dns_zone("axb.com", "ns1.axb.com", "admin@axb.com")
+        self.primary.create_dns_record("www.axb.com", RecordType.A, "10.2.0.1")
+        self.primary.import_zone_file("a_b.com", ["$ORIGIN a_b.com.",
+                                                  "@ 300 IN SOA ns1.a_b.com. admin.a_b.com. 1 3600 900 604800 300",
+                                                  "www 300 IN A 10.3.0.1"])
+        
+        self.assertEqual(self.primary.resolve_domain("www.axb.com")[0].value, "10.2.0.1")
+        self.assertEqual(self.primary.resolve_domain("www.a_b.com")[0].value, "10.3.0.1")
+    
+    def test_export_long_txt_with_escapes(self):
+        """Test TXT values split across strings keep their escapes intact."""
+        value = "a" * 254 + '"quoted\\path"' + "b" * 300
+        self.primary.import_zone_file("example.com", ZONE_FILE.splitlines())
+        self.primary.create_dns_record("long.example.com", RecordType.TXT, value)
+        
+        self.replica.import_zone_file("example.com", list(self.primary.export_zone_file("example.com")))
+        self.assertEqual(self.replica.resolve_domain("long.example.com", RecordType.TXT)[0].value, value)
+    
+    def test_zone_api(self):
+        """Test the import, export and IXFR endpoints."""
+        with patch('dns_service.dns_service', self.primary):
+            from dns_service import app
+            client = app.test_client()
+            response = client.post('/api/zones/example.com/import', data=ZONE_FILE)
+            self.assertEqual(response.get_json()['added'], 8)
+            
+            response = client.get('/api/zones/example.com/export')
+            self.assertIn("www.example.com. 300 IN A 10.0.0.1", response.get_data(as_text=True))
+            response = client.get('/api/zones/example.com/ixfr?serial=0')
+            self.assertTrue(response.get_json()['full'])
+            self.assertEqual(client.get('/api/zones/missing.com/ixfr').status_code, 404)
+    
+    def test_bulk_import_performance(self):
+        """Test a hundred thousand records import in one pass."""
+        def zone_lines():
+            yield "$ORIGIN big.com."
+            yield "@ 3600 IN SOA ns1 hostmaster 1 3600 900 604800 300"
+            for i in range(100000):
+                yield f"host{i} 3600 IN A 10.{i >> 16}.{(i >> 8) & 0xFF}.{i & 0xFF}"
+        
+        start_time = time.time()
+        result = self.primary.import_zone_file("big.com", zone_lines())
+        elapsed = time.time() - start_time
+        
+        self.assertEqual(result['added'], 100000)
+        self.assertEqual(self.primary.resolve_domain("host99999.big.com")[0].value, "10.1.134.159")
+        self.assertLess(elapsed, 30.0)
+
+def parse_dns_response(data):
+    """Decode a wire-format response into header fields and answer records."""
+    message_id, flags, qdcount, ancount, nscount, arcount = struct.unpack('!6H', data[:12])
+    _, offset = read_wire_name(data, 12)
+    offset += 4
+    records = []
+    for _ in range(ancount + nscount):
+        name, offset = read_wire_name(data, offset)
+        rtype, _, ttl, rdlength = struct.unpack('!HHIH', data[offset:offset + 10])
+        offset += 10
+        records.append((name, rtype, ttl, data[offset:offset + rdlength], offset))
+        offset += rdlength
+    return {'id': message_id, 'flags': flags, 'rcode': flags & 0xF, 'ancount': ancount,
+            'nscount': nscount, 'arcount': arcount, 'records': records}
+
+class TestDNSWireProtocol(unittest.TestCase):
+    """Test the UDP/TCP wire-format frontend."""
+    
+    def setUp(self):
+        """Set up test service with some records."""
+        self.temp_db = tempfile.NamedTemporaryFile(delete=False)
+        self.temp_db.close()
+        self.service = DNSService(self.temp_db.name)
+        self.service.create_dns_zone("example.com", "ns1.example.com", "admin@example.com")
+        self.service.create_dns_record("example.com", RecordType.A, "192.168.1.1", ttl=600)
+        self.service.create_dns_record("www.example.com", RecordType.CNAME, "example.com")
+        self.service.create_dns_record("example.com", RecordType.MX, "mail.example.com", priority=10)
+        self.service.create_dns_record("v6.example.com", RecordType.AAAA, "2001:db8::1")
+        for i in range(10):
+            self.service.create_dns_record("big.example.com", RecordType.TXT, "x" * 200 + str(i))
+    
+    def tearDown(self):
+        """Clean up test service."""
+        self.service.close()
+        os.unlink(self.temp_db.name)
+    
+    async def _udp_exchange(self, server, message):
+        """Send one UDP query and wait for the reply."""
+        loop = asyncio.get_running_loop()
+        reply = loop.create_future()
+        
+        class Client(asyncio.DatagramProtocol):
+            def datagram_received(self, data, addr):
+                if not reply.done():
+                    reply.set_result(data)
+        
+        transport, _ = await loop.create_datagram_endpoint(
+            Client, remote_addr=(server.host, server.port))
+        try:
+            transport.sendto(message)
+            return await asyncio.wait_for(reply, 2.0)
+        finally:
+            transport.close()
+    
+    async def _tcp_exchange(self, server, message):
+        """Send one length-prefixed TCP query and read the reply."""
+        reader, writer = await asyncio.open_connection(server.host, server.port)
+        try:
+            writer.write(struct.pack('!H', len(message)) + message)
+            await writer.drain()
+            (length,) = struct.unpack('!H', await reader.readexactly(2))
+            return await reader.readexactly(length)
+        finally:
+            writer.close()
+    
+    def exchange(self, *messages, tcp=False):
+        """Start a server on an ephemeral port and exchange the given queries."""
+        async def run():
+            async with DNSWireServer(self.service, port=0) as server:
+                send = self._tcp_exchange if tcp else self._udp_exchange
+                return [await send(server, message) for message in messages]
+        return [parse_dns_response(reply) for reply in asyncio.run(run())]
+    
+    def test_query_round_trip(self):
+        """Test building and parsing a query with EDNS0."""
+        query = parse_dns_query(build_dns_query("Example.com", 15, 4242, edns_payload_size=1232))
+        self.assertEqual((query.message_id, query.name, query.qtype), (4242, "Example.com", 15))
+        self.assertTrue(query.edns)
+        self.assertEqual(query.udp_payload_size, 1232)
+        
+        self.assertRaises(DNSWireError, parse_dns_query, b"\x00\x01")
+        self.assertRaises(DNSWireError, parse_dns_query, b"\x00" * 12)
+    
+    def test_compressed_names(self):
+        """Test compression pointers are followed and loops rejected."""
+        data = b"\x07example\x03com\x00\x03www\xc0\x00"
+        self.assertEqual(read_wire_name(data, 13), ("www.example.com", 19))
+        self.assertRaises(DNSWireError, read_wire_name, b"\xc0\x00", 0)
+    
+    def test_udp_answers(self):
+        """Test A, CNAME chasing, MX and AAAA answers over UDP."""
+        a, cname, mx, aaaa = self.exchange(
+            build_dns_query("example.com", 1, 1),
+            build_dns_query("www.example.com", 1, 2),
+            build_dns_query("example.com", 15, 3),
+            build_dns_query("v6.example.com", 28, 4))
+        
+        self.assertEqual(a['id'], 1)
+        self.assertTrue(a['flags'] & FLAG_AA)
+        self.assertEqual(a['records'][0][1:4], (1, 600, socket.inet_aton("192.168.1.1")))
+        self.assertEqual([r[1] for r in cname['records']], [5, 1])
+        self.assertEqual(mx['records'][0][3][:2], b"\x00\x0a")
+        self.assertEqual(aaaa['records'][0][3], socket.inet_pton(socket.AF_INET6, "2001:db8::1"))
+    
+    def test_negative_answers_carry_soa(self):
+        """Test NXDOMAIN and NODATA responses include the zone SOA."""
+        nxdomain, nodata = self.exchange(build_dns_query("missing.example.com", 1, 5),
+                                         build_dns_query("example.com", 16, 6))
+        
+        self.assertEqual(nxdomain['rcode'], RCODE_NXDOMAIN)
+        self.assertEqual(nxdomain['nscount'], 1)
+        self.assertEqual(nxdomain['records'][0][:2], ("example.com", 6))
+        self.assertEqual(nodata['rcode'], 0)
+        self.assertEqual(nodata['ancount'], 0)
+        self.assertEqual(nodata['nscount'], 1)
+    
+    def test_truncation_and_tcp_fallback(self):
+        """Test large answers are truncated over UDP but complete over TCP or EDNS0."""
+        plain, edns = self.exchange(build_dns_query("big.example.com", 16, 7),
+                                    build_dns_query("big.example.com", 16, 8, edns_payload_size=4096))
+        (tcp,) = self.exchange(build_dns_query("big.example.com", 16, 9), tcp=True)
+        
+        self.assertTrue(plain['flags'] & FLAG_TC)
+        self.assertEqual(plain['ancount'], 0)
+        self.assertFalse(edns['flags'] & FLAG_TC)
+        self.assertEqual(edns['ancount'], 10)
+        self.assertEqual(edns['arcount'], 1)
+        self.assertFalse(tcp['flags'] & FLAG_TC)
+        self.assertEqual(tcp['ancount'], 10)
+    
+    def test_malformed_query(self):
+        """Test a malformed query gets FORMERR with its id."""
+        server = DNSWireServer(self.service)
+        reply = server.handle_message(struct.pack('!6H', 77, 0, 2, 0, 0, 0), "127.0.0.1")
+        message_id, flags = struct.unpack('!HH', reply[:4])
+        self.assertEqual(message_id, 77)
+        self.assertEqual(flags & 0xF, RCODE_FORMERR)
+        self.assertIsNone(server.handle_message(b"\x00", "127.0.0.1"))
+    
+    def test_benchmark_client(self):
+        """Test the bundled benchmark client against a local server."""
+        async def run():
+            async with DNSWireServer(self.service, port=0) as server:
+                return await benchmark_dns_server(server.host, server.port,
+                                                  ["example.com", "www.example.com"],
+                                                  queries=2000, concurrency=50)
+        result = asyncio.run(run())
+        
+        self.assertEqual(result['answered'], 2000)
+        self.assertEqual(result['timeouts'], 0)
+        self.assertGreater(result['qps'], 1000)
+
 class TestFlaskApp(unittest.TestCase):
     """Test Flask application."""
     
@@ -518,6 +1386,7 @@ class TestFlaskApp(unittest.TestCase):
     
     def tearDown(self):
         """Clean up test database."""
+        self.test_service.close()
         os.unlink(self.temp_db.name)
     
     def test_index_page(self):
@@ -628,6 +1497,7 @@ class TestErrorHandling(unittest.TestCase):
     
     def tearDown(self):
         """Clean up test database."""
+        self.service.close()
         os.unlink(self.temp_db.name)
     
     def test_database_error_handling_save_dns_record(self):
@@ -953,6 +1823,7 @@ class TestPerformance(unittest.TestCase):
     
     def tearDown(self):
         """Clean up test database."""
+        self.service.close()
         os.unlink(self.temp_db.name)
     
     def test_dns_record_creation_performance(self):
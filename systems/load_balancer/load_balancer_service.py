@@ -10,6 +10,7 @@ A comprehensive load balancing system with features like:
 - Rate limiting
 - Circuit breaker pattern
 - Metrics collection
+- Pooled keep-alive backend connections and an asyncio streaming forwarder
 """
 
 import os
@@ -19,18 +20,28 @@ import random
 import hashlib
 import logging
 import threading
+import asyncio
+import argparse
 from datetime import datetime, timedelta
-from typing import List, Dict, Optional, Tuple
+from typing import List, Dict, Optional, Tuple, AsyncIterator
 from dataclasses import dataclass, asdict
 from flask import Flask, request, jsonify, render_template_string
 import requests
+from requests.adapters import HTTPAdapter
 from collections import defaultdict, deque
+from http.cookies import SimpleCookie, CookieError
 import statistics
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Headers that describe a single connection and are not forwarded
+HOP_BY_HOP_HEADERS = {
+    'connection', 'keep-alive', 'proxy-authenticate', 'proxy-authorization', 'proxy-connection',
+    'te', 'trailer', 'trailers', 'transfer-encoding', 'upgrade'
+}
+
 @dataclass
 class BackendServer:
     """Backend server configuration."""
@@ -79,6 +90,9 @@ class LoadBalancerConfig:
     ssl_termination: bool = False
     ssl_cert_path: str = ""
     ssl_key_path: str = ""
+    # Backend connection pools; each backend's max_connections caps its open connections
+    max_idle_connections: int = 10  # per backend, kept open between requests
+    idle_connection_timeout: float = 30.0  # seconds before an idle connection is dropped
 
 @dataclass
 class RequestMetrics:
@@ -172,13 +186,26 @@ class CircuitBreaker:
         self.last_failure_time = None
         self.state = "CLOSED"  # CLOSED, OPEN, HALF_OPEN
     
-    def call(self, func, *args, **kwargs):
-        """Execute function with circuit breaker protection."""
+    def allow_request(self) -> bool:
+        """Check whether a call may go through, half-opening after the recovery timeout."""
         if self.state == "OPEN":
             if self._should_attempt_reset():
                 self.state = "HALF_OPEN"
             else:
-                raise Exception("Circuit breaker is OPEN")
+                return False
+        return True
+    
+    def record_result(self, success: bool):
+        """Record the outcome of a call made after allow_request."""
+        if success:
+            self._on_success()
+        else:
+            self._on_failure()
+    
+    def call(self, func, *args, **kwargs):
+        """Execute function with circuit breaker protection."""
+        if not self.allow_request():
+            raise Exception("Circuit breaker is OPEN")
         
         try:
             result = func(*args, **kwargs)
@@ -249,10 +276,15 @@ class LoadBalancer:
         self.session_storage: Dict[str, str] = {}  # session_id -> server_id
         self.metrics: List[RequestMetrics] = []
         self.metrics_lock = threading.Lock()
+        # Per-backend keep-alive sessions, and slots capping concurrent requests to each
+        self.sessions: Dict[str, requests.Session] = {}
+        self.connection_slots: Dict[str, threading.BoundedSemaphore] = {}
+        self.pool_lock = threading.Lock()
     
     def add_server(self, server: BackendServer):
         """Add a backend server."""
         self.servers.append(server)
+        self._close_session(server.server_id)
         if self.config.circuit_breaker_enabled:
             self.circuit_breakers[server.server_id] = CircuitBreaker(
                 self.config.circuit_breaker_failure_threshold,
@@ -265,8 +297,34 @@ class LoadBalancer:
         self.servers = [s for s in self.servers if s.server_id != server_id]
         if server_id in self.circuit_breakers:
             del self.circuit_breakers[server_id]
+        self._close_session(server_id)
         logger.info(f"Removed server: {server_id}")
     
+    def get_session(self, server: BackendServer) -> Tuple[requests.Session, threading.BoundedSemaphore]:
+        """Get a backend's pooled keep-alive session and its connection slots."""
+        with self.pool_lock:
+            session = self.sessions.get(server.server_id)
+            if session is None:
+                session = requests.Session()
+                # Connections beyond the idle limit are closed after use instead of pooled
+                adapter = HTTPAdapter(pool_connections=1,
+                                      pool_maxsize=self.config.max_idle_connections,
+                                      max_retries=0)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                self.sessions[server.server_id] = session
+                self.connection_slots[server.server_id] = threading.BoundedSemaphore(
+                    max(1, server.max_connections))
+            return session, self.connection_slots[server.server_id]
+    
+    def _close_session(self, server_id: str):
+        """Close a backend's pooled connections."""
+        with self.pool_lock:
+            session = self.sessions.pop(server_id, None)
+            self.connection_slots.pop(server_id, None)
+        if session is not None:
+            session.close()
+    
     def get_healthy_servers(self) -> List[BackendServer]:
         """Get list of healthy servers."""
         return [s for s in self.servers if s.is_healthy]
@@ -378,8 +436,11 @@ class LoadBalancer:
     
     def _make_request(self, server: BackendServer, method: str, path: str, 
                      headers: Dict, data: bytes = None) -> Tuple[int, Dict, bytes]:
-        """Make actual request to backend server."""
+        """Make actual request to backend server over its pooled keep-alive connections."""
         start_time = time.time()
+        session, slots = self.get_session(server)
+        if not slots.acquire(timeout=server.timeout):
+            return 503, {"Content-Type": "application/json"}, b'{"error": "Backend connection limit reached"}'
         
         try:
             # Update connection count
@@ -388,12 +449,13 @@ class LoadBalancer:
             
             # Prepare request
             url = f"{server.url}{path}"
-            request_headers = dict(headers)
+            request_headers = {name: value for name, value in headers.items()
+                               if name.lower() not in HOP_BY_HOP_HEADERS}
             request_headers['X-Forwarded-For'] = headers.get('X-Forwarded-For', 'unknown')
             request_headers['X-Forwarded-Proto'] = 'http'
             
             # Make request
-            response = requests.request(
+            response = session.request(
                 method=method,
                 url=url,
                 headers=request_headers,
@@ -427,6 +489,7 @@ class LoadBalancer:
         finally:
             # Update connection count
             server.active_connections = max(0, server.active_connections - 1)
+            slots.release()
     
     def _record_metrics(self, client_ip: str, backend_server: str, response_time: float,
                        status_code: int, bytes_sent: int, user_agent: str):
@@ -499,6 +562,474 @@ class LoadBalancer:
         """Stop health checking."""
         self.health_checker.stop()
 
+def header_value(headers: List[Tuple[str, str]], name: str) -> Optional[str]:
+    """Get a header from a parsed header list, comma-joining repeats."""
+    values = [value for key, value in headers if key.lower() == name.lower()]
+    return ', '.join(values) if values else None
+
+def is_keep_alive(version: str, headers: List[Tuple[str, str]]) -> bool:
+    """Check whether an HTTP/1.x message leaves its connection open."""
+    connection = (header_value(headers, 'Connection') or '').lower()
+    if version.upper() == 'HTTP/1.0':
+        return 'keep-alive' in connection
+    return 'close' not in connection
+
+def encode_http_head(start_line: str, headers: List[Tuple[str, str]]) -> bytes:
+    """Serialize a request or status line and its headers."""
+    lines = [start_line] + [f"{name}: {value}" for name, value in headers]
+    return ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1')
+
+async def read_http_head(reader: asyncio.StreamReader) -> Optional[Tuple[str, List[Tuple[str, str]]]]:
+    """Read a request or status line and its headers; None if the peer closed cleanly."""
+    line = await reader.readline()
+    if not line:
+        return None
+    if not line.endswith(b'\n'):
+        raise asyncio.IncompleteReadError(line, None)
+    start_line = line.decode('latin-1').rstrip('\r\n')
+    headers = []
+    while True:
+        line = await reader.readline()
+        if not line.endswith(b'\n'):
+            raise asyncio.IncompleteReadError(line, None)
+        if line in (b'\r\n', b'\n'):
+            return start_line, headers
+        name, sep, value = line.decode('latin-1').partition(':')
+        if not sep:
+            raise ValueError(f"Malformed header line: {line!r}")
+        headers.append((name.strip(), value.strip()))
+
+async def iter_http_body(reader: asyncio.StreamReader, headers: List[Tuple[str, str]],
+                         chunk_size: int = 65536, until_close: bool = False) -> AsyncIterator[bytes]:
+    """Yield a message body as it arrives, removing any chunked framing."""
+    if 'chunked' in (header_value(headers, 'Transfer-Encoding') or '').lower():
+        while True:
+            size_line = await reader.readline()
+            if not size_line.endswith(b'\n'):
+                raise asyncio.IncompleteReadError(size_line, None)
+            size = int(size_line.split(b';', 1)[0].strip(), 16)
+            if size == 0:
+                # Skip trailers
+                while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                    pass
+                return
+            while size > 0:
+                data = await reader.read(min(chunk_size, size))
+                if not data:
+                    raise asyncio.IncompleteReadError(b'', size)
+                size -= len(data)
+                yield data
+            await reader.readexactly(2)
+    
+    length = header_value(headers, 'Content-Length')
+    if length is not None:
+        remaining = int(length.split(',')[0])
+        while remaining > 0:
+            data = await reader.read(min(chunk_size, remaining))
+            if not data:
+                raise asyncio.IncompleteReadError(b'', remaining)
+            remaining -= len(data)
+            yield data
+        return
+    
+    if until_close:
+        while True:
+            data = await reader.read(chunk_size)
+            if not data:
+                return
+            yield data
+
+class AsyncConnectionPool:
+    """Keep-alive connections to one backend, shared by the asyncio forwarder."""
+    
+    def __init__(self, host: str, port: int, max_connections: int = 100,
+                 max_idle: int = 10, idle_timeout: float = 30.0):
+        self.host = host
+        self.port = port
+        self.max_idle = max_idle
+        self.idle_timeout = idle_timeout
+        self.slots = asyncio.Semaphore(max(1, max_connections))
+        self.idle: deque = deque()  # (reader, writer, idle_since), most recent last
+        self.opened = 0
+        self.closed = False
+    
+    async def acquire(self, timeout: float = 5) -> Tuple[asyncio.StreamReader, asyncio.StreamWriter, bool]:
+        """Take a connection slot and a connection; returns (reader, writer, reused)."""
+        await asyncio.wait_for(self.slots.acquire(), timeout)
+        try:
+            self._expire_idle()
+            while self.idle:
+                # Reuse the most recently used connection, it is the least likely to be stale
+                reader, writer, _ = self.idle.pop()
+                if not reader.at_eof() and not writer.is_closing():
+                    return reader, writer, True
+                writer.close()
+            
+            reader, writer = await asyncio.wait_for(
+                asyncio.open_connection(self.host, self.port), timeout)
+            self.opened += 1
+            return reader, writer, False
+        except BaseException:
+            self.slots.release()
+            raise
+    
+    def release(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, reusable: bool = True):
+        """Return a connection, keeping it idle if allowed or closing it."""
+        try:
+            self._expire_idle()
+            if (reusable and not self.closed and not writer.is_closing()
+                    and len(self.idle) < self.max_idle):
+                self.idle.append((reader, writer, time.monotonic()))
+            else:
+                writer.close()
+        finally:
+            self.slots.release()
+    
+    def _expire_idle(self):
+        """Close idle connections past the idle timeout."""
+        cutoff = time.monotonic() - self.idle_timeout
+        while self.idle and self.idle[0][2] <= cutoff:
+            self.idle.popleft()[1].close()
+    
+    def close(self):
+        """Close all idle connections; busy ones are closed when released."""
+        self.closed = True
+        while self.idle:
+            self.idle.popleft()[1].close()
+
+class AsyncForwarder:
+    """Asyncio HTTP/1.1 proxy streaming bodies between clients and pooled backend connections."""
+    
+    def __init__(self, load_balancer: LoadBalancer, chunk_size: int = 65536):
+        self.load_balancer = load_balancer
+        self.chunk_size = chunk_size
+        self.pools: Dict[str, AsyncConnectionPool] = {}
+        self.server: Optional[asyncio.AbstractServer] = None
+        self.clients: Dict[asyncio.StreamWriter, asyncio.Task] = {}
+    
+    def get_pool(self, server: BackendServer) -> AsyncConnectionPool:
+        """Get the connection pool for a backend, replacing it if the backend moved."""
+        pool = self.pools.get(server.server_id)
+        if pool is None or (pool.host, pool.port) != (server.host, server.port):
+            if pool is not None:
+                pool.close()
+            config = self.load_balancer.config
+            pool = AsyncConnectionPool(server.host, server.port, server.max_connections,
+                                       config.max_idle_connections, config.idle_connection_timeout)
+            self.pools[server.server_id] = pool
+        return pool
+    
+    async def start(self, host: str = '0.0.0.0', port: int = 8080) -> asyncio.AbstractServer:
+        """Start accepting client connections."""
+        self.server = await asyncio.start_server(self.handle_client, host, port)
+        logger.info(f"Async proxy listening on {host}:{self.server.sockets[0].getsockname()[1]}")
+        return self.server
+    
+    async def close(self):
+        """Stop accepting clients and close client and backend connections."""
+        if self.server:
+            self.server.close()
+            handlers = list(self.clients.values())
+            for writer in list(self.clients):
+                writer.close()
+            # Closed connections read as EOF, so handlers finish their current request and exit
+            if handlers:
+                await asyncio.wait(handlers, timeout=5)
+            await self.server.wait_closed()
+        for pool in self.pools.values():
+            pool.close()
+    
+    async def handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Serve requests from one client connection until either side closes it."""
+        peer = writer.get_extra_info('peername')
+        client_ip = peer[0] if peer else 'unknown'
+        self.clients[writer] = asyncio.current_task()
+        try:
+            while True:
+                head = await read_http_head(reader)
+                if head is None or not await self.forward(head, reader, writer, client_ip):
+                    break
+        except ValueError as e:
+            logger.error(f"Malformed request from {client_ip}: {e}")
+            await self._send_error(writer, 400, "Bad Request", False)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except Exception as e:
+            logger.error(f"Async proxy error for client {client_ip}: {e}")
+        finally:
+            self.clients.pop(writer, None)
+            writer.close()
+    
+    async def forward(self, head: Tuple[str, List[Tuple[str, str]]], reader: asyncio.StreamReader,
+                      writer: asyncio.StreamWriter, client_ip: str) -> bool:
+        """Forward one request; returns whether the client connection stays open."""
+        start_line, headers = head
+        parts = start_line.split()
+        if len(parts) != 3 or not parts[2].upper().startswith('HTTP/1.'):
+            raise ValueError(f"Malformed request line: {start_line!r}")
+        method, path, version = parts
+        keep_alive = is_keep_alive(version, headers)
+        request_chunked = 'chunked' in (header_value(headers, 'Transfer-Encoding') or '').lower()
+        has_body = request_chunked or int((header_value(headers, 'Content-Length') or '0').split(',')[0]) > 0
+        # An error sent before the request body is read leaves the connection unusable
+        error_keep_alive = keep_alive and not has_body
+        lb = self.load_balancer
+        
+        # Rate limiting
+        forwarded_for = header_value(headers, 'X-Forwarded-For')
+        if lb.rate_limiter and not lb.rate_limiter.is_allowed(client_ip):
+            return await self._send_error(writer, 429, "Rate limit exceeded", error_keep_alive)
+        
+        # Select server, keeping the Flask proxy's session cookie for persistence
+        cookie = SimpleCookie()
+        try:
+            cookie.load(header_value(headers, 'Cookie') or '')
+        except CookieError:
+            pass
+        session_id = cookie['session_id'].value if 'session_id' in cookie else None
+        new_session_id = None
+        if not session_id and lb.config.session_persistence:
+            new_session_id = session_id = f"session_{int(time.time())}_{random.randint(1000, 9999)}"
+        server = lb.select_server(client_ip, session_id)
+        if not server:
+            return await self._send_error(writer, 503, "No healthy servers available", error_keep_alive)
+        
+        # Circuit breaker protection
+        breaker = lb.circuit_breakers.get(server.server_id) if lb.config.circuit_breaker_enabled else None
+        if breaker and not breaker.allow_request():
+            return await self._send_error(writer, 503, "Service temporarily unavailable", error_keep_alive)
+        
+        if has_body and '100-continue' in (header_value(headers, 'Expect') or '').lower():
+            writer.write(b'HTTP/1.1 100 Continue\r\n\r\n')
+        
+        # Transfer-Encoding overrides Content-Length (RFC 7230 3.3.3); forwarding both invites smuggling
+        dropped = ('expect', 'x-forwarded-for', 'x-forwarded-proto') + (('content-length',) if request_chunked else ())
+        upstream_headers = [(name, value) for name, value in headers
+                            if name.lower() not in HOP_BY_HOP_HEADERS and name.lower() not in dropped]
+        if request_chunked:
+            upstream_headers.append(('Transfer-Encoding', 'chunked'))
+        upstream_headers.append(('X-Forwarded-For', f"{forwarded_for}, {client_ip}" if forwarded_for else client_ip))
+        upstream_headers.append(('X-Forwarded-Proto', 'http'))
+        request_head = encode_http_head(f"{method} {path} HTTP/1.1", upstream_headers)
+        
+        pool = self.get_pool(server)
+        start_time = time.time()
+        server.active_connections += 1
+        server.total_requests += 1
+        status_code = 502
+        bytes_sent = 0
+        response_started = False
+        connection = None
+        try:
+            # A reused connection may have been closed by the backend; a bodiless request can be resent
+            for attempt in range(1 if has_body else 2):
+                connection = await pool.acquire(server.timeout)
+                backend_reader, backend_writer, reused = connection
+                try:
+                    backend_writer.write(request_head)
+                    if has_body:
+                        await self._stream_request_body(reader, headers, backend_writer, request_chunked)
+                    await backend_writer.drain()
+                    response_head = await asyncio.wait_for(
+                        self._read_response_head(backend_reader), server.timeout)
+                    break
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    pool.release(backend_reader, backend_writer, reusable=False)
+                    connection = None
+                    if not (reused and not has_body and attempt == 0):
+                        raise
+            
+            status_line, response_headers = response_head
+            response_version, status_text = status_line.split(' ', 1)
+            status_code = int(status_text.split()[0])
+            backend_keep_alive = is_keep_alive(response_version, response_headers)
+            no_body = method.upper() == 'HEAD' or status_code in (204, 304)
+            response_chunked = 'chunked' in (header_value(response_headers, 'Transfer-Encoding') or '').lower()
+            # A chunked body's length is unknown whatever Content-Length the backend also sent
+            length = None if response_chunked else header_value(response_headers, 'Content-Length')
+            if not no_body and length is None and not response_chunked:
+                backend_keep_alive = False  # body is delimited by the backend closing
+            
+            downstream_headers = [(name, value) for name, value in response_headers
+                                  if name.lower() not in HOP_BY_HOP_HEADERS
+                                  and not (response_chunked and name.lower() == 'content-length')]
+            # Unknown-length bodies are re-chunked for HTTP/1.1 clients; HTTP/1.0 clients read until close
+            client_chunked = not no_body and length is None and version.upper() != 'HTTP/1.0'
+            if not no_body and length is None and not client_chunked:
+                keep_alive = False
+            if client_chunked:
+                downstream_headers.append(('Transfer-Encoding', 'chunked'))
+            if new_session_id:
+                downstream_headers.append(
+                    ('Set-Cookie', f"session_id={new_session_id}; Max-Age={lb.config.session_timeout}; Path=/"))
+            downstream_headers.append(('Connection', 'keep-alive' if keep_alive else 'close'))
+            writer.write(encode_http_head(f"HTTP/1.1 {status_text}", downstream_headers))
+            response_started = True
+            
+            if not no_body:
+                async for chunk in iter_http_body(backend_reader, response_headers, self.chunk_size, until_close=True):
+                    bytes_sent += len(chunk)
+                    writer.write(b'%x\r\n%b\r\n' % (len(chunk), chunk) if client_chunked else chunk)
+                    await writer.drain()
+                if client_chunked:
+                    writer.write(b'0\r\n\r\n')
+            await writer.drain()
+            
+            pool.release(backend_reader, backend_writer, backend_keep_alive)
+            connection = None
+            if breaker:
+                breaker.record_result(True)
+            return keep_alive
+        
+        except Exception as e:
+            logger.error(f"Request failed to server {server.server_id}: {e}")
+            status_code = 502
+            if connection:
+                pool.release(connection[0], connection[1], reusable=False)
+            if breaker:
+                breaker.record_result(False)
+            if response_started:
+                return False
+            return await self._send_error(writer, 502, "Bad Gateway", False)
+        
+        finally:
+            server.active_connections = max(0, server.active_connections - 1)
+            lb._record_metrics(
+                client_ip=client_ip,
+                backend_server=server.server_id,
+                response_time=time.time() - start_time,
+                status_code=status_code,
+                bytes_sent=bytes_sent,
+                user_agent=header_value(headers, 'User-Agent') or ''
+            )
+    
+    async def _stream_request_body(self, reader: asyncio.StreamReader, headers: List[Tuple[str, str]],
+                                   backend_writer: asyncio.StreamWriter, chunked: bool):
+        """Copy the client's request body to the backend as it arrives."""
+        async for chunk in iter_http_body(reader, headers, self.chunk_size):
+            backend_writer.write(b'%x\r\n%b\r\n' % (len(chunk), chunk) if chunked else chunk)
+            await backend_writer.drain()
+        if chunked:
+            backend_writer.write(b'0\r\n\r\n')
+    
+    async def _read_response_head(self, reader: asyncio.StreamReader) -> Tuple[str, List[Tuple[str, str]]]:
+        """Read the backend's final response head, skipping interim 1xx responses."""
+        while True:
+            head = await read_http_head(reader)
+            if head is None:
+                raise ConnectionResetError("Backend closed the connection")
+            status = head[0].split(' ', 2)
+            if len(status) < 2 or not status[1].isdigit():
+                raise ValueError(f"Malformed status line: {head[0]!r}")
+            if not 100 <= int(status[1]) < 200:
+                return head
+    
+    async def _send_error(self, writer: asyncio.StreamWriter, status_code: int, message: str,
+                          keep_alive: bool) -> bool:
+        """Send a JSON error response; returns whether the client connection stays open."""
+        body = json.dumps({"error": message}).encode()
+        reasons = {400: 'Bad Request', 429: 'Too Many Requests', 502: 'Bad Gateway', 503: 'Service Unavailable'}
+        writer.write(encode_http_head(f"HTTP/1.1 {status_code} {reasons.get(status_code, 'Error')}", [
+            ('Content-Type', 'application/json'),
+            ('Content-Length', str(len(body))),
+            ('Connection', 'keep-alive' if keep_alive else 'close')
+        ]) + body)
+        try:
+            await writer.drain()
+        except ConnectionError:
+            return False
+        return keep_alive
+
+async def _start_stub_backend(body: bytes, counter: Dict[str, int],
+                              handlers: set) -> asyncio.AbstractServer:
+    """Start a keep-alive HTTP backend on an ephemeral port that answers every request with body."""
+    response_head = encode_http_head("HTTP/1.1 200 OK", [
+        ('Content-Type', 'application/octet-stream'),
+        ('Content-Length', str(len(body)))
+    ])
+    
+    async def handle(reader, writer):
+        counter['connections'] += 1
+        handlers.add(asyncio.current_task())
+        try:
+            while True:
+                head = await read_http_head(reader)
+                if head is None:
+                    break
+                async for _ in iter_http_body(reader, head[1]):
+                    pass
+                writer.write(response_head + body)
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+    
+    return await asyncio.start_server(handle, '127.0.0.1', 0)
+
+async def benchmark_proxy(total_requests: int = 2000, concurrency: int = 50, backends: int = 3,
+                          body_size: int = 1024) -> Dict:
+    """Measure proxied RPS and latency through the async forwarder against local stub backends."""
+    counter = {'connections': 0}
+    body = b'x' * body_size
+    stub_handlers = set()
+    stubs = [await _start_stub_backend(body, counter, stub_handlers) for _ in range(backends)]
+    lb = LoadBalancer(LoadBalancerConfig(health_check_enabled=False, rate_limit_enabled=False,
+                                         max_idle_connections=concurrency))
+    for i, stub in enumerate(stubs):
+        lb.add_server(BackendServer(server_id=f"stub{i + 1}", host='127.0.0.1',
+                                    port=stub.sockets[0].getsockname()[1]))
+    forwarder = AsyncForwarder(lb)
+    proxy = await forwarder.start('127.0.0.1', 0)
+    proxy_port = proxy.sockets[0].getsockname()[1]
+    
+    remaining = [total_requests]
+    latencies = []
+    errors = [0]
+    
+    async def client():
+        reader, writer = await asyncio.open_connection('127.0.0.1', proxy_port)
+        try:
+            while remaining[0] > 0:
+                remaining[0] -= 1
+                started = time.perf_counter()
+                writer.write(b'GET /bench HTTP/1.1\r\nHost: bench\r\n\r\n')
+                status_line, headers = await read_http_head(reader)
+                async for _ in iter_http_body(reader, headers):
+                    pass
+                latencies.append(time.perf_counter() - started)
+                if ' 200 ' not in status_line:
+                    errors[0] += 1
+        finally:
+            writer.close()
+    
+    started = time.perf_counter()
+    try:
+        await asyncio.gather(*(client() for _ in range(min(concurrency, total_requests))))
+        elapsed = time.perf_counter() - started
+    finally:
+        await forwarder.close()
+        for stub in stubs:
+            stub.close()
+        if stub_handlers:
+            await asyncio.wait(stub_handlers, timeout=5)
+        for stub in stubs:
+            await stub.wait_closed()
+    
+    latencies.sort()
+    def percentile(p: float) -> float:
+        return round(latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000, 3) if latencies else 0
+    
+    return {
+        'requests': len(latencies),
+        'errors': errors[0],
+        'concurrency': concurrency,
+        'rps': round(len(latencies) / elapsed, 1) if elapsed > 0 else 0,
+        'p50_ms': percentile(0.50),
+        'p99_ms': percentile(0.99),
+        'backend_connections': counter['connections']
+    }
+
 # Flask application
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'load-balancer-secret-key'
@@ -734,8 +1265,32 @@ def proxy_request(path):
     
     return response
 
+async def run_async_proxy(host: str, port: int):
+    """Serve the proxy with the asyncio forwarder instead of Flask."""
+    forwarder = AsyncForwarder(load_balancer)
+    server = await forwarder.start(host, port)
+    try:
+        await server.serve_forever()
+    finally:
+        await forwarder.close()
+
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='HTTP load balancer')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--async-proxy', action='store_true',
+                        help='Forward with the streaming asyncio engine instead of Flask')
+    parser.add_argument('--benchmark', action='store_true',
+                        help='Benchmark the async forwarder against local stub backends and exit')
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=50)
+    args = parser.parse_args()
+    
     try:
-        app.run(debug=True, host='0.0.0.0', port=8080)
+        if args.benchmark:
+            print(json.dumps(asyncio.run(benchmark_proxy(args.requests, args.concurrency)), indent=2))
+        elif args.async_proxy:
+            asyncio.run(run_async_proxy('0.0.0.0', args.port))
+        else:
+            app.run(debug=True, host='0.0.0.0', port=args.port)
     finally:
         load_balancer.stop_health_checking()
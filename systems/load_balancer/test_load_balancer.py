@@ -9,6 +9,8 @@ import os
 import sys
 import time
 import threading
+import asyncio
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from datetime import datetime, timedelta
 from unittest.mock import Mock, patch, MagicMock
 
@@ -17,7 +19,9 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
 from load_balancer_service import (
     BackendServer, LoadBalancerConfig, RequestMetrics, HealthChecker,
-    CircuitBreaker, RateLimiter, LoadBalancer, app
+    CircuitBreaker, RateLimiter, LoadBalancer, app,
+    AsyncConnectionPool, AsyncForwarder, benchmark_proxy,
+    read_http_head, iter_http_body
 )
 
 class TestBackendServer(unittest.TestCase):
@@ -458,7 +462,7 @@ class TestLoadBalancer(unittest.TestCase):
         selected3 = self.lb.select_server(session_id="session456")
         # Note: This might be the same server due to round robin, which is fine
     
-    @patch('requests.request')
+    @patch('requests.Session.request')
     def test_forward_request_success(self, mock_request):
         """Test successful request forwarding."""
         # Mock successful response
@@ -482,7 +486,7 @@ class TestLoadBalancer(unittest.TestCase):
         self.assertEqual(content, b'{"success": true}')
         self.assertEqual(server.total_requests, 1)
     
-    @patch('requests.request')
+    @patch('requests.Session.request')
     def test_forward_request_failure(self, mock_request):
         """Test request forwarding failure."""
         # Mock failed response
@@ -649,7 +653,7 @@ class TestFlaskApp(unittest.TestCase):
         self.assertTrue(data['success'])
         self.assertIn('updated successfully', data['message'])
     
-    @patch('requests.request')
+    @patch('requests.Session.request')
     def test_proxy_request(self, mock_request):
         """Test request proxying."""
         # Mock successful response
@@ -663,7 +667,7 @@ class TestFlaskApp(unittest.TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertIn(b'success', response.data)
     
-    @patch('requests.request')
+    @patch('requests.Session.request')
     def test_proxy_request_failure(self, mock_request):
         """Test request proxying failure."""
         # Mock failed response
@@ -673,5 +677,305 @@ class TestFlaskApp(unittest.TestCase):
         self.assertEqual(response.status_code, 502)
         self.assertIn(b'Bad Gateway', response.data)
 
+class KeepAliveHandler(BaseHTTPRequestHandler):
+    """Backend that counts TCP connections and echoes request bodies."""
+    protocol_version = 'HTTP/1.1'
+    connections = 0
+    delay = 0
+    
+    def setup(self):
+        type(self).connections += 1
+        super().setup()
+    
+    def do_GET(self):
+        time.sleep(self.delay)
+        body = b'hello'
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def log_message(self, format, *args):
+        pass
+
+class TestConnectionPooling(unittest.TestCase):
+    """Test pooled keep-alive connections on the synchronous path."""
+    
+    def setUp(self):
+        KeepAliveHandler.connections = 0
+        KeepAliveHandler.delay = 0
+        self.backend = ThreadingHTTPServer(('127.0.0.1', 0), KeepAliveHandler)
+        threading.Thread(target=self.backend.serve_forever, daemon=True).start()
+        self.load_balancer = LoadBalancer(LoadBalancerConfig(health_check_enabled=False))
+        self.server = BackendServer(server_id="backend", host="127.0.0.1",
+                                    port=self.backend.server_address[1], weight=1)
+        self.load_balancer.add_server(self.server)
+    
+    def tearDown(self):
+        self.load_balancer.remove_server("backend")
+        self.backend.shutdown()
+        self.backend.server_close()
+    
+    def test_connections_are_reused(self):
+        """Test sequential requests share one backend connection."""
+        for _ in range(5):
+            status, _, content = self.load_balancer.forward_request('GET', '/', {}, client_ip='10.0.0.1')
+            self.assertEqual(status, 200)
+            self.assertEqual(content, b'hello')
+        
+        status, _, content = self.load_balancer.forward_request('POST', '/', {}, data=b'payload',
+                                                                client_ip='10.0.0.1')
+        self.assertEqual(content, b'payload')
+        self.assertEqual(KeepAliveHandler.connections, 1)
+    
+    def test_max_connections_limit(self):
+        """Test requests beyond a backend's max_connections are rejected."""
+        KeepAliveHandler.delay = 0.5
+        self.load_balancer.remove_server("backend")
+        self.server.max_connections = 1
+        self.server.timeout = 0.1
+        self.load_balancer.add_server(self.server)
+        
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(
+            self.load_balancer._make_request(self.server, 'GET', '/', {})[0])) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        # The second request times out waiting for a slot rather than on the backend
+        self.assertIn(503, results)
+    
+    def test_remove_server_closes_session(self):
+        """Test removing a server drops its pooled connections."""
+        self.load_balancer.forward_request('GET', '/', {}, client_ip='10.0.0.1')
+        self.assertIn("backend", self.load_balancer.sessions)
+        
+        self.load_balancer.remove_server("backend")
+        self.assertNotIn("backend", self.load_balancer.sessions)
+
+class StreamingBackend:
+    """Asyncio backend for forwarder tests; /echo echoes the body, /chunked streams a chunked body."""
+    
+    def __init__(self, chunk: bytes = b'x' * 65536, chunks: int = 16):
+        self.chunk = chunk
+        self.chunks = chunks
+        self.connections = 0
+        self.requests = []
+        self.handlers = {}
+    
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle, '127.0.0.1', 0)
+        self.port = self.server.sockets[0].getsockname()[1]
+    
+    async def stop(self):
+        self.server.close()
+        for writer in list(self.handlers):
+            writer.close()
+        if self.handlers:
+            await asyncio.wait(list(self.handlers.values()), timeout=5)
+    
+    async def handle(self, reader, writer):
+        self.connections += 1
+        self.handlers[writer] = asyncio.current_task()
+        try:
+            while True:
+                head = await read_http_head(reader)
+                if head is None:
+                    break
+                self.requests.append(head)
+                body = b''.join([data async for data in iter_http_body(reader, head[1])])
+                if head[0].startswith('GET /chunked'):
+                    writer.write(b'HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n\r\n')
+                    for _ in range(self.chunks):
+                        writer.write(b'%x\r\n%b\r\n' % (len(self.chunk), self.chunk))
+                        await writer.drain()
+                    writer.write(b'0\r\n\r\n')
+                elif head[0].startswith('GET /conflicting'):
+                    writer.write(b'HTTP/1.1 200 OK\r\nContent-Length: 2\r\nTransfer-Encoding: chunked\r\n\r\n'
+                                 b'5\r\nhello\r\n0\r\n\r\n')
+                elif head[0].startswith('GET /close'):
+                    writer.write(b'HTTP/1.1 200 OK\r\nConnection: close\r\n\r\nuntil close')
+                    await writer.drain()
+                    break
+                else:
+                    writer.write(b'HTTP/1.1 200 OK\r\nContent-Length: %d\r\n\r\n%b' % (len(body), body))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self.handlers.pop(writer, None)
+            writer.close()
+
+class TestAsyncForwarder(unittest.IsolatedAsyncioTestCase):
+    """Test the asyncio streaming forwarder."""
+    
+    async def asyncSetUp(self):
+        self.backend = StreamingBackend()
+        await self.backend.start()
+        self.load_balancer = LoadBalancer(LoadBalancerConfig(health_check_enabled=False,
+                                                             max_idle_connections=2))
+        self.load_balancer.add_server(BackendServer(server_id="backend", host="127.0.0.1",
+                                                    port=self.backend.port, weight=1))
+        self.forwarder = AsyncForwarder(self.load_balancer, chunk_size=8192)
+        proxy = await self.forwarder.start('127.0.0.1', 0)
+        self.reader, self.writer = await asyncio.open_connection(
+            '127.0.0.1', proxy.sockets[0].getsockname()[1])
+    
+    async def asyncTearDown(self):
+        self.writer.close()
+        await self.forwarder.close()
+        await self.backend.stop()
+    
+    async def request(self, raw: bytes):
+        self.writer.write(raw)
+        status_line, headers = await read_http_head(self.reader)
+        body = b''.join([data async for data in iter_http_body(self.reader, headers, until_close=True)])
+        return int(status_line.split()[1]), dict(headers), body
+    
+    async def test_keep_alive_reuses_backend_connection(self):
+        """Test requests on one client connection reuse one backend connection."""
+        for i in range(5):
+            status, _, body = await self.request(
+                b'POST /echo HTTP/1.1\r\nHost: test\r\nContent-Length: 5\r\n\r\nreq-%d' % i)
+            self.assertEqual(status, 200)
+            self.assertEqual(body, b'req-%d' % i)
+        
+        self.assertEqual(self.backend.connections, 1)
+        self.assertEqual(self.forwarder.pools["backend"].opened, 1)
+        self.assertEqual(self.load_balancer.get_metrics()['total_requests'], 5)
+    
+    async def test_streams_chunked_response(self):
+        """Test a chunked response is relayed intact with chunked framing."""
+        status, headers, body = await self.request(b'GET /chunked HTTP/1.1\r\nHost: test\r\n\r\n')
+        
+        self.assertEqual(status, 200)
+        self.assertEqual(headers['Transfer-Encoding'], 'chunked')
+        self.assertEqual(len(body), 65536 * 16)
+        
+        # The connection stays usable after the chunked body
+        status, _, body = await self.request(b'GET /echo HTTP/1.1\r\nHost: test\r\n\r\n')
+        self.assertEqual((status, body), (200, b''))
+    
+    async def test_streams_chunked_request_body(self):
+        """Test a chunked request body reaches the backend and forwarding headers are set."""
+        status, _, body = await self.request(
+            b'POST /echo HTTP/1.1\r\nHost: test\r\nTransfer-Encoding: chunked\r\n\r\n'
+            b'3\r\nabc\r\n4\r\ndefg\r\n0\r\n\r\n')
+        
+        self.assertEqual((status, body), (200, b'abcdefg'))
+        forwarded = dict(self.backend.requests[-1][1])
+        self.assertEqual(forwarded['X-Forwarded-For'], '127.0.0.1')
+        self.assertEqual(forwarded['Transfer-Encoding'], 'chunked')
+    
+    async def test_chunked_request_drops_content_length(self):
+        """Test a request with both Content-Length and chunked framing is forwarded chunked only."""
+        status, _, body = await self.request(
+            b'POST /echo HTTP/1.1\r\nHost: test\r\nContent-Length: 4\r\nTransfer-Encoding: chunked\r\n\r\n'
+            b'7\r\nabcdefg\r\n0\r\n\r\n')
+        
+        self.assertEqual((status, body), (200, b'abcdefg'))
+        forwarded = [name.lower() for name, _ in self.backend.requests[-1][1]]
+        self.assertNotIn('content-length', forwarded)
+        self.assertIn('transfer-encoding', forwarded)
+    
+    async def test_chunked_response_drops_content_length(self):
+        """Test a chunked response is not relayed under the backend's Content-Length."""
+        status, headers, body = await self.request(b'GET /conflicting HTTP/1.1\r\nHost: test\r\n\r\n')
+        
+        self.assertEqual((status, body), (200, b'hello'))
+        self.assertNotIn('Content-Length', headers)
+        self.assertEqual(headers['Transfer-Encoding'], 'chunked')
+        
+        # The connection stays in sync for the next request
+        status, _, body = await self.request(b'GET /echo HTTP/1.1\r\nHost: test\r\n\r\n')
+        self.assertEqual((status, body), (200, b''))
+    
+    async def test_backend_closing_connection(self):
+        """Test a close-delimited response is re-chunked and its connection not pooled."""
+        status, headers, body = await self.request(b'GET /close HTTP/1.1\r\nHost: test\r\n\r\n')
+        
+        self.assertEqual((status, body), (200, b'until close'))
+        self.assertEqual(headers['Transfer-Encoding'], 'chunked')
+        self.assertEqual(len(self.forwarder.pools["backend"].idle), 0)
+    
+    async def test_backend_unavailable(self):
+        """Test an unreachable backend returns 502 and counts as a breaker failure."""
+        await self.backend.stop()
+        server = self.load_balancer.servers[0]
+        server.port = 1
+        
+        status, _, body = await self.request(b'GET / HTTP/1.1\r\nHost: test\r\n\r\n')
+        
+        self.assertEqual(status, 502)
+        self.assertIn(b'Bad Gateway', body)
+        self.assertEqual(self.load_balancer.circuit_breakers["backend"].failure_count, 1)
+
+class TestAsyncConnectionPool(unittest.IsolatedAsyncioTestCase):
+    """Test idle limits and timeouts of the async connection pool."""
+    
+    async def asyncSetUp(self):
+        self.backend = StreamingBackend()
+        await self.backend.start()
+    
+    async def asyncTearDown(self):
+        await self.backend.stop()
+    
+    async def test_max_idle_connections(self):
+        """Test connections beyond max_idle are closed on release."""
+        pool = AsyncConnectionPool('127.0.0.1', self.backend.port, max_connections=5, max_idle=1)
+        first = await pool.acquire()
+        second = await pool.acquire()
+        pool.release(first[0], first[1])
+        pool.release(second[0], second[1])
+        
+        self.assertEqual(len(pool.idle), 1)
+        reader, writer, reused = await pool.acquire()
+        self.assertTrue(reused)
+        self.assertIs(writer, first[1])
+        pool.release(reader, writer)
+        pool.close()
+    
+    async def test_idle_timeout(self):
+        """Test expired idle connections are replaced."""
+        pool = AsyncConnectionPool('127.0.0.1', self.backend.port, max_idle=2, idle_timeout=0.05)
+        reader, writer, _ = await pool.acquire()
+        pool.release(reader, writer)
+        await asyncio.sleep(0.1)
+        
+        reader, writer, reused = await pool.acquire()
+        self.assertFalse(reused)
+        self.assertEqual(pool.opened, 2)
+        pool.release(reader, writer)
+        pool.close()
+    
+    async def test_max_connections(self):
+        """Test acquire waits for a free slot and times out."""
+        pool = AsyncConnectionPool('127.0.0.1', self.backend.port, max_connections=1)
+        reader, writer, _ = await pool.acquire()
+        
+        with self.assertRaises(asyncio.TimeoutError):
+            await pool.acquire(timeout=0.05)
+        pool.release(reader, writer)
+        pool.close()
+    
+    async def test_benchmark(self):
+        """Test the proxy benchmark reports throughput over pooled connections."""
+        result = await benchmark_proxy(total_requests=200, concurrency=10, backends=2)
+        
+        self.assertEqual(result['requests'], 200)
+        self.assertEqual(result['errors'], 0)
+        self.assertGreater(result['rps'], 0)
+        self.assertGreaterEqual(result['p99_ms'], result['p50_ms'])
+        self.assertLessEqual(result['backend_connections'], 10 + 2)
+
 if __name__ == '__main__':
     unittest.main()
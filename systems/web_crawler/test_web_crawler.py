@@ -11,17 +11,21 @@ import tempfile
 import os
 import json
 import asyncio
-from datetime import datetime
+from datetime import datetime, timedelta
 from unittest.mock import Mock, patch, AsyncMock
 import sys
 import time
+import hashlib
+import sqlite3
 
 # Add the web_crawler directory to the path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__)))
 
 from web_crawler_service import (
     CrawlJob, WebPage, CrawlStats, WebCrawlerDatabase, 
-    WebCrawlerService, web_crawler_service
+    WebCrawlerService, HostRateLimiter, CrawlFrontier, CrawlWriteBuffer, ScalableBloomFilter,
+    normalize_url, extract_page_content, compute_simhash, hamming_distance,
+    SimHashIndex, parse_crawl_delay, web_crawler_service
 )
 
 class TestCrawlJob(unittest.TestCase):
@@ -725,14 +729,6 @@ TestAsyncCrawling.test_check_robots_txt_allowed = run_async_test(TestAsyncCrawli
 TestAsyncCrawling.test_check_robots_txt_disallowed = run_async_test(TestAsyncCrawling.test_check_robots_txt_disallowed)
 TestAsyncCrawling.test_check_robots_txt_error = run_async_test(TestAsyncCrawling.test_check_robots_txt_error)
 
-# Apply async test decorator to TestAsyncCrawlJob methods
-TestAsyncCrawlJob.test_run_crawl_job_success = run_async_test(TestAsyncCrawlJob.test_run_crawl_job_success)
-TestAsyncCrawlJob.test_run_crawl_job_not_found = run_async_test(TestAsyncCrawlJob.test_run_crawl_job_not_found)
-TestAsyncCrawlJob.test_run_crawl_job_with_errors = run_async_test(TestAsyncCrawlJob.test_run_crawl_job_with_errors)
-TestAsyncCrawlJob.test_add_new_urls_to_queue = run_async_test(TestAsyncCrawlJob.test_add_new_urls_to_queue)
-TestAsyncCrawlJob.test_add_new_urls_with_external_links = run_async_test(TestAsyncCrawlJob.test_add_new_urls_with_external_links)
-TestAsyncCrawlJob.test_crawl_page_duplicate_detection = run_async_test(TestAsyncCrawlJob.test_crawl_page_duplicate_detection)
-
 class TestAsyncCrawlJob(unittest.TestCase):
     """Test async crawl job execution."""
 
@@ -912,6 +908,905 @@ class TestAsyncCrawlJob(unittest.TestCase):
             self.assertIsNotNone(page2)
             self.assertEqual(page1.url, page2.url)
 
+# Apply async test decorator to TestAsyncCrawlJob methods
+TestAsyncCrawlJob.test_run_crawl_job_success = run_async_test(TestAsyncCrawlJob.test_run_crawl_job_success)
+TestAsyncCrawlJob.test_run_crawl_job_not_found = run_async_test(TestAsyncCrawlJob.test_run_crawl_job_not_found)
+TestAsyncCrawlJob.test_run_crawl_job_with_errors = run_async_test(TestAsyncCrawlJob.test_run_crawl_job_with_errors)
+TestAsyncCrawlJob.test_add_new_urls_to_queue = run_async_test(TestAsyncCrawlJob.test_add_new_urls_to_queue)
+TestAsyncCrawlJob.test_add_new_urls_with_external_links = run_async_test(TestAsyncCrawlJob.test_add_new_urls_with_external_links)
+TestAsyncCrawlJob.test_crawl_page_duplicate_detection = run_async_test(TestAsyncCrawlJob.test_crawl_page_duplicate_detection)
+
+class TestConcurrentCrawling(unittest.TestCase):
+    """Test the worker pool against a local aiohttp stub server."""
+
+    def setUp(self):
+        """Set up test service."""
+        self.temp_db = tempfile.NamedTemporaryFile(delete=False)
+        self.temp_db.close()
+        self.service = WebCrawlerService(self.temp_db.name, max_workers=4, max_in_flight=3)
+
+    def tearDown(self):
+        """Clean up test service."""
+        os.unlink(self.temp_db.name)
+
+    async def _crawl_stub_site(self, page_count, delay=0.0):
+        """Serve a linked site locally and crawl it, returning request stats."""
+        from aiohttp import web
+        from aiohttp.test_utils import TestServer
+
+        stats = {'active': 0, 'max_active': 0, 'requests': 0}
+
+        async def handle_missing(request):
+            return web.Response(status=404)
+
+        async def handle_page(request):
+            stats['requests'] += 1
+            stats['active'] += 1
+            stats['max_active'] = max(stats['max_active'], stats['active'])
+            await asyncio.sleep(0.05)
+            stats['active'] -= 1
+            links = ''.join(f'<a href="/page{i}">p{i}</a>' for i in range(page_count))
+            return web.Response(text=f'<html><head><title>{request.path}</title></head>'
+                                     f'<body>{links}</body></html>', content_type='text/html')
+
+        app = web.Application()
+        app.router.add_get('/robots.txt', handle_missing)
+        app.router.add_get('/{name}', handle_page)
+
+        async with TestServer(app) as server:
+            job = self.service.create_crawl_job(
+                name="Stub Crawl",
+                start_urls=[str(server.make_url('/page0'))],
+                max_pages=page_count,
+                max_depth=2,
+                delay=delay
+            )
+            async with self.service:
+                started = time.monotonic()
+                result = await self.service.run_crawl_job(job.job_id)
+                stats['elapsed'] = time.monotonic() - started
+        stats['result'] = result
+        stats['job'] = self.service.get_crawl_job(job.job_id)
+        return stats
+
+    def test_workers_fetch_concurrently(self):
+        """Test that workers crawl pages in parallel within the in-flight cap."""
+        stats = asyncio.run(self._crawl_stub_site(page_count=10))
+
+        self.assertTrue(stats['result'])
+        self.assertEqual(stats['job'].status, "completed")
+        self.assertEqual(stats['job'].pages_crawled, 10)
+        self.assertGreater(stats['max_active'], 1)
+        self.assertLessEqual(stats['max_active'], 3)
+
+    def test_per_host_delay_serializes_requests(self):
+        """Test that job.delay is enforced per host despite multiple workers."""
+        stats = asyncio.run(self._crawl_stub_site(page_count=4, delay=0.1))
+
+        self.assertEqual(stats['job'].pages_crawled, 4)
+        self.assertEqual(stats['max_active'], 1)
+        self.assertGreaterEqual(stats['elapsed'], 0.3)
+
+    def test_host_rate_limiter(self):
+        """Test token bucket reservations per host."""
+        limiter = HostRateLimiter()
+
+        self.assertEqual(limiter.reserve("a.com", 1.0), 0)
+        self.assertAlmostEqual(limiter.reserve("a.com", 1.0), 1.0, places=2)
+        self.assertAlmostEqual(limiter.reserve("a.com", 1.0), 2.0, places=2)
+        self.assertEqual(limiter.reserve("b.com", 1.0), 0)
+
+class TestCrawlFrontier(unittest.TestCase):
+    """Test in-memory frontier, Bloom filter dedup and URL normalization."""
+
+    def setUp(self):
+        """Set up test database."""
+        self.temp_db = tempfile.NamedTemporaryFile(delete=False)
+        self.temp_db.close()
+        self.db = WebCrawlerDatabase(self.temp_db.name)
+
+    def tearDown(self):
+        """Clean up test database."""
+        os.unlink(self.temp_db.name)
+
+    def test_normalize_url(self):
+        """Test URL normalization."""
+        self.assertEqual(normalize_url("HTTP://Example.COM:80"), "http://example.com/")
+        self.assertEqual(normalize_url("https://example.com:443/a?b=1#frag"),
+                         "https://example.com/a?b=1")
+        self.assertEqual(normalize_url("https://example.com:8443/a"),
+                         "https://example.com:8443/a")
+
+    def test_scalable_bloom_filter(self):
+        """Test Bloom filter has no false negatives and grows past capacity."""
+        bloom = ScalableBloomFilter(initial_capacity=1000, error_rate=0.01)
+        for i in range(5000):
+            bloom.add(f"https://example.com/{i}")
+
+        self.assertGreater(len(bloom), 4950)
+        self.assertGreater(len(bloom.filters), 1)
+        self.assertTrue(all(f"https://example.com/{i}" in bloom for i in range(5000)))
+        false_positives = sum(f"https://other.com/{i}" in bloom for i in range(5000))
+        self.assertLess(false_positives, 100)
+
+    def test_frontier_dedup_and_priority(self):
+        """Test frontier deduplicates normalized URLs and pops by priority."""
+        frontier = CrawlFrontier(self.db, "job1")
+
+        self.assertTrue(frontier.add("https://example.com/low", 2, priority=1))
+        self.assertTrue(frontier.add("https://example.com/high", 1, priority=9))
+        self.assertFalse(frontier.add("https://EXAMPLE.com/high#section", 1, priority=9))
+
+        self.assertEqual(frontier.pop()[0], "https://example.com/high")
+        self.assertEqual(frontier.pop()[0], "https://example.com/low")
+        self.assertIsNone(frontier.pop())
+
+    def test_frontier_spills_per_job(self):
+        """Test jobs sharing URLs each spill and reload their own queue rows."""
+        urls = [f"https://example.com/{i}" for i in range(10)]
+        popped = {}
+        for job_id in ("job1", "job2"):
+            frontier = CrawlFrontier(self.db, job_id, max_in_memory=4)
+            for i, url in enumerate(urls):
+                frontier.add(url, 1, priority=i)
+            self.assertEqual(len(frontier), 10)
+            popped[job_id] = []
+            while True:
+                entry = frontier.pop()
+                if not entry:
+                    break
+                popped[job_id].append(entry[0])
+            frontier.close()
+
+        self.assertEqual(sorted(popped["job1"]), sorted(urls))
+        self.assertEqual(sorted(popped["job2"]), sorted(urls))
+        self.assertEqual(len(self.db.get_crawl_queue_urls("job2")), 10)
+
+    def test_crawl_queue_key_migrated(self):
+        """Test a queue keyed on url alone is rebuilt with a (job_id, url) key."""
+        conn = sqlite3.connect(self.temp_db.name)
+        conn.execute("DROP TABLE crawl_queue")
+        conn.execute("""
+            CREATE TABLE crawl_queue (url TEXT PRIMARY KEY, job_id TEXT NOT NULL, depth INTEGER DEFAULT 0,
+                parent_url TEXT, priority INTEGER DEFAULT 0,
+                added_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, status TEXT DEFAULT 'pending')
+        """)
+        conn.execute("INSERT INTO crawl_queue (url, job_id) VALUES ('https://example.com/', 'job1')")
+        conn.commit()
+        conn.close()
+
+        db = WebCrawlerDatabase(self.temp_db.name)
+        db.add_to_crawl_queue("https://example.com/", "job2")
+        self.assertEqual(db.get_crawl_queue_urls("job1"), [("https://example.com/", "pending")])
+        self.assertEqual(db.get_crawl_queue_urls("job2"), [("https://example.com/", "pending")])
+
+    def test_frontier_spills_and_reloads(self):
+        """Test frontier spills to SQLite and reloads in priority order."""
+        frontier = CrawlFrontier(self.db, "job1", max_in_memory=10)
+        for i in range(30):
+            frontier.add(f"https://example.com/{i}", 1, priority=i)
+
+        self.assertLessEqual(len(frontier.heap), 10)
+        self.assertEqual(len(frontier), 30)
+
+        priorities = []
+        while True:
+            entry = frontier.pop()
+            if not entry:
+                break
+            priorities.append(int(entry[0].rsplit('/', 1)[1]))
+        self.assertEqual(priorities, sorted(range(30), reverse=True))
+
+    def test_frontier_persists_and_resumes(self):
+        """Test closed frontier persists pending URLs and resumes dedup state."""
+        frontier = CrawlFrontier(self.db, "job1")
+        frontier.add("https://example.com/a", 1)
+        frontier.add("https://example.com/b", 1)
+        url = frontier.pop()[0]
+        frontier.complete(url)
+        frontier.close()
+
+        resumed = CrawlFrontier(self.db, "job1")
+        self.assertFalse(resumed.add("https://example.com/a", 1))
+        self.assertEqual(len(resumed), 1)
+        self.assertIsNotNone(resumed.pop())
+        self.assertIsNone(resumed.pop())
+
+    def test_frontier_throughput(self):
+        """Test frontier admits a hundred thousand URLs quickly."""
+        frontier = CrawlFrontier(self.db, "job1", max_in_memory=50000)
+        start_time = time.time()
+        for i in range(100000):
+            frontier.add(f"https://example.com/page/{i}", 2, priority=i % 10)
+        for i in range(0, 100000, 2):
+            frontier.add(f"https://example.com/page/{i}", 2)  # Duplicates are rejected
+        elapsed = time.time() - start_time
+
+        # A handful of Bloom filter false positives are expected at this scale
+        self.assertGreater(len(frontier), 99950)
+        self.assertLessEqual(len(frontier), 100000)
+        self.assertLess(elapsed, 20.0)
+
+def build_html_corpus(page_count=100, paragraphs=200):
+    """Build a fixed corpus of synthetic HTML pages for parsing benchmarks."""
+    corpus = []
+    for i in range(page_count):
+        body = ''.join(
+            f'<p>Paragraph {j} of page {i} &amp; some <b>bold</b> text.</p>'
+            f'<a href="/page{i}/{j}">link {j}</a><img src="/img/{i}/{j}.png">'
+            for j in range(paragraphs)
+        )
+        corpus.append(
+            f'<html><head><title>Page {i}</title>'
+            f'<meta name="description" content="Description {i}">'
+            f'<style>p {{ color: red; }}</style></head>'
+            f'<body>{body}<script>var x = "<p>not text</p>";</script></body></html>'
+        )
+    return corpus
+
+class TestParsingPerformance(unittest.TestCase):
+    """Test single-pass extraction and process pool parsing."""
+
+    def setUp(self):
+        """Set up test service."""
+        self.temp_db = tempfile.NamedTemporaryFile(delete=False)
+        self.temp_db.close()
+        self.service = WebCrawlerService(self.temp_db.name, parse_workers=2,
+                                         parse_offload_bytes=1024)
+        self.corpus = build_html_corpus()
+
+    def tearDown(self):
+        """Clean up test service."""
+        os.unlink(self.temp_db.name)
+
+    def test_single_pass_extraction(self):
+        """Test extractor output on a corpus page."""
+        extracted = extract_page_content(self.corpus[3])
+
+        self.assertEqual(extracted['title'], "Page 3")
+        self.assertEqual(extracted['meta_description'], "Description 3")
+        self.assertEqual(len(extracted['links']), 200)
+        self.assertEqual(len(extracted['images']), 200)
+        self.assertIn("Paragraph 0 of page 3 & some bold text.", extracted['content'])
+        self.assertNotIn("not text", extracted['content'])
+        self.assertNotIn("color", extracted['content'])
+
+    def test_inline_parsing_throughput(self):
+        """Benchmark pages/sec for inline extraction on the fixed corpus."""
+        start_time = time.time()
+        for html in self.corpus:
+            self.service.extract_content(html)
+        elapsed = time.time() - start_time
+
+        pages_per_second = len(self.corpus) / elapsed
+        self.assertGreater(pages_per_second, 20)
+
+    def test_process_pool_parsing(self):
+        """Test pooled parsing matches inline results and keeps the loop free."""
+        async def parse_corpus():
+            async with self.service:
+                self.assertIsNotNone(self.service.parse_pool)
+                ticks = 0
+                parsing = asyncio.gather(*(self.service.parse_html(html) for html in self.corpus))
+                while not parsing.done():
+                    ticks += 1
+                    await asyncio.sleep(0.001)
+                return await parsing, ticks
+
+        results, ticks = asyncio.run(parse_corpus())
+
+        self.assertEqual(results, [extract_page_content(html) for html in self.corpus])
+        self.assertGreater(ticks, 1)  # Event loop kept running while pages parsed
+        self.assertIsNone(self.service.parse_pool)
+
+class TestFullTextSearch(unittest.TestCase):
+    """Test the FTS5-backed page search."""
+
+    def setUp(self):
+        """Set up test service."""
+        self.temp_db = tempfile.NamedTemporaryFile(delete=False)
+        self.temp_db.close()
+        self.service = WebCrawlerService(self.temp_db.name)
+
+    def tearDown(self):
+        """Clean up test service."""
+        os.unlink(self.temp_db.name)
+
+    def test_title_matches_rank_first(self):
+        """Test BM25 ranking boosts title matches and returns snippets."""
+        self.service.db.save_web_page(WebPage(
+            url="https://example.com/body",
+            title="Gardening",
+            content="Tips on watering plants. Python snakes live in gardens too."
+        ))
+        self.service.db.save_web_page(WebPage(
+            url="https://example.com/title",
+            title="Python Tutorial",
+            content="Learn to program step by step."
+        ))
+
+        results = self.service.search_pages("python")
+
+        self.assertEqual([page.url for page in results],
+                         ["https://example.com/title", "https://example.com/body"])
+        self.assertIn("<b>Python</b>", results[1].snippet)
+
+    def test_resaved_page_is_reindexed(self):
+        """Test saving a page again replaces its index entry."""
+        page = WebPage(url="https://example.com", title="Old", content="obsolete words")
+        self.service.db.save_web_page(page)
+        page.content = "fresh words"
+        self.service.db.save_web_page(page)
+
+        self.assertEqual(self.service.search_pages("obsolete"), [])
+        self.assertEqual(len(self.service.search_pages("fresh")), 1)
+        self.assertEqual(len(self.service.search_pages("words")), 1)
+
+    def test_prefix_and_special_characters(self):
+        """Test prefix matching and that FTS syntax in queries is neutralized."""
+        self.service.db.save_web_page(WebPage(url="https://example.com", content="programming languages"))
+
+        self.assertEqual(len(self.service.search_pages("program")), 1)
+        self.assertEqual(len(self.service.search_pages('program" OR "x')), 0)
+        self.assertEqual(self.service.search_pages("!!!"), [])
+
+    def test_existing_pages_indexed_on_upgrade(self):
+        """Test pages saved before the index existed are indexed at startup."""
+        import sqlite3
+        conn = sqlite3.connect(self.temp_db.name)
+        conn.execute("DROP TABLE web_pages_fts")
+        conn.execute("INSERT INTO web_pages (url, title, content) VALUES (?, ?, ?)",
+                     ("https://example.com/legacy", "Legacy", "archived content"))
+        conn.commit()
+        conn.close()
+
+        service = WebCrawlerService(self.temp_db.name)
+        results = service.search_pages("archived")
+        self.assertEqual([page.url for page in results], ["https://example.com/legacy"])
+
+    def test_index_survives_vacuum(self):
+        """Test search results still match their pages after VACUUM."""
+        for name in ("alpha", "beta", "gamma"):
+            self.service.db.save_web_page(WebPage(url=f"https://example.com/{name}", content=f"{name} words"))
+        # Re-saving leaves a gap in the ids that VACUUM must not close
+        self.service.db.save_web_page(WebPage(url="https://example.com/alpha", content="alpha words again"))
+        import sqlite3
+        conn = sqlite3.connect(self.temp_db.name)
+        conn.execute("VACUUM")
+        conn.close()
+
+        for name in ("alpha", "beta", "gamma"):
+            self.assertEqual([page.url for page in self.service.search_pages(name)],
+                             [f"https://example.com/{name}"])
+
+    def test_legacy_pages_table_migrated(self):
+        """Test a web_pages table keyed on url gains page_id and is reindexed."""
+        import sqlite3
+        conn = sqlite3.connect(self.temp_db.name)
+        conn.execute("DROP TABLE web_pages_fts")
+        conn.execute("DROP TABLE web_pages")
+        conn.execute("CREATE TABLE web_pages (url TEXT PRIMARY KEY, title TEXT, content TEXT, "
+                     "html_content TEXT, meta_description TEXT, meta_keywords TEXT, links TEXT, images TEXT, "
+                     "status_code INTEGER, content_type TEXT, content_length INTEGER, last_modified TIMESTAMP, "
+                     "crawl_timestamp TIMESTAMP, depth INTEGER, parent_url TEXT, page_hash TEXT, "
+                     "is_duplicate BOOLEAN)")
+        conn.execute("INSERT INTO web_pages (url, title, content) VALUES (?, ?, ?)",
+                     ("https://example.com/legacy", "Legacy", "archived content"))
+        conn.commit()
+        conn.close()
+
+        service = WebCrawlerService(self.temp_db.name)
+        conn = sqlite3.connect(self.temp_db.name)
+        columns = {row[1]: row[5] for row in conn.execute("PRAGMA table_info(web_pages)")}
+        conn.close()
+        self.assertEqual(columns['page_id'], 1)
+        self.assertEqual([page.url for page in service.search_pages("archived")], ["https://example.com/legacy"])
+        self.assertEqual(service.db.get_web_page("https://example.com/legacy").title, "Legacy")
+
+    def test_search_latency_on_large_corpus(self):
+        """Test search stays fast as the corpus grows."""
+        import sqlite3
+        conn = sqlite3.connect(self.temp_db.name)
+        cursor = conn.cursor()
+        for i in range(20000):
+            self.service.db._write_web_page(cursor, WebPage(
+                url=f"https://example.com/{i}",
+                title=f"Page {i}",
+                content=f"common filler text for page number {i}" + (" needle" if i % 5000 == 0 else "")
+            ))
+        conn.commit()
+        conn.close()
+
+        start_time = time.time()
+        for _ in range(50):
+            results = self.service.search_pages("needle")
+        elapsed = time.time() - start_time
+
+        self.assertEqual(len(results), 4)
+        self.assertLess(elapsed, 1.0)
+
+ARTICLE_TEXT = " ".join(
+    f"sentence {i} describes the crawler architecture and its politeness rules in detail"
+    for i in range(40)
+)
+
+class TestNearDuplicateDetection(unittest.TestCase):
+    """Test SimHash fingerprints and the banded near-duplicate index."""
+
+    def setUp(self):
+        """Set up test service."""
+        self.temp_db = tempfile.NamedTemporaryFile(delete=False)
+        self.temp_db.close()
+        self.service = WebCrawlerService(self.temp_db.name)
+
+    def tearDown(self):
+        """Clean up test service."""
+        os.unlink(self.temp_db.name)
+
+    def test_simhash_distance(self):
+        """Test lightly edited text stays close and unrelated text does not."""
+        original = compute_simhash(ARTICLE_TEXT)
+        edited = compute_simhash(ARTICLE_TEXT.replace("sentence 7 ", "sentence seven "))
+        unrelated = compute_simhash(" ".join(f"recipe step {i} adds flour sugar and eggs" for i in range(40)))
+
+        self.assertLessEqual(hamming_distance(original, edited), 3)
+        self.assertGreater(hamming_distance(original, unrelated), 10)
+        self.assertEqual(compute_simhash(""), 0)
+
+    def test_index_lookup(self):
+        """Test banded lookup finds fingerprints within the distance threshold."""
+        index = SimHashIndex(max_distance=3)
+        index.add(0xF0F0F0F0F0F0F0F0, "https://a.com")
+
+        self.assertEqual(index.find_near_duplicate(0xF0F0F0F0F0F0F0F0 ^ 0b10101), "https://a.com")
+        self.assertIsNone(index.find_near_duplicate(0xF0F0F0F0F0F0F0F0 ^ 0b11111))
+        self.assertIsNone(index.find_near_duplicate(0xF0F0F0F0F0F0F0F0, exclude_url="https://a.com"))
+        self.assertIsNone(index.find_near_duplicate(0))
+
+    def test_index_remove(self):
+        """Test removing a fingerprint drops it from every band."""
+        index = SimHashIndex(max_distance=3)
+        index.add(0xF0F0F0F0F0F0F0F0, "https://a.com")
+        index.add(0x0F0F0F0F0F0F0F0F, "https://b.com")
+
+        index.remove(0xF0F0F0F0F0F0F0F0, "https://a.com")
+        index.remove(0xF0F0F0F0F0F0F0F0, "https://missing.com")
+        self.assertEqual(len(index), 1)
+        self.assertIsNone(index.find_near_duplicate(0xF0F0F0F0F0F0F0F0))
+        self.assertEqual(index.find_near_duplicate(0x0F0F0F0F0F0F0F0F), "https://b.com")
+
+    def test_index_lookup_latency(self):
+        """Test lookups stay sub-millisecond with many fingerprints indexed."""
+        import random
+        rng = random.Random(42)
+        index = SimHashIndex()
+        for i in range(100000):
+            index.add(rng.getrandbits(64), f"https://example.com/{i}")
+
+        probes = [rng.getrandbits(64) for _ in range(1000)]
+        start_time = time.time()
+        for probe in probes:
+            index.find_near_duplicate(probe)
+        elapsed = time.time() - start_time
+
+        self.assertLess(elapsed / len(probes), 0.001)
+
+    def test_fingerprints_reloaded_from_database(self):
+        """Test stored fingerprints seed the index for a new service."""
+        simhash = compute_simhash(ARTICLE_TEXT)
+        self.service.db.save_web_page(WebPage(url="https://a.com", content=ARTICLE_TEXT, simhash=simhash))
+
+        self.assertEqual(self.service.db.get_web_page("https://a.com").simhash, simhash)
+        service = WebCrawlerService(self.temp_db.name)
+        self.assertEqual(service.get_simhash_index().find_near_duplicate(simhash), "https://a.com")
+
+    @patch('aiohttp.ClientSession.get')
+    def test_recrawl_replaces_fingerprint(self, mock_get):
+        """Test a recrawled page's old fingerprint leaves the index."""
+        original = compute_simhash(ARTICLE_TEXT)
+        self.service.db.save_web_page(WebPage(url="https://a.com/doc", content=ARTICLE_TEXT, simhash=original))
+        index = self.service.get_simhash_index()
+
+        mock_response = AsyncMock()
+        mock_response.status = 200
+        mock_response.headers = {'content-type': 'text/html'}
+        mock_response.text = AsyncMock(return_value=(
+            '<html><body><p>' + " ".join(f"recipe step {i} adds flour sugar and eggs" for i in range(40))
+            + '</p></body></html>'))
+        mock_get.return_value.__aenter__.return_value = mock_response
+
+        async def refresh():
+            async with self.service:
+                return await self.service.refresh_page("https://a.com/doc")
+
+        self.assertEqual(asyncio.run(refresh()), 'updated')
+        self.assertEqual(len(index), 1)
+        self.assertIsNone(index.find_near_duplicate(original))
+
+    @patch('aiohttp.ClientSession.get')
+    def test_mirrored_page_not_expanded(self, mock_get):
+        """Test near-duplicate pages are flagged, stored without body and not expanded."""
+        mock_response = AsyncMock()
+        mock_response.status = 200
+        mock_response.headers = {'content-type': 'text/html'}
+        mock_get.return_value.__aenter__.return_value = mock_response
+
+        job = CrawlJob(job_id="job1", name="Test", start_urls=["https://a.com"], max_depth=3)
+
+        async def crawl_both():
+            async with self.service:
+                mock_response.text = AsyncMock(return_value=(
+                    f'<html><body><p>{ARTICLE_TEXT}</p><a href="/next">next</a></body></html>'))
+                original = await self.service.crawl_page("https://a.com/doc", job)
+                mock_response.text = AsyncMock(return_value=(
+                    f'<html><body><p>{ARTICLE_TEXT} Mirrored copy.</p>'
+                    f'<a href="/mirror-only">more</a></body></html>'))
+                mirror = await self.service.crawl_page("https://mirror.com/doc", job)
+                return original, mirror
+
+        original, mirror = asyncio.run(crawl_both())
+
+        self.assertFalse(original.is_duplicate)
+        self.assertTrue(mirror.is_duplicate)
+        self.assertEqual(self.service.db.get_web_page("https://mirror.com/doc").html_content, "")
+        frontier = self.service.get_frontier("job1")
+        self.assertFalse(frontier.add("https://a.com/next", 1))
+        self.assertTrue(frontier.add("https://mirror.com/mirror-only", 1))
+
+class TestConditionalRecrawl(unittest.TestCase):
+    """Test conditional re-crawling and compressed page storage."""
+
+    def setUp(self):
+        """Set up test service."""
+        self.temp_db = tempfile.NamedTemporaryFile(delete=False)
+        self.temp_db.close()
+        self.service = WebCrawlerService(self.temp_db.name)
+
+    def tearDown(self):
+        """Clean up test service."""
+        os.unlink(self.temp_db.name)
+
+    def test_html_stored_compressed(self):
+        """Test HTML is compressed at rest and decompressed transparently."""
+        import sqlite3
+        corpus = build_html_corpus(page_count=20)
+        for i, html in enumerate(corpus):
+            self.service.db.save_web_page(WebPage(url=f"https://example.com/{i}", html_content=html))
+
+        conn = sqlite3.connect(self.temp_db.name)
+        stored_bytes = conn.execute("SELECT SUM(LENGTH(html_content)) FROM web_pages").fetchone()[0]
+        conn.close()
+        raw_bytes = sum(len(html.encode('utf-8')) for html in corpus)
+
+        self.assertLess(stored_bytes, raw_bytes * 0.2)
+        self.assertEqual(self.service.db.get_web_page("https://example.com/3").html_content, corpus[3])
+
+    def test_uncompressed_rows_still_readable(self):
+        """Test rows written before compression are returned unchanged."""
+        import sqlite3
+        conn = sqlite3.connect(self.temp_db.name)
+        conn.execute("INSERT INTO web_pages (url, html_content) VALUES (?, ?)",
+                     ("https://example.com", "<html>plain</html>"))
+        conn.commit()
+        conn.close()
+
+        self.assertEqual(self.service.db.get_web_page("https://example.com").html_content,
+                         "<html>plain</html>")
+
+    async def _run_stub_origin(self, pages, scenario):
+        """Serve pages with ETag/Last-Modified validators and run a scenario."""
+        from aiohttp import web
+        from aiohttp.test_utils import TestServer
+
+        counts = {'200': 0, '304': 0}
+
+        async def handle_missing(request):
+            return web.Response(status=404)
+
+        async def handle_page(request):
+            body = pages[request.path]
+            etag = '"%s"' % hashlib.md5(body.encode()).hexdigest()
+            if request.headers.get('If-None-Match') == etag:
+                counts['304'] += 1
+                return web.Response(status=304)
+            counts['200'] += 1
+            return web.Response(text=body, content_type='text/html', headers={
+                'ETag': etag, 'Last-Modified': 'Wed, 01 Jan 2025 00:00:00 GMT'})
+
+        app = web.Application()
+        app.router.add_get('/robots.txt', handle_missing)
+        app.router.add_get('/{name}', handle_page)
+
+        async with TestServer(app) as server:
+            async with self.service:
+                await scenario(server)
+        return counts
+
+    def test_recrawl_skips_unchanged_pages(self):
+        """Test unchanged pages revalidate with 304 and changed pages are updated."""
+        pages = {f'/page{i}': f'<html><body><p>Story number {i} about topic {i * 7}.</p></body></html>'
+                 for i in range(30)}
+        job = CrawlJob(job_id="job1", name="Test", start_urls=[], max_depth=0, delay=0.0)
+        outcome = {}
+
+        async def scenario(server):
+            for path in pages:
+                await self.service.crawl_page(str(server.make_url(path)), job)
+            stored = self.service.db.get_web_page(str(server.make_url('/page0')))
+            outcome['etag'] = stored.etag
+            outcome['last_modified'] = stored.last_modified
+
+            pages['/page0'] = '<html><body><p>Completely rewritten article text.</p></body></html>'
+            started = time.monotonic()
+            outcome['results'] = await self.service.recrawl_pages(timedelta(seconds=0))
+            outcome['elapsed'] = time.monotonic() - started
+            outcome['page0'] = self.service.db.get_web_page(str(server.make_url('/page0')))
+
+        counts = asyncio.run(self._run_stub_origin(pages, scenario))
+
+        self.assertTrue(outcome['etag'])
+        self.assertEqual(outcome['last_modified'].year, 2025)
+        self.assertEqual(outcome['results'],
+                         {'checked': 30, 'unchanged': 29, 'updated': 1, 'failed': 0})
+        self.assertEqual(counts, {'200': 31, '304': 29})
+        self.assertIn("rewritten", outcome['page0'].content)
+        self.assertLess(outcome['elapsed'], 5.0)
+
+class TestRobotsCaching(unittest.TestCase):
+    """Test robots.txt caching, crawl-delay and connection reuse."""
+
+    def setUp(self):
+        """Set up test database."""
+        self.temp_db = tempfile.NamedTemporaryFile(delete=False)
+        self.temp_db.close()
+
+    def tearDown(self):
+        """Clean up test database."""
+        os.unlink(self.temp_db.name)
+
+    async def _crawl_single_host(self, service, page_count, robots_body="User-agent: *\nDisallow: /private",
+                                 sequential=False):
+        """Crawl a local host and count robots.txt fetches and TCP connections."""
+        from aiohttp import web
+        from aiohttp.test_utils import TestServer
+
+        stats = {'robots': 0, 'pages': 0, 'connections': set()}
+
+        async def handle_robots(request):
+            stats['robots'] += 1
+            return web.Response(text=robots_body)
+
+        async def handle_page(request):
+            stats['pages'] += 1
+            stats['connections'].add(id(request.transport))
+            return web.Response(text=f'<html><body>{request.path}</body></html>', content_type='text/html')
+
+        app = web.Application()
+        app.router.add_get('/robots.txt', handle_robots)
+        app.router.add_get('/{name}', handle_page)
+
+        job = CrawlJob(job_id="job1", name="Test", start_urls=[], max_depth=0, delay=0.0)
+        async with TestServer(app) as server:
+            async with service:
+                urls = [str(server.make_url(f'/page{i}')) for i in range(page_count)]
+                started = time.monotonic()
+                if sequential:
+                    pages = [await service.crawl_page(url, job) for url in urls]
+                else:
+                    pages = await asyncio.gather(*(service.crawl_page(url, job) for url in urls))
+                stats['elapsed'] = time.monotonic() - started
+                stats['blocked'] = not await service.check_robots_txt(str(server.make_url('/private')))
+        stats['crawled'] = sum(1 for page in pages if page)
+        return stats
+
+    def test_robots_fetched_once_per_host(self):
+        """Test politeness checks reuse one robots.txt fetch and pooled connections."""
+        service = WebCrawlerService(self.temp_db.name, connections_per_host=4)
+        stats = asyncio.run(self._crawl_single_host(service, 40))
+
+        self.assertEqual(stats['crawled'], 40)
+        self.assertEqual(stats['robots'], 1)
+        self.assertTrue(stats['blocked'])
+        self.assertLessEqual(len(stats['connections']), 4)
+
+    def test_cached_robots_faster_than_uncached(self):
+        """Measure requests/sec to one host with and without the robots cache."""
+        cached = asyncio.run(self._crawl_single_host(
+            WebCrawlerService(self.temp_db.name), 100, sequential=True))
+        os.unlink(self.temp_db.name)
+        uncached = asyncio.run(self._crawl_single_host(
+            WebCrawlerService(self.temp_db.name, robots_ttl=0), 100, sequential=True))
+
+        self.assertEqual(cached['robots'], 1)
+        self.assertGreaterEqual(uncached['robots'], 100)
+        cached_rps = cached['crawled'] / cached['elapsed']
+        uncached_rps = uncached['crawled'] / uncached['elapsed']
+        self.assertGreater(cached_rps, uncached_rps)
+
+    def test_crawl_delay_and_persisted_cache(self):
+        """Test Crawl-delay is parsed and robots.txt is reused from the database."""
+        robots = "User-agent: *\nCrawl-delay: 0.05\nDisallow: /private"
+        service = WebCrawlerService(self.temp_db.name)
+        stats = asyncio.run(self._crawl_single_host(service, 3, robots_body=robots))
+        self.assertEqual(stats['robots'], 1)
+        self.assertGreaterEqual(stats['elapsed'], 0.1)  # Three requests 50ms apart
+
+        restarted = WebCrawlerService(self.temp_db.name)
+
+        async def check_without_network():
+            restarted.session = Mock()  # Any fetch would fail loudly
+            domain = next(iter(service.robots_cache))
+            allowed = await restarted.check_robots_txt(f"{domain}/public")
+            blocked = await restarted.check_robots_txt(f"{domain}/private/page")
+            return allowed, blocked, restarted.robots_crawl_delay(f"{domain}/public")
+
+        allowed, blocked, delay = asyncio.run(check_without_network())
+        self.assertTrue(allowed)
+        self.assertFalse(blocked)
+        self.assertEqual(delay, 0.05)
+        restarted.session.get.assert_not_called()
+
+    def test_robots_fetch_failures_retried_soon(self):
+        """Test 5xx robots.txt disallows crawling briefly and is not persisted."""
+        from aiohttp import web
+        from aiohttp.test_utils import TestServer
+
+        statuses = [503, 200]
+
+        async def handle_robots(request):
+            status = statuses.pop(0)
+            if status != 200:
+                return web.Response(status=status)
+            return web.Response(text="User-agent: *\nDisallow: /private")
+
+        async def run():
+            app = web.Application()
+            app.router.add_get('/robots.txt', handle_robots)
+            service = WebCrawlerService(self.temp_db.name, robots_retry_ttl=0.05)
+            async with TestServer(app) as server:
+                async with service:
+                    url = str(server.make_url('/public'))
+                    blocked = not await service.check_robots_txt(url)
+                    domain = next(iter(service.robots_cache))
+                    persisted = service.db.get_robots_txt(domain)
+                    await asyncio.sleep(0.1)
+                    allowed = await service.check_robots_txt(url)
+            return blocked, persisted, allowed
+
+        blocked, persisted, allowed = asyncio.run(run())
+        self.assertTrue(blocked)
+        self.assertIsNone(persisted)
+        self.assertTrue(allowed)
+        self.assertEqual(statuses, [])
+
+    def test_robots_failure_not_persisted_with_equal_ttls(self):
+        """Test a 5xx robots.txt is not saved even when both TTLs match."""
+        from aiohttp import web
+        from aiohttp.test_utils import TestServer
+
+        async def handle_robots(request):
+            return web.Response(status=500)
+
+        async def run():
+            app = web.Application()
+            app.router.add_get('/robots.txt', handle_robots)
+            service = WebCrawlerService(self.temp_db.name, robots_ttl=60, robots_retry_ttl=60)
+            async with TestServer(app) as server:
+                async with service:
+                    blocked = not await service.check_robots_txt(str(server.make_url('/public')))
+                    return blocked, service.db.get_robots_txt(next(iter(service.robots_cache)))
+
+        blocked, persisted = asyncio.run(run())
+        self.assertTrue(blocked)
+        self.assertIsNone(persisted)
+
+    def test_parse_crawl_delay(self):
+        """Test Crawl-delay parsing prefers the crawler's own group."""
+        robots = ("User-agent: *\nCrawl-delay: 2\n\n"
+                  "User-agent: WebCrawler\nUser-agent: OtherBot\nCrawl-delay: 0.5\nDisallow: /x")
+
+        self.assertEqual(parse_crawl_delay(robots, WebCrawlerService.USER_AGENT), 0.5)
+        self.assertEqual(parse_crawl_delay(robots, "SomeoneElse/2.0"), 2.0)
+        self.assertEqual(parse_crawl_delay("User-agent: *\nDisallow: /", "x"), 0.0)
+
+class TestBatchedWrites(unittest.TestCase):
+    """Test write-behind batching of crawl progress."""
+
+    def setUp(self):
+        """Set up test database."""
+        self.temp_db = tempfile.NamedTemporaryFile(delete=False)
+        self.temp_db.close()
+        self.db = WebCrawlerDatabase(self.temp_db.name)
+
+    def tearDown(self):
+        """Clean up test database."""
+        os.unlink(self.temp_db.name)
+
+    def count_pages(self):
+        """Count stored page rows."""
+        conn = sqlite3.connect(self.temp_db.name)
+        count = conn.execute("SELECT COUNT(*) FROM web_pages").fetchone()[0]
+        conn.close()
+        return count
+
+    def make_page(self, i):
+        """Build a page for batch writes."""
+        return WebPage(url=f"https://example.com/{i}", title=f"Page {i}",
+                       content=ARTICLE_TEXT, html_content=f"<p>{ARTICLE_TEXT}</p>")
+
+    def test_buffer_flushes_by_page_count(self):
+        """Test the buffer writes once enough pages are pending."""
+        buffer = CrawlWriteBuffer(self.db, "job1", flush_pages=3, flush_interval=60)
+        for i in range(2):
+            buffer.add_page(self.make_page(i))
+            buffer.maybe_flush()
+        self.assertIsNone(self.db.get_web_page("https://example.com/0"))
+
+        buffer.add_page(self.make_page(2))
+        buffer.maybe_flush()
+        self.assertFalse(buffer.has_pending())
+        self.assertIsNotNone(self.db.get_web_page("https://example.com/0"))
+        self.assertEqual(self.count_pages(), 3)
+
+    def test_failed_flush_keeps_buffer(self):
+        """Test buffered rows survive a failed write."""
+        buffer = CrawlWriteBuffer(self.db, "job1")
+        buffer.add_page(self.make_page(0))
+        with patch.object(self.db, 'write_crawl_batch', return_value=False):
+            self.assertFalse(buffer.flush())
+        self.assertTrue(buffer.has_pending())
+
+        self.assertTrue(buffer.flush())
+        self.assertIsNotNone(self.db.get_web_page("https://example.com/0"))
+
+    def test_resume_after_crash(self):
+        """Test a job interrupted before flushing resumes from its last batch."""
+        job = CrawlJob(job_id="job1", name="Crash", start_urls=[], max_pages=10,
+                       max_depth=2, delay=0, respect_robots=False,
+                       follow_external=False, content_filters=[], status="running")
+        self.db.save_crawl_job(job)
+        frontier = CrawlFrontier(self.db, "job1")
+        frontier.buffer.job = job
+        for name in ("a", "b", "c"):
+            frontier.add(f"https://example.com/{name}", 1)
+
+        url = frontier.pop()[0]
+        frontier.buffer.add_page(WebPage(url=url, title="A"))
+        frontier.complete(url)
+        job.pages_crawled = 1
+        frontier.buffer.flush()
+
+        # Crawled but never flushed, then the process dies without close()
+        url = frontier.pop()[0]
+        frontier.buffer.add_page(WebPage(url=url, title="B"))
+        frontier.complete(url)
+        job.pages_crawled = 2
+
+        resumed = CrawlFrontier(self.db, "job1")
+        self.assertEqual(len(resumed), 2)
+        self.assertEqual(self.db.get_crawl_job("job1").pages_crawled, 1)
+        self.assertIsNotNone(self.db.get_web_page("https://example.com/a"))
+        self.assertIsNone(self.db.get_web_page("https://example.com/b"))
+        remaining = {resumed.pop()[0], resumed.pop()[0]}
+        self.assertEqual(remaining, {"https://example.com/b", "https://example.com/c"})
+
+    def test_batched_writes_faster_than_per_page(self):
+        """Test one transaction per batch beats one per page."""
+        pages = [self.make_page(i) for i in range(200)]
+
+        start_time = time.time()
+        for page in pages:
+            self.db.save_web_page(page)
+        per_page_time = time.time() - start_time
+
+        batched = [self.make_page(i + 1000) for i in range(200)]
+        start_time = time.time()
+        self.assertTrue(self.db.write_crawl_batch("job1", batched))
+        batch_time = time.time() - start_time
+
+        self.assertEqual(self.count_pages(), 400)
+        self.assertLess(batch_time, per_page_time / 2)
+
 class TestErrorHandling(unittest.TestCase):
     """Test error handling and edge cases."""
 
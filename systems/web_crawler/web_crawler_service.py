@@ -11,17 +11,25 @@ import asyncio
 import aiohttp
 import sqlite3
 import hashlib
+import heapq
+import itertools
+import math
 import time
 import re
 import urllib.parse
 import urllib.robotparser
+import zlib
+from collections import Counter, defaultdict, deque
 from dataclasses import dataclass, field
 from typing import List, Dict, Set, Optional, Any
-from datetime import datetime, timedelta
-from urllib.parse import urljoin, urlparse
-from bs4 import BeautifulSoup
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from urllib.parse import urljoin, urlparse, urlunparse
 import json
 import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from html.parser import HTMLParser
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -67,6 +75,9 @@ class WebPage:
     parent_url: Optional[str] = None
     page_hash: str = ""
     is_duplicate: bool = False
+    simhash: int = 0  # 64-bit SimHash of the text content, 0 if not computed
+    etag: str = ""
+    snippet: str = ""  # Search result excerpt, not persisted
 
 @dataclass
 class CrawlStats:
@@ -82,11 +93,344 @@ class CrawlStats:
     start_time: Optional[datetime] = None
     end_time: Optional[datetime] = None
 
+class HostRateLimiter:
+    """Per-host token bucket enforcing a minimum interval between requests."""
+    
+    def __init__(self):
+        self.next_slot: Dict[str, float] = {}
+    
+    def reserve(self, host: str, delay: float) -> float:
+        """Reserve the next request slot for a host and return seconds to wait."""
+        now = time.monotonic()
+        slot = max(now, self.next_slot.get(host, now))
+        self.next_slot[host] = slot + max(0.0, delay)
+        return slot - now
+    
+    async def wait(self, host: str, delay: float):
+        """Sleep until the host's next request slot is available."""
+        wait_time = self.reserve(host, delay)
+        if wait_time > 0:
+            await asyncio.sleep(wait_time)
+
+class PageContentParser(HTMLParser):
+    """Single-pass extractor for title, meta tags, links, images and text."""
+    
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.title_parts: List[str] = []
+        self.in_title = False
+        self.title_seen = False
+        self.meta: Dict[str, str] = {}
+        self.links: List[str] = []
+        self.images: List[str] = []
+        self.text_parts: List[str] = []
+        self.skip_depth = 0  # Nesting inside script/style elements
+    
+    def handle_starttag(self, tag, attrs):
+        if tag in ('script', 'style'):
+            self.skip_depth += 1
+        elif tag == 'title' and not self.title_seen:
+            self.in_title = True
+        elif tag == 'meta':
+            attrs = dict(attrs)
+            name = attrs.get('name')
+            if name in ('description', 'keywords') and name not in self.meta:
+                self.meta[name] = (attrs.get('content') or '').strip()
+        elif tag == 'a':
+            href = dict(attrs).get('href') or ''
+            if href.startswith('http') or href.startswith('/'):
+                self.links.append(href)
+        elif tag == 'img':
+            src = dict(attrs).get('src') or ''
+            if src.startswith('http') or src.startswith('/'):
+                self.images.append(src)
+    
+    def handle_endtag(self, tag):
+        if tag in ('script', 'style'):
+            self.skip_depth = max(0, self.skip_depth - 1)
+        elif tag == 'title' and self.in_title:
+            self.in_title = False
+            self.title_seen = True
+    
+    def handle_data(self, data):
+        if self.skip_depth:
+            return
+        self.text_parts.append(data)
+        if self.in_title:
+            self.title_parts.append(data)
+
+SIMHASH_BITS = 64
+
+def compute_simhash(text: str, shingle_size: int = 3) -> int:
+    """Compute a 64-bit SimHash over word shingles of the text.
+    
+    Returns 0 for text without any words, meaning "no fingerprint".
+    """
+    words = re.findall(r'\w+', text.lower())
+    if len(words) < shingle_size:
+        features = Counter(words)
+    else:
+        features = Counter(
+            ' '.join(words[i:i + shingle_size]) for i in range(len(words) - shingle_size + 1)
+        )
+    if not features:
+        return 0
+    
+    weights = [0] * SIMHASH_BITS
+    for feature, weight in features.items():
+        feature_hash = int.from_bytes(
+            hashlib.blake2b(feature.encode('utf-8'), digest_size=8).digest(), 'little'
+        )
+        for bit in range(SIMHASH_BITS):
+            if feature_hash >> bit & 1:
+                weights[bit] += weight
+            else:
+                weights[bit] -= weight
+    
+    simhash = 0
+    for bit in range(SIMHASH_BITS):
+        if weights[bit] > 0:
+            simhash |= 1 << bit
+    return simhash
+
+def compress_html(html: str):
+    """Compress HTML for storage; empty HTML is stored as-is."""
+    return zlib.compress(html.encode('utf-8'), 6) if html else html
+
+def decompress_html(value) -> str:
+    """Decompress stored HTML, passing through rows saved uncompressed."""
+    if isinstance(value, bytes):
+        return zlib.decompress(value).decode('utf-8')
+    return value or ""
+
+def parse_crawl_delay(robots_content: str, agent: str) -> float:
+    """Parse Crawl-delay for an agent from robots.txt, falling back to the * group.
+    
+    urllib.robotparser only understands integer delays, so fractional
+    values like "Crawl-delay: 0.5" are parsed here.
+    """
+    agent = agent.split('/')[0].lower()
+    delays: Dict[str, float] = {}
+    group_agents: List[str] = []
+    in_rules = False
+    for line in robots_content.splitlines():
+        line = line.split('#', 1)[0].strip()
+        if ':' not in line:
+            continue
+        key, value = (part.strip() for part in line.split(':', 1))
+        key = key.lower()
+        if key == 'user-agent':
+            if in_rules:
+                group_agents, in_rules = [], False
+            group_agents.append(value.lower())
+        else:
+            in_rules = True
+            if key == 'crawl-delay':
+                try:
+                    for group_agent in group_agents:
+                        delays[group_agent] = float(value)
+                except ValueError:
+                    pass
+    for group_agent, delay in delays.items():
+        if group_agent != '*' and group_agent in agent:
+            return delay
+    return delays.get('*', 0.0)
+
+def to_signed_64(value: int) -> int:
+    """Map an unsigned 64-bit value onto SQLite's signed INTEGER range."""
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+def to_unsigned_64(value: Optional[int]) -> int:
+    """Inverse of to_signed_64, treating NULL as 0."""
+    return (value or 0) & ((1 << 64) - 1)
+
+def hamming_distance(a: int, b: int) -> int:
+    """Number of differing bits between two fingerprints."""
+    return bin(a ^ b).count('1')
+
+class SimHashIndex:
+    """Banded SimHash index for near-duplicate lookup.
+    
+    Fingerprints are split into max_distance + 1 bands. Two fingerprints
+    within max_distance bits must agree exactly on at least one band, so
+    only fingerprints sharing a band value are compared.
+    """
+    
+    def __init__(self, max_distance: int = 3):
+        self.max_distance = max_distance
+        self.num_bands = max_distance + 1
+        self.band_bits = SIMHASH_BITS // self.num_bands
+        self.band_mask = (1 << self.band_bits) - 1
+        self.bands: List[Dict[int, List[tuple]]] = [defaultdict(list) for _ in range(self.num_bands)]
+        self.size = 0
+    
+    def _band_values(self, simhash: int) -> List[int]:
+        return [(simhash >> (band * self.band_bits)) & self.band_mask
+                for band in range(self.num_bands)]
+    
+    def add(self, simhash: int, url: str):
+        """Index a fingerprint for a URL."""
+        if not simhash:
+            return
+        for band, value in enumerate(self._band_values(simhash)):
+            self.bands[band][value].append((simhash, url))
+        self.size += 1
+    
+    def remove(self, simhash: int, url: str):
+        """Drop a URL's fingerprint, e.g. before indexing its recrawled content."""
+        if not simhash:
+            return
+        removed = False
+        for band, value in enumerate(self._band_values(simhash)):
+            entries = self.bands[band].get(value)
+            if entries and (simhash, url) in entries:
+                entries.remove((simhash, url))
+                removed = True
+                if not entries:
+                    del self.bands[band][value]
+        if removed:
+            self.size -= 1
+    
+    def find_near_duplicate(self, simhash: int, exclude_url: str = None) -> Optional[str]:
+        """Return the URL of an indexed near-duplicate, if any."""
+        if not simhash:
+            return None
+        for band, value in enumerate(self._band_values(simhash)):
+            for candidate, url in self.bands[band].get(value, ()):
+                if url != exclude_url and hamming_distance(candidate, simhash) <= self.max_distance:
+                    return url
+        return None
+    
+    def __len__(self) -> int:
+        return self.size
+
+def extract_page_content(html: str) -> Dict[str, Any]:
+    """Extract title, meta tags, text, links and images from HTML in one pass.
+    
+    Defined at module level so it can run in a ProcessPoolExecutor.
+    """
+    parser = PageContentParser()
+    parser.feed(html)
+    parser.close()
+    
+    # Clean up text
+    text_content = ''.join(parser.text_parts)
+    lines = (line.strip() for line in text_content.splitlines())
+    chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
+    text_content = ' '.join(chunk for chunk in chunks if chunk)
+    
+    return {
+        'title': ''.join(parser.title_parts).strip(),
+        'content': text_content,
+        'meta_description': parser.meta.get('description', ''),
+        'meta_keywords': parser.meta.get('keywords', ''),
+        'links': parser.links,
+        'images': parser.images,
+        'simhash': compute_simhash(text_content)
+    }
+
+def build_fts_query(query: str) -> str:
+    """Turn free text into an FTS5 query of quoted prefix terms (implicit AND)."""
+    terms = re.findall(r'\w+', (query or '').lower())
+    return ' '.join(f'"{term}"*' for term in terms)
+
+def normalize_url(url: str) -> str:
+    """Normalize a URL for deduplication (case, default ports, fragments)."""
+    parsed = urlparse(url.strip())
+    scheme = parsed.scheme.lower()
+    netloc = parsed.netloc.lower()
+    if (scheme == 'http' and netloc.endswith(':80')) or \
+            (scheme == 'https' and netloc.endswith(':443')):
+        netloc = netloc.rsplit(':', 1)[0]
+    path = parsed.path or '/'
+    return urlunparse((scheme, netloc, path, parsed.params, parsed.query, ''))
+
+def _bloom_hashes(item: str) -> tuple:
+    """Two independent 64-bit hashes of an item for double hashing."""
+    digest = hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+    return int.from_bytes(digest[:8], 'little'), int.from_bytes(digest[8:], 'little') | 1
+
+class BloomFilter:
+    """Fixed-capacity Bloom filter using double hashing over a bit array."""
+    
+    def __init__(self, capacity: int, error_rate: float):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.num_bits = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.num_hashes = max(1, int(round(self.num_bits / capacity * math.log(2))))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+    
+    def _positions(self, hashes: tuple) -> List[int]:
+        h1, h2 = hashes
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+    
+    def add_hashes(self, hashes: tuple):
+        """Add an item given its precomputed hashes."""
+        bits = self.bits
+        for pos in self._positions(hashes):
+            bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+    
+    def contains_hashes(self, hashes: tuple) -> bool:
+        """Check membership given precomputed hashes."""
+        bits = self.bits
+        for pos in self._positions(hashes):
+            if not bits[pos >> 3] & (1 << (pos & 7)):
+                return False
+        return True
+    
+    def add(self, item: str):
+        """Add an item to the filter."""
+        self.add_hashes(_bloom_hashes(item))
+    
+    def __contains__(self, item: str) -> bool:
+        return self.contains_hashes(_bloom_hashes(item))
+
+class ScalableBloomFilter:
+    """Bloom filter that adds larger, tighter stages as it fills up."""
+    
+    def __init__(self, initial_capacity: int = 100000, error_rate: float = 0.0001,
+                 growth: int = 2, tightening: float = 0.5):
+        self.initial_capacity = initial_capacity
+        self.error_rate = error_rate
+        self.growth = growth
+        self.tightening = tightening
+        self.filters: List[BloomFilter] = [
+            BloomFilter(initial_capacity, error_rate * (1 - tightening))
+        ]
+    
+    def add(self, item: str) -> bool:
+        """Add an item unless already present. Returns True if it was added."""
+        hashes = _bloom_hashes(item)
+        if any(bloom.contains_hashes(hashes) for bloom in self.filters):
+            return False
+        current = self.filters[-1]
+        if current.count >= current.capacity:
+            current = BloomFilter(
+                current.capacity * self.growth,
+                current.error_rate * self.tightening
+            )
+            self.filters.append(current)
+        current.add_hashes(hashes)
+        return True
+    
+    def __contains__(self, item: str) -> bool:
+        hashes = _bloom_hashes(item)
+        return any(bloom.contains_hashes(hashes) for bloom in self.filters)
+    
+    def __len__(self) -> int:
+        return sum(bloom.count for bloom in self.filters)
+
 class WebCrawlerDatabase:
     """Database operations for web crawler."""
     
+    # bm25() column weights for (title, content, meta_description)
+    SEARCH_WEIGHTS = (10.0, 1.0, 2.0)
+    
     def __init__(self, db_path: str = "web_crawler.db"):
         self.db_path = db_path
+        self.fts_enabled = False
         self.init_database()
     
     def init_database(self):
@@ -116,10 +460,22 @@ class WebCrawlerDatabase:
             )
         ''')
         
-        # Web pages table
+        # Web pages table; page_id is the stable key the full-text index points at
+        cursor.execute('PRAGMA table_info(web_pages)')
+        page_columns = {row[1] for row in cursor.fetchall()}
+        migrate_pages = bool(page_columns) and 'page_id' not in page_columns
+        if migrate_pages:
+            # Tables keyed on url alone, whose implicit rowids VACUUM may renumber
+            self._add_missing_columns(cursor, 'web_pages', {'simhash': 'INTEGER', 'etag': 'TEXT'})
+            try:
+                cursor.execute('DROP TABLE IF EXISTS web_pages_fts')
+            except sqlite3.OperationalError as e:
+                logger.warning(f"Could not drop old full-text index: {e}")
+            cursor.execute('ALTER TABLE web_pages RENAME TO web_pages_old')
+            cursor.execute('DROP INDEX IF EXISTS idx_web_pages_crawl_timestamp')
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS web_pages (
-                url TEXT PRIMARY KEY,
+                url TEXT NOT NULL UNIQUE,
                 title TEXT,
                 content TEXT,
                 html_content TEXT,
@@ -135,22 +491,53 @@ class WebCrawlerDatabase:
                 depth INTEGER DEFAULT 0,
                 parent_url TEXT,
                 page_hash TEXT,
-                is_duplicate BOOLEAN DEFAULT 0
+                is_duplicate BOOLEAN DEFAULT 0,
+                simhash INTEGER,
+                etag TEXT,
+                page_id INTEGER PRIMARY KEY
             )
         ''')
+        if migrate_pages:
+            page_fields = ('url, title, content, html_content, meta_description, meta_keywords, links, '
+                           'images, status_code, content_type, content_length, last_modified, '
+                           'crawl_timestamp, depth, parent_url, page_hash, is_duplicate, simhash, etag')
+            cursor.execute(f'INSERT INTO web_pages ({page_fields}) SELECT {page_fields} FROM web_pages_old')
+            cursor.execute('DROP TABLE web_pages_old')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_web_pages_crawl_timestamp
+            ON web_pages (crawl_timestamp)
+        ''')
         
-        # Crawl queue table
+        # Crawl queue table, one row per URL per job
+        cursor.execute('PRAGMA table_info(crawl_queue)')
+        queue_key = [row[1] for row in sorted(cursor.fetchall(), key=lambda row: row[5]) if row[5]]
+        if queue_key == ['url']:
+            # Queues created before the key included job_id
+            cursor.execute('ALTER TABLE crawl_queue RENAME TO crawl_queue_old')
+            cursor.execute('DROP INDEX IF EXISTS idx_crawl_queue_job_status')
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS crawl_queue (
-                url TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
                 job_id TEXT NOT NULL,
                 depth INTEGER DEFAULT 0,
                 parent_url TEXT,
                 priority INTEGER DEFAULT 0,
                 added_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                status TEXT DEFAULT 'pending'
+                status TEXT DEFAULT 'pending',
+                PRIMARY KEY (job_id, url)
             )
         ''')
+        if queue_key == ['url']:
+            cursor.execute('''
+                INSERT INTO crawl_queue (url, job_id, depth, parent_url, priority, added_at, status)
+                SELECT url, job_id, depth, parent_url, priority, added_at, status FROM crawl_queue_old
+            ''')
+            cursor.execute('DROP TABLE crawl_queue_old')
+        
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_crawl_queue_job_status
+            ON crawl_queue (job_id, status, priority DESC)
+        ''')
         
         # Robots.txt cache
         cursor.execute('''
@@ -161,30 +548,62 @@ class WebCrawlerDatabase:
             )
         ''')
         
+        # Full-text index over web_pages, keyed by page_id
+        cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'web_pages_fts'"
+        )
+        fts_exists = cursor.fetchone() is not None
+        try:
+            cursor.execute('''
+                CREATE VIRTUAL TABLE IF NOT EXISTS web_pages_fts USING fts5(
+                    title, content, meta_description,
+                    content='web_pages', content_rowid='page_id',
+                    tokenize='porter unicode61'
+                )
+            ''')
+            if not fts_exists:
+                # Index pages saved before the full-text index existed
+                cursor.execute("INSERT INTO web_pages_fts(web_pages_fts) VALUES ('rebuild')")
+            self.fts_enabled = True
+        except sqlite3.OperationalError as e:
+            logger.warning(f"FTS5 unavailable, falling back to LIKE search: {e}")
+        
         conn.commit()
         conn.close()
     
+    def _add_missing_columns(self, cursor: sqlite3.Cursor, table: str, columns: Dict[str, str]):
+        """Add columns introduced after a table was first created."""
+        cursor.execute(f'PRAGMA table_info({table})')
+        existing = {row[1] for row in cursor.fetchall()}
+        for name, column_type in columns.items():
+            if name not in existing:
+                cursor.execute(f'ALTER TABLE {table} ADD COLUMN {name} {column_type}')
+    
+    def _write_crawl_job(self, cursor: sqlite3.Cursor, job: CrawlJob):
+        """Upsert a crawl job row."""
+        cursor.execute('''
+            INSERT OR REPLACE INTO crawl_jobs 
+            (job_id, name, start_urls, max_pages, max_depth, delay, 
+             respect_robots, follow_external, content_filters, status, 
+             created_at, started_at, completed_at, pages_crawled, 
+             pages_failed, error_message)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (
+            job.job_id, job.name, json.dumps(job.start_urls), 
+            job.max_pages, job.max_depth, job.delay,
+            job.respect_robots, job.follow_external, 
+            json.dumps(job.content_filters), job.status,
+            job.created_at, job.started_at, job.completed_at,
+            job.pages_crawled, job.pages_failed, job.error_message
+        ))
+    
     def save_crawl_job(self, job: CrawlJob) -> bool:
         """Save crawl job to database."""
         try:
             conn = sqlite3.connect(self.db_path)
             cursor = conn.cursor()
             
-            cursor.execute('''
-                INSERT OR REPLACE INTO crawl_jobs 
-                (job_id, name, start_urls, max_pages, max_depth, delay, 
-                 respect_robots, follow_external, content_filters, status, 
-                 created_at, started_at, completed_at, pages_crawled, 
-                 pages_failed, error_message)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                job.job_id, job.name, json.dumps(job.start_urls), 
-                job.max_pages, job.max_depth, job.delay,
-                job.respect_robots, job.follow_external, 
-                json.dumps(job.content_filters), job.status,
-                job.created_at, job.started_at, job.completed_at,
-                job.pages_crawled, job.pages_failed, job.error_message
-            ))
+            self._write_crawl_job(cursor, job)
             
             conn.commit()
             conn.close()
@@ -229,26 +648,50 @@ class WebCrawlerDatabase:
             logger.error(f"Error getting crawl job: {e}")
             return None
     
+    def _write_web_page(self, cursor: sqlite3.Cursor, page: WebPage):
+        """Upsert a web page row and keep the full-text index in sync."""
+        if self.fts_enabled:
+            cursor.execute('''
+                SELECT page_id, title, content, meta_description FROM web_pages WHERE url = ?
+            ''', (page.url,))
+            old_row = cursor.fetchone()
+            if old_row:
+                # External-content FTS tables need the old values to delete an entry
+                cursor.execute('''
+                    INSERT INTO web_pages_fts(web_pages_fts, rowid, title, content, meta_description)
+                    VALUES ('delete', ?, ?, ?, ?)
+                ''', old_row)
+        
+        cursor.execute('''
+            INSERT OR REPLACE INTO web_pages 
+            (url, title, content, html_content, meta_description, meta_keywords,
+             links, images, status_code, content_type, content_length, 
+             last_modified, crawl_timestamp, depth, parent_url, page_hash, is_duplicate,
+             simhash, etag)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (
+            page.url, page.title, page.content, compress_html(page.html_content),
+            page.meta_description, page.meta_keywords,
+            json.dumps(page.links), json.dumps(page.images),
+            page.status_code, page.content_type, page.content_length,
+            page.last_modified, page.crawl_timestamp, page.depth,
+            page.parent_url, page.page_hash, page.is_duplicate,
+            to_signed_64(page.simhash), page.etag
+        ))
+        
+        if self.fts_enabled:
+            cursor.execute('''
+                INSERT INTO web_pages_fts(rowid, title, content, meta_description)
+                VALUES (?, ?, ?, ?)
+            ''', (cursor.lastrowid, page.title, page.content, page.meta_description))
+    
     def save_web_page(self, page: WebPage) -> bool:
         """Save web page to database."""
         try:
             conn = sqlite3.connect(self.db_path)
             cursor = conn.cursor()
             
-            cursor.execute('''
-                INSERT OR REPLACE INTO web_pages 
-                (url, title, content, html_content, meta_description, meta_keywords,
-                 links, images, status_code, content_type, content_length, 
-                 last_modified, crawl_timestamp, depth, parent_url, page_hash, is_duplicate)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                page.url, page.title, page.content, page.html_content,
-                page.meta_description, page.meta_keywords,
-                json.dumps(page.links), json.dumps(page.images),
-                page.status_code, page.content_type, page.content_length,
-                page.last_modified, page.crawl_timestamp, page.depth,
-                page.parent_url, page.page_hash, page.is_duplicate
-            ))
+            self._write_web_page(cursor, page)
             
             conn.commit()
             conn.close()
@@ -271,7 +714,7 @@ class WebCrawlerDatabase:
                     url=row[0],
                     title=row[1] or "",
                     content=row[2] or "",
-                    html_content=row[3] or "",
+                    html_content=decompress_html(row[3]),
                     meta_description=row[4] or "",
                     meta_keywords=row[5] or "",
                     links=json.loads(row[6]) if row[6] else [],
@@ -284,7 +727,9 @@ class WebCrawlerDatabase:
                     depth=row[13] or 0,
                     parent_url=row[14],
                     page_hash=row[15] or "",
-                    is_duplicate=bool(row[16])
+                    is_duplicate=bool(row[16]),
+                    simhash=to_unsigned_64(row[17]),
+                    etag=row[18] or ""
                 )
                 conn.close()
                 return page
@@ -294,6 +739,98 @@ class WebCrawlerDatabase:
             logger.error(f"Error getting web page: {e}")
             return None
     
+    def touch_web_page(self, url: str, crawl_timestamp: datetime) -> bool:
+        """Record that a page was revalidated without changes."""
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                UPDATE web_pages SET crawl_timestamp = ? WHERE url = ?
+            ''', (crawl_timestamp, url))
+            
+            conn.commit()
+            conn.close()
+            return True
+        except Exception as e:
+            logger.error(f"Error touching web page: {e}")
+            return False
+    
+    def get_pages_due_for_refresh(self, crawled_before: datetime, limit: int = 1000) -> List[str]:
+        """Get URLs of non-duplicate pages last crawled before a cutoff, oldest first."""
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                SELECT url FROM web_pages 
+                WHERE crawl_timestamp < ? AND is_duplicate = 0
+                ORDER BY crawl_timestamp ASC 
+                LIMIT ?
+            ''', (crawled_before, limit))
+            urls = [row[0] for row in cursor.fetchall()]
+            
+            conn.close()
+            return urls
+        except Exception as e:
+            logger.error(f"Error getting pages due for refresh: {e}")
+            return []
+    
+    def get_robots_txt(self, domain: str) -> Optional[tuple]:
+        """Get cached (robots_content, last_checked) for a domain."""
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                SELECT robots_content, last_checked FROM robots_cache WHERE domain = ?
+            ''', (domain,))
+            row = cursor.fetchone()
+            
+            conn.close()
+            if row:
+                return row[0] or "", datetime.fromisoformat(row[1]) if row[1] else None
+            return None
+        except Exception as e:
+            logger.error(f"Error getting robots.txt: {e}")
+            return None
+    
+    def save_robots_txt(self, domain: str, robots_content: str) -> bool:
+        """Cache robots.txt content for a domain."""
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                INSERT OR REPLACE INTO robots_cache (domain, robots_content, last_checked)
+                VALUES (?, ?, ?)
+            ''', (domain, robots_content, datetime.now()))
+            
+            conn.commit()
+            conn.close()
+            return True
+        except Exception as e:
+            logger.error(f"Error saving robots.txt: {e}")
+            return False
+    
+    def get_page_fingerprints(self) -> List[tuple]:
+        """Get (url, simhash) for every non-duplicate page with a fingerprint."""
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                SELECT url, simhash FROM web_pages 
+                WHERE simhash IS NOT NULL AND simhash != 0 AND is_duplicate = 0
+            ''')
+            rows = [(url, to_unsigned_64(simhash)) for url, simhash in cursor.fetchall()]
+            
+            conn.close()
+            return rows
+        except Exception as e:
+            logger.error(f"Error getting page fingerprints: {e}")
+            return []
+    
     def add_to_crawl_queue(self, url: str, job_id: str, depth: int = 0, 
                           parent_url: str = None, priority: int = 0) -> bool:
         """Add URL to crawl queue."""
@@ -360,6 +897,126 @@ class WebCrawlerDatabase:
             logger.error(f"Error marking URL completed: {e}")
             return False
     
+    def write_crawl_batch(self, job_id: str, pages: List[WebPage] = (),
+                          new_rows: List[tuple] = (), status_changes: List[tuple] = (),
+                          job: Optional[CrawlJob] = None) -> bool:
+        """Write buffered crawl progress in a single transaction.
+        
+        new_rows are (url, depth, parent_url, priority, status) queue rows and
+        status_changes are (status, url) pairs applied in order after them.
+        """
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            for page in pages:
+                self._write_web_page(cursor, page)
+            
+            cursor.executemany('''
+                INSERT OR IGNORE INTO crawl_queue 
+                (url, job_id, depth, parent_url, priority, status)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', [(url, job_id, depth, parent_url, priority, status)
+                  for url, depth, parent_url, priority, status in new_rows])
+            
+            cursor.executemany('''
+                UPDATE crawl_queue SET status = ? 
+                WHERE url = ? AND job_id = ?
+            ''', [(status, url, job_id) for status, url in status_changes])
+            
+            if job:
+                self._write_crawl_job(cursor, job)
+            
+            conn.commit()
+            conn.close()
+            return True
+        except Exception as e:
+            logger.error(f"Error writing crawl batch: {e}")
+            return False
+    
+    def claim_pending_urls(self, job_id: str, limit: int) -> List[tuple]:
+        """Load up to limit pending URLs by priority and mark them as queued in memory."""
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                SELECT url, depth, parent_url, priority FROM crawl_queue 
+                WHERE job_id = ? AND status = 'pending' 
+                ORDER BY priority DESC, added_at ASC 
+                LIMIT ?
+            ''', (job_id, limit))
+            rows = cursor.fetchall()
+            
+            cursor.executemany('''
+                UPDATE crawl_queue SET status = 'queued' 
+                WHERE url = ? AND job_id = ?
+            ''', [(row[0], job_id) for row in rows])
+            
+            conn.commit()
+            conn.close()
+            return rows
+        except Exception as e:
+            logger.error(f"Error claiming pending URLs: {e}")
+            return []
+    
+    def mark_urls_pending(self, job_id: str, urls: List[str]) -> List[str]:
+        """Mark a job's queued URLs as pending on disk; returns the URLs whose rows were updated."""
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            updated = []
+            for url in urls:
+                cursor.execute('''
+                    UPDATE crawl_queue SET status = 'pending' 
+                    WHERE url = ? AND job_id = ?
+                ''', (url, job_id))
+                if cursor.rowcount:
+                    updated.append(url)
+            
+            conn.commit()
+            conn.close()
+            return updated
+        except Exception as e:
+            logger.error(f"Error marking URLs pending: {e}")
+            return []
+    
+    def requeue_unfinished_urls(self, job_id: str) -> bool:
+        """Return queued or in-progress URLs of a job to the pending state."""
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                UPDATE crawl_queue SET status = 'pending' 
+                WHERE job_id = ? AND status IN ('queued', 'processing')
+            ''', (job_id,))
+            
+            conn.commit()
+            conn.close()
+            return True
+        except Exception as e:
+            logger.error(f"Error requeueing URLs: {e}")
+            return False
+    
+    def get_crawl_queue_urls(self, job_id: str) -> List[tuple]:
+        """Get (url, status) for every queue entry of a job."""
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                SELECT url, status FROM crawl_queue WHERE job_id = ?
+            ''', (job_id,))
+            rows = cursor.fetchall()
+            
+            conn.close()
+            return rows
+        except Exception as e:
+            logger.error(f"Error getting crawl queue URLs: {e}")
+            return []
+    
     def get_crawl_stats(self, job_id: str) -> CrawlStats:
         """Get crawl statistics for a job."""
         try:
@@ -422,29 +1079,232 @@ class WebCrawlerDatabase:
             logger.error(f"Error getting crawl stats: {e}")
             return CrawlStats()
 
+class CrawlWriteBuffer:
+    """Write-behind buffer for a crawl job's progress.
+    
+    Page rows, crawl queue inserts and status changes, and the job's
+    counters accumulate in memory and are written in one transaction every
+    flush_pages pages or flush_interval seconds. Callers flush only between
+    pages, so the database always holds a consistent point to resume from.
+    """
+    
+    def __init__(self, db: WebCrawlerDatabase, job_id: str,
+                 flush_pages: int = 100, flush_interval: float = 1.0):
+        self.db = db
+        self.job_id = job_id
+        self.job: Optional[CrawlJob] = None  # Saved with each flush when set
+        self.flush_pages = max(1, flush_pages)
+        self.flush_interval = flush_interval
+        self.pages: Dict[str, WebPage] = {}
+        self.queue_rows: List[tuple] = []
+        self.status_changes: List[tuple] = []
+        self.last_flush = time.monotonic()
+    
+    def add_page(self, page: WebPage):
+        """Buffer a page row."""
+        self.pages[page.url] = page
+    
+    def add_queue_row(self, url: str, depth: int, parent_url: Optional[str],
+                      priority: int, status: str):
+        """Buffer a new crawl queue entry."""
+        self.queue_rows.append((url, depth, parent_url, priority, status))
+    
+    def set_status(self, url: str, status: str):
+        """Buffer a crawl queue status change."""
+        self.status_changes.append((status, url))
+    
+    def has_pending(self) -> bool:
+        return bool(self.pages or self.queue_rows or self.status_changes)
+    
+    def maybe_flush(self) -> bool:
+        """Flush if enough pages are buffered or the flush interval has passed."""
+        if len(self.pages) >= self.flush_pages or (
+                time.monotonic() - self.last_flush >= self.flush_interval):
+            return self.flush()
+        return True
+    
+    def flush(self) -> bool:
+        """Write everything buffered in one transaction; keeps the buffer on failure."""
+        if not self.has_pending() and self.job is None:
+            return True
+        if not self.db.write_crawl_batch(self.job_id, list(self.pages.values()),
+                                         self.queue_rows, self.status_changes, self.job):
+            return False
+        self.pages = {}
+        self.queue_rows = []
+        self.status_changes = []
+        self.last_flush = time.monotonic()
+        return True
+
+class CrawlFrontier:
+    """In-memory priority frontier for a crawl job.
+    
+    URLs are deduplicated with a scalable Bloom filter over normalized URLs
+    and held in a heap ordered by priority. When the heap grows past
+    max_in_memory the lowest-priority half is spilled to the crawl_queue
+    table and reloaded on demand. Queue writes go through the job's
+    CrawlWriteBuffer.
+    """
+    
+    def __init__(self, db: WebCrawlerDatabase, job_id: str,
+                 max_in_memory: int = 50000, buffer: CrawlWriteBuffer = None):
+        self.db = db
+        self.job_id = job_id
+        self.max_in_memory = max(2, max_in_memory)
+        self.buffer = buffer or CrawlWriteBuffer(db, job_id)
+        self.seen = ScalableBloomFilter()
+        self.heap: List[tuple] = []
+        self.sequence = itertools.count()
+        self.spilled_count = 0
+        self.spilled_max_priority: Optional[int] = None
+        self.load()
+    
+    def load(self):
+        """Seed the frontier from the job's persisted crawl queue."""
+        # Anything left queued or in progress by an earlier run is crawled again
+        self.db.requeue_unfinished_urls(self.job_id)
+        for url, status in self.db.get_crawl_queue_urls(self.job_id):
+            self.seen.add(normalize_url(url))
+            if status == 'pending':
+                self.spilled_count += 1
+        if self.spilled_count:
+            self.spilled_max_priority = float('inf')  # Unknown until reloaded
+    
+    def __len__(self) -> int:
+        return len(self.heap) + self.spilled_count
+    
+    def add(self, url: str, depth: int, parent_url: Optional[str] = None,
+            priority: int = 0) -> bool:
+        """Add a URL unless it was already seen. Returns True if added."""
+        url = normalize_url(url)
+        if not self.seen.add(url):
+            return False
+        
+        heapq.heappush(self.heap, (-priority, next(self.sequence), url, depth, parent_url))
+        self.buffer.add_queue_row(url, depth, parent_url, priority, 'queued')
+        
+        if len(self.heap) > self.max_in_memory:
+            self.spill()
+        return True
+    
+    def pop(self) -> Optional[tuple]:
+        """Pop the highest-priority (url, depth, parent_url), reloading spilled URLs."""
+        if self.spilled_count and (
+                not self.heap or -self.heap[0][0] < self.spilled_max_priority):
+            self.reload()
+        if not self.heap:
+            return None
+        _, _, url, depth, parent_url = heapq.heappop(self.heap)
+        return url, depth, parent_url
+    
+    def complete(self, url: str):
+        """Record that a URL has been crawled."""
+        self.buffer.set_status(url, 'completed')
+    
+    def spill(self):
+        """Move the lowest-priority half of the heap to the on-disk queue."""
+        self.heap.sort()
+        keep = self.max_in_memory // 2
+        spilled = self.heap[keep:]
+        
+        # The queue rows must be on disk first; only URLs whose rows were updated leave memory
+        self.buffer.flush()
+        written = set(self.db.mark_urls_pending(self.job_id, [entry[2] for entry in spilled]))
+        spilled = [entry for entry in spilled if entry[2] in written]
+        self.heap = self.heap[:keep] + [entry for entry in self.heap[keep:] if entry[2] not in written]
+        heapq.heapify(self.heap)
+        if not spilled:
+            return
+        
+        self.spilled_count += len(spilled)
+        top_spilled = -spilled[0][0]
+        if self.spilled_max_priority is None or top_spilled > self.spilled_max_priority:
+            self.spilled_max_priority = top_spilled
+    
+    def reload(self):
+        """Load the highest-priority spilled URLs back into memory."""
+        self.buffer.flush()
+        rows = self.db.claim_pending_urls(self.job_id, max(1, self.max_in_memory // 2))
+        for url, depth, parent_url, priority in rows:
+            heapq.heappush(self.heap, (-priority, next(self.sequence), url, depth, parent_url))
+        self.spilled_count = max(0, self.spilled_count - len(rows)) if rows else 0
+        # Rows come back in priority order, so nothing left on disk outranks the last one
+        self.spilled_max_priority = rows[-1][3] if self.spilled_count else None
+    
+    def close(self):
+        """Flush buffered writes and persist all remaining URLs as pending."""
+        self.buffer.flush()
+        self.db.requeue_unfinished_urls(self.job_id)
+        self.heap = []
+        self.spilled_count = 0
+
 class WebCrawlerService:
     """Web crawler service with async crawling capabilities."""
     
-    def __init__(self, db_path: str = "web_crawler.db"):
+    USER_AGENT = 'WebCrawler/1.0 (+https://example.com/bot)'
+    
+    def __init__(self, db_path: str = "web_crawler.db", max_workers: int = 8,
+                 max_in_flight: int = 32, idle_poll_interval: float = 0.05,
+                 frontier_memory_limit: int = 50000,
+                 parse_workers: Optional[int] = None, parse_offload_bytes: int = 16384,
+                 near_duplicate_distance: int = 3, robots_ttl: float = 3600.0,
+                 robots_retry_ttl: float = 60.0, connections_per_host: int = 8, flush_pages: int = 100,
+                 flush_interval: float = 1.0):
         self.db = WebCrawlerDatabase(db_path)
         self.session: Optional[aiohttp.ClientSession] = None
-        self.robots_cache: Dict[str, urllib.robotparser.RobotFileParser] = {}
+        # domain -> (parsed robots.txt, monotonic expiry time, crawl delay)
+        self.robots_cache: Dict[str, tuple] = {}
+        self.robots_fetches: Dict[str, asyncio.Task] = {}
+        self.robots_ttl = robots_ttl
+        self.robots_retry_ttl = robots_retry_ttl  # For failed fetches, which are not persisted
+        self.connections_per_host = connections_per_host
         self.crawl_tasks: Dict[str, asyncio.Task] = {}
+        self.max_workers = max(1, max_workers)  # Concurrent workers per crawl job
+        self.max_in_flight = max(1, max_in_flight)  # Fetch cap shared by all jobs
+        self.idle_poll_interval = idle_poll_interval
+        self.rate_limiter = HostRateLimiter()
+        self.fetch_slots: Optional[asyncio.Semaphore] = None
+        self.frontier_memory_limit = frontier_memory_limit
+        self.frontiers: Dict[str, CrawlFrontier] = {}
+        self.flush_pages = flush_pages
+        self.flush_interval = flush_interval
+        # Processes for CPU-bound HTML parsing; 0 parses on the event loop
+        self.parse_workers = (os.cpu_count() or 1) if parse_workers is None else parse_workers
+        self.parse_offload_bytes = parse_offload_bytes
+        self.parse_pool: Optional[ProcessPoolExecutor] = None
+        self.near_duplicate_distance = near_duplicate_distance
+        self.simhash_index: Optional[SimHashIndex] = None
         
     async def __aenter__(self):
         """Async context manager entry."""
+        self.fetch_slots = asyncio.Semaphore(self.max_in_flight)
+        if self.parse_workers > 0:
+            self.parse_pool = ProcessPoolExecutor(max_workers=self.parse_workers)
+        # One pooled connector: keep-alive reuse and cached DNS per host
+        connector = aiohttp.TCPConnector(
+            limit=self.max_in_flight,
+            limit_per_host=self.connections_per_host,
+            ttl_dns_cache=300,
+            keepalive_timeout=30
+        )
         self.session = aiohttp.ClientSession(
+            connector=connector,
             timeout=aiohttp.ClientTimeout(total=30),
             headers={
-                'User-Agent': 'WebCrawler/1.0 (+https://example.com/bot)'
+                'User-Agent': self.USER_AGENT
             }
         )
         return self
     
     async def __aexit__(self, exc_type, exc_val, exc_tb):
         """Async context manager exit."""
+        for job_id in list(self.frontiers):
+            self.close_frontier(job_id)
         if self.session:
             await self.session.close()
+        if self.parse_pool:
+            self.parse_pool.shutdown(wait=True)
+            self.parse_pool = None
     
     def create_crawl_job(self, name: str, start_urls: List[str], 
                         max_pages: int = 1000, max_depth: int = 5,
@@ -472,45 +1332,96 @@ class WebCrawlerService:
             return job
         return None
     
+    def get_frontier(self, job_id: str) -> CrawlFrontier:
+        """Get the in-memory frontier for a job, loading it on first use."""
+        frontier = self.frontiers.get(job_id)
+        if frontier is None:
+            buffer = CrawlWriteBuffer(self.db, job_id, self.flush_pages, self.flush_interval)
+            frontier = CrawlFrontier(self.db, job_id, self.frontier_memory_limit, buffer)
+            self.frontiers[job_id] = frontier
+        return frontier
+    
+    def get_simhash_index(self) -> SimHashIndex:
+        """Get the near-duplicate index, loading stored fingerprints on first use."""
+        if self.simhash_index is None:
+            self.simhash_index = SimHashIndex(self.near_duplicate_distance)
+            for url, simhash in self.db.get_page_fingerprints():
+                self.simhash_index.add(simhash, url)
+        return self.simhash_index
+    
+    def close_frontier(self, job_id: str):
+        """Persist and drop a job's frontier."""
+        frontier = self.frontiers.pop(job_id, None)
+        if frontier:
+            frontier.close()
+    
     async def check_robots_txt(self, url: str) -> bool:
         """Check if URL is allowed by robots.txt."""
         try:
-            parsed_url = urlparse(url)
-            domain = f"{parsed_url.scheme}://{parsed_url.netloc}"
-            
-            if domain in self.robots_cache:
-                rp = self.robots_cache[domain]
-            else:
-                rp = urllib.robotparser.RobotFileParser()
-                robots_url = urljoin(domain, '/robots.txt')
-                
-                try:
-                    async with self.session.get(robots_url) as response:
-                        if response.status == 200:
-                            robots_content = await response.text()
-                            # Create a mock response for the robot parser
-                            import io
-                            from urllib.request import Request, urlopen
-                            
-                            # Use a simple approach - just check for Disallow patterns
-                            if 'Disallow: /' in robots_content:
-                                return False  # Disallow all
-                            elif 'Allow: /' in robots_content:
-                                return True   # Allow all
-                            else:
-                                return True   # Default to allow
-                        else:
-                            return True  # No robots.txt, allow crawling
-                except:
-                    return True  # Error fetching robots.txt, allow crawling
-                
-                self.robots_cache[domain] = rp
-            
-            return rp.can_fetch('*', url)
+            rp = await self.get_robots_parser(url)
+            return rp.can_fetch(self.USER_AGENT, url)
         except Exception as e:
             logger.error(f"Error checking robots.txt: {e}")
             return True  # Allow crawling on error
     
+    def robots_crawl_delay(self, url: str) -> float:
+        """Crawl-delay from the host's cached robots.txt, or 0 if none is known."""
+        parsed_url = urlparse(url)
+        cached = self.robots_cache.get(f"{parsed_url.scheme}://{parsed_url.netloc}")
+        return cached[2] if cached else 0.0
+    
+    async def get_robots_parser(self, url: str) -> urllib.robotparser.RobotFileParser:
+        """Get the parsed robots.txt for a URL's host, fetching at most once per TTL."""
+        parsed_url = urlparse(url)
+        domain = f"{parsed_url.scheme}://{parsed_url.netloc}"
+        
+        cached = self.robots_cache.get(domain)
+        if cached and cached[1] > time.monotonic():
+            return cached[0]
+        
+        # Concurrent checks for the same host share a single fetch
+        fetch = self.robots_fetches.get(domain)
+        if fetch is None:
+            fetch = asyncio.ensure_future(self._load_robots_txt(domain))
+            self.robots_fetches[domain] = fetch
+            fetch.add_done_callback(lambda _: self.robots_fetches.pop(domain, None))
+        return await asyncio.shield(fetch)
+    
+    async def _load_robots_txt(self, domain: str) -> urllib.robotparser.RobotFileParser:
+        """Load robots.txt from the database cache or the host and cache it."""
+        stored = self.db.get_robots_txt(domain)
+        age = (datetime.now() - stored[1]).total_seconds() if stored and stored[1] else None
+        
+        if age is not None and age < self.robots_ttl:
+            robots_content, ttl = stored[0], self.robots_ttl - age
+        else:
+            ttl = self.robots_ttl
+            fetched = True  # Only answers from the host are persisted
+            try:
+                async with self.session.get(urljoin(domain, '/robots.txt')) as response:
+                    if response.status == 200:
+                        robots_content = await response.text()
+                    elif response.status in (401, 403):
+                        robots_content = "User-agent: *\nDisallow: /"
+                    elif response.status >= 500:
+                        # Unreachable robots.txt disallows everything until a retry (RFC 9309)
+                        robots_content, ttl = "User-agent: *\nDisallow: /", self.robots_retry_ttl
+                        fetched = False
+                    else:
+                        robots_content = ""  # No robots.txt, allow crawling
+                if fetched:
+                    self.db.save_robots_txt(domain, robots_content)
+            except Exception as e:
+                logger.info(f"Could not fetch robots.txt for {domain}: {e}")
+                robots_content, ttl = "", self.robots_retry_ttl  # Allow crawling, retry soon
+        
+        rp = urllib.robotparser.RobotFileParser()
+        rp.parse(robots_content.splitlines())
+        self.robots_cache[domain] = (
+            rp, time.monotonic() + ttl, parse_crawl_delay(robots_content, self.USER_AGENT)
+        )
+        return rp
+    
     def calculate_page_hash(self, content: str) -> str:
         """Calculate hash of page content for duplicate detection."""
         return hashlib.md5(content.encode('utf-8')).hexdigest()
@@ -518,59 +1429,7 @@ class WebCrawlerService:
     def extract_content(self, html: str) -> Dict[str, Any]:
         """Extract content from HTML."""
         try:
-            soup = BeautifulSoup(html, 'html.parser')
-            
-            # Remove script and style elements
-            for script in soup(["script", "style"]):
-                script.decompose()
-            
-            # Extract title
-            title = ""
-            title_tag = soup.find('title')
-            if title_tag:
-                title = title_tag.get_text().strip()
-            
-            # Extract meta description
-            meta_description = ""
-            meta_desc = soup.find('meta', attrs={'name': 'description'})
-            if meta_desc:
-                meta_description = meta_desc.get('content', '').strip()
-            
-            # Extract meta keywords
-            meta_keywords = ""
-            meta_keywords_tag = soup.find('meta', attrs={'name': 'keywords'})
-            if meta_keywords_tag:
-                meta_keywords = meta_keywords_tag.get('content', '').strip()
-            
-            # Extract text content
-            text_content = soup.get_text()
-            # Clean up text
-            lines = (line.strip() for line in text_content.splitlines())
-            chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-            text_content = ' '.join(chunk for chunk in chunks if chunk)
-            
-            # Extract links
-            links = []
-            for link in soup.find_all('a', href=True):
-                href = link['href']
-                if href.startswith('http') or href.startswith('/'):
-                    links.append(href)
-            
-            # Extract images
-            images = []
-            for img in soup.find_all('img', src=True):
-                src = img['src']
-                if src.startswith('http') or src.startswith('/'):
-                    images.append(src)
-            
-            return {
-                'title': title,
-                'content': text_content,
-                'meta_description': meta_description,
-                'meta_keywords': meta_keywords,
-                'links': links,
-                'images': images
-            }
+            return extract_page_content(html)
         except Exception as e:
             logger.error(f"Error extracting content: {e}")
             return {
@@ -579,9 +1438,25 @@ class WebCrawlerService:
                 'meta_description': '',
                 'meta_keywords': '',
                 'links': [],
-                'images': []
+                'images': [],
+                'simhash': 0
             }
     
+    async def parse_html(self, html: str) -> Dict[str, Any]:
+        """Extract content without blocking the event loop.
+        
+        Large pages are parsed in the process pool; small ones are parsed
+        inline because pickling them costs more than parsing.
+        """
+        if self.parse_pool is None or len(html) < self.parse_offload_bytes:
+            return self.extract_content(html)
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.parse_pool, extract_page_content, html)
+        except Exception as e:
+            logger.error(f"Error extracting content in parse pool: {e}")
+            return self.extract_content(html)
+    
     async def crawl_page(self, url: str, job: CrawlJob, depth: int = 0, 
                         parent_url: str = None) -> Optional[WebPage]:
         """Crawl a single page."""
@@ -596,9 +1471,55 @@ class WebCrawlerService:
                 logger.info(f"Blocked by robots.txt: {url}")
                 return None
             
-            # Fetch page
-            async with self.session.get(url) as response:
+            fetched = await self._fetch_page(url, job.delay)
+            if not fetched:
+                return None
+            
+            page = await self._build_page(url, fetched, depth, parent_url)
+            
+            # Add new URLs to crawl queue if within limits
+            if depth < job.max_depth and not page.is_duplicate:
+                await self.add_new_urls_to_queue(page, job, depth + 1)
+            
+            # Save to database, buffered with its links while the job's frontier is open
+            frontier = self.frontiers.get(job.job_id)
+            if frontier:
+                frontier.buffer.add_page(page)
+            else:
+                self.db.save_web_page(page)
+            
+            return page
+                
+        except Exception as e:
+            logger.error(f"Error crawling page {url}: {e}")
+            return None
+    
+    async def _fetch_page(self, url: str, delay: float,
+                          existing_page: WebPage = None) -> Optional[Dict[str, Any]]:
+        """Fetch a page politely, revalidating against existing_page if given.
+        
+        Returns the response fields, {'status_code': 304} when the page is
+        unchanged, or None for non-HTML content.
+        """
+        headers = {}
+        if existing_page:
+            if existing_page.etag:
+                headers['If-None-Match'] = existing_page.etag
+            if existing_page.last_modified:
+                last_modified = existing_page.last_modified
+                if last_modified.tzinfo is None:
+                    last_modified = last_modified.replace(tzinfo=timezone.utc)
+                headers['If-Modified-Since'] = format_datetime(last_modified, usegmt=True)
+        
+        # Wait for this host's politeness slot, then fetch within the in-flight cap
+        delay = max(delay, self.robots_crawl_delay(url))
+        await self.rate_limiter.wait(urlparse(url).netloc, delay)
+        async with self.fetch_slots:
+            async with self.session.get(url, headers=headers or None) as response:
                 status_code = response.status
+                if status_code == 304:
+                    return {'status_code': status_code}
+                
                 content_type = response.headers.get('content-type', '')
                 content_length = int(response.headers.get('content-length', 0))
                 
@@ -607,57 +1528,122 @@ class WebCrawlerService:
                     logger.info(f"Skipping non-HTML content: {url}")
                     return None
                 
-                html_content = await response.text()
-                
-                # Extract content
-                extracted = self.extract_content(html_content)
-                
-                # Calculate page hash
-                page_hash = self.calculate_page_hash(extracted['content'])
-                
-                # Check for duplicates
-                is_duplicate = False
-                if existing_page and existing_page.page_hash == page_hash:
-                    is_duplicate = True
-                
-                # Create WebPage object
-                page = WebPage(
-                    url=url,
-                    title=extracted['title'],
-                    content=extracted['content'],
-                    html_content=html_content,
-                    meta_description=extracted['meta_description'],
-                    meta_keywords=extracted['meta_keywords'],
-                    links=extracted['links'],
-                    images=extracted['images'],
-                    status_code=status_code,
-                    content_type=content_type,
-                    content_length=content_length,
-                    crawl_timestamp=datetime.now(),
-                    depth=depth,
-                    parent_url=parent_url,
-                    page_hash=page_hash,
-                    is_duplicate=is_duplicate
-                )
-                
-                # Save to database
-                self.db.save_web_page(page)
-                
-                # Add new URLs to crawl queue if within limits
-                if depth < job.max_depth and not is_duplicate:
-                    await self.add_new_urls_to_queue(page, job, depth + 1)
-                
-                return page
+                last_modified = None
+                if response.headers.get('last-modified'):
+                    try:
+                        last_modified = parsedate_to_datetime(response.headers['last-modified'])
+                    except (TypeError, ValueError):
+                        pass
                 
+                return {
+                    'status_code': status_code,
+                    'content_type': content_type,
+                    'content_length': content_length,
+                    'etag': response.headers.get('etag', ''),
+                    'last_modified': last_modified,
+                    'html_content': await response.text()
+                }
+    
+    async def _build_page(self, url: str, fetched: Dict[str, Any], depth: int,
+                          parent_url: Optional[str], previous_simhash: int = 0) -> WebPage:
+        """Parse a fetched page and check it against the near-duplicate index.
+        
+        previous_simhash is the URL's stored fingerprint on a recrawl; it is
+        replaced in the index by the new one.
+        """
+        html_content = fetched['html_content']
+        
+        # Extract content
+        extracted = await self.parse_html(html_content)
+        
+        # Calculate page hash
+        page_hash = self.calculate_page_hash(extracted['content'])
+        
+        # Check for exact and near duplicates
+        is_duplicate = False
+        simhash_index = self.get_simhash_index()
+        simhash_index.remove(previous_simhash, url)
+        duplicate_of = simhash_index.find_near_duplicate(extracted['simhash'], exclude_url=url)
+        if duplicate_of:
+            logger.info(f"Near-duplicate of {duplicate_of}: {url}")
+            is_duplicate = True
+            # Keep only metadata for near-duplicates; the canonical page holds the body
+            extracted['content'] = ''
+            html_content = ''
+        else:
+            simhash_index.add(extracted['simhash'], url)
+        
+        return WebPage(
+            url=url,
+            title=extracted['title'],
+            content=extracted['content'],
+            html_content=html_content,
+            meta_description=extracted['meta_description'],
+            meta_keywords=extracted['meta_keywords'],
+            links=extracted['links'],
+            images=extracted['images'],
+            status_code=fetched['status_code'],
+            content_type=fetched['content_type'],
+            content_length=fetched['content_length'],
+            last_modified=fetched['last_modified'],
+            crawl_timestamp=datetime.now(),
+            depth=depth,
+            parent_url=parent_url,
+            page_hash=page_hash,
+            is_duplicate=is_duplicate,
+            simhash=extracted['simhash'],
+            etag=fetched['etag']
+        )
+    
+    async def refresh_page(self, url: str, delay: float = 0.0) -> str:
+        """Re-crawl a stored page with a conditional GET.
+        
+        Returns 'unchanged', 'updated' or 'failed'.
+        """
+        try:
+            existing_page = self.db.get_web_page(url)
+            if not existing_page or not await self.check_robots_txt(url):
+                return 'failed'
+            
+            fetched = await self._fetch_page(url, delay, existing_page)
+            if not fetched:
+                return 'failed'
+            if fetched['status_code'] == 304:
+                self.db.touch_web_page(url, datetime.now())
+                return 'unchanged'
+            
+            page = await self._build_page(url, fetched, existing_page.depth, existing_page.parent_url,
+                                          previous_simhash=existing_page.simhash)
+            self.db.save_web_page(page)
+            return 'unchanged' if page.page_hash == existing_page.page_hash else 'updated'
         except Exception as e:
-            logger.error(f"Error crawling page {url}: {e}")
-            return None
+            logger.error(f"Error refreshing page {url}: {e}")
+            return 'failed'
+    
+    async def recrawl_pages(self, max_age: timedelta, limit: int = 1000,
+                            delay: float = 0.0) -> Dict[str, int]:
+        """Revalidate pages last crawled more than max_age ago."""
+        urls = deque(self.db.get_pages_due_for_refresh(datetime.now() - max_age, limit))
+        results = {'checked': 0, 'unchanged': 0, 'updated': 0, 'failed': 0}
+        
+        async def refresh_worker():
+            while urls:
+                outcome = await self.refresh_page(urls.popleft(), delay)
+                results[outcome] += 1
+                results['checked'] += 1
+        
+        await asyncio.gather(*(refresh_worker() for _ in range(min(self.max_workers, len(urls)))))
+        return results
     
     async def add_new_urls_to_queue(self, page: WebPage, job: CrawlJob, depth: int):
         """Add new URLs from page to crawl queue."""
         try:
             parsed_base_url = urlparse(page.url)
             base_domain = parsed_base_url.netloc
+            frontier = self.get_frontier(job.job_id)
+            
+            # Add to queue with lower priority for deeper pages
+            priority = max(0, 10 - depth)
             
             for link in page.links:
                 # Convert relative URLs to absolute
@@ -668,13 +1654,8 @@ class WebCrawlerService:
                 if not job.follow_external and parsed_link.netloc != base_domain:
                     continue
                 
-                # Skip if already in queue or crawled
-                if self.db.get_web_page(absolute_url):
-                    continue
-                
-                # Add to queue with lower priority for deeper pages
-                priority = max(0, 10 - depth)
-                self.db.add_to_crawl_queue(absolute_url, job.job_id, depth, page.url, priority)
+                # The frontier skips URLs already queued or crawled for this job
+                frontier.add(absolute_url, depth, page.url, priority)
                 
         except Exception as e:
             logger.error(f"Error adding URLs to queue: {e}")
@@ -687,40 +1668,27 @@ class WebCrawlerService:
                 logger.error(f"Job not found: {job_id}")
                 return False
             
-            # Update job status
+            # Update job status; a job interrupted mid-run resumes from its last flush
             job.status = "running"
-            job.started_at = datetime.now()
+            job.started_at = job.started_at or datetime.now()
             self.db.save_crawl_job(job)
             
             logger.info(f"Starting crawl job: {job.name}")
             
-            while job.pages_crawled < job.max_pages:
-                # Get next URL from queue
-                next_url_data = self.db.get_next_crawl_url(job_id)
-                if not next_url_data:
-                    break  # No more URLs to crawl
-                
-                url, depth, parent_url = next_url_data
-                
-                # Crawl the page
-                page = await self.crawl_page(url, job, depth, parent_url)
-                
-                if page:
-                    job.pages_crawled += 1
-                    if page.is_duplicate:
-                        job.pages_crawled -= 1  # Don't count duplicates
-                else:
-                    job.pages_failed += 1
-                
-                # Mark URL as completed
-                self.db.mark_url_completed(url, job_id)
-                
-                # Update job progress
-                self.db.save_crawl_job(job)
-                
-                # Delay between requests
-                if job.delay > 0:
-                    await asyncio.sleep(job.delay)
+            # Run a pool of workers pulling from the shared frontier
+            frontier = self.get_frontier(job_id)
+            frontier.buffer.job = job
+            progress = {'in_flight': 0}
+            workers = [
+                asyncio.create_task(self._crawl_worker(job, frontier, progress))
+                for _ in range(self.max_workers)
+            ]
+            try:
+                await asyncio.gather(*workers)
+            finally:
+                for worker in workers:
+                    worker.cancel()
+                self.close_frontier(job_id)
             
             # Mark job as completed
             job.status = "completed"
@@ -740,6 +1708,36 @@ class WebCrawlerService:
                 self.db.save_crawl_job(job)
             return False
     
+    async def _crawl_worker(self, job: CrawlJob, frontier: CrawlFrontier,
+                            progress: Dict[str, int]):
+        """Crawl URLs from the frontier until the page budget or frontier is exhausted."""
+        # Pages in flight are reserved against max_pages so workers don't overshoot
+        while job.pages_crawled + progress['in_flight'] < job.max_pages:
+            next_url_data = frontier.pop()
+            if not next_url_data:
+                if progress['in_flight'] == 0:
+                    break  # No more URLs and no worker can discover new ones
+                await asyncio.sleep(self.idle_poll_interval)
+                continue
+            
+            url, depth, parent_url = next_url_data
+            
+            progress['in_flight'] += 1
+            try:
+                page = await self.crawl_page(url, job, depth, parent_url)
+            finally:
+                progress['in_flight'] -= 1
+            
+            if page:
+                if not page.is_duplicate:
+                    job.pages_crawled += 1  # Don't count duplicates
+            else:
+                job.pages_failed += 1
+            
+            # Mark URL as completed; job progress is written with the next batch
+            frontier.complete(url)
+            frontier.buffer.maybe_flush()
+    
     def get_crawl_job(self, job_id: str) -> Optional[CrawlJob]:
         """Get crawl job by ID."""
         return self.db.get_crawl_job(job_id)
@@ -749,14 +1747,31 @@ class WebCrawlerService:
         return self.db.get_crawl_stats(job_id)
     
     def search_pages(self, query: str, job_id: str = None, limit: int = 20) -> List[WebPage]:
-        """Search crawled pages."""
+        """Search crawled pages, best matches first."""
         try:
+            fts_query = build_fts_query(query)
+            if not fts_query:
+                return []
+            
             conn = sqlite3.connect(self.db.db_path)
             cursor = conn.cursor()
             
-            if job_id:
+            if self.db.fts_enabled:
+                # Rank by BM25 with title matches boosted; join the job via crawl_queue's key
+                job_join = 'JOIN crawl_queue q ON q.url = w.url AND q.job_id = ?' if job_id else ''
+                params = ([job_id] if job_id else []) + [fts_query, *self.db.SEARCH_WEIGHTS, limit]
+                cursor.execute(f'''
+                    SELECT w.*, snippet(web_pages_fts, 1, '<b>', '</b>', '...', 24) AS snippet
+                    FROM web_pages_fts
+                    JOIN web_pages w ON w.page_id = web_pages_fts.rowid
+                    {job_join}
+                    WHERE web_pages_fts MATCH ?
+                    ORDER BY bm25(web_pages_fts, ?, ?, ?)
+                    LIMIT ?
+                ''', params)
+            elif job_id:
                 cursor.execute('''
-                    SELECT * FROM web_pages 
+                    SELECT *, '' FROM web_pages 
                     WHERE url IN (SELECT url FROM crawl_queue WHERE job_id = ?)
                     AND (title LIKE ? OR content LIKE ? OR meta_description LIKE ?)
                     ORDER BY crawl_timestamp DESC
@@ -764,7 +1779,7 @@ class WebCrawlerService:
                 ''', (job_id, f'%{query}%', f'%{query}%', f'%{query}%', limit))
             else:
                 cursor.execute('''
-                    SELECT * FROM web_pages 
+                    SELECT *, '' FROM web_pages 
                     WHERE title LIKE ? OR content LIKE ? OR meta_description LIKE ?
                     ORDER BY crawl_timestamp DESC
                     LIMIT ?
@@ -776,7 +1791,7 @@ class WebCrawlerService:
                     url=row[0],
                     title=row[1] or "",
                     content=row[2] or "",
-                    html_content=row[3] or "",
+                    html_content=decompress_html(row[3]),
                     meta_description=row[4] or "",
                     meta_keywords=row[5] or "",
                     links=json.loads(row[6]) if row[6] else [],
@@ -789,7 +1804,10 @@ class WebCrawlerService:
                     depth=row[13] or 0,
                     parent_url=row[14],
                     page_hash=row[15] or "",
-                    is_duplicate=bool(row[16])
+                    is_duplicate=bool(row[16]),
+                    simhash=to_unsigned_64(row[17]),
+                    etag=row[18] or "",
+                    snippet=row[-1] or ""
                 )
                 pages.append(page)
             
@@ -1022,6 +2040,7 @@ def search_pages():
             'title': page.title,
             'content': page.content[:500] + '...' if len(page.content) > 500 else page.content,
             'meta_description': page.meta_description,
+            'snippet': page.snippet,
             'crawl_timestamp': page.crawl_timestamp.isoformat(),
             'status_code': page.status_code
         })
@@ -15,6 +15,8 @@ from collections import defaultdict, deque
 from enum import Enum
 import statistics
 import hashlib
+import heapq
+import math
 import urllib.parse
 import re
 from urllib.robotparser import RobotFileParser
@@ -121,7 +123,7 @@ class WebCrawler:
         self.urls = {}  # url -> URL
         self.pages = {}  # url -> WebPage
         self.crawl_jobs = {}  # job_id -> CrawlJob
-        self.robots_cache = {}  # domain -> RobotFileParser
+        self.robots_cache = {}  # domain -> (RobotFileParser or None, expires_at)
         
         # Crawl queues
         self.pending_urls = deque()  # Queue of URLs to crawl
@@ -131,7 +133,8 @@ class WebCrawler:
         # Indexes
         self.domain_urls = defaultdict(list)  # domain -> List[url]
         self.job_urls = defaultdict(list)  # job_id -> List[url]
-        self.content_index = defaultdict(list)  # word -> List[url]
+        self.content_index = defaultdict(dict)  # word -> {url: term weight}
+        self.page_terms = {}  # url -> words indexed for the page
         
         # Threading
         self.lock = threading.RLock()
@@ -145,6 +148,13 @@ class WebCrawler:
         self.max_retries = 3
         self.retry_delay = 60  # seconds
         self.cleanup_interval = 3600  # 1 hour
+        self.robots_ttl = 3600  # seconds
+        
+        # Shared HTTP session so workers reuse keep-alive connections per host
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=100, pool_maxsize=self.max_workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
         
         # Logging
         self.logger = logging.getLogger(__name__)
@@ -250,22 +260,26 @@ class WebCrawler:
             if not query_words:
                 return []
             
-            # Find URLs containing query words
-            matching_urls = set()
+            # Score URLs straight from the postings (tf-idf, title boosted at index time)
+            total_pages = max(1, len(self.page_terms))
+            scores = defaultdict(float)
             for word in query_words:
-                if word in self.content_index:
-                    matching_urls.update(self.content_index[word])
+                postings = self.content_index.get(word)
+                if not postings:
+                    continue
+                idf = math.log(1 + total_pages / len(postings))
+                for url, weight in postings.items():
+                    scores[url] += weight * idf
             
             # Filter by job if specified
             if job_id and job_id in self.job_urls:
                 job_urls = set(self.job_urls[job_id])
-                matching_urls = matching_urls & job_urls
-            
-            # Get pages and rank by relevance
-            pages = [self.pages[url] for url in matching_urls if url in self.pages]
-            pages.sort(key=lambda x: self._calculate_relevance_score(x, query_words), reverse=True)
+                scores = {url: score for url, score in scores.items() if url in job_urls}
             
-            return pages[:limit]
+            # Get the best-scoring pages without sorting every match
+            top_urls = heapq.nlargest(limit, (url for url in scores if url in self.pages),
+                                      key=scores.get)
+            return [self.pages[url] for url in top_urls]
     
     def get_domain_stats(self, domain: str) -> Dict[str, Any]:
         """Get statistics for a domain"""
@@ -367,8 +381,9 @@ class WebCrawler:
                 # Crawl the URL
                 self._crawl_url(url, job_id)
                 
-                # Respect crawl delay
-                time.sleep(self.crawl_delay)
+                # Respect crawl delay, including the domain's robots.txt Crawl-delay
+                url_obj = self.urls.get(url)
+                time.sleep(self._get_crawl_delay(url_obj) if url_obj else self.crawl_delay)
                 
             except Exception as e:
                 self.logger.error(f"Error in crawler worker: {e}")
@@ -410,7 +425,7 @@ class WebCrawler:
         
         try:
             # Make HTTP request
-            response = requests.get(
+            response = self.session.get(
                 url,
                 timeout=self.timeout,
                 headers={"User-Agent": job.user_agent},
@@ -479,24 +494,43 @@ class WebCrawler:
     
     def _check_robots_txt(self, url_obj: URL) -> bool:
         """Check robots.txt for URL"""
-        domain = url_obj.domain
-        
-        if domain not in self.robots_cache:
-            try:
-                robots_url = f"http://{domain}/robots.txt"
-                rp = RobotFileParser()
-                rp.set_url(robots_url)
-                rp.read()
-                self.robots_cache[domain] = rp
-            except:
-                self.robots_cache[domain] = None
-        
-        rp = self.robots_cache[domain]
+        rp = self._get_robots_parser(url_obj)
         if not rp:
             return True
         
         return rp.can_fetch("*", url_obj.url)
     
+    def _get_robots_parser(self, url_obj: URL) -> Optional[RobotFileParser]:
+        """Get the cached robots.txt parser for the URL's domain, refetching after the TTL"""
+        domain = url_obj.domain
+        
+        cached = self.robots_cache.get(domain)
+        if cached and cached[1] > time.time():
+            return cached[0]
+        
+        rp = None
+        try:
+            scheme = urllib.parse.urlparse(url_obj.url).scheme or "http"
+            response = self.session.get(f"{scheme}://{domain}/robots.txt", timeout=self.timeout)
+            rp = RobotFileParser()
+            if response.status_code in (401, 403):
+                rp.disallow_all = True
+            elif response.status_code >= 400:
+                rp.allow_all = True
+            else:
+                rp.parse(response.text.splitlines())
+        except Exception:
+            rp = None
+        
+        self.robots_cache[domain] = (rp, time.time() + self.robots_ttl)
+        return rp
+    
+    def _get_crawl_delay(self, url_obj: URL) -> float:
+        """Crawl delay for a domain, honoring robots.txt Crawl-delay"""
+        cached = self.robots_cache.get(url_obj.domain)
+        robots_delay = cached[0].crawl_delay("*") if cached and cached[0] else None
+        return max(self.crawl_delay, float(robots_delay or 0))
+    
     def _process_response(self, url: str, response: requests.Response, job: CrawlJob) -> Optional[WebPage]:
         """Process HTTP response"""
         if response.status_code != 200:
@@ -636,10 +670,23 @@ class WebCrawler:
             self.logger.error(f"Error extracting links from {page.url}: {e}")
     
     def _index_content(self, page: WebPage):
-        """Index page content for search"""
-        words = self._extract_words(page.content)
-        for word in words:
-            self.content_index[word].append(page.url)
+        """Index page content for search, replacing any earlier postings for the URL"""
+        for word in self.page_terms.pop(page.url, ()):
+            postings = self.content_index.get(word)
+            if postings is not None:
+                postings.pop(page.url, None)
+                if not postings:
+                    del self.content_index[word]
+        
+        term_counts = defaultdict(float)
+        for word in re.findall(r'\b[a-zA-Z]{3,}\b', page.content.lower()):
+            term_counts[word] += 1.0
+        for word in self._extract_words(page.title):
+            term_counts[word] += 5.0  # Boost title matches
+        
+        for word, count in term_counts.items():
+            self.content_index[word][page.url] = 1.0 + math.log(count)
+        self.page_terms[page.url] = set(term_counts)
     
     def _extract_words(self, text: str) -> List[str]:
         """Extract words from text"""
@@ -647,24 +694,6 @@ class WebCrawler:
         words = re.findall(r'\b[a-zA-Z]{3,}\b', text.lower())
         return list(set(words))  # Remove duplicates
     
-    def _calculate_relevance_score(self, page: WebPage, query_words: List[str]) -> float:
-        """Calculate relevance score for search"""
-        content_words = self._extract_words(page.content)
-        title_words = self._extract_words(page.title)
-        
-        score = 0.0
-        
-        # Count word matches in content
-        for word in query_words:
-            score += content_words.count(word)
-        
-        # Boost score for title matches
-        for word in query_words:
-            if word in title_words:
-                score += 5.0
-        
-        return score
-    
     def _persist_url(self, url_obj: URL):
         """Persist URL to Redis"""
         url_data = {